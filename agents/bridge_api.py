@@ -1,71 +1,639 @@
 #!/usr/bin/env python3
 """
 Agent: bridge_api
-Version: 1.6
+Version: 1.9
 Description: REST API bridge for external system integration
-Status: Scaffold - waiting for implementation
+
+Async HTTP service (aiohttp) on BRIDGE_API_PORT (default 5000). Database
+access goes through a psycopg2 ThreadedConnectionPool; queries run in a
+thread pool sized to the connection pool, so the event loop never blocks and
+hundreds of concurrent readers share a bounded number of connections.
+
+Endpoints:
+- GET  /health
+- GET  /api/v1/matches             keyset pagination (?cursor=), ETag
+- GET  /api/v1/coverage            GREEN/YELLOW/RED summary per project, ETag
+- GET  /api/v1/trace/{req_id}      trace layers of a requirement, ETag
+- POST /api/v1/jobs                submit a job (agent_job table)
+- GET  /api/v1/jobs, /api/v1/jobs/{job_id}
+- GET  /api/v1/export/matches.jsonl   streamed JSON Lines export
+- POST /system-status, GET /system-status   node metrics (resource_monitor)
+- GET  /metrics                    Prometheus text format (agents/runtime/metrics)
+
+If BRIDGE_API_TOKEN is set, /api/* requires "Authorization: Bearer <token>".
 """
 
 import os
 import sys
+import json
 import time
-import psutil
+import base64
+import asyncio
+import hashlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+
+from aiohttp import web
+from psycopg2.extras import RealDictCursor
 
 # Add parent directory to path for imports
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from agents.db_bridge.database import update_agent_heartbeat
+from agents.db_bridge.database import (
+    update_agent_heartbeat,
+    get_connection_pool,
+    FULL_MATCH_THRESHOLD,
+    PARTIAL_MATCH_THRESHOLD
+)
+from agents.runtime.metrics import REGISTRY
+from agents.runtime.resources import get_resource_metrics
 
 AGENT_NAME = "bridge_api"
+API_VERSION = "1.9"
 
+BRIDGE_API_PORT = int(os.getenv('BRIDGE_API_PORT', '5000'))
+BRIDGE_DB_POOL = int(os.getenv('BRIDGE_DB_POOL', '20'))
+BRIDGE_API_TOKEN = os.getenv('BRIDGE_API_TOKEN')
+BRIDGE_DEFAULT_MODEL = os.getenv('BRIDGE_DEFAULT_MODEL', 'nomic-embed-text')
+PAGE_SIZE_DEFAULT = 200
+PAGE_SIZE_MAX = 1000
+EXPORT_BATCH = 2000
+HEARTBEAT_INTERVAL = 30
 
-def get_resource_metrics():
-    """Get current CPU and RAM usage."""
-    return {
-        "cpu_percent": psutil.cpu_percent(interval=1),
-        "ram_percent": psutil.virtual_memory().percent,
-        "ram_mb": round(psutil.virtual_memory().used / 1024 / 1024, 2)
-    }
+# Job types accepted by POST /api/v1/jobs ('report' is consumed by report_agent)
+JOB_TYPES = ("report",)
 
+LAYER_SCOPES = ("system", "arch", "code", "test")
+
+
+# ============================================================================
+# DATABASE ACCESS
+# ============================================================================
+
+class PooledDatabase:
+    """psycopg2 connection pool used from asyncio through a thread pool."""
+
+    def __init__(self, maxconn: int = BRIDGE_DB_POOL):
+        self.maxconn = maxconn
+        self.pool = get_connection_pool(1, maxconn)
+        self.executor = ThreadPoolExecutor(max_workers=maxconn, thread_name_prefix="bridge-db")
+        # Connections held across awaits (exports) must never exceed the pool
+        self.slots = asyncio.Semaphore(maxconn)
+
+    async def _run(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, fn, *args)
+
+    @asynccontextmanager
+    async def connection(self):
+        async with self.slots:
+            conn = await self._run(self.pool.getconn)
+            try:
+                yield conn
+            finally:
+                try:
+                    await self._run(conn.rollback)
+                finally:
+                    self.pool.putconn(conn)
+
+    @staticmethod
+    def _execute(conn, query: str, params: tuple, fetch: str):
+        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            cur.execute(query, params)
+            if fetch == "all":
+                result = [dict(r) for r in cur.fetchall()]
+            elif fetch == "one":
+                row = cur.fetchone()
+                result = dict(row) if row else None
+            else:
+                result = cur.rowcount
+        conn.commit()
+        return result
+
+    async def fetch_all(self, query: str, params: tuple = ()) -> list:
+        async with self.connection() as conn:
+            return await self._run(self._execute, conn, query, params, "all")
+
+    async def fetch_one(self, query: str, params: tuple = ()) -> dict:
+        async with self.connection() as conn:
+            return await self._run(self._execute, conn, query, params, "one")
+
+    async def execute(self, query: str, params: tuple = ()) -> int:
+        async with self.connection() as conn:
+            return await self._run(self._execute, conn, query, params, "none")
+
+    async def stream(self, query: str, params: tuple = (), batch: int = EXPORT_BATCH):
+        """Async generator over a server-side cursor (rows fetched in batches)."""
+        async with self.connection() as conn:
+            cur = await self._run(lambda: conn.cursor(name="bridge_export", cursor_factory=RealDictCursor))
+            try:
+                await self._run(cur.execute, query, params)
+                while True:
+                    rows = await self._run(cur.fetchmany, batch)
+                    if not rows:
+                        break
+                    yield rows
+            finally:
+                await self._run(cur.close)
+
+    def close(self):
+        self.executor.shutdown(wait=False)
+        self.pool.closeall()
+
+
+class RequestStats:
+    """Request counters and latency window for the heartbeat."""
+
+    def __init__(self, window: int = 1000):
+        self.count = 0
+        self.errors = 0
+        self.not_modified = 0
+        self.in_flight = 0
+        self.recent = deque(maxlen=window)
+
+    def snapshot(self) -> dict:
+        ordered = sorted(self.recent)
+
+        def pct(p):
+            return round(ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))], 2) if ordered else 0.0
+
+        return {"requests": self.count, "errors": self.errors, "not_modified": self.not_modified,
+                "in_flight": self.in_flight, "p50_ms": pct(50), "p95_ms": pct(95)}
+
+
+# ============================================================================
+# HELPERS
+# ============================================================================
+
+def json_response(data, status: int = 200, headers: dict = None) -> web.Response:
+    return web.Response(text=json.dumps(data, default=str), status=status,
+                        content_type="application/json", headers=headers)
+
+
+def make_etag(*parts) -> str:
+    digest = hashlib.sha256(json.dumps(parts, default=str, sort_keys=True).encode('utf-8')).hexdigest()
+    return f'"{digest[:32]}"'
+
+
+def not_modified(request: web.Request, etag: str):
+    """304 response if If-None-Match matches the ETag, else None."""
+    header = request.headers.get("If-None-Match", "")
+    if etag in [t.strip() for t in header.split(",")] or header.strip() == "*":
+        request.app["stats"].not_modified += 1
+        return web.Response(status=304, headers={"ETag": etag})
+    return None
+
+
+def encode_cursor(match_id: int) -> str:
+    return base64.urlsafe_b64encode(json.dumps({"id": match_id}).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> int:
+    if not cursor:
+        return 0
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        return int(json.loads(base64.urlsafe_b64decode(padded))["id"])
+    except Exception:
+        raise web.HTTPBadRequest(text=json.dumps({"error": "invalid cursor"}), content_type="application/json")
+
+
+def int_param(request: web.Request, name: str, default: int, maximum: int = None) -> int:
+    try:
+        value = int(request.query.get(name, default))
+    except ValueError:
+        raise web.HTTPBadRequest(text=json.dumps({"error": f"{name} must be an integer"}),
+                                 content_type="application/json")
+    return max(1, min(value, maximum)) if maximum else value
+
+
+async def resolve_model_id(request: web.Request) -> int:
+    """?model= (name or id), default BRIDGE_DEFAULT_MODEL. Cached per process."""
+    model = request.query.get("model", BRIDGE_DEFAULT_MODEL)
+    if model.isdigit():
+        return int(model)
+    cache = request.app["model_ids"]
+    if model not in cache:
+        row = await request.app["db"].fetch_one(
+            "SELECT model_id FROM embedding_models WHERE model_name = %s", (model,))
+        if not row:
+            raise web.HTTPNotFound(text=json.dumps({"error": f"unknown model {model}"}),
+                                   content_type="application/json")
+        cache[model] = row["model_id"]
+    return cache[model]
+
+
+async def matches_version(db: PooledDatabase, model_id: int) -> dict:
+    """
+    Cheap version probe of the matches of a model for ETags, without touching
+    matches: the latest finished run (runs replace the matches), the model's
+    committed thresholds (re-classify in place) and matches_changed_at (LLM
+    verdicts, clearing).
+    """
+    return await db.fetch_one("""
+        SELECT r.run_id, r.finished_at,
+               em.full_threshold, em.partial_threshold, em.thresholds_committed_at, em.matches_changed_at
+        FROM (SELECT %s::int AS model_id) x
+        LEFT JOIN embedding_models em ON em.model_id = x.model_id
+        LEFT JOIN LATERAL (
+            SELECT run_id, finished_at
+            FROM match_runs
+            WHERE model_id = x.model_id AND finished_at IS NOT NULL
+            ORDER BY run_id DESC
+            LIMIT 1
+        ) r ON true
+    """, (model_id,))
+
+
+async def graph_version(db: PooledDatabase) -> dict:
+    """
+    Version probe of nodes and links for ETags: their insert/update/delete
+    counters from pg_stat_user_tables (no table scan). The counters are
+    published at transaction end, at most about a second late.
+    """
+    return await db.fetch_one("""
+        SELECT SUM(n_tup_ins) AS ins, SUM(n_tup_upd) AS upd, SUM(n_tup_del) AS del
+        FROM pg_stat_user_tables
+        WHERE relid IN ('nodes'::regclass, 'links'::regclass)
+    """)
+
+
+def committed_thresholds(version: dict) -> tuple:
+    """(GREEN, YELLOW) thresholds committed for the model, defaults if it was never matched."""
+    if version.get("full_threshold") is None or version.get("partial_threshold") is None:
+        return FULL_MATCH_THRESHOLD, PARTIAL_MATCH_THRESHOLD
+    return version["full_threshold"], version["partial_threshold"]
+
+
+def match_filters(request: web.Request, model_id: int) -> tuple:
+    """WHERE clause + params for ?project=, ?classification=, ?verdict=, ?max_rank=.
+
+    ?verdict= is an LLM re-ranking verdict (MATCH, PARTIAL, NO_MATCH) or NONE
+    for matches that were not judged.
+    """
+    where = ["m.model_id = %s"]
+    params = [model_id]
+    if request.query.get("project"):
+        where.append("c.project_id = %s")
+        params.append(request.query["project"])
+    if request.query.get("classification"):
+        where.append("m.classification = %s")
+        params.append(request.query["classification"].upper())
+    if request.query.get("verdict"):
+        verdict = request.query["verdict"].upper()
+        if verdict == "NONE":
+            where.append("m.rerank_verdict IS NULL")
+        else:
+            where.append("m.rerank_verdict = %s")
+            params.append(verdict)
+    if request.query.get("max_rank"):
+        where.append("m.match_rank <= %s")
+        params.append(int_param(request, "max_rank", 1))
+    return " AND ".join(where), params
+
+
+MATCH_COLUMNS = """
+    m.match_id, m.model_id,
+    c.project_id AS customer_project_id, c.attributes->>'req_id' AS customer_req_id,
+    p.project_id AS platform_project_id, p.attributes->>'req_id' AS platform_req_id,
+    m.similarity_score, m.match_rank, m.classification,
+    m.rerank_verdict, m.rerank_score, m.rerank_model, m.created_at
+"""
+
+
+# ============================================================================
+# HANDLERS
+# ============================================================================
+
+async def handle_health(request: web.Request) -> web.Response:
+    return json_response({"status": "running", "agent": AGENT_NAME, "version": API_VERSION})
+
+
+async def handle_metrics(request: web.Request) -> web.Response:
+    return web.Response(text=REGISTRY.render(), content_type="text/plain", charset="utf-8")
 
-def main_loop():
-    """Main daemon loop - sends heartbeat every 30s."""
-    db_host = os.getenv('DB_HOST', 'localhost')
-    db_port = os.getenv('DB_PORT', '5432')
 
-    print(f"[{AGENT_NAME}] Starting daemon loop...")
-    print(f"[{AGENT_NAME}] Connected to DB at {db_host}:{db_port}")
-    print(f"[{AGENT_NAME}] Status: Scaffold (waiting for implementation)")
+async def handle_matches(request: web.Request) -> web.Response:
+    """Match results, keyset paginated by match_id."""
+    db = request.app["db"]
+    model_id = await resolve_model_id(request)
+    limit = int_param(request, "limit", PAGE_SIZE_DEFAULT, PAGE_SIZE_MAX)
+    after = decode_cursor(request.query.get("cursor"))
 
+    etag = make_etag("matches", request.query_string, await matches_version(db, model_id))
+    cached = not_modified(request, etag)
+    if cached:
+        return cached
+
+    where, params = match_filters(request, model_id)
+    rows = await db.fetch_all(f"""
+        SELECT {MATCH_COLUMNS}
+        FROM matches m
+        JOIN nodes c ON c.node_uuid = m.customer_node_uuid
+        JOIN nodes p ON p.node_uuid = m.platform_node_uuid
+        WHERE {where} AND m.match_id > %s
+        ORDER BY m.match_id
+        LIMIT %s
+    """, tuple(params + [after, limit + 1]))
+
+    has_more = len(rows) > limit
+    items = rows[:limit]
+    return json_response({
+        "items": items,
+        "count": len(items),
+        "next_cursor": encode_cursor(items[-1]["match_id"]) if has_more else None
+    }, headers={"ETag": etag})
+
+
+async def handle_coverage(request: web.Request) -> web.Response:
+    """Coverage summary of a customer project (best match per requirement)."""
+    db = request.app["db"]
+    project = request.query.get("project")
+    if not project:
+        return json_response({"error": "project is required"}, status=400)
+    model_id = await resolve_model_id(request)
+
+    version = await matches_version(db, model_id)
+    full_threshold, partial_threshold = committed_thresholds(version)
+    etag = make_etag("coverage", request.query_string, version)
+    cached = not_modified(request, etag)
+    if cached:
+        return cached
+
+    row = await db.fetch_one("""
+        WITH best AS (
+            SELECT DISTINCT ON (m.customer_node_uuid) m.customer_node_uuid, m.similarity_score
+            FROM matches m
+            JOIN nodes c ON c.node_uuid = m.customer_node_uuid
+            WHERE m.model_id = %s AND c.project_id = %s
+            ORDER BY m.customer_node_uuid, m.match_rank
+        )
+        SELECT COUNT(*) AS total,
+               COUNT(*) FILTER (WHERE similarity_score >= %s) AS green,
+               COUNT(*) FILTER (WHERE similarity_score >= %s AND similarity_score < %s) AS yellow,
+               COUNT(*) FILTER (WHERE similarity_score < %s) AS red
+        FROM best
+    """, (model_id, project, full_threshold, partial_threshold, full_threshold, partial_threshold))
+
+    total = row["total"]
+    summary = {"project_id": project, "model_id": model_id, **row}
+    for color in ("green", "yellow", "red"):
+        summary[f"pct_{color}"] = round(row[color] / total * 100, 2) if total else 0.0
+    return json_response(summary, headers={"ETag": etag})
+
+
+async def handle_trace(request: web.Request) -> web.Response:
+    """
+    Trace of a requirement: for a customer req_id its best platform match,
+    then all nodes reachable over links from the platform requirement.
+    """
+    db = request.app["db"]
+    req_id = request.match_info["req_id"]
+    model_id = await resolve_model_id(request)
+
+    etag = make_etag("trace", req_id, model_id, await matches_version(db, model_id), await graph_version(db))
+    cached = not_modified(request, etag)
+    if cached:
+        return cached
+
+    root = await db.fetch_one("""
+        SELECT n.node_uuid, n.project_id, n.scope, n.content,
+               n.attributes->>'req_id' AS req_id
+        FROM nodes n
+        WHERE n.attributes->>'req_id' = %s
+        ORDER BY (n.scope = 'customer') DESC
+        LIMIT 1
+    """, (req_id,))
+    if not root:
+        return json_response({"error": f"requirement {req_id} not found"}, status=404)
+
+    result = {"requirement": root, "match": None, "layers": {s: [] for s in LAYER_SCOPES}}
+    platform_uuid = root["node_uuid"]
+
+    if root["scope"] == "customer":
+        match = await db.fetch_one("""
+            SELECT p.node_uuid, p.project_id, p.attributes->>'req_id' AS req_id, p.content,
+                   m.similarity_score, m.classification
+            FROM matches m JOIN nodes p ON p.node_uuid = m.platform_node_uuid
+            WHERE m.model_id = %s AND m.customer_node_uuid = %s
+            ORDER BY m.match_rank
+            LIMIT 1
+        """, (model_id, root["node_uuid"]))
+        result["match"] = match
+        platform_uuid = match["node_uuid"] if match else None
+
+    if platform_uuid:
+        nodes = await db.fetch_all("""
+            WITH RECURSIVE reach(node_uuid) AS (
+                SELECT target_uuid FROM links WHERE source_uuid = %s
+                UNION
+                SELECT l.target_uuid FROM links l JOIN reach r ON l.source_uuid = r.node_uuid
+            )
+            SELECT n.node_uuid, n.scope, n.type, n.attributes->>'req_id' AS req_id, LEFT(n.content, 300) AS content
+            FROM reach JOIN nodes n ON n.node_uuid = reach.node_uuid
+            WHERE n.node_uuid <> %s
+        """, (platform_uuid, platform_uuid))
+        for node in nodes:
+            if node["scope"] in result["layers"]:
+                result["layers"][node["scope"]].append(node)
+
+    result["layer_counts"] = {s: len(v) for s, v in result["layers"].items()}
+    return json_response(result, headers={"ETag": etag})
+
+
+async def handle_submit_job(request: web.Request) -> web.Response:
+    try:
+        body = await request.json()
+    except Exception:
+        return json_response({"error": "JSON body required"}, status=400)
+
+    job_type = body.get("job_type")
+    if job_type not in JOB_TYPES:
+        return json_response({"error": f"job_type must be one of {list(JOB_TYPES)}"}, status=400)
+
+    row = await request.app["db"].fetch_one("""
+        INSERT INTO agent_job (job_type, params, submitted_by)
+        VALUES (%s, %s, %s)
+        RETURNING job_id, job_type, params, status, created_at
+    """, (job_type, json.dumps(body.get("params") or {}),
+          body.get("submitted_by") or request.remote))
+    return json_response(row, status=202, headers={"Location": f"/api/v1/jobs/{row['job_id']}"})
+
+
+async def handle_get_job(request: web.Request) -> web.Response:
+    try:
+        job_id = int(request.match_info["job_id"])
+    except ValueError:
+        return json_response({"error": "invalid job id"}, status=400)
+    row = await request.app["db"].fetch_one("SELECT * FROM agent_job WHERE job_id = %s", (job_id,))
+    if not row:
+        return json_response({"error": "job not found"}, status=404)
+    return json_response(row)
+
+
+async def handle_list_jobs(request: web.Request) -> web.Response:
+    limit = int_param(request, "limit", 50, PAGE_SIZE_MAX)
+    status = request.query.get("status")
+    rows = await request.app["db"].fetch_all(f"""
+        SELECT job_id, job_type, status, submitted_by, created_at, started_at, finished_at
+        FROM agent_job
+        {"WHERE status = %s" if status else ""}
+        ORDER BY job_id DESC
+        LIMIT %s
+    """, (status, limit) if status else (limit,))
+    return json_response({"items": rows, "count": len(rows)})
+
+
+async def handle_export_matches(request: web.Request) -> web.StreamResponse:
+    """All matches (same filters as /matches) as JSON Lines, streamed from a server-side cursor."""
+    db = request.app["db"]
+    model_id = await resolve_model_id(request)
+
+    etag = make_etag("export", request.query_string, await matches_version(db, model_id))
+    cached = not_modified(request, etag)
+    if cached:
+        return cached
+
+    where, params = match_filters(request, model_id)
+    response = web.StreamResponse(headers={
+        "Content-Type": "application/x-ndjson",
+        "Content-Disposition": "attachment; filename=matches.jsonl",
+        "ETag": etag
+    })
+    response.enable_chunked_encoding()
+    await response.prepare(request)
+
+    async for rows in db.stream(f"""
+        SELECT {MATCH_COLUMNS}
+        FROM matches m
+        JOIN nodes c ON c.node_uuid = m.customer_node_uuid
+        JOIN nodes p ON p.node_uuid = m.platform_node_uuid
+        WHERE {where}
+        ORDER BY m.match_id
+    """, tuple(params)):
+        await response.write("".join(json.dumps(dict(r), default=str) + "\n" for r in rows).encode('utf-8'))
+
+    await response.write_eof()
+    return response
+
+
+async def handle_post_system_status(request: web.Request) -> web.Response:
+    """Node metrics from resource_monitor.py (stored in system_health)."""
+    try:
+        data = await request.json()
+    except Exception:
+        data = None
+    if not data:
+        return json_response({"error": "No data received"}, status=400)
+
+    await request.app["db"].execute("""
+        INSERT INTO system_health (node_name, cpu_usage, ram_usage, disk_usage)
+        VALUES (%s, %s, %s, %s)
+    """, (data.get("node", "unknown"), data.get("cpu"), data.get("ram"), data.get("disk")))
+    return json_response({"status": "success"})
+
+
+async def handle_get_system_status(request: web.Request) -> web.Response:
+    """Latest metrics per node."""
+    rows = await request.app["db"].fetch_all("""
+        SELECT DISTINCT ON (node_name) node_name, cpu_usage AS cpu, ram_usage AS ram,
+               disk_usage AS disk, timestamp AS last_update
+        FROM system_health
+        ORDER BY node_name, timestamp DESC
+    """)
+    return json_response({r.pop("node_name"): r for r in rows})
+
+
+# ============================================================================
+# APP
+# ============================================================================
+
+@web.middleware
+async def stats_middleware(request: web.Request, handler):
+    stats = request.app["stats"]
+    stats.count += 1
+    stats.in_flight += 1
+    start = time.perf_counter()
+    try:
+        if BRIDGE_API_TOKEN and request.path.startswith("/api/"):
+            if request.headers.get("Authorization") != f"Bearer {BRIDGE_API_TOKEN}":
+                return json_response({"error": "unauthorized"}, status=401)
+        return await handler(request)
+    except web.HTTPException:
+        raise
+    except Exception as e:
+        stats.errors += 1
+        print(f"[{AGENT_NAME}] [ERROR] {request.method} {request.path}: {e}")
+        return json_response({"error": "internal error"}, status=500)
+    finally:
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        stats.in_flight -= 1
+        stats.recent.append(elapsed_ms)
+        resource = request.match_info.route.resource
+        REGISTRY.histogram("aat_http_request_ms", "Bridge API request latency (ms)",
+                           route=resource.canonical if resource else "unmatched",
+                           method=request.method).observe(elapsed_ms)
+
+
+async def heartbeat_loop(app: web.Application):
+    """Heartbeat with request statistics every HEARTBEAT_INTERVAL seconds."""
+    loop = asyncio.get_running_loop()
     while True:
         try:
-            metrics = get_resource_metrics()
-
             details = {
-                "mode": "scaffold",
-                "status": "waiting_for_implementation",
-                "version": "1.6",
-                "cpu_percent": metrics["cpu_percent"],
-                "ram_percent": metrics["ram_percent"],
-                "ram_mb": metrics["ram_mb"]
+                "mode": "active",
+                "status": "serving",
+                "version": API_VERSION,
+                "port": BRIDGE_API_PORT,
+                "db_pool": BRIDGE_DB_POOL,
+                **app["stats"].snapshot(),
+                **get_resource_metrics(),
+                "metrics": REGISTRY.summary()
             }
+            await loop.run_in_executor(None, lambda: update_agent_heartbeat(
+                agent_name=AGENT_NAME, queue_size=app["stats"].in_flight, details=details))
+        except Exception as e:
+            print(f"[{AGENT_NAME}] Heartbeat error: {e}")
+        await asyncio.sleep(HEARTBEAT_INTERVAL)
 
-            update_agent_heartbeat(
-                agent_name=AGENT_NAME,
-                queue_size=0,
-                details=details
-            )
 
-            print(f"[{AGENT_NAME}] Heartbeat sent: CPU={metrics['cpu_percent']}%, RAM={metrics['ram_percent']}%")
+async def on_startup(app: web.Application):
+    app["db"] = PooledDatabase(BRIDGE_DB_POOL)
+    app["heartbeat"] = asyncio.create_task(heartbeat_loop(app))
+
+
+async def on_cleanup(app: web.Application):
+    app["heartbeat"].cancel()
+    app["db"].close()
 
-        except Exception as e:
-            print(f"[{AGENT_NAME}] Error: {e}")
 
-        time.sleep(30)
+def create_app() -> web.Application:
+    app = web.Application(middlewares=[stats_middleware])
+    app["stats"] = RequestStats()
+    app["model_ids"] = {}
+
+    app.router.add_get("/health", handle_health)
+    app.router.add_get("/metrics", handle_metrics)
+    app.router.add_get("/api/v1/matches", handle_matches)
+    app.router.add_get("/api/v1/coverage", handle_coverage)
+    app.router.add_get("/api/v1/trace/{req_id}", handle_trace)
+    app.router.add_post("/api/v1/jobs", handle_submit_job)
+    app.router.add_get("/api/v1/jobs", handle_list_jobs)
+    app.router.add_get("/api/v1/jobs/{job_id}", handle_get_job)
+    app.router.add_get("/api/v1/export/matches.jsonl", handle_export_matches)
+    app.router.add_post("/system-status", handle_post_system_status)
+    app.router.add_get("/system-status", handle_get_system_status)
+
+    app.on_startup.append(on_startup)
+    app.on_cleanup.append(on_cleanup)
+    return app
 
 
 if __name__ == "__main__":
-    try:
-        main_loop()
-    except KeyboardInterrupt:
-        print(f"[{AGENT_NAME}] Shutting down...")
+    db_host = os.getenv('DB_HOST', 'localhost')
+    db_port = os.getenv('DB_PORT', '5432')
+
+    print(f"[{AGENT_NAME}] Starting v{API_VERSION} on port {BRIDGE_API_PORT}")
+    print(f"[{AGENT_NAME}] Connected to DB at {db_host}:{db_port} (pool={BRIDGE_DB_POOL})")
+
+    web.run_app(create_app(), host="0.0.0.0", port=BRIDGE_API_PORT, access_log=None)
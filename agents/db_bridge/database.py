@@ -1,17 +1,29 @@
-import os
 import psycopg2
-from psycopg2.extras import RealDictCursor
+from psycopg2.extras import RealDictCursor, execute_values
 import time
 import json
+import inspect
+
+try:
+    import numpy as np
+except ImportError:
+    np = None  # iter_embedding_blocks() falls back to float lists
+
+from agents.db_bridge import tracing
+from agents.runtime.metrics import instrument
 
 def get_connection():
-    return psycopg2.connect(
-        host=os.getenv('DB_HOST'),
-        database=os.getenv('DB_NAME'),
-        user=os.getenv('DB_USER'),
-        password=os.getenv('DB_PASS'),
-        port=os.getenv('DB_PORT'),
-        options="-c search_path=work_aa"
+    """Traced connection to the work_aa schema (agents/db_bridge/tracing.py)."""
+    return tracing.connect()
+
+
+def get_connection_pool(minconn: int = 1, maxconn: int = 10):
+    """Thread-safe connection pool with the same settings as get_connection()."""
+    from psycopg2.pool import ThreadedConnectionPool
+    return ThreadedConnectionPool(
+        minconn, maxconn,
+        connection_factory=tracing.pool_connection_factory(),
+        **tracing.connection_params()
     )
 
 def get_aa_stats():
@@ -70,6 +82,38 @@ def update_agent_heartbeat(agent_name: str, queue_size: int = 0, details: dict =
     except Exception as e:
         print(f"Error updating heartbeat for {agent_name}: {e}")
 
+def update_agent_heartbeats(beats: list) -> bool:
+    """
+    Update the heartbeats of several agents in one statement (agent runtime).
+
+    Args:
+        beats: List of (agent_name, queue_size, details) tuples
+    """
+    if not beats:
+        return True
+    conn = None
+    try:
+        conn = get_connection()
+        cur = conn.cursor()
+        execute_values(cur, """
+            UPDATE agent_status AS a
+            SET last_heartbeat = now(), queue_size = v.queue_size, details = v.details::jsonb
+            FROM (VALUES %s) AS v(agent_name, queue_size, details)
+            WHERE a.agent_name = v.agent_name
+        """, [(name, queue_size, json.dumps(details, default=str)) for name, queue_size, details in beats])
+        conn.commit()
+        cur.close()
+        return True
+    except Exception as e:
+        print(f"Error updating agent heartbeats: {e}")
+        if conn:
+            conn.rollback()
+        return False
+    finally:
+        if conn:
+            conn.close()
+
+
 def list_agent_status():
     """List all agent status records."""
     try:
@@ -477,6 +521,38 @@ def activate_user(user_id: str) -> bool:
             conn.close()
 
 
+def delete_expired_sessions(grace_hours: int = 24) -> int:
+    """
+    Delete sessions that expired (or were revoked) more than grace_hours ago.
+
+    Returns:
+        Number of deleted sessions (-1 on error)
+    """
+    conn = None
+    try:
+        conn = get_connection()
+        cur = conn.cursor()
+
+        cur.execute("""
+            DELETE FROM app_session
+            WHERE expires_at < NOW() - make_interval(hours => %s)
+               OR (revoked = TRUE AND created_at < NOW() - make_interval(hours => %s))
+        """, (grace_hours, grace_hours))
+        deleted = cur.rowcount
+
+        conn.commit()
+        cur.close()
+        return deleted
+    except Exception as e:
+        print(f"Error deleting expired sessions: {e}")
+        if conn:
+            conn.rollback()
+        return -1
+    finally:
+        if conn:
+            conn.close()
+
+
 def get_available_roles() -> list:
     """Get list of all roles."""
     try:
@@ -759,7 +835,7 @@ PARTIAL_MATCH_THRESHOLD = 0.65
 def list_best_matches(model_id: int, rfq_id: str, platform_id: str) -> list:
     """
     Get best match for each customer requirement.
-    Returns the highest-ranked match (rank=1) per customer_req_id.
+    Returns the highest-ranked match per customer requirement within the platform.
 
     Args:
         model_id: The embedding model ID used for matching
@@ -774,15 +850,17 @@ def list_best_matches(model_id: int, rfq_id: str, platform_id: str) -> list:
         cur = conn.cursor(cursor_factory=RealDictCursor)
 
         cur.execute("""
-            SELECT DISTINCT ON (customer_req_id)
-                customer_req_id,
-                platform_req_id,
-                cosine_similarity
-            FROM req_match
-            WHERE model_id = %s
-              AND rfq_id = %s
-              AND platform_id = %s
-            ORDER BY customer_req_id, rank ASC
+            SELECT DISTINCT ON (m.customer_node_uuid)
+                c.attributes->>'req_id' AS customer_req_id,
+                p.attributes->>'req_id' AS platform_req_id,
+                m.similarity_score AS cosine_similarity
+            FROM matches m
+            JOIN nodes c ON c.node_uuid = m.customer_node_uuid
+            JOIN nodes p ON p.node_uuid = m.platform_node_uuid
+            WHERE m.model_id = %s
+              AND m.customer_project_id = %s
+              AND m.platform_project_id = %s
+            ORDER BY m.customer_node_uuid, m.match_rank ASC
         """, (model_id, rfq_id, platform_id))
 
         rows = cur.fetchall()
@@ -794,6 +872,66 @@ def list_best_matches(model_id: int, rfq_id: str, platform_id: str) -> list:
         return []
 
 
+def get_coverage_counts(model_id: int, rfq_id: str, platform_id: str,
+                        full_th: float = None, partial_th: float = None) -> dict:
+    """
+    GREEN/YELLOW/RED counts of the best match per customer requirement of an
+    RFQ within one platform, aggregated in the database (index-only scan on
+    idx_matches_coverage).
+
+    Counts are driven by the RFQ's customer requirements (deleted nodes
+    excluded): matches hold a global top-K over all platforms, so a
+    requirement without a stored match on this platform is counted RED.
+
+    Args:
+        model_id: The embedding model ID used for matching
+        rfq_id: The RFQ/customer project ID
+        platform_id: The platform project ID
+        full_th: GREEN threshold (default: committed thresholds of the model)
+        partial_th: YELLOW threshold (default: committed thresholds of the model)
+
+    Returns:
+        Dict with total, green, yellow, red, unmatched (RED without any stored
+        match on the platform); {} on error
+    """
+    if full_th is None or partial_th is None:
+        committed_full, committed_partial = get_match_thresholds(model_id)
+        full_th = committed_full if full_th is None else full_th
+        partial_th = committed_partial if partial_th is None else partial_th
+
+    try:
+        conn = get_connection()
+        cur = conn.cursor(cursor_factory=RealDictCursor)
+        cur.execute("""
+            SELECT COUNT(*) AS total,
+                   COUNT(*) FILTER (WHERE b.best >= %(full)s) AS green,
+                   COUNT(*) FILTER (WHERE b.best >= %(partial)s AND b.best < %(full)s) AS yellow,
+                   COUNT(*) FILTER (WHERE b.best IS NULL OR b.best < %(partial)s) AS red,
+                   COUNT(*) FILTER (WHERE b.best IS NULL) AS unmatched
+            FROM nodes n
+            LEFT JOIN (
+                SELECT customer_node_uuid, MAX(similarity_score) AS best
+                FROM matches
+                WHERE model_id = %(model_id)s
+                  AND customer_project_id = %(rfq_id)s
+                  AND platform_project_id = %(platform_id)s
+                GROUP BY customer_node_uuid
+            ) b ON b.customer_node_uuid = n.node_uuid
+            WHERE n.project_id = %(rfq_id)s
+              AND n.scope = 'customer'
+              AND n.id_type = 'requirement'
+              AND n.node_status IS DISTINCT FROM 'deleted'
+        """, {"model_id": model_id, "rfq_id": rfq_id, "platform_id": platform_id,
+              "full": full_th, "partial": partial_th})
+        row = cur.fetchone()
+        cur.close()
+        conn.close()
+        return dict(row)
+    except Exception as e:
+        print(f"Error computing coverage counts: {e}")
+        return {}
+
+
 def classify_coverage(full_th: float, partial_th: float, rows: list) -> list:
     """
     Classify coverage for each match row based on cosine similarity thresholds.
@@ -839,12 +977,20 @@ def classify_coverage(full_th: float, partial_th: float, rows: list) -> list:
 # EMBEDDING FUNCTIONS (v1.70 - Task F)
 # ============================================================================
 
-def get_or_create_embedding_model(model_name: str, vector_dims: int = 768, framework: str = 'ollama') -> int:
+def get_or_create_embedding_model(model_name: str, vector_dims: int = None, framework: str = 'ollama') -> int:
     """
     Get or create embedding model registry entry.
 
+    A new model also gets its partial HNSW index (ensure_embedding_index).
+
+    Args:
+        model_name: Model name
+        vector_dims: Vector dimensions (required to create a model; an
+            existing model keeps its registered dimensions)
+        framework: Embedding framework
+
     Returns:
-        model_id (int)
+        model_id (int), None if the model is unknown and vector_dims is not given
     """
     conn = None
     try:
@@ -858,8 +1004,12 @@ def get_or_create_embedding_model(model_name: str, vector_dims: int = 768, frame
         """, (model_name,))
 
         row = cur.fetchone()
+        created = False
         if row:
             model_id = row[0]
+        elif not vector_dims:
+            cur.close()
+            return None
         else:
             # Create new
             cur.execute("""
@@ -869,8 +1019,11 @@ def get_or_create_embedding_model(model_name: str, vector_dims: int = 768, frame
             """, (model_name, vector_dims, framework))
             model_id = cur.fetchone()[0]
             conn.commit()
+            created = True
 
         cur.close()
+        if created:
+            ensure_embedding_index(model_id, vector_dims)
         return model_id
 
     except Exception as e:
@@ -883,7 +1036,209 @@ def get_or_create_embedding_model(model_name: str, vector_dims: int = 768, frame
             conn.close()
 
 
-def get_nodes_for_embedding(scope: str = None, only_missing: bool = True, model_id: int = None, limit: int = None) -> list:
+def ensure_embedding_index(model_id: int, vector_dims: int) -> bool:
+    """
+    Create the partial HNSW index of one model.
+
+    embeddings.embedding has no fixed dimension (models differ), so each model
+    is indexed on embedding::vector(dims) WHERE model_id = <id>. Queries must
+    use the same cast and a literal model_id (see search_similar_requirements).
+
+    Returns:
+        True if the index exists
+    """
+    conn = None
+    try:
+        conn = get_connection()
+        cur = conn.cursor()
+        cur.execute(f"""
+            CREATE INDEX IF NOT EXISTS idx_embeddings_hnsw_{int(model_id)}
+            ON embeddings USING hnsw ((embedding::vector({int(vector_dims)})) vector_cosine_ops)
+            WHERE model_id = {int(model_id)}
+        """)
+        conn.commit()
+        cur.close()
+        return True
+    except Exception as e:
+        if conn:
+            conn.rollback()
+        print(f"Error creating embedding index: {e}")
+        return False
+    finally:
+        if conn:
+            conn.close()
+
+
+def list_embedding_models() -> list:
+    """
+    Registered embedding models with their embedding counts.
+
+    Returns:
+        List of dicts with model_id, model_name, vector_dims, framework,
+        storage_mode, embeddings
+    """
+    try:
+        conn = get_connection()
+        cur = conn.cursor(cursor_factory=RealDictCursor)
+        cur.execute("""
+            SELECT m.model_id, m.model_name, m.vector_dims, m.framework, m.storage_mode,
+                   (SELECT COUNT(*) FROM embeddings e WHERE e.model_id = m.model_id) AS embeddings
+            FROM embedding_models m
+            ORDER BY m.model_id
+        """)
+        rows = cur.fetchall()
+        cur.close()
+        conn.close()
+        return [dict(r) for r in rows]
+    except Exception as e:
+        print(f"Error listing embedding models: {e}")
+        return []
+
+
+def get_embedding_storage(model_id: int) -> dict:
+    """
+    Storage used by one model's embeddings.
+
+    Returns:
+        Dict with embeddings, vector_bytes (sum of pg_column_size of all
+        vector columns) and index_bytes (its HNSW index); {} on error
+    """
+    try:
+        conn = get_connection()
+        cur = conn.cursor(cursor_factory=RealDictCursor)
+        cur.execute("""
+            SELECT COUNT(*) AS embeddings,
+                   COALESCE(SUM(pg_column_size(embedding)), 0)
+                   + COALESCE(SUM(pg_column_size(embedding_half)), 0)
+                   + COALESCE(SUM(pg_column_size(embedding_bits)), 0) AS vector_bytes,
+                   COALESCE(pg_relation_size(to_regclass(%s)), 0) AS index_bytes
+            FROM embeddings
+            WHERE model_id = %s
+        """, (f"idx_embeddings_hnsw_{int(model_id)}", model_id))
+        row = cur.fetchone()
+        cur.close()
+        conn.close()
+        return dict(row) if row else {}
+    except Exception as e:
+        print(f"Error loading embedding storage: {e}")
+        return {}
+
+
+def get_embedding_model_settings(model_id: int) -> dict:
+    """
+    Storage settings of an embedding model.
+
+    Returns:
+        Dict with model_name, vector_dims, storage_mode, quant_rescore,
+        quant_agreement, quant_min_agreement (required at activation) and
+        quant_check_age_hours (None if never checked); {} if not found
+    """
+    try:
+        conn = get_connection()
+        cur = conn.cursor(cursor_factory=RealDictCursor)
+        cur.execute("""
+            SELECT model_id, model_name, vector_dims, storage_mode, quant_rescore, quant_agreement,
+                   quant_min_agreement,
+                   EXTRACT(EPOCH FROM now() - quant_checked_at) / 3600 AS quant_check_age_hours
+            FROM embedding_models
+            WHERE model_id = %s
+        """, (model_id,))
+        row = cur.fetchone()
+        cur.close()
+        conn.close()
+        return dict(row) if row else {}
+    except Exception as e:
+        print(f"Error loading embedding model settings: {e}")
+        return {}
+
+
+def set_embedding_storage_mode(model_id: int, storage_mode: str, rescore: bool = True,
+                               agreement: float = None, min_agreement: float = None) -> bool:
+    """
+    Set the vector storage mode of a model ('float32', 'halfvec', 'int8', 'binary').
+
+    Args:
+        model_id: Model ID
+        storage_mode: New storage mode
+        rescore: Re-score quantized top-K candidates at full precision
+        agreement: Rank-1 agreement of the recall check (stamps quant_checked_at)
+        min_agreement: Agreement required by the activation, kept for the
+            periodic re-checks (default: keep the stored value)
+
+    Returns:
+        True if successful
+    """
+    conn = None
+    try:
+        conn = get_connection()
+        cur = conn.cursor()
+        cur.execute("""
+            UPDATE embedding_models
+            SET storage_mode = %s, quant_rescore = %s,
+                quant_agreement = %s,
+                quant_min_agreement = COALESCE(%s, quant_min_agreement),
+                quant_checked_at = CASE WHEN %s IS NULL THEN NULL ELSE now() END
+            WHERE model_id = %s
+        """, (storage_mode, rescore, agreement, min_agreement, agreement, model_id))
+        conn.commit()
+        cur.close()
+        return True
+    except Exception as e:
+        if conn:
+            conn.rollback()
+        print(f"Error setting storage mode: {e}")
+        return False
+    finally:
+        if conn:
+            conn.close()
+
+
+def sync_quantized_embeddings(model_id: int, storage_mode: str) -> int:
+    """
+    Fill the compact vector column of a storage mode and clear the other one.
+
+    'halfvec' fills embedding_half, 'int8' fills embedding_int8 (one signed
+    byte per dimension, round(x * 127)), 'binary' fills embedding_bits
+    (pgvector binary_quantize); 'float32' keeps none. Only rows that need a
+    change are touched.
+
+    Returns:
+        Number of rows updated, -1 on error
+    """
+    half = "COALESCE(embedding_half, embedding::halfvec)" if storage_mode == "halfvec" else "NULL"
+    bits = "COALESCE(embedding_bits, binary_quantize(embedding)::varbit)" if storage_mode == "binary" else "NULL"
+    int8 = """COALESCE(embedding_int8, (
+        SELECT decode(string_agg(lpad(to_hex(GREATEST(-127, LEAST(127, round(x * 127)::int)) & 255), 2, '0'),
+                                 '' ORDER BY i), 'hex')
+        FROM unnest(embedding::real[]) WITH ORDINALITY AS u(x, i)))""" if storage_mode == "int8" else "NULL"
+    half_ok = "embedding_half IS NOT NULL" if storage_mode == "halfvec" else "embedding_half IS NULL"
+    bits_ok = "embedding_bits IS NOT NULL" if storage_mode == "binary" else "embedding_bits IS NULL"
+    int8_ok = "embedding_int8 IS NOT NULL" if storage_mode == "int8" else "embedding_int8 IS NULL"
+    conn = None
+    try:
+        conn = get_connection()
+        cur = conn.cursor()
+        cur.execute(f"""
+            UPDATE embeddings
+            SET embedding_half = {half}, embedding_bits = {bits}, embedding_int8 = {int8}
+            WHERE model_id = %s AND NOT ({half_ok} AND {bits_ok} AND {int8_ok})
+        """, (model_id,))
+        updated = cur.rowcount
+        conn.commit()
+        cur.close()
+        return updated
+    except Exception as e:
+        if conn:
+            conn.rollback()
+        print(f"Error syncing quantized embeddings: {e}")
+        return -1
+    finally:
+        if conn:
+            conn.close()
+
+
+def get_nodes_for_embedding(scope: str = None, only_missing: bool = True, model_id: int = None, limit: int = None,
+                            after: tuple = None) -> list:
     """
     Get nodes that need embeddings.
 
@@ -892,24 +1247,28 @@ def get_nodes_for_embedding(scope: str = None, only_missing: bool = True, model_
         only_missing: If True, skip nodes that already have embeddings
         model_id: Model ID to check for existing embeddings
         limit: Maximum number of nodes to return
+        after: Keyset cursor (created_at, node_uuid) of the last node of the
+               previous page; pages never repeat nodes even while embeddings
+               are being written
 
     Returns:
-        List of node dicts
+        List of node dicts (ordered by created_at, node_uuid)
     """
     try:
         conn = get_connection()
         cur = conn.cursor(cursor_factory=RealDictCursor)
 
         query = """
-            SELECT n.node_uuid, n.project_id, n.node_id, n.type, n.scope,
-                   n.content, n.attributes
+            SELECT n.node_uuid, n.project_id, n.type, n.scope,
+                   n.content, n.attributes, n.created_at
         """
-        # Add node_id from attributes if available
+        # node_id is derived from attributes below (nodes has no node_id column)
         query += """
             FROM nodes n
             WHERE n.type = 'requirement'
               AND n.content IS NOT NULL
               AND n.content <> ''
+              AND n.node_status IS DISTINCT FROM 'deleted'
         """
 
         params = []
@@ -928,7 +1287,11 @@ def get_nodes_for_embedding(scope: str = None, only_missing: bool = True, model_
             """
             params.append(model_id)
 
-        query += " ORDER BY n.created_at"
+        if after:
+            query += " AND (n.created_at, n.node_uuid) > (%s, %s)"
+            params.extend(after)
+
+        query += " ORDER BY n.created_at, n.node_uuid"
 
         if limit:
             query += " LIMIT %s"
@@ -997,6 +1360,46 @@ def insert_embedding(node_uuid: str, model_id: int, content_hash: str, embedding
             conn.close()
 
 
+def insert_embeddings(model_id: int, rows: list) -> int:
+    """
+    Bulk insert embeddings in one statement.
+
+    Args:
+        model_id: Model ID
+        rows: List of (node_uuid, content_hash, embedding_vector)
+
+    Returns:
+        Number of rows written (existing node/model/hash rows are skipped), -1 on error
+    """
+    if not rows:
+        return 0
+    conn = None
+    try:
+        conn = get_connection()
+        cur = conn.cursor()
+        values = [
+            (str(node_uuid), model_id, content_hash, '[' + ','.join(map(str, vector)) + ']')
+            for node_uuid, content_hash, vector in rows
+        ]
+        execute_values(cur, """
+            INSERT INTO embeddings (node_uuid, model_id, content_hash, embedding)
+            VALUES %s
+            ON CONFLICT (node_uuid, model_id, content_hash) DO NOTHING
+        """, values, template="(%s, %s, %s, %s::vector)", page_size=500)
+        written = cur.rowcount
+        conn.commit()
+        cur.close()
+        return written
+    except Exception as e:
+        if conn:
+            conn.rollback()
+        print(f"Error inserting embeddings: {e}")
+        return -1
+    finally:
+        if conn:
+            conn.close()
+
+
 # ============================================================================
 # MATCHING FUNCTIONS (v1.70 - Task G)
 # ============================================================================
@@ -1020,7 +1423,7 @@ def get_embeddings_by_scope(model_id: int, scope: str) -> list:
             SELECT n.node_uuid, n.attributes->>'req_id' as node_id, n.content, e.embedding
             FROM embeddings e
             JOIN nodes n ON e.node_uuid = n.node_uuid
-            WHERE e.model_id = %s AND n.scope = %s
+            WHERE e.model_id = %s AND n.scope = %s AND n.node_status IS DISTINCT FROM 'deleted'
         """, (model_id, scope))
 
         results = cur.fetchall()
@@ -1034,40 +1437,202 @@ def get_embeddings_by_scope(model_id: int, scope: str) -> list:
         return []
 
 
-def insert_match(model_id: int, customer_uuid: str, platform_uuid: str,
-                similarity: float, rank: int, classification: str) -> bool:
+EMBEDDING_COLUMNS = {
+    "float32": "e.embedding",
+    "int8": "e.embedding_int8",
+    "halfvec": "e.embedding_half",
+    "binary": "e.embedding_bits"
+}
+
+
+def iter_embeddings_by_scope(model_id: int, scope: str, itersize: int = 2000, storage_mode: str = "float32",
+                             project_ids: list = None):
     """
-    Insert matching result.
+    Stream embeddings for nodes with given scope (server-side cursor).
+
+    Unlike get_embeddings_by_scope() the result set is never materialized:
+    rows arrive itersize at a time and are yielded as plain tuples without
+    the node content.
 
     Args:
         model_id: Model ID
-        customer_uuid: Customer node UUID
-        platform_uuid: Platform node UUID
-        similarity: Cosine similarity score
-        rank: Match rank (1 = best match)
-        classification: 'GREEN', 'YELLOW', or 'RED'
+        scope: 'customer' or 'platform'
+        itersize: Rows fetched per round trip
+        storage_mode: Vector column to read (see EMBEDDING_COLUMNS); compact
+            columns must be filled by sync_quantized_embeddings()
+        project_ids: Only nodes of these projects (default: all)
+
+    Yields:
+        (node_uuid, node_id, embedding) tuples; embedding is the pgvector /
+        halfvec / bytea / bit string text
+    """
+    column = EMBEDDING_COLUMNS.get(storage_mode, EMBEDDING_COLUMNS["float32"])
+    project_filter = "AND n.project_id = ANY(%s)" if project_ids is not None else ""
+    params = (model_id, scope) + ((list(project_ids),) if project_ids is not None else ())
+    conn = get_connection()
+    try:
+        cur = conn.cursor(name=f"embeddings_{scope}_{model_id}")
+        cur.itersize = itersize
+        cur.execute(f"""
+            SELECT n.node_uuid::text, n.attributes->>'req_id', {column}::text
+            FROM embeddings e
+            JOIN nodes n ON e.node_uuid = n.node_uuid
+            WHERE e.model_id = %s AND n.scope = %s AND {column} IS NOT NULL
+              AND n.node_status IS DISTINCT FROM 'deleted' {project_filter}
+        """, params)
+        for row in cur:
+            yield row
+        cur.close()
+    finally:
+        conn.close()
+
+
+def _vector_block(texts: list, storage_mode: str = "float32"):
+    """
+    Parse vector texts into one block.
+
+    float32: float32 matrix, halfvec: float16 matrix, int8: int8 matrix (bytea
+    hex text), binary: bits packed into a uint8 matrix (numpy required for
+    the compact modes). Without numpy: list of float lists.
+    """
+    if storage_mode == "int8":
+        return np.vstack([np.frombuffer(bytes.fromhex(t[2:]), dtype=np.int8) for t in texts])
+    if storage_mode == "binary":
+        bits = np.frombuffer("".join(texts).encode("ascii"), dtype=np.uint8).reshape(len(texts), -1)
+        return np.packbits(bits - ord("0"), axis=1)
+    if np is not None:
+        block = np.vstack([np.fromstring(t.strip('[]'), dtype=np.float32, sep=',') for t in texts])
+        return block.astype(np.float16) if storage_mode == "halfvec" else block
+    return [[float(x) for x in t.strip('[]').split(',')] for t in texts]
+
+
+def iter_embedding_blocks(model_id: int, scope: str, block_size: int = 2048, itersize: int = 2000,
+                          storage_mode: str = "float32", project_ids: list = None):
+    """
+    Stream embeddings for nodes with given scope in fixed-size blocks.
+
+    Args:
+        model_id: Model ID
+        scope: 'customer' or 'platform'
+        block_size: Vectors per block
+        itersize: Rows fetched per round trip
+        storage_mode: 'float32' (default), or 'halfvec', 'int8' or 'binary'
+            (compact columns)
+        project_ids: Only nodes of these projects (default: all)
+
+    Yields:
+        (keys, vectors): keys is a list of (node_uuid, node_id); vectors is a
+        NumPy matrix (see _vector_block), or a list of float lists if numpy
+        is not installed
+    """
+    keys, texts = [], []
+    for node_uuid, node_id, embedding in iter_embeddings_by_scope(model_id, scope, itersize, storage_mode,
+                                                                  project_ids):
+        keys.append((node_uuid, node_id))
+        texts.append(embedding)
+        if len(keys) >= block_size:
+            yield keys, _vector_block(texts, storage_mode)
+            keys, texts = [], []
+    if keys:
+        yield keys, _vector_block(texts, storage_mode)
+
+
+def sample_embedding_block(model_id: int, scope: str, sample: int = 200) -> tuple:
+    """
+    Random full-precision embeddings of a scope (recall checks).
 
     Returns:
-        True if successful
+        (keys, vectors) like iter_embedding_blocks(); ([], []) if none or on error
     """
-    conn = None
     try:
         conn = get_connection()
         cur = conn.cursor()
-
         cur.execute("""
-            INSERT INTO matches
-            (model_id, customer_node_uuid, platform_node_uuid,
-             similarity_score, match_rank, classification)
-            VALUES (%s, %s, %s, %s, %s, %s)
-        """, (model_id, customer_uuid, platform_uuid, similarity, rank, classification))
-
-        conn.commit()
+            SELECT n.node_uuid::text, n.attributes->>'req_id', e.embedding::text
+            FROM embeddings e
+            JOIN nodes n ON e.node_uuid = n.node_uuid
+            WHERE e.model_id = %s AND n.scope = %s AND n.node_status IS DISTINCT FROM 'deleted'
+            ORDER BY random()
+            LIMIT %s
+        """, (model_id, scope, sample))
+        rows = cur.fetchall()
         cur.close()
-        return True
-
+        conn.close()
+        if not rows:
+            return [], []
+        return [(r[0], r[1]) for r in rows], _vector_block([r[2] for r in rows])
     except Exception as e:
-        if conn:
+        print(f"Error sampling embeddings: {e}")
+        return [], []
+
+
+def get_embedding_vectors(model_id: int, node_uuids: list) -> dict:
+    """
+    Full-precision embeddings of the given nodes (top-K re-scoring).
+
+    Returns:
+        Dict node_uuid -> vector (float32 array, or list of floats without numpy);
+        None on error
+    """
+    if not node_uuids:
+        return {}
+    try:
+        conn = get_connection()
+        cur = conn.cursor()
+        cur.execute("""
+            SELECT node_uuid::text, embedding::text
+            FROM embeddings
+            WHERE model_id = %s AND node_uuid = ANY(%s::uuid[])
+        """, (model_id, list(node_uuids)))
+        rows = cur.fetchall()
+        cur.close()
+        conn.close()
+        if not rows:
+            return {}
+        return dict(zip((r[0] for r in rows), _vector_block([r[1] for r in rows])))
+    except Exception as e:
+        print(f"Error loading embedding vectors: {e}")
+        return None
+
+
+def insert_match(model_id: int, customer_uuid: str, platform_uuid: str,
+                similarity: float, rank: int, classification: str) -> bool:
+    """
+    Insert matching result.
+
+    Args:
+        model_id: Model ID
+        customer_uuid: Customer node UUID
+        platform_uuid: Platform node UUID
+        similarity: Cosine similarity score
+        rank: Match rank (1 = best match)
+        classification: 'GREEN', 'YELLOW', or 'RED'
+
+    Returns:
+        True if successful
+    """
+    conn = None
+    try:
+        conn = get_connection()
+        cur = conn.cursor()
+
+        cur.execute("""
+            INSERT INTO matches
+            (model_id, customer_node_uuid, platform_node_uuid,
+             similarity_score, match_rank, classification,
+             customer_project_id, platform_project_id)
+            VALUES (%s, %s, %s, %s, %s, %s,
+                    (SELECT project_id FROM nodes WHERE node_uuid = %s),
+                    (SELECT project_id FROM nodes WHERE node_uuid = %s))
+        """, (model_id, customer_uuid, platform_uuid, similarity, rank, classification,
+              customer_uuid, platform_uuid))
+
+        conn.commit()
+        cur.close()
+        return True
+
+    except Exception as e:
+        if conn:
             conn.rollback()
         print(f"Error inserting match: {e}")
         return False
@@ -1076,6 +1641,58 @@ def insert_match(model_id: int, customer_uuid: str, platform_uuid: str,
             conn.close()
 
 
+def insert_matches(model_id: int, rows: list, run_id: int = None, staged: bool = False) -> int:
+    """
+    Bulk insert matching results in one statement. The project IDs of both
+    nodes are denormalized into the rows (coverage by RFQ x platform), as is
+    the content hash of the customer embedding (match reuse).
+
+    Args:
+        model_id: Model ID
+        rows: List of (customer_uuid, platform_uuid, similarity, rank, classification)
+        run_id: match_runs entry the rows belong to
+        staged: Write to match_staging (see swap_match_run) instead of matches
+
+    Returns:
+        Number of rows written, -1 on error
+    """
+    if not rows:
+        return 0
+    conn = None
+    try:
+        conn = get_connection()
+        cur = conn.cursor()
+        execute_values(cur, f"""
+            INSERT INTO {'match_staging' if staged else 'matches'}
+            (model_id, customer_node_uuid, platform_node_uuid,
+             similarity_score, match_rank, classification, run_id,
+             customer_project_id, platform_project_id, customer_content_hash)
+            SELECT v.model_id, v.customer_uuid, v.platform_uuid,
+                   v.similarity, v.match_rank, v.classification, v.run_id,
+                   c.project_id, p.project_id,
+                   (SELECT e.content_hash FROM embeddings e
+                    WHERE e.node_uuid = v.customer_uuid AND e.model_id = v.model_id
+                    ORDER BY e.embedding_id DESC LIMIT 1)
+            FROM (VALUES %s) AS v(model_id, customer_uuid, platform_uuid,
+                                  similarity, match_rank, classification, run_id)
+            JOIN nodes c ON c.node_uuid = v.customer_uuid
+            JOIN nodes p ON p.node_uuid = v.platform_uuid
+        """, [(model_id, c, p, float(sim), rank, cls, run_id) for c, p, sim, rank, cls in rows],
+            template="(%s::int, %s::uuid, %s::uuid, %s::float8, %s::int, %s::text, %s::int)",
+            page_size=1000)
+        conn.commit()
+        cur.close()
+        return len(rows)
+    except Exception as e:
+        if conn:
+            conn.rollback()
+        print(f"Error inserting matches: {e}")
+        return -1
+    finally:
+        if conn:
+            conn.close()
+
+
 def clear_matches(model_id: int) -> bool:
     """Delete all matches for given model."""
     conn = None
@@ -1084,6 +1701,7 @@ def clear_matches(model_id: int) -> bool:
         cur = conn.cursor()
 
         cur.execute("DELETE FROM matches WHERE model_id = %s", (model_id,))
+        cur.execute("UPDATE embedding_models SET matches_changed_at = now() WHERE model_id = %s", (model_id,))
         conn.commit()
         cur.close()
         return True
@@ -1097,37 +1715,46 @@ def clear_matches(model_id: int) -> bool:
             conn.close()
 
 
-def get_match_statistics(model_id: int = 1) -> dict:
+def get_match_statistics(model_id: int = 1, full_threshold: float = None,
+                         partial_threshold: float = None) -> dict:
     """
     Get match statistics for a model.
 
+    Classification is derived from the stored rank-1 similarities, so any
+    threshold pair can be evaluated without re-running the matcher.
+
     Args:
         model_id: Embedding model ID
+        full_threshold: GREEN threshold (default: committed thresholds of the model)
+        partial_threshold: YELLOW threshold (default: committed thresholds of the model)
 
     Returns:
         Dict with GREEN, YELLOW, RED counts and percentages
     """
+    if full_threshold is None or partial_threshold is None:
+        committed_full, committed_partial = get_match_thresholds(model_id)
+        full_threshold = committed_full if full_threshold is None else full_threshold
+        partial_threshold = committed_partial if partial_threshold is None else partial_threshold
+
     try:
         conn = get_connection()
         cur = conn.cursor(cursor_factory=RealDictCursor)
 
-        # Count by classification (rank 1 only = best match per customer)
+        # Rank 1 only = best match per customer
         cur.execute("""
-            SELECT classification, COUNT(*) as count
+            SELECT COUNT(*) FILTER (WHERE similarity_score >= %(full)s) AS green,
+                   COUNT(*) FILTER (WHERE similarity_score >= %(partial)s
+                                      AND similarity_score < %(full)s) AS yellow,
+                   COUNT(*) FILTER (WHERE similarity_score < %(partial)s) AS red
             FROM matches
-            WHERE model_id = %s AND match_rank = 1
-            GROUP BY classification
-        """, (model_id,))
+            WHERE model_id = %(model_id)s AND match_rank = 1
+        """, {"model_id": model_id, "full": full_threshold, "partial": partial_threshold})
 
-        results = cur.fetchall()
+        row = cur.fetchone()
         cur.close()
         conn.close()
 
-        counts = {'GREEN': 0, 'YELLOW': 0, 'RED': 0}
-        for row in results:
-            if row['classification'] in counts:
-                counts[row['classification']] = row['count']
-
+        counts = {'GREEN': row['green'], 'YELLOW': row['yellow'], 'RED': row['red']}
         total = sum(counts.values())
 
         if total == 0:
@@ -1156,5 +1783,2273 @@ def get_match_statistics(model_id: int = 1) -> dict:
         return {'total': 0, 'green': 0, 'yellow': 0, 'red': 0}
 
 
+def get_match_ranks(model_id: int) -> list:
+    """
+    All stored matches of a model by requirement ID (model evaluation).
+
+    Returns:
+        List of (customer_req_id, platform_req_id, match_rank, similarity_score) tuples
+    """
+    try:
+        conn = get_connection()
+        cur = conn.cursor()
+        cur.execute("""
+            SELECT c.attributes->>'req_id', p.attributes->>'req_id', m.match_rank, m.similarity_score
+            FROM matches m
+            JOIN nodes c ON c.node_uuid = m.customer_node_uuid
+            JOIN nodes p ON p.node_uuid = m.platform_node_uuid
+            WHERE m.model_id = %s
+        """, (model_id,))
+        rows = cur.fetchall()
+        cur.close()
+        conn.close()
+        return rows
+    except Exception as e:
+        print(f"Error loading match ranks: {e}")
+        return []
+
+
+def search_similar_requirements(model_id: int, query_vector: list, top_n: int = 8,
+                                scope: str = None) -> list:
+    """
+    Nearest requirement nodes to a query vector (uses the HNSW vector index).
+
+    Args:
+        model_id: Embedding model ID
+        query_vector: L2 normalized query embedding
+        top_n: Number of nodes to return
+        scope: 'customer', 'platform', or None (all)
+
+    Returns:
+        List of dicts with node_uuid, project_id, scope, req_id, content, similarity;
+        None on error
+    """
+    try:
+        conn = get_connection()
+        cur = conn.cursor(cursor_factory=RealDictCursor)
+
+        vector_str = '[' + ','.join(map(str, query_vector)) + ']'
+        # Same expression as the model's partial index (ensure_embedding_index)
+        column = f"e.embedding::vector({len(query_vector)})"
+
+        query = f"""
+            SELECT n.node_uuid, n.project_id, n.scope,
+                   n.attributes->>'req_id' as req_id, n.content,
+                   1 - ({column} <=> %s::vector) as similarity
+            FROM embeddings e
+            JOIN nodes n ON e.node_uuid = n.node_uuid
+            WHERE e.model_id = %s
+        """
+        params = [vector_str, model_id]
+
+        if scope:
+            query += " AND n.scope = %s"
+            params.append(scope)
+
+        query += f" ORDER BY {column} <=> %s::vector LIMIT %s"
+        params.extend([vector_str, top_n])
+
+        cur.execute(query, params)
+        rows = cur.fetchall()
+        cur.close()
+        conn.close()
+        return [dict(r) for r in rows]
+
+    except Exception as e:
+        print(f"Error searching similar requirements: {e}")
+        return None
+
+
+# ============================================================================
+# CHAT METRICS FUNCTIONS (v1.9)
+# ============================================================================
+
+def insert_chat_metric(model: str, stats: dict, context_messages: int = 0) -> bool:
+    """
+    Record latency of one streamed chat answer.
+
+    Args:
+        model: Ollama model name
+        stats: Dict filled by ollama_bridge.client.chat_stream()
+               (ttft_ms, total_ms, prompt_tokens, eval_tokens, tokens_per_sec, done)
+               plus optional mode ('plain' / 'rag') and retrieval_ms
+        context_messages: Number of messages sent as conversation context
+
+    Returns:
+        True if successful
+    """
+    conn = None
+    try:
+        conn = get_connection()
+        cur = conn.cursor()
+
+        cur.execute("""
+            INSERT INTO chat_metrics
+            (model, ttft_ms, total_ms, prompt_tokens, eval_tokens, tokens_per_sec,
+             context_messages, completed, mode, retrieval_ms)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+        """, (
+            model,
+            stats.get("ttft_ms"),
+            stats.get("total_ms"),
+            stats.get("prompt_tokens"),
+            stats.get("eval_tokens"),
+            stats.get("tokens_per_sec"),
+            context_messages,
+            bool(stats.get("done")),
+            stats.get("mode", "plain"),
+            stats.get("retrieval_ms")
+        ))
+
+        conn.commit()
+        cur.close()
+        return True
+
+    except Exception as e:
+        if conn:
+            conn.rollback()
+        print(f"Error inserting chat metric: {e}")
+        return False
+    finally:
+        if conn:
+            conn.close()
+
+
+def get_chat_latency_by_model(days: int = 7) -> list:
+    """
+    Interactive latency per chat model over the last N days.
+
+    Returns:
+        List of dicts with model, mode, answers, ttft_p50_ms, ttft_p95_ms,
+        avg_tokens_per_sec, avg_retrieval_ms, avg_total_ms
+    """
+    try:
+        conn = get_connection()
+        cur = conn.cursor(cursor_factory=RealDictCursor)
+
+        cur.execute("""
+            SELECT
+                model,
+                COALESCE(mode, 'plain') as mode,
+                COUNT(*) as answers,
+                ROUND(percentile_cont(0.5) WITHIN GROUP (ORDER BY ttft_ms)::numeric, 1) as ttft_p50_ms,
+                ROUND(percentile_cont(0.95) WITHIN GROUP (ORDER BY ttft_ms)::numeric, 1) as ttft_p95_ms,
+                ROUND(AVG(tokens_per_sec)::numeric, 2) as avg_tokens_per_sec,
+                ROUND(AVG(retrieval_ms)::numeric, 1) as avg_retrieval_ms,
+                ROUND(AVG(total_ms)::numeric, 1) as avg_total_ms
+            FROM chat_metrics
+            WHERE created_at > now() - make_interval(days => %s)
+              AND completed
+            GROUP BY model, COALESCE(mode, 'plain')
+            ORDER BY ttft_p50_ms
+        """, (days,))
+
+        rows = cur.fetchall()
+        cur.close()
+        conn.close()
+        return [dict(r) for r in rows]
+
+    except Exception as e:
+        print(f"Error getting chat latency: {e}")
+        return []
+
+
+# ============================================================================
+# PDF EXTRACTION FUNCTIONS (v1.9)
+# ============================================================================
+
+def get_or_create_pdf_document(content_hash: str, file_name: str, file_size: int, page_count: int) -> dict:
+    """
+    Register a PDF by content hash (re-uploads of the same file map to the same row).
+
+    Returns:
+        Dict with document_id, status, page_count, pages_done or None on error
+    """
+    conn = None
+    try:
+        conn = get_connection()
+        cur = conn.cursor(cursor_factory=RealDictCursor)
+
+        cur.execute("""
+            INSERT INTO pdf_document (content_hash, file_name, file_size, page_count)
+            VALUES (%s, %s, %s, %s)
+            ON CONFLICT (content_hash) DO UPDATE SET file_name = pdf_document.file_name
+            RETURNING document_id, status, page_count, pages_done
+        """, (content_hash, file_name, file_size, page_count))
+        row = cur.fetchone()
+
+        conn.commit()
+        cur.close()
+        return dict(row)
+    except Exception as e:
+        print(f"Error registering PDF document: {e}")
+        if conn:
+            conn.rollback()
+        return None
+    finally:
+        if conn:
+            conn.close()
+
+
+def get_extracted_page_numbers(document_id: int) -> set:
+    """Page numbers already stored for a document (for resuming)."""
+    try:
+        conn = get_connection()
+        cur = conn.cursor()
+        cur.execute("SELECT page_no FROM pdf_page WHERE document_id = %s", (document_id,))
+        pages = {r[0] for r in cur.fetchall()}
+        cur.close()
+        conn.close()
+        return pages
+    except Exception as e:
+        print(f"Error getting extracted pages: {e}")
+        return set()
+
+
+def get_pdf_page_by_hash(page_hash: str) -> dict:
+    """
+    Extraction result of a page with the same raw content, from any document.
+
+    Returns:
+        Dict with text, blocks; None if the page was never extracted (or on error)
+    """
+    try:
+        conn = get_connection()
+        cur = conn.cursor(cursor_factory=RealDictCursor)
+        cur.execute("SELECT text, blocks FROM pdf_page WHERE page_hash = %s LIMIT 1", (page_hash,))
+        row = cur.fetchone()
+        cur.close()
+        conn.close()
+        return dict(row) if row else None
+    except Exception as e:
+        print(f"Error looking up PDF page: {e}")
+        return None
+
+
+def insert_pdf_pages(document_id: int, pages: list) -> int:
+    """
+    Bulk insert extracted pages.
+
+    Args:
+        document_id: pdf_document ID
+        pages: List of dicts with page_no, page_hash, text, blocks
+
+    Returns:
+        Number of inserted pages (-1 on error)
+    """
+    conn = None
+    try:
+        conn = get_connection()
+        cur = conn.cursor()
+
+        execute_values(cur, """
+            INSERT INTO pdf_page (document_id, page_no, page_hash, text, blocks, char_count)
+            VALUES %s
+            ON CONFLICT (document_id, page_no) DO NOTHING
+        """, [
+            (document_id, p['page_no'], p['page_hash'], p['text'],
+             json.dumps(p['blocks']), len(p['text']))
+            for p in pages
+        ])
+        inserted = cur.rowcount
+
+        cur.execute("""
+            UPDATE pdf_document
+            SET pages_done = (SELECT COUNT(*) FROM pdf_page WHERE document_id = %s)
+            WHERE document_id = %s
+        """, (document_id, document_id))
+
+        conn.commit()
+        cur.close()
+        return inserted
+    except Exception as e:
+        print(f"Error inserting PDF pages: {e}")
+        if conn:
+            conn.rollback()
+        return -1
+    finally:
+        if conn:
+            conn.close()
+
+
+def update_pdf_document_status(document_id: int, status: str, error: str = None,
+                               extract_seconds: float = None, peak_rss_mb: float = None) -> bool:
+    """Set processing status ('pending', 'processing', 'done', 'error') of a PDF."""
+    conn = None
+    try:
+        conn = get_connection()
+        cur = conn.cursor()
+
+        cur.execute("""
+            UPDATE pdf_document SET
+                status = %s,
+                error = %s,
+                extract_seconds = COALESCE(%s, extract_seconds),
+                peak_rss_mb = COALESCE(%s, peak_rss_mb),
+                finished_at = CASE WHEN %s IN ('done', 'error') THEN now() ELSE finished_at END
+            WHERE document_id = %s
+        """, (status, error, extract_seconds, peak_rss_mb, status, document_id))
+
+        conn.commit()
+        cur.close()
+        return True
+    except Exception as e:
+        print(f"Error updating PDF document status: {e}")
+        if conn:
+            conn.rollback()
+        return False
+    finally:
+        if conn:
+            conn.close()
+
+
+# ============================================================================
+# PDF CHUNK FUNCTIONS (v1.9)
+# ============================================================================
+
+def get_documents_to_chunk(limit: int = 10) -> list:
+    """Extracted PDFs that have not been chunked yet (oldest first)."""
+    try:
+        conn = get_connection()
+        cur = conn.cursor(cursor_factory=RealDictCursor)
+        cur.execute("""
+            SELECT document_id, content_hash, file_name, page_count
+            FROM pdf_document
+            WHERE status = 'done'
+              AND chunk_status IS DISTINCT FROM 'done'
+            ORDER BY created_at
+            LIMIT %s
+        """, (limit,))
+        rows = cur.fetchall()
+        cur.close()
+        conn.close()
+        return [dict(r) for r in rows]
+    except Exception as e:
+        print(f"Error getting documents to chunk: {e}")
+        return []
+
+
+def iter_pdf_pages(document_id: int, itersize: int = 50):
+    """
+    Stream pages of a document in page order (server-side cursor).
+
+    Yields:
+        Dicts with page_no, text, blocks
+    """
+    conn = get_connection()
+    try:
+        cur = conn.cursor(name=f"pdf_pages_{document_id}", cursor_factory=RealDictCursor)
+        cur.itersize = itersize
+        cur.execute("""
+            SELECT page_no, text, blocks
+            FROM pdf_page
+            WHERE document_id = %s
+            ORDER BY page_no
+        """, (document_id,))
+        for row in cur:
+            yield row
+        cur.close()
+    finally:
+        conn.close()
+
+
+def get_current_chunk_index(source_key: str, exclude_document_id: int = None) -> dict:
+    """
+    Anchor -> {chunk_id, chunk_hash} of the current (latest) chunk version of a source.
+    Only anchors and hashes are loaded, not chunk text.
+    """
+    try:
+        conn = get_connection()
+        cur = conn.cursor(cursor_factory=RealDictCursor)
+        cur.execute("""
+            SELECT anchor, chunk_id, chunk_hash
+            FROM pdf_chunk
+            WHERE source_key = %s
+              AND is_current
+              AND change_type <> 'deleted'
+              AND document_id IS DISTINCT FROM %s
+        """, (source_key, exclude_document_id))
+        index = {r['anchor']: {'chunk_id': r['chunk_id'], 'chunk_hash': r['chunk_hash']} for r in cur.fetchall()}
+        cur.close()
+        conn.close()
+        return index
+    except Exception as e:
+        print(f"Error getting chunk index: {e}")
+        return {}
+
+
+def start_chunk_version(document_id: int, source_key: str) -> bool:
+    """Mark a document as being chunked and drop leftovers of an interrupted run."""
+    conn = None
+    try:
+        conn = get_connection()
+        cur = conn.cursor()
+        cur.execute("DELETE FROM pdf_chunk WHERE document_id = %s", (document_id,))
+        cur.execute("""
+            UPDATE pdf_document SET source_key = %s, chunk_status = 'processing'
+            WHERE document_id = %s
+        """, (source_key, document_id))
+        conn.commit()
+        cur.close()
+        return True
+    except Exception as e:
+        print(f"Error starting chunk version: {e}")
+        if conn:
+            conn.rollback()
+        return False
+    finally:
+        if conn:
+            conn.close()
+
+
+def insert_pdf_chunks(chunks: list) -> int:
+    """
+    Bulk insert chunks (new version rows, is_current = FALSE until finalized).
+
+    Args:
+        chunks: List of dicts with source_key, document_id, chunk_index, anchor,
+                chunk_hash, heading, text, page_start, page_end, token_estimate,
+                change_type, previous_chunk_id
+
+    Returns:
+        Number of inserted chunks (-1 on error)
+    """
+    conn = None
+    try:
+        conn = get_connection()
+        cur = conn.cursor()
+        execute_values(cur, """
+            INSERT INTO pdf_chunk
+            (source_key, document_id, chunk_index, anchor, chunk_hash, heading, text,
+             page_start, page_end, token_estimate, change_type, previous_chunk_id, is_current)
+            VALUES %s
+        """, [
+            (c['source_key'], c['document_id'], c['chunk_index'], c['anchor'], c['chunk_hash'],
+             c.get('heading'), c.get('text'), c.get('page_start'), c.get('page_end'),
+             c.get('token_estimate'), c['change_type'], c.get('previous_chunk_id'), False)
+            for c in chunks
+        ], page_size=len(chunks) or 100)
+        inserted = cur.rowcount
+        conn.commit()
+        cur.close()
+        return inserted
+    except Exception as e:
+        print(f"Error inserting PDF chunks: {e}")
+        if conn:
+            conn.rollback()
+        return -1
+    finally:
+        if conn:
+            conn.close()
+
+
+def finalize_chunk_version(document_id: int, source_key: str, counts: dict) -> bool:
+    """Make the new chunk version current (one transaction) and store the diff counts."""
+    conn = None
+    try:
+        conn = get_connection()
+        cur = conn.cursor()
+        cur.execute("""
+            UPDATE pdf_chunk SET is_current = FALSE
+            WHERE source_key = %s AND document_id <> %s AND is_current
+        """, (source_key, document_id))
+        cur.execute("UPDATE pdf_chunk SET is_current = TRUE WHERE document_id = %s", (document_id,))
+        cur.execute("""
+            UPDATE pdf_document SET chunk_status = 'done', chunked_at = now(), chunk_stats = %s
+            WHERE document_id = %s
+        """, (json.dumps(counts), document_id))
+        conn.commit()
+        cur.close()
+        return True
+    except Exception as e:
+        print(f"Error finalizing chunk version: {e}")
+        if conn:
+            conn.rollback()
+        return False
+    finally:
+        if conn:
+            conn.close()
+
+
+# ============================================================================
+# STRICT EXTRACTION FUNCTIONS (v1.9)
+# ============================================================================
+
+def get_chunks_to_extract(limit: int = 500) -> list:
+    """
+    Current chunks that were inserted, changed or deleted and not yet extracted.
+    Unchanged chunks are skipped - their requirements are already in nodes.
+    """
+    try:
+        conn = get_connection()
+        cur = conn.cursor(cursor_factory=RealDictCursor)
+        cur.execute("""
+            SELECT c.chunk_id, c.document_id, c.source_key, c.anchor, c.text,
+                   c.page_start, c.change_type, d.project_id, d.file_name
+            FROM pdf_chunk c
+            JOIN pdf_document d ON d.document_id = c.document_id
+            WHERE c.is_current
+              AND c.extracted_at IS NULL
+              AND c.change_type <> 'unchanged'
+            ORDER BY c.chunk_id
+            LIMIT %s
+        """, (limit,))
+        rows = cur.fetchall()
+        cur.close()
+        conn.close()
+        return [dict(r) for r in rows]
+    except Exception as e:
+        print(f"Error getting chunks to extract: {e}")
+        return []
+
+
+def count_chunks_to_extract() -> int:
+    """Backlog size for the strict extractor heartbeat."""
+    try:
+        conn = get_connection()
+        cur = conn.cursor()
+        cur.execute("""
+            SELECT COUNT(*) FROM pdf_chunk
+            WHERE is_current AND extracted_at IS NULL AND change_type <> 'unchanged'
+        """)
+        count = cur.fetchone()[0]
+        cur.close()
+        conn.close()
+        return count
+    except Exception as e:
+        print(f"Error counting chunks to extract: {e}")
+        return 0
+
+
+def upsert_extracted_requirements(project_id: str, scope: str, records: list) -> dict:
+    """
+    Batched insert-or-update of extracted requirement nodes (keyed by req_id).
+
+    Args:
+        project_id: Target project
+        scope: 'customer' or 'platform'
+        records: List of dicts with req_id, text, id_type, attributes
+
+    Returns:
+        Dict with inserted, updated counts (or error)
+    """
+    # Last occurrence wins for duplicate IDs in one batch
+    by_req_id = {r['req_id']: r for r in records}
+    if not by_req_id:
+        return {"inserted": 0, "updated": 0}
+
+    conn = None
+    try:
+        conn = get_connection()
+        cur = conn.cursor()
+
+        cur.execute("""
+            SELECT attributes->>'req_id', node_uuid::text FROM nodes
+            WHERE project_id = %s AND scope = %s AND attributes->>'req_id' = ANY(%s)
+        """, (project_id, scope, list(by_req_id)))
+        existing = dict(cur.fetchall())
+
+        new_rows = [
+            (project_id, scope, r['text'], json.dumps(r['attributes']), r['id_type'])
+            for req_id, r in by_req_id.items() if req_id not in existing
+        ]
+        update_rows = [
+            (existing[req_id], r['text'], json.dumps(r['attributes']), r['id_type'])
+            for req_id, r in by_req_id.items() if req_id in existing
+        ]
+
+        if new_rows:
+            execute_values(cur, """
+                INSERT INTO nodes (project_id, type, scope, content, attributes, id_type)
+                VALUES %s
+            """, new_rows, template="(%s, 'requirement', %s, %s, %s, %s)", page_size=500)
+
+        if update_rows:
+            execute_values(cur, """
+                UPDATE nodes n SET
+                    content = v.content,
+                    attributes = v.attributes::jsonb,
+                    id_type = v.id_type,
+                    node_status = NULL
+                FROM (VALUES %s) AS v(node_uuid, content, attributes, id_type)
+                WHERE n.node_uuid = v.node_uuid::uuid
+            """, update_rows, page_size=500)
+
+        conn.commit()
+        cur.close()
+        return {"inserted": len(new_rows), "updated": len(update_rows)}
+    except Exception as e:
+        print(f"Error upserting extracted requirements: {e}")
+        if conn:
+            conn.rollback()
+        return {"inserted": 0, "updated": 0, "error": str(e)}
+    finally:
+        if conn:
+            conn.close()
+
+
+def mark_deleted_chunk_requirements(source_key: str, anchors: list) -> int:
+    """Flag nodes extracted from chunks that were removed in a new spec revision."""
+    if not anchors:
+        return 0
+    conn = None
+    try:
+        conn = get_connection()
+        cur = conn.cursor()
+        cur.execute("""
+            UPDATE nodes SET node_status = 'deleted'
+            WHERE attributes->>'source_key' = %s
+              AND attributes->>'anchor' = ANY(%s)
+        """, (source_key, anchors))
+        updated = cur.rowcount
+        conn.commit()
+        cur.close()
+        return updated
+    except Exception as e:
+        print(f"Error marking deleted requirements: {e}")
+        if conn:
+            conn.rollback()
+        return -1
+    finally:
+        if conn:
+            conn.close()
+
+
+def mark_chunks_extracted(chunk_ids: list) -> bool:
+    """Set extracted_at for processed chunks."""
+    if not chunk_ids:
+        return True
+    conn = None
+    try:
+        conn = get_connection()
+        cur = conn.cursor()
+        cur.execute("UPDATE pdf_chunk SET extracted_at = now() WHERE chunk_id = ANY(%s)", (chunk_ids,))
+        conn.commit()
+        cur.close()
+        return True
+    except Exception as e:
+        print(f"Error marking chunks extracted: {e}")
+        if conn:
+            conn.rollback()
+        return False
+    finally:
+        if conn:
+            conn.close()
+
+
+# ============================================================================
+# GIT IMPACT FUNCTIONS (v1.9)
+# ============================================================================
+
+def claim_code_change_events(limit: int = 4, stale_minutes: int = 15, max_attempts: int = 5,
+                             retry_minutes: int = 5) -> list:
+    """
+    Claim NEW events, PROCESSING events abandoned for stale_minutes and ERROR
+    events older than retry_minutes that were claimed fewer than max_attempts
+    times. FOR UPDATE SKIP LOCKED lets several agent instances run side by side.
+    """
+    conn = None
+    try:
+        conn = get_connection()
+        cur = conn.cursor(cursor_factory=RealDictCursor)
+        cur.execute("""
+            UPDATE code_change_event
+            SET status = 'PROCESSING', claimed_at = now(), error = NULL, attempts = attempts + 1
+            WHERE event_id IN (
+                SELECT event_id FROM code_change_event
+                WHERE status = 'NEW'
+                   OR (status = 'PROCESSING' AND claimed_at < now() - make_interval(mins => %s))
+                   OR (status = 'ERROR' AND attempts < %s
+                       AND processed_at < now() - make_interval(mins => %s))
+                ORDER BY event_id
+                LIMIT %s
+                FOR UPDATE SKIP LOCKED
+            )
+            RETURNING event_id, repo, branch, commit_before, commit_after, author, files
+        """, (stale_minutes, max_attempts, retry_minutes, limit))
+        rows = cur.fetchall()
+        conn.commit()
+        cur.close()
+        return [dict(r) for r in rows]
+    except Exception as e:
+        print(f"Error claiming code change events: {e}")
+        if conn:
+            conn.rollback()
+        return []
+    finally:
+        if conn:
+            conn.close()
+
+
+def count_new_code_change_events() -> int:
+    """Number of events waiting for the git impact agent."""
+    try:
+        conn = get_connection()
+        cur = conn.cursor()
+        cur.execute("SELECT COUNT(*) FROM code_change_event WHERE status = 'NEW'")
+        count = cur.fetchone()[0]
+        cur.close()
+        conn.close()
+        return count
+    except Exception as e:
+        print(f"Error counting code change events: {e}")
+        return 0
+
+
+def find_existing_req_ids(tokens: list) -> set:
+    """Subset of tokens that are req_ids of existing nodes (None on error)."""
+    if not tokens:
+        return set()
+    try:
+        conn = get_connection()
+        cur = conn.cursor()
+        cur.execute("""
+            SELECT DISTINCT attributes->>'req_id' FROM nodes
+            WHERE attributes->>'req_id' = ANY(%s)
+        """, (list(tokens),))
+        found = {r[0] for r in cur.fetchall()}
+        cur.close()
+        conn.close()
+        return found
+    except Exception as e:
+        print(f"Error finding req_ids: {e}")
+        return None
+
+
+def save_code_impact_results(event: dict, hints: list, impacts: list) -> bool:
+    """
+    Replace hints/impacts of an event and mark it DONE (one transaction, so
+    re-processing an event is idempotent).
+
+    Args:
+        event: Event dict (event_id, repo, commit_after)
+        hints: Dicts with file_path, line_no, token, matched_req_id
+        impacts: Dicts with file_path, code_id, platform_req_id, similarity,
+                 impact_level, signal_source
+    """
+    conn = None
+    try:
+        conn = get_connection()
+        cur = conn.cursor()
+
+        cur.execute("DELETE FROM code_link_hint WHERE event_id = %s", (event['event_id'],))
+        cur.execute("DELETE FROM code_impact WHERE event_id = %s", (event['event_id'],))
+
+        if hints:
+            execute_values(cur, """
+                INSERT INTO code_link_hint (event_id, repo, commit_after, file_path, line_no, token, matched_req_id)
+                VALUES %s
+            """, [
+                (event['event_id'], event['repo'], event['commit_after'], h['file_path'],
+                 h['line_no'], h['token'], h.get('matched_req_id'))
+                for h in hints
+            ], page_size=1000)
+
+        if impacts:
+            execute_values(cur, """
+                INSERT INTO code_impact
+                (event_id, repo, commit_after, file_path, code_id, platform_req_id,
+                 similarity, impact_level, signal_source)
+                VALUES %s
+            """, [
+                (event['event_id'], event['repo'], event['commit_after'], i['file_path'], i['code_id'],
+                 i['platform_req_id'], i['similarity'], i['impact_level'], i['signal_source'])
+                for i in impacts
+            ], page_size=1000)
+
+        cur.execute("""
+            UPDATE code_change_event SET status = 'DONE', processed_at = now(), error = NULL
+            WHERE event_id = %s
+        """, (event['event_id'],))
+
+        conn.commit()
+        cur.close()
+        return True
+    except Exception as e:
+        print(f"Error saving code impact results: {e}")
+        if conn:
+            conn.rollback()
+        return False
+    finally:
+        if conn:
+            conn.close()
+
+
+def fail_code_change_event(event_id: int, error: str) -> bool:
+    """Mark an event as failed (claimed again by claim_code_change_events until max_attempts)."""
+    conn = None
+    try:
+        conn = get_connection()
+        cur = conn.cursor()
+        cur.execute("""
+            UPDATE code_change_event SET status = 'ERROR', processed_at = now(), error = %s
+            WHERE event_id = %s
+        """, (error[:2000], event_id))
+        conn.commit()
+        cur.close()
+        return True
+    except Exception as e:
+        print(f"Error failing code change event: {e}")
+        if conn:
+            conn.rollback()
+        return False
+    finally:
+        if conn:
+            conn.close()
+
+
+# ============================================================================
+# REPORT FUNCTIONS (v1.9)
+# ============================================================================
+
+def get_rfq_report_queue(model_id: int) -> list:
+    """
+    RFQs with a run key of their current inputs (customer nodes, matches, links).
+
+    The run key is derived from counts, content hashes and max ids plus the
+    latest match run, the model's committed thresholds and the LLM verdicts
+    (re-classification and re-ranking update matches in place) - it changes
+    whenever a report input changes.
+
+    Returns:
+        List of dicts with rfq_id, project_id, run_key, stale
+    """
+    try:
+        conn = get_connection()
+        cur = conn.cursor(cursor_factory=RealDictCursor)
+        cur.execute("""
+            SELECT r.rfq_id, r.project_id,
+                   md5(concat_ws('|', %s::text, c.cnt, c.content_sum, m.cnt, m.max_id, m.verdict_sum, l.cnt, l.max_id,
+                                 mr.run_id, em.full_threshold, em.partial_threshold,
+                                 em.thresholds_committed_at)) AS run_key,
+                   rr.run_key IS DISTINCT FROM
+                   md5(concat_ws('|', %s::text, c.cnt, c.content_sum, m.cnt, m.max_id, m.verdict_sum, l.cnt, l.max_id,
+                                 mr.run_id, em.full_threshold, em.partial_threshold,
+                                 em.thresholds_committed_at)) AS stale
+            FROM rfq r
+            LEFT JOIN rfq_report rr ON rr.rfq_id = r.rfq_id
+            LEFT JOIN LATERAL (
+                SELECT COUNT(*) AS cnt,
+                       SUM(hashtextextended(COALESCE(attributes->>'req_id', '') || COALESCE(content, ''), 0)) AS content_sum
+                FROM nodes WHERE project_id = r.project_id
+            ) c ON true
+            LEFT JOIN LATERAL (
+                SELECT COUNT(*) AS cnt, MAX(m.match_id) AS max_id,
+                       SUM(hashtext(m.rerank_model || ':' || m.rerank_verdict)) AS verdict_sum
+                FROM matches m JOIN nodes n ON n.node_uuid = m.customer_node_uuid
+                WHERE m.model_id = %s AND n.project_id = r.project_id
+            ) m ON true
+            CROSS JOIN (SELECT COUNT(*) AS cnt, MAX(link_id) AS max_id FROM links) l
+            LEFT JOIN LATERAL (
+                SELECT run_id
+                FROM match_runs
+                WHERE model_id = %s AND finished_at IS NOT NULL
+                ORDER BY run_id DESC
+                LIMIT 1
+            ) mr ON true
+            LEFT JOIN embedding_models em ON em.model_id = %s
+            WHERE r.project_id IS NOT NULL
+            ORDER BY r.rfq_id
+        """, (model_id, model_id, model_id, model_id, model_id))
+        rows = cur.fetchall()
+        cur.close()
+        conn.close()
+        return [dict(r) for r in rows]
+    except Exception as e:
+        print(f"Error getting RFQ report queue: {e}")
+        return []
+
+
+def iter_rfq_report_rows(model_id: int, project_id: str, itersize: int = 500):
+    """
+    Stream one row per customer requirement of a project (server-side cursor):
+    best match (rank 1), platform requirement and trace layer counts of the
+    platform requirement (nodes reachable over links, by scope).
+
+    Yields:
+        Dicts with node_uuid, req_id, content, platform_req_id, platform_id,
+        platform_content, similarity, classification, verdict (LLM re-ranking,
+        None if not judged), system, arch, code, test
+    """
+    conn = get_connection()
+    try:
+        cur = conn.cursor(name=f"rfq_report_{abs(hash(project_id))}", cursor_factory=RealDictCursor)
+        cur.itersize = itersize
+        cur.execute("""
+            WITH RECURSIVE best AS (
+                SELECT DISTINCT ON (m.customer_node_uuid)
+                       m.customer_node_uuid, m.platform_node_uuid, m.similarity_score, m.classification,
+                       m.rerank_verdict
+                FROM matches m
+                JOIN nodes c ON c.node_uuid = m.customer_node_uuid
+                WHERE m.model_id = %s AND c.project_id = %s
+                ORDER BY m.customer_node_uuid, m.match_rank, m.similarity_score DESC
+            ),
+            reach(root, node_uuid) AS (
+                SELECT l.source_uuid, l.target_uuid
+                FROM links l
+                WHERE l.source_uuid IN (SELECT DISTINCT platform_node_uuid FROM best)
+                UNION
+                SELECT r.root, l.target_uuid
+                FROM reach r JOIN links l ON l.source_uuid = r.node_uuid
+            ),
+            trace AS (
+                SELECT r.root,
+                       COUNT(*) FILTER (WHERE n.scope = 'system') AS system,
+                       COUNT(*) FILTER (WHERE n.scope = 'arch') AS arch,
+                       COUNT(*) FILTER (WHERE n.scope = 'code') AS code,
+                       COUNT(*) FILTER (WHERE n.scope = 'test') AS test
+                FROM reach r JOIN nodes n ON n.node_uuid = r.node_uuid
+                WHERE r.node_uuid <> r.root
+                GROUP BY r.root
+            )
+            SELECT c.node_uuid::text AS node_uuid,
+                   COALESCE(c.attributes->>'req_id', c.node_uuid::text) AS req_id,
+                   c.content,
+                   p.attributes->>'req_id' AS platform_req_id,
+                   p.project_id AS platform_id,
+                   LEFT(p.content, 500) AS platform_content,
+                   b.similarity_score AS similarity,
+                   b.classification,
+                   b.rerank_verdict AS verdict,
+                   COALESCE(t.system, 0) AS system,
+                   COALESCE(t.arch, 0) AS arch,
+                   COALESCE(t.code, 0) AS code,
+                   COALESCE(t.test, 0) AS test
+            FROM nodes c
+            LEFT JOIN best b ON b.customer_node_uuid = c.node_uuid
+            LEFT JOIN nodes p ON p.node_uuid = b.platform_node_uuid
+            LEFT JOIN trace t ON t.root = b.platform_node_uuid
+            WHERE c.project_id = %s AND c.id_type = 'requirement'
+            ORDER BY req_id
+        """, (model_id, project_id, project_id))
+        for row in cur:
+            yield row
+        cur.close()
+    finally:
+        conn.close()
+
+
+def get_report_fragments(keys: list) -> dict:
+    """Cached rendered fragments by key (and mark them as used)."""
+    if not keys:
+        return {}
+    conn = None
+    try:
+        conn = get_connection()
+        cur = conn.cursor()
+        cur.execute("""
+            UPDATE report_fragment SET last_used_at = now()
+            WHERE fragment_key = ANY(%s)
+            RETURNING fragment_key, html
+        """, (list(keys),))
+        found = {r[0]: r[1] for r in cur.fetchall()}
+        conn.commit()
+        cur.close()
+        return found
+    except Exception as e:
+        print(f"Error getting report fragments: {e}")
+        if conn:
+            conn.rollback()
+        return {}
+    finally:
+        if conn:
+            conn.close()
+
+
+def save_report_fragments(fragments: dict) -> int:
+    """Store rendered fragments {key: html}. Returns number of rows written or -1."""
+    if not fragments:
+        return 0
+    conn = None
+    try:
+        conn = get_connection()
+        cur = conn.cursor()
+        execute_values(cur, """
+            INSERT INTO report_fragment (fragment_key, html)
+            VALUES %s
+            ON CONFLICT (fragment_key) DO UPDATE SET last_used_at = now()
+        """, list(fragments.items()), page_size=500)
+        conn.commit()
+        cur.close()
+        return len(fragments)
+    except Exception as e:
+        print(f"Error saving report fragments: {e}")
+        if conn:
+            conn.rollback()
+        return -1
+    finally:
+        if conn:
+            conn.close()
+
+
+def prune_report_fragments(days: int = 30) -> int:
+    """Delete fragments not used for `days` days. Returns number deleted or -1."""
+    conn = None
+    try:
+        conn = get_connection()
+        cur = conn.cursor()
+        cur.execute("""
+            DELETE FROM report_fragment
+            WHERE last_used_at < now() - make_interval(days => %s)
+        """, (days,))
+        deleted = cur.rowcount
+        conn.commit()
+        cur.close()
+        return deleted
+    except Exception as e:
+        print(f"Error pruning report fragments: {e}")
+        if conn:
+            conn.rollback()
+        return -1
+    finally:
+        if conn:
+            conn.close()
+
+
+def save_rfq_report(rfq_id: str, platform_id: str, summary_html: str, report_path: str,
+                    pdf_path: str, run_key: str, stats: dict) -> bool:
+    """Insert or replace the report of an RFQ."""
+    conn = None
+    try:
+        conn = get_connection()
+        cur = conn.cursor()
+        cur.execute("""
+            INSERT INTO rfq_report (rfq_id, platform_id, summary_html, report_path, pdf_path,
+                                    run_key, stats, updated_at)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, now())
+            ON CONFLICT (rfq_id) DO UPDATE SET
+                platform_id = EXCLUDED.platform_id,
+                summary_html = EXCLUDED.summary_html,
+                report_path = EXCLUDED.report_path,
+                pdf_path = EXCLUDED.pdf_path,
+                run_key = EXCLUDED.run_key,
+                stats = EXCLUDED.stats,
+                updated_at = now()
+        """, (rfq_id, platform_id, summary_html, report_path, pdf_path, run_key, json.dumps(stats)))
+        conn.commit()
+        cur.close()
+        return True
+    except Exception as e:
+        print(f"Error saving RFQ report: {e}")
+        if conn:
+            conn.rollback()
+        return False
+    finally:
+        if conn:
+            conn.close()
+
+
+# ============================================================================
+# AGENT JOB FUNCTIONS (v1.9)
+# ============================================================================
+
+def claim_agent_jobs(job_type: str, limit: int = 10) -> list:
+    """Claim NEW jobs of a type submitted through the bridge API (SKIP LOCKED)."""
+    conn = None
+    try:
+        conn = get_connection()
+        cur = conn.cursor(cursor_factory=RealDictCursor)
+        cur.execute("""
+            UPDATE agent_job SET status = 'RUNNING', started_at = now()
+            WHERE job_id IN (
+                SELECT job_id FROM agent_job
+                WHERE job_type = %s AND status = 'NEW'
+                ORDER BY job_id
+                LIMIT %s
+                FOR UPDATE SKIP LOCKED
+            )
+            RETURNING job_id, job_type, params, submitted_by
+        """, (job_type, limit))
+        rows = cur.fetchall()
+        conn.commit()
+        cur.close()
+        return [dict(r) for r in rows]
+    except Exception as e:
+        print(f"Error claiming agent jobs: {e}")
+        if conn:
+            conn.rollback()
+        return []
+    finally:
+        if conn:
+            conn.close()
+
+
+def finish_agent_job(job_id: int, status: str, result: dict = None, error: str = None) -> bool:
+    """Store the outcome of a job ('DONE' or 'ERROR')."""
+    conn = None
+    try:
+        conn = get_connection()
+        cur = conn.cursor()
+        cur.execute("""
+            UPDATE agent_job SET status = %s, result = %s, error = %s, finished_at = now()
+            WHERE job_id = %s
+        """, (status, json.dumps(result, default=str) if result is not None else None, error, job_id))
+        conn.commit()
+        cur.close()
+        return True
+    except Exception as e:
+        print(f"Error finishing agent job: {e}")
+        if conn:
+            conn.rollback()
+        return False
+    finally:
+        if conn:
+            conn.close()
+
+
+# ============================================================================
+# PROFILE RUN FUNCTIONS (v1.9)
+# ============================================================================
+
+def save_profile_run(kind: str, target: str, mode: str, fmt: str, data: bytes,
+                     duration_ms: float, samples: int = None, meta: dict = None,
+                     summary: str = None) -> int:
+    """
+    Store a captured profile (data is gzip-compressed by the caller).
+
+    Returns:
+        profile_id, or -1 on error
+    """
+    conn = None
+    try:
+        conn = get_connection()
+        cur = conn.cursor()
+        cur.execute("""
+            INSERT INTO profile_runs (kind, target, mode, format, duration_ms, samples,
+                                      meta, summary, data, size_bytes)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+            RETURNING profile_id
+        """, (kind, target, mode, fmt, duration_ms, samples, json.dumps(meta or {}, default=str),
+              summary, psycopg2.Binary(data), len(data)))
+        profile_id = cur.fetchone()[0]
+        conn.commit()
+        cur.close()
+        return profile_id
+    except Exception as e:
+        print(f"Error saving profile run: {e}")
+        if conn:
+            conn.rollback()
+        return -1
+    finally:
+        if conn:
+            conn.close()
+
+
+def list_profile_runs(limit: int = 100) -> list:
+    """Latest profile runs (metadata only, without the profile data)."""
+    try:
+        conn = get_connection()
+        cur = conn.cursor(cursor_factory=RealDictCursor)
+        cur.execute("""
+            SELECT profile_id, kind, target, mode, format, duration_ms, samples,
+                   meta, summary, size_bytes, created_at
+            FROM profile_runs
+            ORDER BY created_at DESC
+            LIMIT %s
+        """, (limit,))
+        rows = cur.fetchall()
+        cur.close()
+        conn.close()
+        return [dict(r) for r in rows]
+    except Exception as e:
+        print(f"Error listing profile runs: {e}")
+        return []
+
+
+def get_profile_run_data(profile_id: int) -> dict:
+    """Return {'format', 'target', 'data'} (gzip bytes) of a profile run, {} if missing."""
+    try:
+        conn = get_connection()
+        cur = conn.cursor(cursor_factory=RealDictCursor)
+        cur.execute("SELECT format, target, data FROM profile_runs WHERE profile_id = %s", (profile_id,))
+        row = cur.fetchone()
+        cur.close()
+        conn.close()
+        if not row:
+            return {}
+        return {"format": row["format"], "target": row["target"], "data": bytes(row["data"])}
+    except Exception as e:
+        print(f"Error loading profile run: {e}")
+        return {}
+
+
+def delete_profile_runs(older_than_days: int = None, profile_id: int = None) -> int:
+    """Delete one profile run or all runs older than N days. Returns deleted count, -1 on error."""
+    conn = None
+    try:
+        conn = get_connection()
+        cur = conn.cursor()
+        if profile_id is not None:
+            cur.execute("DELETE FROM profile_runs WHERE profile_id = %s", (profile_id,))
+        else:
+            cur.execute("DELETE FROM profile_runs WHERE created_at < now() - make_interval(days => %s)",
+                        (older_than_days or 30,))
+        deleted = cur.rowcount
+        conn.commit()
+        cur.close()
+        return deleted
+    except Exception as e:
+        print(f"Error deleting profile runs: {e}")
+        if conn:
+            conn.rollback()
+        return -1
+    finally:
+        if conn:
+            conn.close()
+
+
+# ============================================================================
+# QUERY STATS FUNCTIONS (v1.9)
+# ============================================================================
+
+QUERY_STATS_ORDER = {
+    "total_ms": "total_ms DESC",
+    "calls": "calls DESC",
+    "avg_ms": "total_ms / GREATEST(calls, 1) DESC",
+    "max_ms": "max_ms DESC"
+}
+
+
+def get_top_queries(limit: int = 50, order_by: str = "total_ms") -> list:
+    """
+    Top traced statements from query_stats (agents/db_bridge/tracing.py).
+
+    Args:
+        limit: Max rows
+        order_by: 'total_ms', 'calls', 'avg_ms' or 'max_ms'
+
+    Returns:
+        List of dicts, one per fingerprint + caller
+    """
+    try:
+        conn = get_connection()
+        cur = conn.cursor(cursor_factory=RealDictCursor)
+        cur.execute(f"""
+            SELECT fingerprint, caller, query_text, calls,
+                   ROUND(total_ms::numeric, 1) AS total_ms,
+                   ROUND((total_ms / GREATEST(calls, 1))::numeric, 2) AS avg_ms,
+                   ROUND(max_ms::numeric, 1) AS max_ms,
+                   ROUND(rows::numeric / GREATEST(calls, 1), 1) AS rows_per_call,
+                   slow_calls, slow_ms, slow_query, slow_plan, slow_sampled_at,
+                   first_seen, last_seen
+            FROM query_stats
+            ORDER BY {QUERY_STATS_ORDER.get(order_by, QUERY_STATS_ORDER["total_ms"])}
+            LIMIT %s
+        """, (limit,))
+        rows = cur.fetchall()
+        cur.close()
+        conn.close()
+        return [dict(r) for r in rows]
+    except Exception as e:
+        print(f"Error loading query stats: {e}")
+        return []
+
+
+def reset_query_stats() -> bool:
+    """Delete all collected query statistics."""
+    conn = None
+    try:
+        conn = get_connection()
+        cur = conn.cursor()
+        cur.execute("TRUNCATE query_stats")
+        conn.commit()
+        cur.close()
+        return True
+    except Exception as e:
+        print(f"Error resetting query stats: {e}")
+        if conn:
+            conn.rollback()
+        return False
+    finally:
+        if conn:
+            conn.close()
+
+
+# ============================================================================
+# MATCH RUN FUNCTIONS (v1.9)
+# ============================================================================
+
+def start_match_run(model_id: int, top_k: int, storage_mode: str,
+                    full_threshold: float, partial_threshold: float, candidates: str = "full",
+                    platform_fingerprint: str = None, override_full_threshold: float = None,
+                    override_partial_threshold: float = None) -> int:
+    """
+    Register a matching run.
+
+    Args:
+        full_threshold, partial_threshold: Committed thresholds of the model
+            when the run starts (replaced by the ones applied at the swap)
+        platform_fingerprint: Fingerprint of the platform embeddings the run
+            matches against (match reuse)
+        override_full_threshold, override_partial_threshold: Thresholds given
+            for this run only (re-ranking band); stored matches always use the
+            committed thresholds
+
+    Returns:
+        run_id, or None on error
+    """
+    conn = None
+    try:
+        conn = get_connection()
+        cur = conn.cursor()
+        cur.execute("""
+            INSERT INTO match_runs (model_id, top_k, storage_mode, full_threshold, partial_threshold,
+                                    candidates, platform_fingerprint, override_full_threshold,
+                                    override_partial_threshold)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+            RETURNING run_id
+        """, (model_id, top_k, storage_mode, full_threshold, partial_threshold, candidates,
+              platform_fingerprint, override_full_threshold, override_partial_threshold))
+        run_id = cur.fetchone()[0]
+        conn.commit()
+        cur.close()
+        return run_id
+    except Exception as e:
+        if conn:
+            conn.rollback()
+        print(f"Error starting match run: {e}")
+        return None
+    finally:
+        if conn:
+            conn.close()
+
+
+def finish_match_run(run_id: int, customers: int, platforms: int, matched: int,
+                     histogram: list, bin_width: float, reused: int = 0) -> bool:
+    """
+    Store the results of a matching run.
+
+    Args:
+        run_id: match_runs entry
+        customers, platforms, matched: Run counts
+        histogram: Rank-1 similarity counts; bin i covers [i * bin_width, (i + 1) * bin_width)
+        bin_width: Histogram bin width
+        reused: Customer requirements whose matches were copied from an earlier run
+
+    Returns:
+        True if successful
+    """
+    conn = None
+    try:
+        conn = get_connection()
+        cur = conn.cursor()
+        cur.execute("""
+            UPDATE match_runs
+            SET customers = %s, platforms = %s, matched = %s, reused = %s,
+                histogram = %s, bin_width = %s, finished_at = now()
+            WHERE run_id = %s
+        """, (customers, platforms, matched, reused, json.dumps(histogram), bin_width, run_id))
+        conn.commit()
+        cur.close()
+        return True
+    except Exception as e:
+        if conn:
+            conn.rollback()
+        print(f"Error finishing match run: {e}")
+        return False
+    finally:
+        if conn:
+            conn.close()
+
+
+def get_latest_match_run(model_id: int) -> dict:
+    """
+    Latest finished matching run of a model.
+
+    Returns:
+        Dict with run_id, top_k, storage_mode, candidates, customers, platforms, matched,
+        reused, histogram, bin_width, override_full_threshold, override_partial_threshold,
+        started_at, finished_at, plus the model's committed full_threshold,
+        partial_threshold and thresholds_committed_at; {} if none
+    """
+    try:
+        conn = get_connection()
+        cur = conn.cursor(cursor_factory=RealDictCursor)
+        cur.execute("""
+            SELECT r.run_id, r.top_k, r.storage_mode, r.candidates, r.customers, r.platforms, r.matched,
+                   r.reused, r.histogram, r.bin_width, em.full_threshold, em.partial_threshold,
+                   r.override_full_threshold, r.override_partial_threshold,
+                   em.thresholds_committed_at, r.started_at, r.finished_at
+            FROM match_runs r
+            JOIN embedding_models em ON em.model_id = r.model_id
+            WHERE r.model_id = %s AND r.finished_at IS NOT NULL
+            ORDER BY r.run_id DESC
+            LIMIT 1
+        """, (model_id,))
+        row = cur.fetchone()
+        cur.close()
+        conn.close()
+        return dict(row) if row else {}
+    except Exception as e:
+        print(f"Error loading match run: {e}")
+        return {}
+
+
+def get_match_thresholds(model_id: int) -> tuple:
+    """
+    Committed (GREEN, YELLOW) thresholds of a model (embedding_models),
+    FULL_MATCH_THRESHOLD / PARTIAL_MATCH_THRESHOLD if none were committed.
+    """
+    try:
+        conn = get_connection()
+        cur = conn.cursor()
+        cur.execute("SELECT full_threshold, partial_threshold FROM embedding_models WHERE model_id = %s",
+                    (model_id,))
+        row = cur.fetchone()
+        cur.close()
+        conn.close()
+    except Exception as e:
+        print(f"Error loading match thresholds: {e}")
+        row = None
+    if not row or row[0] is None or row[1] is None:
+        return FULL_MATCH_THRESHOLD, PARTIAL_MATCH_THRESHOLD
+    return row[0], row[1]
+
+
+def commit_match_thresholds(model_id: int, full_threshold: float, partial_threshold: float) -> int:
+    """
+    Persist thresholds: store them on the model and re-classify its stored
+    matches in place (no re-matching). The model row stays locked until the
+    commit, so a concurrent swap_match_run() classifies with the new pair.
+
+    Returns:
+        Number of matches whose classification changed, -1 on error
+    """
+    conn = None
+    try:
+        conn = get_connection()
+        cur = conn.cursor()
+        cur.execute("""
+            UPDATE embedding_models
+            SET full_threshold = %s, partial_threshold = %s, thresholds_committed_at = now()
+            WHERE model_id = %s
+            RETURNING model_id
+        """, (full_threshold, partial_threshold, model_id))
+        row = cur.fetchone()
+        if not row:
+            conn.rollback()
+            return -1
+        cur.execute("""
+            UPDATE matches
+            SET classification = c.classification
+            FROM (SELECT match_id,
+                         CASE WHEN similarity_score >= %(full)s THEN 'GREEN'
+                              WHEN similarity_score >= %(partial)s THEN 'YELLOW'
+                              ELSE 'RED' END AS classification
+                  FROM matches
+                  WHERE model_id = %(model_id)s) c
+            WHERE matches.match_id = c.match_id
+              AND matches.classification IS DISTINCT FROM c.classification
+        """, {"model_id": row[0], "full": full_threshold, "partial": partial_threshold})
+        changed = cur.rowcount
+        conn.commit()
+        cur.close()
+        return changed
+    except Exception as e:
+        if conn:
+            conn.rollback()
+        print(f"Error committing match thresholds: {e}")
+        return -1
+    finally:
+        if conn:
+            conn.close()
+
+
+# ============================================================================
+# COVERAGE MATRIX FUNCTIONS (v1.9)
+# ============================================================================
+
+def get_embedding_fingerprints(model_id: int, scope: str) -> dict:
+    """
+    Per-project fingerprint of a model's embeddings (count, newest embedding,
+    content hashes); changes whenever a node of the project is (re-)embedded
+    or deleted.
+
+    Returns:
+        Dict project_id -> fingerprint string; None on error (an empty dict
+        means the scope has no embeddings)
+    """
+    try:
+        conn = get_connection()
+        cur = conn.cursor()
+        cur.execute("""
+            SELECT n.project_id,
+                   COUNT(*) || '-' || MAX(e.embedding_id) || '-' || SUM(hashtext(e.content_hash)::bigint)
+            FROM embeddings e
+            JOIN nodes n ON n.node_uuid = e.node_uuid
+            WHERE e.model_id = %s AND n.scope = %s AND n.node_status IS DISTINCT FROM 'deleted'
+            GROUP BY n.project_id
+        """, (model_id, scope))
+        rows = cur.fetchall()
+        cur.close()
+        conn.close()
+        return dict(rows)
+    except Exception as e:
+        print(f"Error loading embedding fingerprints: {e}")
+        return None
+
+
+def get_node_projects(model_id: int, scope: str, project_ids: list = None) -> dict:
+    """
+    Project of every embedded node of a scope.
+
+    Returns:
+        Dict node_uuid (text) -> project_id; {} on error
+    """
+    try:
+        conn = get_connection()
+        cur = conn.cursor()
+        cur.execute("""
+            SELECT n.node_uuid::text, n.project_id
+            FROM embeddings e
+            JOIN nodes n ON n.node_uuid = e.node_uuid
+            WHERE e.model_id = %s AND n.scope = %s AND n.node_status IS DISTINCT FROM 'deleted'
+              AND (%s::text[] IS NULL OR n.project_id = ANY(%s::text[]))
+        """, (model_id, scope, project_ids, project_ids))
+        rows = cur.fetchall()
+        cur.close()
+        conn.close()
+        return dict(rows)
+    except Exception as e:
+        print(f"Error loading node projects: {e}")
+        return {}
+
+
+def get_coverage_matrix(model_id: int) -> list:
+    """
+    Stored coverage matrix of a model (one row per customer x platform project).
+
+    Returns:
+        List of dicts with customer_project_id, platform_project_id,
+        requirements, mean_best, histogram, bin_width, customer_fingerprint,
+        platform_fingerprint, computed_at
+    """
+    try:
+        conn = get_connection()
+        cur = conn.cursor(cursor_factory=RealDictCursor)
+        cur.execute("""
+            SELECT customer_project_id, platform_project_id, requirements, mean_best,
+                   histogram, bin_width, customer_fingerprint, platform_fingerprint, computed_at
+            FROM coverage_matrix
+            WHERE model_id = %s
+            ORDER BY customer_project_id, platform_project_id
+        """, (model_id,))
+        rows = cur.fetchall()
+        cur.close()
+        conn.close()
+        return [dict(r) for r in rows]
+    except Exception as e:
+        print(f"Error loading coverage matrix: {e}")
+        return []
+
+
+def save_coverage_matrix(model_id: int, rows: list, customer_projects: list, platform_projects: list) -> int:
+    """
+    Upsert coverage matrix cells and drop cells of projects that no longer
+    have embeddings.
+
+    Args:
+        model_id: Model ID
+        rows: Dicts with customer_project_id, platform_project_id, requirements,
+            mean_best, histogram, bin_width, customer_fingerprint, platform_fingerprint
+        customer_projects: Customer projects that still have embeddings
+        platform_projects: Platform projects that still have embeddings
+
+    Returns:
+        Number of cells written, -1 on error
+    """
+    conn = None
+    try:
+        conn = get_connection()
+        cur = conn.cursor()
+        if rows:
+            execute_values(cur, """
+                INSERT INTO coverage_matrix
+                (model_id, customer_project_id, platform_project_id, requirements, mean_best,
+                 histogram, bin_width, customer_fingerprint, platform_fingerprint, computed_at)
+                VALUES %s
+                ON CONFLICT (model_id, customer_project_id, platform_project_id) DO UPDATE SET
+                    requirements = EXCLUDED.requirements,
+                    mean_best = EXCLUDED.mean_best,
+                    histogram = EXCLUDED.histogram,
+                    bin_width = EXCLUDED.bin_width,
+                    customer_fingerprint = EXCLUDED.customer_fingerprint,
+                    platform_fingerprint = EXCLUDED.platform_fingerprint,
+                    computed_at = now()
+            """, [(model_id, r["customer_project_id"], r["platform_project_id"], r["requirements"],
+                   r["mean_best"], json.dumps(r["histogram"]), r["bin_width"],
+                   r["customer_fingerprint"], r["platform_fingerprint"]) for r in rows],
+                template="(%s, %s, %s, %s, %s, %s, %s, %s, %s, now())")
+        cur.execute("""
+            DELETE FROM coverage_matrix
+            WHERE model_id = %s
+              AND (customer_project_id <> ALL(%s::text[]) OR platform_project_id <> ALL(%s::text[]))
+        """, (model_id, list(customer_projects), list(platform_projects)))
+        conn.commit()
+        cur.close()
+        return len(rows)
+    except Exception as e:
+        if conn:
+            conn.rollback()
+        print(f"Error saving coverage matrix: {e}")
+        return -1
+    finally:
+        if conn:
+            conn.close()
+
+
+# ============================================================================
+# HYBRID CANDIDATE FUNCTIONS (v1.9)
+# ============================================================================
+
+def get_node_contents(node_uuids: list) -> dict:
+    """
+    Content of the given nodes.
+
+    Returns:
+        Dict node_uuid (text) -> content; None on error
+    """
+    if not node_uuids:
+        return {}
+    try:
+        conn = get_connection()
+        cur = conn.cursor()
+        cur.execute("""
+            SELECT node_uuid::text, COALESCE(content, '')
+            FROM nodes
+            WHERE node_uuid = ANY(%s::uuid[])
+        """, (list(node_uuids),))
+        rows = cur.fetchall()
+        cur.close()
+        conn.close()
+        return dict(rows)
+    except Exception as e:
+        print(f"Error loading node contents: {e}")
+        return None
+
+
+# Upper bound pgvector accepts for hnsw.ef_search
+HNSW_EF_SEARCH_MAX = 1000
+
+
+def get_vector_candidates(model_id: int, vector_dims: int, customer_uuids: list, limit: int) -> dict:
+    """
+    Nearest platform requirements of each customer requirement via the
+    model's HNSW index (approximate).
+
+    Customer vectors share the index and the scope filter runs after the
+    index scan, so near-duplicate customer texts can crowd out platform rows.
+    pgvector's iterative index scan (0.8+) keeps scanning until the filter is
+    satisfied; on older versions, customers that got fewer than limit
+    candidates are queried again with a 4x larger ef_search, up to
+    HNSW_EF_SEARCH_MAX.
+
+    Args:
+        model_id: Embedding model ID
+        vector_dims: Vector dimension (must match the partial index expression)
+        customer_uuids: Customer node UUIDs
+        limit: Candidates per customer
+
+    Returns:
+        Dict customer_uuid -> list of (platform_uuid, platform_req_id); None on error
+    """
+    if not customer_uuids:
+        return {}
+    conn = None
+    try:
+        conn = get_connection()
+        cur = conn.cursor()
+        cur.execute("SAVEPOINT iterative_scan")
+        try:
+            cur.execute("SET LOCAL hnsw.iterative_scan = relaxed_order")
+            cur.execute("RELEASE SAVEPOINT iterative_scan")
+        except Exception:
+            # pgvector < 0.8: over-fetch adaptively below
+            cur.execute("ROLLBACK TO SAVEPOINT iterative_scan")
+
+        column = f"::vector({int(vector_dims)})"
+        candidates = {}
+        pending = list(customer_uuids)
+        ef_search = max(100, int(limit) * 4)
+        while pending:
+            cur.execute(f"SET LOCAL hnsw.ef_search = {min(ef_search, HNSW_EF_SEARCH_MAX)}")
+            cur.execute(f"""
+                SELECT q.node_uuid::text, c.node_uuid::text, c.req_id
+                FROM embeddings q
+                CROSS JOIN LATERAL (
+                    SELECT e.node_uuid, n.attributes->>'req_id' AS req_id
+                    FROM embeddings e
+                    JOIN nodes n ON n.node_uuid = e.node_uuid
+                    WHERE e.model_id = {int(model_id)} AND n.scope = 'platform'
+                      AND n.node_status IS DISTINCT FROM 'deleted'
+                    ORDER BY e.embedding{column} <=> q.embedding{column}
+                    LIMIT %s
+                ) c
+                WHERE q.model_id = %s AND q.node_uuid = ANY(%s::uuid[])
+            """, (limit, model_id, pending))
+            found = {}
+            for customer_uuid, platform_uuid, req_id in cur.fetchall():
+                found.setdefault(customer_uuid, []).append((platform_uuid, req_id))
+            candidates.update(found)
+            if ef_search >= HNSW_EF_SEARCH_MAX:
+                break
+            pending = [c for c in pending if len(found.get(c, [])) < limit]
+            ef_search *= 4
+        conn.commit()
+        cur.close()
+        return candidates
+    except Exception as e:
+        if conn:
+            conn.rollback()
+        print(f"Error loading vector candidates: {e}")
+        return None
+    finally:
+        if conn:
+            conn.close()
+
+
+def get_lexical_candidates(model_id: int, customer_tokens: dict, limit: int) -> dict:
+    """
+    Platform requirements sharing identifiers (part numbers, signal names,
+    ASIL tags, ...) with each customer requirement, via the full-text index
+    on nodes.content_tsv. Each identifier is matched as a phrase; the
+    identifiers of one requirement are OR-ed and ranked with ts_rank_cd.
+
+    Args:
+        model_id: Embedding model ID (only embedded platform nodes qualify)
+        customer_tokens: Dict customer_uuid -> list of identifier tokens
+        limit: Candidates per customer
+
+    Returns:
+        Dict customer_uuid -> list of (platform_uuid, platform_req_id, rank); None on error
+    """
+    values = [(uuid, tokens) for uuid, tokens in customer_tokens.items() if tokens]
+    if not values:
+        return {}
+    try:
+        conn = get_connection()
+        cur = conn.cursor()
+        rows = execute_values(cur, f"""
+            SELECT q.customer_uuid, c.node_uuid::text, c.req_id, c.rank
+            FROM (VALUES %s) AS q(customer_uuid, tokens)
+            CROSS JOIN LATERAL (
+                SELECT string_agg('(' || phraseto_tsquery('simple', t)::text || ')', ' | ')::tsquery AS query
+                FROM unnest(q.tokens) t
+                WHERE phraseto_tsquery('simple', t)::text <> ''
+            ) tq
+            CROSS JOIN LATERAL (
+                SELECT p.node_uuid, p.attributes->>'req_id' AS req_id,
+                       ts_rank_cd(p.content_tsv, tq.query) AS rank
+                FROM nodes p
+                WHERE p.scope = 'platform' AND p.content_tsv @@ tq.query
+                  AND p.node_status IS DISTINCT FROM 'deleted'
+                  AND EXISTS (SELECT 1 FROM embeddings e
+                              WHERE e.node_uuid = p.node_uuid AND e.model_id = {int(model_id)})
+                ORDER BY rank DESC
+                LIMIT {int(limit)}
+            ) c
+        """, values, template="(%s, %s::text[])", page_size=500, fetch=True)
+        cur.close()
+        conn.close()
+        candidates = {}
+        for customer_uuid, platform_uuid, req_id, rank in rows:
+            candidates.setdefault(customer_uuid, []).append((platform_uuid, req_id, float(rank)))
+        return candidates
+    except Exception as e:
+        print(f"Error loading lexical candidates: {e}")
+        return None
+
+
+# ============================================================================
+# RERANK FUNCTIONS (v1.9)
+# ============================================================================
+
+def get_yellow_matches(model_id: int, full_th: float, partial_th: float, run_id: int = None,
+                       limit: int = None, max_chars: int = None) -> list:
+    """
+    Matches in the YELLOW band (partial_th <= similarity < full_th) with the
+    texts of both requirements (LLM re-ranking).
+
+    Args:
+        model_id: Embedding model ID
+        full_th: GREEN threshold
+        partial_th: YELLOW threshold
+        run_id: Only matches of this match run (default: all of the model)
+        limit: Max rows (most similar first)
+        max_chars: Texts are cut to this many characters (default: full text);
+            the hashes are taken over the cut texts
+
+    Returns:
+        List of dicts with match_id, similarity_score, customer_hash, platform_hash,
+        customer_content, platform_content
+    """
+    try:
+        conn = get_connection()
+        cur = conn.cursor(cursor_factory=RealDictCursor)
+        cur.execute("""
+            SELECT match_id, similarity_score,
+                   md5(customer_content) AS customer_hash, md5(platform_content) AS platform_hash,
+                   customer_content, platform_content
+            FROM (
+                SELECT m.match_id, m.similarity_score,
+                       left(COALESCE(c.content, ''), COALESCE(%s::int, 2147483647)) AS customer_content,
+                       left(COALESCE(p.content, ''), COALESCE(%s::int, 2147483647)) AS platform_content
+                FROM matches m
+                JOIN nodes c ON c.node_uuid = m.customer_node_uuid
+                JOIN nodes p ON p.node_uuid = m.platform_node_uuid
+                WHERE m.model_id = %s
+                  AND m.similarity_score >= %s AND m.similarity_score < %s
+                  AND (%s::int IS NULL OR m.run_id = %s::int)
+                ORDER BY m.similarity_score DESC
+                LIMIT %s
+            ) y
+            ORDER BY similarity_score DESC
+        """, (max_chars, max_chars, model_id, partial_th, full_th, run_id, run_id, limit))
+        rows = cur.fetchall()
+        cur.close()
+        conn.close()
+        return [dict(r) for r in rows]
+    except Exception as e:
+        print(f"Error loading YELLOW matches: {e}")
+        return []
+
+
+def get_rerank_cache(keys: list, llm_model: str) -> dict:
+    """
+    Cached re-ranking verdicts.
+
+    Args:
+        keys: List of (customer_hash, platform_hash)
+        llm_model: Re-ranking model
+
+    Returns:
+        Dict (customer_hash, platform_hash) -> {verdict, score, reason}
+    """
+    if not keys:
+        return {}
+    try:
+        conn = get_connection()
+        cur = conn.cursor()
+        cur.execute("""
+            SELECT r.customer_hash, r.platform_hash, r.verdict, r.score, r.reason
+            FROM rerank_cache r
+            JOIN unnest(%s::text[], %s::text[]) AS k(customer_hash, platform_hash)
+              ON k.customer_hash = r.customer_hash AND k.platform_hash = r.platform_hash
+            WHERE r.model = %s
+        """, ([k[0] for k in keys], [k[1] for k in keys], llm_model))
+        rows = cur.fetchall()
+        cur.close()
+        conn.close()
+        return {(c, p): {"verdict": v, "score": s, "reason": r} for c, p, v, s, r in rows}
+    except Exception as e:
+        print(f"Error loading rerank cache: {e}")
+        return {}
+
+
+def save_rerank_cache(llm_model: str, results: dict) -> int:
+    """
+    Store re-ranking verdicts.
+
+    Args:
+        llm_model: Re-ranking model
+        results: Dict (customer_hash, platform_hash) -> {verdict, score, reason}
+
+    Returns:
+        Number of entries written, -1 on error
+    """
+    if not results:
+        return 0
+    conn = None
+    try:
+        conn = get_connection()
+        cur = conn.cursor()
+        execute_values(cur, """
+            INSERT INTO rerank_cache (customer_hash, platform_hash, model, verdict, score, reason)
+            VALUES %s
+            ON CONFLICT (customer_hash, platform_hash, model) DO UPDATE SET
+                verdict = EXCLUDED.verdict,
+                score = EXCLUDED.score,
+                reason = EXCLUDED.reason,
+                created_at = now()
+        """, [(c, p, llm_model, r["verdict"], r["score"], r["reason"]) for (c, p), r in results.items()])
+        conn.commit()
+        cur.close()
+        return len(results)
+    except Exception as e:
+        if conn:
+            conn.rollback()
+        print(f"Error saving rerank cache: {e}")
+        return -1
+    finally:
+        if conn:
+            conn.close()
+
+
+def set_match_verdicts(llm_model: str, verdicts: list) -> int:
+    """
+    Store re-ranking verdicts on matches (stamps matches_changed_at of their models).
+
+    Args:
+        llm_model: Re-ranking model
+        verdicts: List of (match_id, verdict, score)
+
+    Returns:
+        Number of matches updated, -1 on error
+    """
+    if not verdicts:
+        return 0
+    conn = None
+    try:
+        conn = get_connection()
+        cur = conn.cursor()
+        execute_values(cur, """
+            UPDATE matches m
+            SET rerank_verdict = v.verdict, rerank_score = v.score, rerank_model = v.model
+            FROM (VALUES %s) AS v(match_id, verdict, score, model)
+            WHERE m.match_id = v.match_id
+        """, [(match_id, verdict, score, llm_model) for match_id, verdict, score in verdicts],
+            template="(%s::int, %s::text, %s::real, %s::text)", page_size=1000)
+        cur.execute("""
+            UPDATE embedding_models SET matches_changed_at = now()
+            WHERE model_id IN (SELECT DISTINCT model_id FROM matches WHERE match_id = ANY(%s))
+        """, ([match_id for match_id, _, _ in verdicts],))
+        conn.commit()
+        cur.close()
+        return len(verdicts)
+    except Exception as e:
+        if conn:
+            conn.rollback()
+        print(f"Error saving match verdicts: {e}")
+        return -1
+    finally:
+        if conn:
+            conn.close()
+
+
+def get_yellow_verdicts(model_id: int, full_th: float, partial_th: float, verdict: str = None,
+                        limit: int = 200) -> tuple:
+    """
+    Best (rank 1) YELLOW matches of a model with their LLM re-ranking verdicts.
+
+    Args:
+        model_id: Embedding model ID
+        full_th: GREEN threshold
+        partial_th: YELLOW threshold
+        verdict: Only this verdict (MATCH, PARTIAL, NO_MATCH) or 'NONE' for
+            matches that were not judged (default: all)
+        limit: Max rows (most similar first)
+
+    Returns:
+        (counts, rows): counts maps verdict (None = not judged) -> number of
+        YELLOW matches; rows are dicts with customer/platform req_id, similarity,
+        verdict, score and model. ({}, []) on error
+    """
+    try:
+        conn = get_connection()
+        cur = conn.cursor(cursor_factory=RealDictCursor)
+        cur.execute("""
+            SELECT rerank_verdict, COUNT(*) AS cnt
+            FROM matches
+            WHERE model_id = %s AND match_rank = 1
+              AND similarity_score >= %s AND similarity_score < %s
+            GROUP BY rerank_verdict
+        """, (model_id, partial_th, full_th))
+        counts = {r["rerank_verdict"]: r["cnt"] for r in cur.fetchall()}
+        cur.execute("""
+            SELECT c.attributes->>'req_id' AS customer_req_id, p.attributes->>'req_id' AS platform_req_id,
+                   m.similarity_score, m.rerank_verdict, m.rerank_score, m.rerank_model
+            FROM matches m
+            JOIN nodes c ON c.node_uuid = m.customer_node_uuid
+            JOIN nodes p ON p.node_uuid = m.platform_node_uuid
+            WHERE m.model_id = %s AND m.match_rank = 1
+              AND m.similarity_score >= %s AND m.similarity_score < %s
+              AND (%s::text IS NULL
+                   OR (%s::text = 'NONE' AND m.rerank_verdict IS NULL)
+                   OR m.rerank_verdict = %s::text)
+            ORDER BY m.similarity_score DESC
+            LIMIT %s
+        """, (model_id, partial_th, full_th, verdict, verdict, verdict, limit))
+        rows = [dict(r) for r in cur.fetchall()]
+        cur.close()
+        conn.close()
+        return counts, rows
+    except Exception as e:
+        print(f"Error loading YELLOW verdicts: {e}")
+        return {}, []
+
+
+# ============================================================================
+# MATCH REUSE FUNCTIONS (v1.9)
+# ============================================================================
+
+def find_reuse_runs(model_id: int, run_id: int, platform_fingerprint: str, top_k: int,
+                    storage_mode: str, candidates: str) -> list:
+    """
+    Earlier finished runs whose matches are still valid for run_id: same
+    model, platform baseline, storage mode and candidate mode, and at least
+    top_k matches per customer requirement.
+
+    Returns:
+        List of dicts (run_id, platforms), newest first; [] if none or on error
+    """
+    if not platform_fingerprint:
+        return []
+    try:
+        conn = get_connection()
+        cur = conn.cursor(cursor_factory=RealDictCursor)
+        cur.execute("""
+            SELECT run_id, platforms
+            FROM match_runs
+            WHERE model_id = %s AND run_id <> %s AND finished_at IS NOT NULL
+              AND platform_fingerprint = %s AND top_k >= %s
+              AND storage_mode = %s AND candidates = %s
+            ORDER BY run_id DESC
+        """, (model_id, run_id, platform_fingerprint, top_k, storage_mode, candidates))
+        rows = cur.fetchall()
+        cur.close()
+        conn.close()
+        return [dict(r) for r in rows]
+    except Exception as e:
+        print(f"Error loading reusable match runs: {e}")
+        return []
+
+
+def reuse_matches(model_id: int, run_id: int, source_run_ids: list, top_k: int,
+                  full_th: float, partial_th: float) -> list:
+    """
+    Copy the top-K matches of customer requirements whose content hash was
+    already matched in one of source_run_ids into the staged matches of
+    run_id (one INSERT ... SELECT). Matches are re-classified with the given
+    thresholds (and again with the committed ones by swap_match_run()); LLM
+    verdicts are copied along.
+
+    Args:
+        model_id: Embedding model ID
+        run_id: Staged run receiving the copies
+        source_run_ids: Runs from find_reuse_runs()
+        top_k: Matches per customer requirement
+        full_th: GREEN threshold
+        partial_th: YELLOW threshold
+
+    Returns:
+        List of (customer_uuid, similarity, rank) of the copied matches; [] if
+        none or on error (everything is then computed)
+    """
+    if not source_run_ids:
+        return []
+    conn = None
+    try:
+        conn = get_connection()
+        cur = conn.cursor()
+        cur.execute("""
+            WITH current AS (
+                SELECT DISTINCT ON (e.node_uuid) e.node_uuid, e.content_hash, n.project_id
+                FROM embeddings e
+                JOIN nodes n ON n.node_uuid = e.node_uuid
+                WHERE e.model_id = %(model_id)s AND n.scope = 'customer' AND n.node_status IS DISTINCT FROM 'deleted'
+                ORDER BY e.node_uuid, e.embedding_id DESC
+            ),
+            source AS (
+                SELECT DISTINCT ON (m.customer_content_hash)
+                       m.customer_content_hash, m.customer_node_uuid, m.run_id
+                FROM matches m
+                WHERE m.model_id = %(model_id)s AND m.match_rank = 1
+                  AND m.run_id = ANY(%(sources)s)
+                  AND m.customer_content_hash IN (SELECT content_hash FROM current)
+                ORDER BY m.customer_content_hash, m.run_id DESC
+            )
+            INSERT INTO match_staging
+            (model_id, customer_node_uuid, platform_node_uuid,
+             similarity_score, match_rank, classification, run_id,
+             customer_project_id, platform_project_id, customer_content_hash,
+             rerank_verdict, rerank_score, rerank_model)
+            SELECT %(model_id)s, c.node_uuid, m.platform_node_uuid,
+                   m.similarity_score, m.match_rank,
+                   CASE WHEN m.similarity_score >= %(full)s THEN 'GREEN'
+                        WHEN m.similarity_score >= %(partial)s THEN 'YELLOW'
+                        ELSE 'RED' END,
+                   %(run_id)s, c.project_id, m.platform_project_id, c.content_hash,
+                   m.rerank_verdict, m.rerank_score, m.rerank_model
+            FROM current c
+            JOIN source s ON s.customer_content_hash = c.content_hash
+            JOIN matches m ON m.model_id = %(model_id)s AND m.run_id = s.run_id
+                          AND m.customer_node_uuid = s.customer_node_uuid
+                          AND m.match_rank <= %(top_k)s
+            RETURNING customer_node_uuid::text, similarity_score, match_rank
+        """, {"model_id": model_id, "run_id": run_id, "sources": list(source_run_ids),
+              "top_k": top_k, "full": full_th, "partial": partial_th})
+        rows = cur.fetchall()
+        conn.commit()
+        cur.close()
+        return rows
+    except Exception as e:
+        if conn:
+            conn.rollback()
+        print(f"Error reusing matches: {e}")
+        return []
+    finally:
+        if conn:
+            conn.close()
+
+
+def swap_match_run(model_id: int, run_id: int, replace: bool = True) -> int:
+    """
+    Move the staged matches of a run into matches in one transaction, so
+    readers never see two runs side by side or a partial run.
+
+    The matches are classified with the model's committed thresholds as of
+    the swap (the model row is locked against a concurrent commit), and those
+    thresholds are recorded on the run.
+
+    Args:
+        model_id: Embedding model ID
+        run_id: Staged run
+        replace: Delete the model's previous matches in the same transaction
+
+    Returns:
+        Number of matches moved, -1 on error (previous matches are kept)
+    """
+    conn = None
+    try:
+        conn = get_connection()
+        cur = conn.cursor()
+        cur.execute("SELECT full_threshold, partial_threshold FROM embedding_models WHERE model_id = %s FOR UPDATE",
+                    (model_id,))
+        row = cur.fetchone()
+        full_th = row[0] if row and row[0] is not None else FULL_MATCH_THRESHOLD
+        partial_th = row[1] if row and row[1] is not None else PARTIAL_MATCH_THRESHOLD
+        if replace:
+            cur.execute("DELETE FROM matches WHERE model_id = %s", (model_id,))
+        cur.execute("""
+            INSERT INTO matches
+            (model_id, customer_node_uuid, platform_node_uuid,
+             similarity_score, match_rank, classification, run_id,
+             customer_project_id, platform_project_id, customer_content_hash,
+             rerank_verdict, rerank_score, rerank_model)
+            SELECT model_id, customer_node_uuid, platform_node_uuid,
+                   similarity_score, match_rank,
+                   CASE WHEN similarity_score >= %(full)s THEN 'GREEN'
+                        WHEN similarity_score >= %(partial)s THEN 'YELLOW'
+                        ELSE 'RED' END,
+                   run_id, customer_project_id, platform_project_id, customer_content_hash,
+                   rerank_verdict, rerank_score, rerank_model
+            FROM match_staging
+            WHERE model_id = %(model_id)s AND run_id = %(run_id)s
+        """, {"model_id": model_id, "run_id": run_id, "full": full_th, "partial": partial_th})
+        moved = cur.rowcount
+        cur.execute("UPDATE match_runs SET full_threshold = %s, partial_threshold = %s WHERE run_id = %s",
+                    (full_th, partial_th, run_id))
+        cur.execute("DELETE FROM match_staging WHERE model_id = %s AND run_id = %s", (model_id, run_id))
+        conn.commit()
+        cur.close()
+        return moved
+    except Exception as e:
+        if conn:
+            conn.rollback()
+        print(f"Error swapping in match run: {e}")
+        return -1
+    finally:
+        if conn:
+            conn.close()
+
+
+# Advisory lock namespace of matching runs: pg_try_advisory_lock(MATCH_RUN_LOCK, model_id)
+MATCH_RUN_LOCK = 4711
+
+
+def lock_match_run(model_id: int):
+    """
+    Take the per-model matching run lock (session advisory lock), so two runs
+    of one model (agent loop, web button) never stage or swap concurrently.
+
+    Returns:
+        Connection holding the lock (pass to unlock_match_run()), None if
+        another run holds it or on error
+    """
+    conn = None
+    try:
+        conn = get_connection()
+        cur = conn.cursor()
+        cur.execute("SELECT pg_try_advisory_lock(%s, %s)", (MATCH_RUN_LOCK, model_id))
+        acquired = cur.fetchone()[0]
+        conn.commit()
+        cur.close()
+        if acquired:
+            return conn
+        conn.close()
+        return None
+    except Exception as e:
+        print(f"Error locking match run: {e}")
+        if conn:
+            conn.close()
+        return None
+
+
+def unlock_match_run(conn):
+    """Release a lock from lock_match_run() (closing the session releases it too)."""
+    try:
+        cur = conn.cursor()
+        cur.execute("SELECT pg_advisory_unlock_all()")
+        conn.commit()
+        cur.close()
+    except Exception as e:
+        print(f"Error unlocking match run: {e}")
+    finally:
+        conn.close()
+
+
+def discard_staged_matches(model_id: int, run_id: int = None) -> int:
+    """
+    Delete staged matches of a failed run, or of every run of the model
+    (leftovers of killed processes; only call this with lock_match_run() held).
+
+    Returns:
+        Number of rows deleted, -1 on error
+    """
+    conn = None
+    try:
+        conn = get_connection()
+        cur = conn.cursor()
+        if run_id is None:
+            cur.execute("DELETE FROM match_staging WHERE model_id = %s", (model_id,))
+        else:
+            cur.execute("DELETE FROM match_staging WHERE model_id = %s AND run_id = %s", (model_id, run_id))
+        deleted = cur.rowcount
+        conn.commit()
+        cur.close()
+        return deleted
+    except Exception as e:
+        if conn:
+            conn.rollback()
+        print(f"Error discarding staged matches: {e}")
+        return -1
+    finally:
+        if conn:
+            conn.close()
+
+
+# ============================================================================
+# METRICS
+# ============================================================================
+
+def _instrument_helpers():
+    """
+    Time every public DB helper of this module (aat_db_query_ms{helper=...}).
+
+    Connection factories and generator helpers (iter_*) are left unwrapped:
+    the former are not queries, the latter return immediately.
+    """
+    skip = {"get_connection", "get_connection_pool", "agent_loop"}
+    for name, fn in list(globals().items()):
+        if (name.startswith("_") or name in skip or not inspect.isfunction(fn)
+                or fn.__module__ != __name__ or inspect.isgeneratorfunction(fn)):
+            continue
+        globals()[name] = instrument(fn, "aat_db_query_ms", "DB helper latency (ms)", label="helper")
+
+
+_instrument_helpers()
+
+
 if __name__ == "__main__":
-    agent_loop()
\ No newline at end of file
+    agent_loop()
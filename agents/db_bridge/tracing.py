@@ -0,0 +1,273 @@
+"""
+DB Bridge - Query Tracing
+Version: 1.9
+
+Single instrumented connection factory for every process that talks to the
+work_aa schema (agents, bridge API, web). Each statement executed through a
+traced connection records:
+
+- fingerprint   normalized statement (literals -> ?, IN/VALUES lists folded)
+- duration, rows
+- caller        first frame outside psycopg2 / this module ("module:function")
+
+Per-process aggregates (calls, total/max ms, rows per fingerprint + caller)
+are flushed every QUERY_STATS_FLUSH_INTERVAL seconds into query_stats by a
+background thread on its own, untraced connection. SELECT statements slower
+than QUERY_SLOW_MS get their EXPLAIN (FORMAT JSON) plan sampled (at most once
+per fingerprint every QUERY_PLAN_INTERVAL seconds) - the query is not run
+again, only planned.
+
+Set QUERY_TRACING=0 to get plain psycopg2 connections.
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import atexit
+import hashlib
+import threading
+from collections import deque
+
+import psycopg2
+import psycopg2.extensions
+import psycopg2.sql
+
+QUERY_TRACING = os.getenv('QUERY_TRACING', '1') == '1'
+QUERY_SLOW_MS = float(os.getenv('QUERY_SLOW_MS', '500'))
+QUERY_PLAN_INTERVAL = float(os.getenv('QUERY_PLAN_INTERVAL', '600'))
+QUERY_STATS_FLUSH_INTERVAL = float(os.getenv('QUERY_STATS_FLUSH_INTERVAL', '30'))
+QUERY_TEXT_MAX = 2000
+
+_SKIP_MODULES = ("psycopg2", __name__)
+
+_NORMALIZE = [
+    (re.compile(r"--[^\n]*"), " "),                               # comments
+    (re.compile(r"'(?:[^']|'')*'"), "?"),                         # string literals
+    (re.compile(r"\b\d+(?:\.\d+)?\b"), "?"),                      # numbers
+    (re.compile(r"%\(\w+\)s|%s"), "?"),                           # psycopg2 placeholders
+    (re.compile(r"\bIN\s*\(\s*\?(?:\s*,\s*\?)*\s*\)", re.I), "IN (?)"),
+    (re.compile(r"\bVALUES\s*\([^()]*\)(?:\s*,\s*\([^()]*\))*", re.I), "VALUES (...)"),
+    (re.compile(r"\s+"), " "),
+]
+
+
+def connection_params() -> dict:
+    """psycopg2.connect() arguments for the work_aa schema (from DB_* env)."""
+    return dict(
+        host=os.getenv('DB_HOST'),
+        database=os.getenv('DB_NAME'),
+        user=os.getenv('DB_USER'),
+        password=os.getenv('DB_PASS'),
+        port=os.getenv('DB_PORT'),
+        options="-c search_path=work_aa"
+    )
+
+
+def normalize_query(query) -> str:
+    """Statement text with literals and placeholders replaced by '?'."""
+    if isinstance(query, bytes):
+        query = query.decode("utf-8", "replace")
+    text = str(query)
+    for pattern, replacement in _NORMALIZE:
+        text = pattern.sub(replacement, text)
+    return text.strip()[:QUERY_TEXT_MAX]
+
+
+def _caller() -> str:
+    frame = sys._getframe(2)
+    while frame is not None:
+        module = frame.f_globals.get("__name__", "")
+        if not module.startswith(_SKIP_MODULES):
+            return f"{module}:{frame.f_code.co_name}"
+        frame = frame.f_back
+    return "unknown"
+
+
+class QueryStats:
+    """Process-wide aggregates, flushed to query_stats by a daemon thread."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = {}
+        self._fingerprints = {}
+        self._plan_requests = deque(maxlen=100)
+        self._plans_sampled = {}
+        self._thread = None
+
+    def fingerprint(self, query) -> tuple:
+        """(fingerprint, normalized text), cached per distinct statement text."""
+        cached = self._fingerprints.get(query)
+        if cached is None:
+            text = normalize_query(query)
+            cached = (hashlib.md5(text.encode("utf-8")).hexdigest()[:16], text)
+            # Batch statements (execute_values) inline their values: not worth caching
+            if len(self._fingerprints) < 5000 and len(query) <= 4096:
+                self._fingerprints[query] = cached
+        return cached
+
+    def record(self, query, duration_ms: float, rows: int, caller: str):
+        fingerprint, text = self.fingerprint(query)
+        slow = duration_ms >= QUERY_SLOW_MS
+        with self._lock:
+            entry = self._stats.get((fingerprint, caller))
+            if entry is None:
+                entry = self._stats[(fingerprint, caller)] = {
+                    "query_text": text, "calls": 0, "total_ms": 0.0,
+                    "max_ms": 0.0, "rows": 0, "slow_calls": 0
+                }
+            entry["calls"] += 1
+            entry["total_ms"] += duration_ms
+            entry["max_ms"] = max(entry["max_ms"], duration_ms)
+            entry["rows"] += max(rows, 0)
+            if slow:
+                entry["slow_calls"] += 1
+        self._ensure_thread()
+        return fingerprint if slow else None
+
+    def request_plan(self, fingerprint: str, caller: str, statement: str, duration_ms: float):
+        """Queue an EXPLAIN of a slow statement (rate limited per fingerprint)."""
+        now = time.monotonic()
+        with self._lock:
+            last = self._plans_sampled.get(fingerprint)
+            if last is not None and now - last < QUERY_PLAN_INTERVAL:
+                return
+            self._plans_sampled[fingerprint] = now
+            self._plan_requests.append((fingerprint, caller, statement, duration_ms))
+
+    def reset_after_fork(self):
+        # Forked pool workers start with empty stats and their own flush thread
+        self._lock = threading.Lock()
+        self._stats = {}
+        self._plan_requests.clear()
+        self._thread = None
+
+    def _ensure_thread(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="query-stats", daemon=True)
+                    self._thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(QUERY_STATS_FLUSH_INTERVAL)
+            self.flush()
+
+    def flush(self):
+        """Write pending aggregates and slow-query plans (own, untraced connection)."""
+        with self._lock:
+            stats, self._stats = self._stats, {}
+            plans = list(self._plan_requests)
+            self._plan_requests.clear()
+        if not stats and not plans:
+            return
+
+        conn = None
+        try:
+            conn = psycopg2.connect(**connection_params())
+            cur = conn.cursor()
+            for (fingerprint, caller), s in stats.items():
+                cur.execute("""
+                    INSERT INTO query_stats (fingerprint, caller, query_text, calls, total_ms,
+                                             max_ms, rows, slow_calls, first_seen, last_seen)
+                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, now(), now())
+                    ON CONFLICT (fingerprint, caller) DO UPDATE SET
+                        calls = query_stats.calls + EXCLUDED.calls,
+                        total_ms = query_stats.total_ms + EXCLUDED.total_ms,
+                        max_ms = GREATEST(query_stats.max_ms, EXCLUDED.max_ms),
+                        rows = query_stats.rows + EXCLUDED.rows,
+                        slow_calls = query_stats.slow_calls + EXCLUDED.slow_calls,
+                        last_seen = now()
+                """, (fingerprint, caller, s["query_text"], s["calls"], s["total_ms"],
+                      s["max_ms"], s["rows"], s["slow_calls"]))
+            conn.commit()
+
+            for fingerprint, caller, statement, duration_ms in plans:
+                try:
+                    cur.execute("EXPLAIN (FORMAT JSON) " + statement)
+                    plan = cur.fetchone()[0]
+                    conn.rollback()
+                    cur.execute("""
+                        UPDATE query_stats
+                        SET slow_plan = %s, slow_query = %s, slow_ms = %s, slow_sampled_at = now()
+                        WHERE fingerprint = %s AND caller = %s
+                    """, (json.dumps(plan), statement[:QUERY_TEXT_MAX], duration_ms, fingerprint, caller))
+                    conn.commit()
+                except Exception as e:
+                    conn.rollback()
+                    print(f"[query-stats] EXPLAIN failed for {fingerprint}: {e}")
+            cur.close()
+        except Exception as e:
+            print(f"[query-stats] Flush failed: {e}")
+        finally:
+            if conn:
+                conn.close()
+
+
+QUERY_STATS = QueryStats()
+atexit.register(QUERY_STATS.flush)
+os.register_at_fork(after_in_child=QUERY_STATS.reset_after_fork)
+
+
+class TracingCursorMixin:
+    """Times execute()/executemany() and records them in QUERY_STATS."""
+
+    def execute(self, query, vars=None):
+        start = time.perf_counter()
+        try:
+            return super().execute(query, vars)
+        finally:
+            self._trace(query, vars, start)
+
+    def executemany(self, query, vars_list):
+        start = time.perf_counter()
+        try:
+            return super().executemany(query, vars_list)
+        finally:
+            self._trace(query, None, start)
+
+    def _trace(self, query, vars, start):
+        duration_ms = (time.perf_counter() - start) * 1000
+        if isinstance(query, psycopg2.sql.Composable):
+            query = query.as_string(self.connection)
+        caller = _caller()
+        slow_fingerprint = QUERY_STATS.record(query, duration_ms, self.rowcount, caller)
+        if slow_fingerprint and self.name is None:
+            statement = self.query.decode("utf-8", "replace") if self.query else ""
+            if statement.lstrip().upper().startswith(("SELECT", "WITH")):
+                QUERY_STATS.request_plan(slow_fingerprint, caller, statement, duration_ms)
+
+
+_cursor_classes = {}
+
+
+def _traced_cursor_class(base):
+    cls = _cursor_classes.get(base)
+    if cls is None:
+        cls = _cursor_classes[base] = type(f"Traced{base.__name__}", (TracingCursorMixin, base), {})
+    return cls
+
+
+class TracingConnection(psycopg2.extensions.connection):
+    """Connection whose cursors (any cursor_factory) are traced."""
+
+    def cursor(self, *args, **kwargs):
+        base = kwargs.pop("cursor_factory", None) or self.cursor_factory or psycopg2.extensions.cursor
+        kwargs["cursor_factory"] = _traced_cursor_class(base)
+        return super().cursor(*args, **kwargs)
+
+
+def connect(**overrides):
+    """Open a (traced) connection to the work_aa schema."""
+    params = connection_params()
+    params.update(overrides)
+    if QUERY_TRACING:
+        params.setdefault("connection_factory", TracingConnection)
+    return psycopg2.connect(**params)
+
+
+def pool_connection_factory():
+    """connection_factory argument for psycopg2.pool (None if tracing is disabled)."""
+    return TracingConnection if QUERY_TRACING else None
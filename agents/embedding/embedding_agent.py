@@ -1,23 +1,52 @@
 """
 Embedding Agent - Generate vector embeddings using Ollama
-Version: 1.70
+Version: 1.9
+
+Embeddings are produced by a pipeline of overlapping stages connected by
+bounded queues (backpressure: a slow stage blocks the one before it):
+
+    fetch (keyset pages) -> prepare (normalize + hash) -> embed (N workers) -> write (bulk)
+
+A pipeline run drains the whole backlog; --loop mode starts the next run as
+soon as one finished with work done, otherwise waits --sleep seconds.
+
+Several models can be embedded side by side (--model a,b): one pipeline per
+model, running concurrently. A model's vector dimension comes from the
+embedding_models registry; unknown models are registered with the dimension
+of a probe embedding.
 """
 
 import sys
 import os
 import hashlib
-import requests
 import time
 import re
+import queue
+import threading
 
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
 
 from agents.db_bridge.database import (
     get_or_create_embedding_model,
+    get_embedding_model_settings,
     get_nodes_for_embedding,
-    insert_embedding,
-    update_agent_heartbeat
+    insert_embeddings
 )
+from agents.ollama_bridge import client as ollama_client
+from agents.runtime.metrics import REGISTRY
+from agents.runtime.profiling import profile_run, PROFILE_MODES
+from agents.runtime.scheduler import run_concurrently
+
+AGENT_NAME = "embedding_agent"
+
+# Pipeline tuning (v1.9)
+EMBED_FETCH_PAGE = int(os.getenv('EMBED_FETCH_PAGE', '200'))
+EMBED_WORKERS = int(os.getenv('EMBED_WORKERS', '2'))          # matches the gateway quota
+EMBED_QUEUE_SIZE = int(os.getenv('EMBED_QUEUE_SIZE', '256'))
+EMBED_WRITE_BATCH = int(os.getenv('EMBED_WRITE_BATCH', '100'))
+EMBED_WRITE_FLUSH_SEC = float(os.getenv('EMBED_WRITE_FLUSH_SEC', '2'))
+
+_DONE = object()
 
 
 def normalize_text(text: str, max_chars: int = 4000) -> str:
@@ -65,29 +94,24 @@ def l2_normalize(vector: list) -> list:
 
 def get_embedding_from_ollama(text: str, model: str, ollama_url: str) -> list:
     """
-    Get embedding from Ollama API.
+    Get embedding from Ollama API (through the Ollama gateway).
 
     Args:
         text: Text to embed
         model: Model name (e.g., 'nomic-embed-text')
-        ollama_url: Ollama API URL
+        ollama_url: Gateway or Ollama API URL
 
     Returns:
         Embedding vector (list of floats)
     """
-    url = f"{ollama_url}/api/embeddings"
-
-    payload = {
-        "model": model,
-        "prompt": text
-    }
-
     try:
-        response = requests.post(url, json=payload, timeout=30)
-        response.raise_for_status()
-
-        data = response.json()
-        embedding = data.get('embedding', [])
+        embedding = ollama_client.embed(
+            text, model,
+            client=AGENT_NAME,
+            priority=ollama_client.PRIORITY_BATCH,
+            timeout=30,
+            base_url=ollama_url
+        )
 
         # L2 normalize
         embedding = l2_normalize(embedding)
@@ -99,113 +123,283 @@ def get_embedding_from_ollama(text: str, model: str, ollama_url: str) -> list:
         return None
 
 
+class EmbeddingPipeline:
+    """
+    One drain of the embedding backlog through bounded stage queues.
+
+    Stages run in their own threads; run() returns when every node fetched
+    has been written (or skipped / failed), or after stop() once the items
+    already in flight are finished. Every stage forwards its end marker even
+    when it fails, and drains its input, so a failing stage never leaves the
+    others blocked; run() then re-raises the first stage exception.
+    """
+
+    def __init__(self, model: str, model_id: int, vector_dims: int, ollama_url: str,
+                 scope: str = None, max_chars: int = 4000, only_missing: bool = True,
+                 limit: int = None, dry_run: bool = False, workers: int = EMBED_WORKERS,
+                 stop_event: threading.Event = None):
+        self.model = model
+        self.model_id = model_id
+        self.vector_dims = vector_dims
+        self.ollama_url = ollama_url
+        self.scope = scope
+        self.max_chars = max_chars
+        self.only_missing = only_missing
+        self.limit = limit
+        self.dry_run = dry_run
+        self.workers = max(1, workers)
+        self.stop_event = stop_event or threading.Event()
+
+        self.nodes = queue.Queue(EMBED_QUEUE_SIZE)
+        self.texts = queue.Queue(EMBED_QUEUE_SIZE)
+        self.results = queue.Queue(EMBED_QUEUE_SIZE)
+        self.stats = {"fetched": 0, "embedded": 0, "skipped": 0, "errors": 0}
+        self._lock = threading.Lock()
+        self._failed = threading.Event()
+        self._exceptions = []
+
+    def depth(self) -> int:
+        """Items waiting between stages (reported as queue_size)."""
+        return self.nodes.qsize() + self.texts.qsize() + self.results.qsize()
+
+    def stop(self):
+        self.stop_event.set()
+
+    def _count(self, key: str, n: int = 1):
+        with self._lock:
+            self.stats[key] += n
+
+    def _stopping(self) -> bool:
+        return self.stop_event.is_set() or self._failed.is_set()
+
+    def _fail(self, stage: str, error: Exception):
+        """Record a stage failure and stop the other stages (in-flight items are dropped)."""
+        print(f"[Embedding Agent] [ERROR] Stage {stage} failed: {error}")
+        with self._lock:
+            self._exceptions.append(error)
+        self._failed.set()
+
+    @staticmethod
+    def _drain(q: queue.Queue, markers: int):
+        """Discard items of q until markers end markers were read."""
+        while markers > 0:
+            if q.get() is _DONE:
+                markers -= 1
+
+    # Stage 1: keyset-paged fetch
+    def _fetch(self):
+        after = None
+        try:
+            while not self._stopping():
+                page = EMBED_FETCH_PAGE
+                if self.limit is not None:
+                    page = min(page, self.limit - self.stats["fetched"])
+                    if page <= 0:
+                        break
+                nodes = get_nodes_for_embedding(scope=self.scope, only_missing=self.only_missing,
+                                                model_id=self.model_id, limit=page, after=after)
+                if not nodes:
+                    break
+                for node in nodes:
+                    self.nodes.put(node)
+                self._count("fetched", len(nodes))
+                after = (nodes[-1]['created_at'], nodes[-1]['node_uuid'])
+        except Exception as e:
+            self._fail("fetch", e)
+        finally:
+            self.nodes.put(_DONE)
+
+    # Stage 2: normalize + hash
+    def _prepare(self):
+        try:
+            while True:
+                node = self.nodes.get()
+                if node is _DONE:
+                    break
+                normalized = normalize_text(node.get('content', ''), self.max_chars)
+                if not normalized:
+                    self._count("skipped")
+                    continue
+                self.texts.put((node, normalized, compute_hash(normalized)))
+        except Exception as e:
+            self._fail("prepare", e)
+            self._drain(self.nodes, 1)
+        finally:
+            for _ in range(self.workers):
+                self.texts.put(_DONE)
+
+    # Stage 3: embed (parallel workers, the gateway schedules them)
+    def _embed(self):
+        try:
+            while True:
+                item = self.texts.get()
+                if item is _DONE:
+                    break
+                node, normalized, content_hash = item
+                if self._stopping():
+                    continue
+                if self.dry_run:
+                    print(f"[DRY RUN] Would embed: {node.get('node_id')} (hash={content_hash[:8]}...)")
+                    continue
+                embedding = get_embedding_from_ollama(normalized, self.model, self.ollama_url)
+                if not embedding:
+                    self._count("errors")
+                    print(f"[ERROR] Failed to get embedding for {node.get('node_id')}")
+                    continue
+                if len(embedding) != self.vector_dims:
+                    self._count("errors")
+                    print(f"[ERROR] Wrong dimensions: expected {self.vector_dims}, got {len(embedding)}")
+                    continue
+                self.results.put((node['node_uuid'], content_hash, embedding))
+        except Exception as e:
+            self._fail("embed", e)
+            self._drain(self.texts, 1)
+        finally:
+            self.results.put(_DONE)
+
+    # Stage 4: bulk write
+    def _write(self):
+        batch = []
+        finished_workers = 0
+        last_flush = time.monotonic()
+        try:
+            while finished_workers < self.workers:
+                try:
+                    item = self.results.get(timeout=EMBED_WRITE_FLUSH_SEC)
+                except queue.Empty:
+                    item = None
+                if item is _DONE:
+                    finished_workers += 1
+                elif item is not None:
+                    batch.append(item)
+                if batch and (len(batch) >= EMBED_WRITE_BATCH or finished_workers == self.workers
+                              or time.monotonic() - last_flush >= EMBED_WRITE_FLUSH_SEC):
+                    self._flush(batch)
+                    batch = []
+                    last_flush = time.monotonic()
+        except Exception as e:
+            self._fail("write", e)
+            self._drain(self.results, self.workers - finished_workers)
+
+    def _flush(self, batch: list):
+        written = insert_embeddings(self.model_id, batch)
+        if written < 0:
+            self._count("errors", len(batch))
+            return
+        self._count("embedded", len(batch))
+        REGISTRY.counter("aat_embeddings_total", "Embeddings stored", model=self.model).inc(len(batch))
+        print(f"[Embedding Agent] Wrote {len(batch)} embeddings "
+              f"({self.stats['embedded']}/{self.stats['fetched']} fetched, queue={self.depth()})")
+
+    def run(self) -> dict:
+        threads = [threading.Thread(target=self._fetch, name="embed-fetch", daemon=True),
+                   threading.Thread(target=self._prepare, name="embed-prepare", daemon=True),
+                   threading.Thread(target=self._write, name="embed-write", daemon=True)]
+        threads += [threading.Thread(target=self._embed, name=f"embed-worker-{i}", daemon=True)
+                    for i in range(self.workers)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        if self._exceptions:
+            raise self._exceptions[0]
+        return dict(self.stats)
+
+
+def _ollama_url() -> str:
+    return os.getenv('OLLAMA_GATEWAY_URL', os.getenv('OLLAMA_BASE_URL', 'http://ollama:11434'))
+
+
+def resolve_model(model: str, vector_dims: int = None) -> tuple:
+    """
+    Registry entry of an embedding model.
+
+    Unknown models are registered with vector_dims, or with the length of a
+    probe embedding if vector_dims is not given. Registered models keep their
+    dimension (a different vector_dims is reported and ignored).
+
+    Returns:
+        (model_id, vector_dims), (None, None) on failure
+    """
+    model_id = get_or_create_embedding_model(model)
+    if model_id is None:
+        if not vector_dims:
+            probe = get_embedding_from_ollama("dimension probe", model, _ollama_url())
+            if not probe:
+                return None, None
+            vector_dims = len(probe)
+        model_id = get_or_create_embedding_model(model, vector_dims, 'ollama')
+        if not model_id:
+            return None, None
+        print(f"[Embedding Agent] Registered model {model} ({vector_dims} dims, model_id={model_id})")
+
+    registered = get_embedding_model_settings(model_id).get('vector_dims') or vector_dims
+    if vector_dims and registered != vector_dims:
+        print(f"[Embedding Agent] {model} is registered with {registered} dims, ignoring {vector_dims}")
+    return model_id, registered
+
+
+def parse_models(value: str) -> list:
+    """Model names from a comma separated --model value."""
+    return [m.strip() for m in value.split(',') if m.strip()]
+
+
+@profile_run(AGENT_NAME)
 def run_once(model: str = 'nomic-embed-text',
-            vector_dims: int = 768,
+            vector_dims: int = None,
             scope: str = None,
             batch_size: int = 50,
             max_chars: int = 4000,
             only_missing: bool = True,
-            dry_run: bool = False) -> dict:
+            dry_run: bool = False,
+            drain: bool = False,
+            stop_event: threading.Event = None,
+            on_pipeline=None) -> dict:
     """
     Run embedding generation once.
 
     Args:
         model: Ollama model name
-        vector_dims: Vector dimensions
+        vector_dims: Vector dimensions (only used to register a new model;
+            default: registry, or probed from the model)
         scope: 'customer', 'platform', or None (all)
-        batch_size: Number of nodes to process
+        batch_size: Number of nodes to process (ignored with drain=True)
         max_chars: Maximum characters per text
         only_missing: Skip nodes with existing embeddings
         dry_run: Don't actually insert, just print
+        drain: Process the whole backlog instead of batch_size nodes
+        stop_event: Set to stop fetching and finish the nodes in flight
+        on_pipeline: Callback receiving the EmbeddingPipeline (queue depth reporting)
 
     Returns:
         Dict with stats: embedded, skipped, errors
     """
-    ollama_url = os.getenv('OLLAMA_BASE_URL', 'http://ollama:11434')
-
-    # Get or create model
-    model_id = get_or_create_embedding_model(model, vector_dims, 'ollama')
+    # Get or register model
+    model_id, vector_dims = resolve_model(model, vector_dims)
     if not model_id:
         return {"embedded": 0, "skipped": 0, "errors": 1, "message": "Failed to get model_id"}
 
-    # Get nodes
-    nodes = get_nodes_for_embedding(
-        scope=scope,
-        only_missing=only_missing,
-        model_id=model_id,
-        limit=batch_size
-    )
-
-    print(f"[Embedding Agent] Processing {len(nodes)} nodes (model={model}, scope={scope})")
-
-    embedded = 0
-    skipped = 0
-    errors = 0
-
-    for i, node in enumerate(nodes):
-        try:
-            # Normalize text
-            content = node.get('content', '')
-            normalized = normalize_text(content, max_chars)
-
-            if not normalized:
-                skipped += 1
-                continue
-
-            # Compute hash
-            content_hash = compute_hash(normalized)
-
-            if dry_run:
-                print(f"[DRY RUN] Would embed: {node.get('node_id')} (hash={content_hash[:8]}...)")
-                continue
-
-            # Get embedding from Ollama
-            embedding = get_embedding_from_ollama(normalized, model, ollama_url)
-
-            if not embedding:
-                errors += 1
-                print(f"[ERROR] Failed to get embedding for {node.get('node_id')}")
-                continue
-
-            # Check dimensions
-            if len(embedding) != vector_dims:
-                errors += 1
-                print(f"[ERROR] Wrong dimensions: expected {vector_dims}, got {len(embedding)}")
-                continue
-
-            # Insert to DB
-            success = insert_embedding(
-                node_uuid=str(node['node_uuid']),
-                model_id=model_id,
-                content_hash=content_hash,
-                embedding_vector=embedding
-            )
-
-            if success:
-                embedded += 1
-                print(f"[{i+1}/{len(nodes)}] Embedded: {node.get('node_id')}")
-            else:
-                errors += 1
-
-            # Small delay to avoid overwhelming Ollama
-            time.sleep(0.1)
-
-        except Exception as e:
-            errors += 1
-            print(f"[ERROR] Processing {node.get('node_id', 'unknown')}: {e}")
-
-    # Update heartbeat
-    update_agent_heartbeat('embedding_agent', queue_size=0, details={
-        'model': model,
-        'scope': scope,
-        'embedded': embedded,
-        'errors': errors
-    })
+    pipeline = EmbeddingPipeline(model, model_id, vector_dims, _ollama_url(), scope=scope,
+                                 max_chars=max_chars, only_missing=only_missing,
+                                 limit=None if drain else batch_size, dry_run=dry_run,
+                                 stop_event=stop_event)
+    if on_pipeline:
+        on_pipeline(pipeline)
+
+    print(f"[Embedding Agent] Pipeline start (model={model}, scope={scope}, "
+          f"{'drain' if drain else f'limit={batch_size}'}, workers={pipeline.workers})")
+    start = time.perf_counter()
+    stats = pipeline.run()
+    elapsed = time.perf_counter() - start
+    rate = round(stats["embedded"] / elapsed, 2) if elapsed > 0 else 0.0
+    print(f"[Embedding Agent] Pipeline done ({model}): {stats} in {elapsed:.1f}s ({rate} embeddings/s)")
 
     return {
-        "embedded": embedded,
-        "skipped": skipped,
-        "errors": errors
+        "embedded": stats["embedded"],
+        "skipped": stats["skipped"],
+        "errors": stats["errors"],
+        "seconds": round(elapsed, 3),
+        "embeddings_per_sec": rate
     }
 
 
@@ -213,42 +407,71 @@ if __name__ == "__main__":
     import argparse
 
     parser = argparse.ArgumentParser(description='Embedding Agent')
-    parser.add_argument('--model', default='nomic-embed-text', help='Ollama model name')
-    parser.add_argument('--dims', type=int, default=768, help='Vector dimensions')
+    parser.add_argument('--model', default='nomic-embed-text',
+                        help='Ollama model name(s), comma separated to embed several models side by side')
+    parser.add_argument('--dims', type=int, help='Vector dimensions of a new model (default: probed)')
     parser.add_argument('--scope', choices=['customer', 'platform', 'all'], default='all')
-    parser.add_argument('--batch', type=int, default=50, help='Batch size')
+    parser.add_argument('--batch', type=int, default=50, help='Nodes per run (single run; --loop drains the backlog)')
     parser.add_argument('--max-chars', type=int, default=4000, help='Max characters')
     parser.add_argument('--only-missing', action='store_true', default=True)
     parser.add_argument('--dry-run', action='store_true', help='Dry run mode')
     parser.add_argument('--loop', action='store_true', help='Run in loop')
-    parser.add_argument('--sleep', type=int, default=60, help='Sleep seconds between loops')
+    parser.add_argument('--sleep', type=int, default=60, help='Idle seconds once the backlog is empty')
+    parser.add_argument('--profile', choices=PROFILE_MODES,
+                        help='Profile each run (same as AAT_PROFILE); stored in profile_runs')
 
     args = parser.parse_args()
 
+    if args.profile:
+        os.environ['AAT_PROFILE'] = args.profile
+
     scope = None if args.scope == 'all' else args.scope
+    models = parse_models(args.model)
 
     if args.loop:
-        print(f"[Embedding Agent] Starting loop mode (sleep={args.sleep}s)")
-        while True:
-            result = run_once(
-                model=args.model,
-                vector_dims=args.dims,
-                scope=scope,
-                batch_size=args.batch,
-                max_chars=args.max_chars,
-                only_missing=args.only_missing,
-                dry_run=args.dry_run
-            )
-            print(f"[Loop] Result: {result}")
-            time.sleep(args.sleep)
+        from agents.runtime import run_agent
+
+        def register(runtime):
+            agent = runtime.agent(AGENT_NAME, version="1.9")
+            state = {"pipelines": {}, "last_result": {}}
+
+            def drain_model(model):
+                return run_once(
+                    model=model,
+                    vector_dims=args.dims,
+                    scope=scope,
+                    max_chars=args.max_chars,
+                    only_missing=args.only_missing,
+                    dry_run=args.dry_run,
+                    drain=True,
+                    stop_event=runtime.stop_event,
+                    on_pipeline=lambda p: state["pipelines"].update({model: p})
+                )
+
+            def drain_backlog():
+                # Drain everything (all models concurrently); rerun at once if work was done, else wait --sleep
+                results = run_concurrently(models, drain_model, name="embed-model")
+                print(f"[Loop] Result: {results}")
+                state["last_result"] = results
+                return any(r and r["embedded"] > 0 for r in results.values())
+
+            agent.queue(drain_backlog, idle=args.sleep)
+            agent.set_queue_size(lambda: sum(p.depth() for p in list(state["pipelines"].values())))
+            agent.details(lambda: {"models": models,
+                                   "last_result": state["last_result"],
+                                   "pipeline": {m: dict(p.stats) for m, p in list(state["pipelines"].items())}})
+
+        print(f"[Embedding Agent] Starting loop mode (models={models}, sleep={args.sleep}s)")
+        run_agent(register)
     else:
-        result = run_once(
-            model=args.model,
+        results = run_concurrently(models, lambda model: run_once(
+            model=model,
             vector_dims=args.dims,
             scope=scope,
             batch_size=args.batch,
             max_chars=args.max_chars,
             only_missing=args.only_missing,
             dry_run=args.dry_run
-        )
-        print(f"Result: {result}")
+        ), name="embed-model")
+        for model, result in results.items():
+            print(f"Result ({model}): {result}")
@@ -1,71 +1,420 @@
 #!/usr/bin/env python3
 """
 Agent: git_impact_agent
-Version: 1.6
+Version: 1.9
 Description: Analyzes Git repository changes and their impact on requirements
-Status: Scaffold - waiting for implementation
+
+For every NEW code_change_event:
+1. Claim it (FOR UPDATE SKIP LOCKED) - several instances can run in parallel
+2. `git diff --unified=0` commit_before..commit_after on a local clone
+   (GIT_REPOS_DIR/<repo>, partial clone on first use) - only changed hunks
+3. Scan added lines for req-id tokens (strict_extractor patterns) -> code_link_hint
+4. Embed changed hunks through the embedding path and score them against
+   platform requirements (vector index) -> code_impact
+5. Replace results of the event and mark it DONE in one transaction
+   (idempotent - a re-run produces the same rows)
+
+A failing event (git error, embedder unavailable) is marked ERROR and claimed
+again after GIT_IMPACT_RETRY_MINUTES, up to GIT_IMPACT_MAX_ATTEMPTS claims.
+
+Hunk scan results and snippet embeddings are cached per repo by blob ids /
+snippet hash, so the same change seen in several events (branch + merge,
+re-pushes, cherry-picks) is not rescanned or re-embedded.
 """
 
 import os
+import re
 import sys
 import time
-import psutil
+import hashlib
+import subprocess
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 
 # Add parent directory to path for imports
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from agents.db_bridge.database import update_agent_heartbeat
+from agents.db_bridge.database import (
+    claim_code_change_events,
+    count_new_code_change_events,
+    find_existing_req_ids,
+    save_code_impact_results,
+    fail_code_change_event,
+    get_or_create_embedding_model,
+    search_similar_requirements,
+    FULL_MATCH_THRESHOLD,
+    PARTIAL_MATCH_THRESHOLD
+)
+from agents.embedding.embedding_agent import normalize_text, get_embedding_from_ollama
+from agents.strict_extractor import COMBINED_RE
+from agents.runtime import run_agent
 
 AGENT_NAME = "git_impact_agent"
 
+GIT_REPOS_DIR = os.getenv('GIT_REPOS_DIR', '/app/data/repos')
+GIT_IMPACT_WORKERS = int(os.getenv('GIT_IMPACT_WORKERS', '4'))
+GIT_IMPACT_MODEL = os.getenv('GIT_IMPACT_MODEL', 'nomic-embed-text')
+GIT_IMPACT_TOP_N = int(os.getenv('GIT_IMPACT_TOP_N', '3'))
+GIT_IMPACT_MIN_SIMILARITY = float(os.getenv('GIT_IMPACT_MIN_SIMILARITY', '0.5'))
+GIT_IMPACT_MAX_HUNKS = int(os.getenv('GIT_IMPACT_MAX_HUNKS', '200'))
+GIT_IMPACT_MAX_ATTEMPTS = int(os.getenv('GIT_IMPACT_MAX_ATTEMPTS', '5'))
+GIT_IMPACT_RETRY_MINUTES = int(os.getenv('GIT_IMPACT_RETRY_MINUTES', '5'))
+GIT_CACHE_SIZE = int(os.getenv('GIT_CACHE_SIZE', '20000'))
+SNIPPET_MAX_CHARS = 2000
+POLL_INTERVAL = int(os.getenv('GIT_IMPACT_POLL_INTERVAL', '30'))
+
+HUNK_RE = re.compile(r'^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@')
+INDEX_RE = re.compile(r'^index ([0-9a-f]+)\.\.([0-9a-f]+)')
+
+
+class RepoCache:
+    """Bounded LRU cache (thread safe) for hunk scans and snippet embeddings."""
+
+    def __init__(self, max_size: int = GIT_CACHE_SIZE):
+        self.max_size = max_size
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+
+_repo_locks = {}
+_repo_locks_guard = threading.Lock()
+_blob_cache = RepoCache()
+_embedding_cache = RepoCache()
+
+
+def _repo_lock(repo: str) -> threading.Lock:
+    with _repo_locks_guard:
+        return _repo_locks.setdefault(repo, threading.Lock())
+
+
+def git(repo_dir: str, *args, timeout: int = 300) -> str:
+    """Run a git command in repo_dir and return stdout (raises on failure)."""
+    return subprocess.run(
+        ["git", "-C", repo_dir, *args],
+        capture_output=True, text=True, timeout=timeout, check=True
+    ).stdout
+
+
+def repo_dir_for(repo: str) -> str:
+    """Local clone directory for a repo name or URL."""
+    name = repo.rstrip('/').rsplit('/', 1)[-1]
+    if name.endswith('.git'):
+        name = name[:-4]
+    return os.path.join(GIT_REPOS_DIR, re.sub(r'[^A-Za-z0-9_.-]', '_', name))
+
+
+def ensure_commits(repo: str, commits: list) -> str:
+    """
+    Make sure the commits exist locally (clone / fetch on demand).
+    Fetching is serialized per repo; diffs of one repo can still run in parallel.
+    """
+    repo_dir = repo_dir_for(repo)
+
+    def missing():
+        result = []
+        for commit in commits:
+            try:
+                git(repo_dir, "cat-file", "-e", f"{commit}^{{commit}}", timeout=30)
+            except subprocess.CalledProcessError:
+                result.append(commit)
+        return result
+
+    with _repo_lock(repo):
+        if not os.path.isdir(os.path.join(repo_dir, ".git")) and not os.path.isfile(os.path.join(repo_dir, "HEAD")):
+            if "://" not in repo and not repo.startswith("git@"):
+                raise RuntimeError(f"Repository {repo} not found in {GIT_REPOS_DIR}")
+            os.makedirs(GIT_REPOS_DIR, exist_ok=True)
+            # Partial clone: blobs are fetched lazily, only for files that are diffed
+            subprocess.run(
+                ["git", "clone", "--quiet", "--filter=blob:none", "--no-checkout", repo, repo_dir],
+                capture_output=True, text=True, timeout=1800, check=True
+            )
+        if missing():
+            git(repo_dir, "fetch", "--quiet", "origin", timeout=1800)
+            still_missing = missing()
+            if still_missing:
+                raise RuntimeError(f"Commits not found in {repo}: {still_missing}")
+
+    return repo_dir
+
+
+def parse_diff(diff_text: str) -> list:
+    """
+    Parse `git diff --unified=0 --full-index` output.
+
+    Header lines are only recognised outside hunks: each hunk is read for
+    exactly the old/new line counts of its "@@" header, so an added line
+    such as "++ x" (shown as "+++ x") stays content.
+
+    Returns:
+        List of file dicts: {path, blob_before, blob_after, hunks: [{start, lines}]}
+        where lines are the added/changed lines of the new version
+    """
+    files = []
+    current = None
+    hunk = None
+    old_left = new_left = 0
+
+    for line in diff_text.splitlines():
+        if old_left > 0 or new_left > 0:
+            if line.startswith("+"):
+                hunk["lines"].append(line[1:])
+                new_left -= 1
+            elif line.startswith("-"):
+                old_left -= 1
+            elif not line.startswith("\\"):
+                old_left -= 1
+                new_left -= 1
+            continue
+        if line.startswith("diff --git "):
+            current = {"path": None, "blob_before": None, "blob_after": None, "hunks": []}
+            files.append(current)
+            hunk = None
+        elif current is None:
+            continue
+        elif line.startswith("index "):
+            m = INDEX_RE.match(line)
+            if m:
+                current["blob_before"], current["blob_after"] = m.group(1), m.group(2)
+        elif line.startswith("+++ "):
+            path = line[4:].strip()
+            current["path"] = path[2:] if path.startswith("b/") else (None if path == "/dev/null" else path)
+        elif line.startswith("@@"):
+            m = HUNK_RE.match(line)
+            if m:
+                hunk = {"start": int(m.group(3)), "lines": []}
+                current["hunks"].append(hunk)
+                old_left = int(m.group(2)) if m.group(2) is not None else 1
+                new_left = int(m.group(4)) if m.group(4) is not None else 1
+
+    # Deleted files (no new path) have nothing to scan
+    return [f for f in files if f["path"] and f["hunks"]]
+
+
+def scan_file_changes(file_change: dict) -> dict:
+    """
+    Hint tokens and snippets of one changed file (cached by blob pair).
+
+    Returns:
+        {"hints": [{line_no, token}], "snippets": [{code_id, start, end, text}]}
+    """
+    cache_key = (file_change["path"], file_change["blob_before"], file_change["blob_after"])
+    if file_change["blob_after"]:
+        cached = _blob_cache.get(cache_key)
+        if cached is not None:
+            return cached
 
-def get_resource_metrics():
-    """Get current CPU and RAM usage."""
+    hints = []
+    snippets = []
+    for hunk in file_change["hunks"]:
+        for offset, line in enumerate(hunk["lines"]):
+            for match in COMBINED_RE.finditer(line):
+                if match.lastgroup != 'modal':
+                    hints.append({"line_no": hunk["start"] + offset, "token": match.group(0)})
+
+        text = "\n".join(hunk["lines"])
+        if len(text.strip()) >= 10:
+            end = hunk["start"] + max(len(hunk["lines"]) - 1, 0)
+            snippets.append({
+                "code_id": f"{file_change['path']}:{hunk['start']}-{end}",
+                "start": hunk["start"],
+                "end": end,
+                "text": text[:SNIPPET_MAX_CHARS]
+            })
+
+    result = {"hints": hints, "snippets": snippets}
+    if file_change["blob_after"]:
+        _blob_cache.put(cache_key, result)
+    return result
+
+
+def embed_snippet(text: str, model: str, ollama_url: str) -> list:
+    """Embedding of a code snippet (cached by normalized text hash)."""
+    normalized = normalize_text(text)
+    key = hashlib.sha256(f"{model}|{normalized}".encode('utf-8')).hexdigest()
+    cached = _embedding_cache.get(key)
+    if cached is not None:
+        return cached
+    embedding = get_embedding_from_ollama(normalized, model, ollama_url)
+    if embedding:
+        _embedding_cache.put(key, embedding)
+    return embedding
+
+
+def impact_level(similarity: float) -> str:
+    """HIGH / MEDIUM / LOW by the coverage thresholds."""
+    if similarity >= FULL_MATCH_THRESHOLD:
+        return "HIGH"
+    if similarity >= PARTIAL_MATCH_THRESHOLD:
+        return "MEDIUM"
+    return "LOW"
+
+
+def process_event(event: dict, model_id: int, ollama_url: str) -> dict:
+    """
+    Compute hints and impacts for one event and store them.
+
+    Returns:
+        Dict with event_id, files, hunks, hints, impacts, status
+    """
+    repo_dir = ensure_commits(event["repo"], [event["commit_before"], event["commit_after"]])
+
+    args = ["diff", "--unified=0", "--no-color", "--no-ext-diff", "--full-index", "-M",
+            event["commit_before"], event["commit_after"]]
+    if isinstance(event.get("files"), list) and event["files"]:
+        args += ["--"] + [str(f) for f in event["files"]]
+    changed = parse_diff(git(repo_dir, *args))
+
+    hints = []
+    impacts = []
+    hunks = 0
+
+    for file_change in changed:
+        scan = scan_file_changes(file_change)
+        hunks += len(file_change["hunks"])
+        for hint in scan["hints"]:
+            hints.append({"file_path": file_change["path"], **hint})
+
+        for snippet in scan["snippets"]:
+            if len(impacts) >= GIT_IMPACT_MAX_HUNKS * GIT_IMPACT_TOP_N:
+                break
+            embedding = embed_snippet(snippet["text"], GIT_IMPACT_MODEL, ollama_url)
+            if not embedding:
+                # Embedder down: fail the event so it is retried, not marked DONE without impacts
+                raise RuntimeError(f"No embedding for {snippet['code_id']} (embedder unavailable)")
+            similar = search_similar_requirements(model_id, embedding, top_n=GIT_IMPACT_TOP_N, scope='platform')
+            if similar is None:
+                # Search failed: fail the event so it is retried, not marked DONE without impacts
+                raise RuntimeError(f"Similarity search failed for {snippet['code_id']}")
+            for req in similar:
+                similarity = float(req.get("similarity") or 0.0)
+                if similarity < GIT_IMPACT_MIN_SIMILARITY:
+                    continue
+                impacts.append({
+                    "file_path": file_change["path"],
+                    "code_id": snippet["code_id"],
+                    "platform_req_id": req.get("req_id"),
+                    "similarity": round(similarity, 4),
+                    "impact_level": impact_level(similarity),
+                    "signal_source": "embedding"
+                })
+
+    # Explicit req-id references in code are the strongest signal
+    known = find_existing_req_ids({h["token"] for h in hints})
+    if known is None:
+        raise RuntimeError("Failed to look up hinted req_ids")
+    for hint in hints:
+        hint["matched_req_id"] = hint["token"] if hint["token"] in known else None
+        if hint["matched_req_id"]:
+            impacts.append({
+                "file_path": hint["file_path"],
+                "code_id": f"{hint['file_path']}:{hint['line_no']}",
+                "platform_req_id": hint["matched_req_id"],
+                "similarity": 1.0,
+                "impact_level": "HIGH",
+                "signal_source": "hint"
+            })
+
+    if not save_code_impact_results(event, hints, impacts):
+        raise RuntimeError("Failed to save results")
+
+    return {"event_id": event["event_id"], "files": len(changed), "hunks": hunks,
+            "hints": len(hints), "impacts": len(impacts), "status": "DONE"}
+
+
+def _process_safe(event: dict, model_id: int, ollama_url: str) -> dict:
+    try:
+        return process_event(event, model_id, ollama_url)
+    except Exception as e:
+        error = e.stderr.strip() if isinstance(e, subprocess.CalledProcessError) and e.stderr else str(e)
+        print(f"[{AGENT_NAME}] [ERROR] Event {event['event_id']}: {error}")
+        fail_code_change_event(event["event_id"], error)
+        return {"event_id": event["event_id"], "status": "ERROR", "error": error}
+
+
+def run_once(executor: ThreadPoolExecutor, batch_size: int = GIT_IMPACT_WORKERS * 2) -> dict:
+    """Claim a batch of events and process them in parallel."""
+    events = claim_code_change_events(batch_size, max_attempts=GIT_IMPACT_MAX_ATTEMPTS,
+                                      retry_minutes=GIT_IMPACT_RETRY_MINUTES)
+    if not events:
+        return {"events": 0, "done": 0, "errors": 0}
+
+    ollama_url = os.getenv('OLLAMA_GATEWAY_URL', os.getenv('OLLAMA_BASE_URL', 'http://ollama:11434'))
+    model_id = get_or_create_embedding_model(GIT_IMPACT_MODEL)
+
+    start = time.perf_counter()
+    results = list(executor.map(lambda e: _process_safe(e, model_id, ollama_url), events))
+    elapsed = time.perf_counter() - start
+
+    done = [r for r in results if r["status"] == "DONE"]
     return {
-        "cpu_percent": psutil.cpu_percent(interval=1),
-        "ram_percent": psutil.virtual_memory().percent,
-        "ram_mb": round(psutil.virtual_memory().used / 1024 / 1024, 2)
+        "events": len(events),
+        "done": len(done),
+        "errors": len(results) - len(done),
+        "hunks": sum(r.get("hunks", 0) for r in done),
+        "hints": sum(r.get("hints", 0) for r in done),
+        "impacts": sum(r.get("impacts", 0) for r in done),
+        "seconds": round(elapsed, 2)
     }
 
 
+def register(runtime):
+    """Register the agent: drain NEW events, heartbeat with cache statistics."""
+    agent = runtime.agent(AGENT_NAME, version="1.9")
+    executor = ThreadPoolExecutor(max_workers=GIT_IMPACT_WORKERS)
+    state = {"last": {}}
+
+    def process_events():
+        result = run_once(executor)
+        if result["events"]:
+            state["last"] = result
+            print(f"[{AGENT_NAME}] {result}")
+        agent.status = "processing" if result["events"] else "idle"
+        return result["events"]
+
+    agent.queue(process_events, idle=POLL_INTERVAL)
+    agent.set_queue_size(count_new_code_change_events)
+    agent.details(lambda: {
+        "workers": GIT_IMPACT_WORKERS,
+        "last_run": state["last"],
+        "blob_cache_hits": _blob_cache.hits,
+        "blob_cache_misses": _blob_cache.misses,
+        "embedding_cache_hits": _embedding_cache.hits
+    })
+    agent.on_shutdown(lambda: executor.shutdown(wait=True))
+    return agent
+
+
 def main_loop():
-    """Main daemon loop - sends heartbeat every 30s."""
+    """Run the agent until SIGTERM/SIGINT (drains the running batch first)."""
     db_host = os.getenv('DB_HOST', 'localhost')
     db_port = os.getenv('DB_PORT', '5432')
 
     print(f"[{AGENT_NAME}] Starting daemon loop...")
     print(f"[{AGENT_NAME}] Connected to DB at {db_host}:{db_port}")
-    print(f"[{AGENT_NAME}] Status: Scaffold (waiting for implementation)")
-
-    while True:
-        try:
-            metrics = get_resource_metrics()
-
-            details = {
-                "mode": "scaffold",
-                "status": "waiting_for_implementation",
-                "version": "1.6",
-                "cpu_percent": metrics["cpu_percent"],
-                "ram_percent": metrics["ram_percent"],
-                "ram_mb": metrics["ram_mb"]
-            }
-
-            update_agent_heartbeat(
-                agent_name=AGENT_NAME,
-                queue_size=0,
-                details=details
-            )
-
-            print(f"[{AGENT_NAME}] Heartbeat sent: CPU={metrics['cpu_percent']}%, RAM={metrics['ram_percent']}%")
+    print(f"[{AGENT_NAME}] Repos: {GIT_REPOS_DIR}, workers={GIT_IMPACT_WORKERS}")
 
-        except Exception as e:
-            print(f"[{AGENT_NAME}] Error: {e}")
-
-        time.sleep(30)
+    run_agent(register)
 
 
 if __name__ == "__main__":
-    try:
-        main_loop()
-    except KeyboardInterrupt:
-        print(f"[{AGENT_NAME}] Shutting down...")
+    main_loop()
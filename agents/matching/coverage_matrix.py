@@ -0,0 +1,159 @@
+"""
+Matching - Coverage Matrix
+Version: 1.9
+
+GREEN/YELLOW/RED coverage of every customer project x platform project pair
+of an embedding model, stored in the coverage_matrix summary table.
+
+Unlike the matches table (global top-K over all platforms), a cell holds the
+best similarity of each customer requirement within one platform project. One
+pass per platform project streams its vectors past the customer blocks; each
+cell stores a histogram of those best similarities, so GREEN/YELLOW/RED is
+derived with the committed thresholds when the matrix is read.
+
+Refresh is incremental: each side is fingerprinted per project (see
+get_embedding_fingerprints) and only cells whose customer or platform
+fingerprint changed are recomputed.
+
+    python agents/matching/coverage_matrix.py --model nomic-embed-text
+"""
+
+import sys
+import os
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
+
+from agents.db_bridge.database import (
+    get_or_create_embedding_model,
+    get_embedding_fingerprints,
+    get_node_projects,
+    get_coverage_matrix,
+    save_coverage_matrix,
+    iter_embedding_blocks
+)
+from agents.matching.matching_agent import (
+    MATCH_CUSTOMER_BLOCK,
+    MATCH_PLATFORM_BLOCK,
+    MATCH_HISTOGRAM_BIN,
+    block_top_k,
+    histogram_bin
+)
+
+
+def stale_cells(customer_fps: dict, platform_fps: dict, cells: list) -> dict:
+    """
+    Cells to recompute, grouped by platform project.
+
+    Args:
+        customer_fps: Customer project -> fingerprint
+        platform_fps: Platform project -> fingerprint
+        cells: Stored coverage_matrix rows
+
+    Returns:
+        Dict platform_project_id -> set of customer_project_ids
+    """
+    stored = {(c["customer_project_id"], c["platform_project_id"]):
+              (c["customer_fingerprint"], c["platform_fingerprint"]) for c in cells}
+    stale = {}
+    for platform_project, platform_fp in platform_fps.items():
+        for customer_project, customer_fp in customer_fps.items():
+            if stored.get((customer_project, platform_project)) != (customer_fp, platform_fp):
+                stale.setdefault(platform_project, set()).add(customer_project)
+    return stale
+
+
+def best_per_customer(model_id: int, platform_project: str, customer_projects: set) -> dict:
+    """
+    Best similarity of every customer requirement (of customer_projects)
+    within one platform project.
+
+    Returns:
+        Dict customer node_uuid -> best cosine similarity
+    """
+    best = {}
+    for customer_keys, customer_vectors in iter_embedding_blocks(model_id, 'customer', MATCH_CUSTOMER_BLOCK,
+                                                                 project_ids=sorted(customer_projects)):
+        block_best = [None] * len(customer_keys)
+        for _, platform_vectors in iter_embedding_blocks(model_id, 'platform', MATCH_PLATFORM_BLOCK,
+                                                         project_ids=[platform_project]):
+            for i, candidates in enumerate(block_top_k(customer_vectors, platform_vectors, 1)):
+                if candidates and (block_best[i] is None or candidates[0][0] > block_best[i]):
+                    block_best[i] = candidates[0][0]
+        for (customer_uuid, _), similarity in zip(customer_keys, block_best):
+            if similarity is not None:
+                best[customer_uuid] = similarity
+    return best
+
+
+def refresh_coverage_matrix(model: str = 'nomic-embed-text', force: bool = False) -> dict:
+    """
+    Recompute the coverage matrix cells whose embeddings changed.
+
+    Args:
+        model: Embedding model name
+        force: Recompute every cell
+
+    Returns:
+        Dict with cells (total), refreshed, platforms_scanned, seconds
+    """
+    model_id = get_or_create_embedding_model(model)
+    if not model_id:
+        return {"cells": 0, "refreshed": 0, "errors": 1, "message": f"Unknown embedding model {model}"}
+
+    start = time.perf_counter()
+    customer_fps = get_embedding_fingerprints(model_id, 'customer')
+    platform_fps = get_embedding_fingerprints(model_id, 'platform')
+    if customer_fps is None or platform_fps is None:
+        # Saving with empty fingerprint lists would delete every cell
+        return {"cells": 0, "refreshed": 0, "errors": 1, "message": "Could not load embedding fingerprints"}
+    stale = stale_cells(customer_fps, platform_fps, [] if force else get_coverage_matrix(model_id))
+
+    rows = []
+    bins = int(round(1.0 / MATCH_HISTOGRAM_BIN))
+    for platform_project, customer_projects in sorted(stale.items()):
+        best = best_per_customer(model_id, platform_project, customer_projects)
+        node_projects = get_node_projects(model_id, 'customer', sorted(customer_projects))
+        cells = {c: {"histogram": [0] * bins, "total": 0.0, "count": 0} for c in customer_projects}
+        for customer_uuid, similarity in best.items():
+            cell = cells.get(node_projects.get(customer_uuid))
+            if cell is None:
+                continue
+            cell["histogram"][histogram_bin(similarity)] += 1
+            cell["total"] += similarity
+            cell["count"] += 1
+        for customer_project, cell in cells.items():
+            rows.append({
+                "customer_project_id": customer_project,
+                "platform_project_id": platform_project,
+                "requirements": cell["count"],
+                "mean_best": round(cell["total"] / cell["count"], 4) if cell["count"] else None,
+                "histogram": cell["histogram"],
+                "bin_width": MATCH_HISTOGRAM_BIN,
+                "customer_fingerprint": customer_fps[customer_project],
+                "platform_fingerprint": platform_fps[platform_project]
+            })
+        print(f"[Coverage Matrix] {platform_project}: {len(customer_projects)} customer projects, "
+              f"{len(best)} requirements")
+
+    written = save_coverage_matrix(model_id, rows, list(customer_fps), list(platform_fps))
+    return {
+        "cells": len(customer_fps) * len(platform_fps),
+        "refreshed": max(written, 0),
+        "platforms_scanned": len(stale),
+        "errors": 1 if written < 0 else 0,
+        "seconds": round(time.perf_counter() - start, 3)
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Coverage Matrix')
+    parser.add_argument('--model', default='nomic-embed-text', help='Embedding model name(s), comma separated')
+    parser.add_argument('--force', action='store_true', help='Recompute every cell')
+
+    args = parser.parse_args()
+
+    for name in [m.strip() for m in args.model.split(',') if m.strip()]:
+        print(f"Result ({name}): {refresh_coverage_matrix(name, force=args.force)}")
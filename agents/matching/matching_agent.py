@@ -1,21 +1,121 @@
 """
 Matching Agent - Match customer and platform requirements using embeddings
-Version: 1.70
+Version: 1.9
+
+Embeddings are streamed from server-side cursors in blocks: a block of
+customer vectors is held while the platform vectors stream past it, and the
+top-K per customer is kept as the blocks go by. Memory is bounded by
+MATCH_CUSTOMER_BLOCK x MATCH_PLATFORM_BLOCK scores, not by the corpus size.
+Scoring uses NumPy when it is installed (pure Python otherwise).
+
+Per model, vectors can be held at reduced precision (embedding_models.
+storage_mode: halfvec / int8 / binary, see quantization.py), optionally with
+the top-K candidates re-scored at full precision. A mode is only activated
+(--storage-mode) if its rank-1 agreement with full precision on a sample of
+customer requirements reaches --min-agreement (MATCH_QUANT_MIN_AGREEMENT); the
+check is repeated every MATCH_QUANT_RECHECK_HOURS against the same stored
+minimum and the model falls back to float32 if it fails.
+
+Several models can be matched side by side (--model a,b), concurrently; the
+vector dimension of each model comes from the embedding_models registry.
+
+Each run is recorded in match_runs with a histogram of the rank-1
+similarities (MATCH_HISTOGRAM_BIN wide bins), so GREEN/YELLOW/RED counts for
+any threshold pair can be shown without re-matching. Stored matches are
+always classified with the model's committed thresholds (embedding_models),
+read when the run is swapped in, so a commit made while a run is in progress
+is kept. Thresholds given explicitly (--full-th / --partial-th) only choose
+the YELLOW band that is re-ranked and the dry-run output; they are stored on
+the run as overrides.
+
+In loop mode the coverage matrix (coverage_matrix.py) is refreshed after
+each run.
+
+With --candidates hybrid only a small candidate set per customer requirement
+is scored instead of every platform requirement: the nearest platform
+vectors from the model's HNSW index plus platform requirements sharing
+identifiers (part numbers, signal names, ASIL tags) found through the
+full-text index on nodes.content. The union is scored at full precision and
+ranked by cosine + MATCH_LEXICAL_WEIGHT x normalized text rank; the stored
+similarity stays the cosine.
+
+Customer requirements whose text (the normalized content hash of their
+embedding) was already matched against the same platform baseline are not
+scored again: their top-K is copied from the earlier run in one INSERT ...
+SELECT (reuse_matches) and only novel text is streamed. A run is a valid
+source if its platform fingerprint, storage mode and candidate mode match
+and it kept at least top_k matches.
+
+A run writes its matches to match_staging. When it finishes without errors
+they are swapped into matches in one transaction (replacing the previous
+matches with clear_existing), so readers never see two runs side by side and
+the previous matches stay available as reuse sources during the run. A run
+with errors, or killed, leaves the previous matches untouched.
+
+With --rerank MODEL the YELLOW matches of the run are afterwards judged by
+an Ollama model (rerank.py); verdicts are cached per pair of texts.
 """
 
 import sys
 import os
+import re
 import time
+import heapq
+import hashlib
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
 
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
 
 from agents.db_bridge.database import (
     get_or_create_embedding_model,
-    get_embeddings_by_scope,
-    insert_match,
+    get_embedding_model_settings,
+    set_embedding_storage_mode,
+    sync_quantized_embeddings,
+    iter_embedding_blocks,
+    sample_embedding_block,
+    get_embedding_vectors,
+    insert_matches,
     clear_matches,
-    update_agent_heartbeat
+    swap_match_run,
+    discard_staged_matches,
+    lock_match_run,
+    unlock_match_run,
+    get_embedding_fingerprints,
+    find_reuse_runs,
+    reuse_matches,
+    start_match_run,
+    finish_match_run,
+    get_match_thresholds,
+    get_node_contents,
+    get_vector_candidates,
+    get_lexical_candidates
 )
+from agents.matching.quantization import STORAGE_MODES, quantize, score_block
+from agents.matching.rerank import rerank_yellow
+from agents.runtime.metrics import REGISTRY
+from agents.runtime.profiling import profile_run, PROFILE_MODES
+from agents.runtime.scheduler import run_concurrently
+
+MATCH_CUSTOMER_BLOCK = int(os.getenv('MATCH_CUSTOMER_BLOCK', '4096'))
+MATCH_PLATFORM_BLOCK = int(os.getenv('MATCH_PLATFORM_BLOCK', '2048'))
+MATCH_RESCORE_FACTOR = int(os.getenv('MATCH_RESCORE_FACTOR', '4'))
+MATCH_RESCORE_BLOCK = int(os.getenv('MATCH_RESCORE_BLOCK', '256'))
+MATCH_QUANT_MIN_AGREEMENT = float(os.getenv('MATCH_QUANT_MIN_AGREEMENT', '0.95'))
+MATCH_QUANT_SAMPLE = int(os.getenv('MATCH_QUANT_SAMPLE', '200'))
+MATCH_QUANT_RECHECK_HOURS = float(os.getenv('MATCH_QUANT_RECHECK_HOURS', '24'))
+MATCH_HISTOGRAM_BIN = 0.01
+MATCH_HYBRID_BLOCK = int(os.getenv('MATCH_HYBRID_BLOCK', '256'))
+MATCH_HYBRID_VECTOR_K = int(os.getenv('MATCH_HYBRID_VECTOR_K', '20'))
+MATCH_HYBRID_LEXICAL_K = int(os.getenv('MATCH_HYBRID_LEXICAL_K', '20'))
+MATCH_LEXICAL_WEIGHT = float(os.getenv('MATCH_LEXICAL_WEIGHT', '0.1'))
+MATCH_MAX_IDENTIFIERS = 16
+
+CANDIDATE_MODES = ("full", "hybrid")
+IDENTIFIER_RE = re.compile(r"[A-Za-z0-9][\w.\-/]*[A-Za-z0-9]")
 
 
 def cosine_similarity(vec1: list, vec2: list) -> float:
@@ -55,6 +155,12 @@ def classify_match(similarity: float, full_threshold: float = 0.85, partial_thre
         return 'RED'
 
 
+def histogram_bin(similarity: float, bin_width: float = MATCH_HISTOGRAM_BIN) -> int:
+    """Histogram bin of a similarity (bin i covers [i * bin_width, (i + 1) * bin_width); < 0 -> bin 0)."""
+    bins = int(round(1.0 / bin_width))
+    return min(max(int(similarity / bin_width + 1e-9), 0), bins - 1)
+
+
 def parse_embedding_vector(embedding_str: str) -> list:
     """
     Parse pgvector string to list of floats.
@@ -73,24 +179,332 @@ def parse_embedding_vector(embedding_str: str) -> list:
     return [float(x) for x in embedding_str.split(',')]
 
 
+def block_top_k(customer_vectors, platform_vectors, top_k: int, storage_mode: str = "float32") -> list:
+    """
+    Best platform columns of one block for each customer row.
+
+    Args:
+        customer_vectors: Customer block (matrix or list of vectors)
+        platform_vectors: Platform block (same type / storage mode)
+        top_k: Candidates to keep per customer
+        storage_mode: Representation of both blocks (see quantization.py)
+
+    Returns:
+        One list of (similarity, platform column) per customer row (unordered)
+    """
+    if np is not None and isinstance(customer_vectors, np.ndarray):
+        scores = score_block(customer_vectors, platform_vectors, storage_mode)
+        k = min(top_k, scores.shape[1])
+        columns = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        top = np.take_along_axis(scores, columns, axis=1)
+        return [list(zip(s.tolist(), c.tolist())) for s, c in zip(top, columns)]
+
+    result = []
+    for customer_vec in customer_vectors:
+        scores = ((cosine_similarity(customer_vec, platform_vec), j)
+                  for j, platform_vec in enumerate(platform_vectors))
+        result.append(heapq.nlargest(top_k, scores))
+    return result
+
+
+def stream_top_k(model_id: int, customer_vectors, top_k: int, storage_mode: str = "float32") -> tuple:
+    """
+    Running top-K of a customer block over all platform blocks.
+
+    Returns:
+        (best, platforms): best holds one list of (similarity, (platform_uuid,
+        platform_id)) per customer, sorted descending; platforms is the number
+        of platform vectors streamed
+    """
+    best = [[] for _ in range(len(customer_vectors))]
+    platforms = 0
+    for platform_keys, platform_vectors in iter_embedding_blocks(model_id, 'platform', MATCH_PLATFORM_BLOCK,
+                                                                 storage_mode=storage_mode):
+        candidates = block_top_k(customer_vectors, quantize(platform_vectors, storage_mode), top_k, storage_mode)
+        for i, block_best in enumerate(candidates):
+            best[i] = heapq.nlargest(
+                top_k, best[i] + [(sim, platform_keys[j]) for sim, j in block_best])
+        platforms += len(platform_keys)
+    return best, platforms
+
+
+def identifier_tokens(text: str, limit: int = MATCH_MAX_IDENTIFIERS) -> list:
+    """
+    Identifier-like tokens of a requirement: words with a letter and a digit
+    or an underscore (ECU-4711, CAN_TX_SPEED), or upper-case hyphenated words
+    (ASIL-D). Plain words (SHALL, ISO, high-speed) are not identifiers.
+    """
+    tokens = []
+    for token in IDENTIFIER_RE.findall(text or ""):
+        if token in tokens or not any(c.isalpha() for c in token):
+            continue
+        if (any(c.isdigit() for c in token) or '_' in token
+                or ('-' in token and not any(c.islower() for c in token))):
+            tokens.append(token)
+            if len(tokens) >= limit:
+                break
+    return tokens
+
+
+def hybrid_top_k(model_id: int, vector_dims: int, customer_keys: list, customer_vectors, top_k: int) -> tuple:
+    """
+    Top-K of a customer block over its vector (HNSW) and lexical (identifier)
+    candidates only.
+
+    Returns:
+        (best, pairs, platform_uuids): best like stream_top_k() with cosine
+        similarities, ordered by the fused score; pairs is the number of
+        customer/platform pairs scored; platform_uuids the candidates seen
+
+    Raises:
+        RuntimeError: A candidate query failed (the block would get no matches)
+    """
+    customer_uuids = [customer_uuid for customer_uuid, _ in customer_keys]
+    vector_candidates = get_vector_candidates(model_id, vector_dims, customer_uuids, MATCH_HYBRID_VECTOR_K)
+    contents = get_node_contents(customer_uuids)
+    if vector_candidates is None or contents is None:
+        raise RuntimeError("Loading hybrid candidates failed")
+    lexical_candidates = get_lexical_candidates(
+        model_id, {u: identifier_tokens(contents.get(u, "")) for u in customer_uuids}, MATCH_HYBRID_LEXICAL_K)
+    if lexical_candidates is None:
+        raise RuntimeError("Loading lexical candidates failed")
+
+    platform_uuids = {p for candidates in vector_candidates.values() for p, _ in candidates}
+    platform_uuids.update(p for candidates in lexical_candidates.values() for p, _, _ in candidates)
+    vectors = get_embedding_vectors(model_id, list(platform_uuids))
+    if vectors is None:
+        raise RuntimeError("Loading candidate vectors failed")
+
+    best = []
+    pairs = 0
+    for i, customer_uuid in enumerate(customer_uuids):
+        lexical = {p: (req_id, rank) for p, req_id, rank in lexical_candidates.get(customer_uuid, [])}
+        top_rank = max((rank for _, rank in lexical.values()), default=0.0) or 1.0
+        keys = dict(vector_candidates.get(customer_uuid, []))
+        keys.update((p, req_id) for p, (req_id, _) in lexical.items())
+
+        scored = []
+        for platform_uuid, platform_id in keys.items():
+            platform_vec = vectors.get(platform_uuid)
+            if platform_vec is None:
+                continue
+            if np is not None:
+                similarity = float(np.dot(customer_vectors[i], platform_vec))
+            else:
+                similarity = cosine_similarity(customer_vectors[i], platform_vec)
+            fused = similarity + MATCH_LEXICAL_WEIGHT * lexical.get(platform_uuid, (None, 0.0))[1] / top_rank
+            scored.append((fused, similarity, (platform_uuid, platform_id)))
+        pairs += len(scored)
+        best.append([(similarity, key) for _, similarity, key in heapq.nlargest(top_k, scored)])
+    return best, pairs, platform_uuids
+
+
+def rescore_top_k(model_id: int, customer_keys: list, best: list, top_k: int) -> list:
+    """
+    Re-score quantized candidates with the full-precision vectors and keep top_k.
+
+    Full-precision vectors are loaded for MATCH_RESCORE_BLOCK customers and
+    their candidates at a time, so memory does not grow with the block size.
+
+    Args:
+        model_id: Model ID
+        customer_keys: (node_uuid, node_id) per customer
+        best: Candidate lists from stream_top_k()
+        top_k: Matches to keep per customer
+
+    Returns:
+        Candidate lists like best, with cosine similarities
+
+    Raises:
+        RuntimeError: Loading the vectors failed
+    """
+    result = []
+    for offset in range(0, len(customer_keys), MATCH_RESCORE_BLOCK):
+        keys = customer_keys[offset:offset + MATCH_RESCORE_BLOCK]
+        block = best[offset:offset + MATCH_RESCORE_BLOCK]
+        node_uuids = {customer_uuid for customer_uuid, _ in keys}
+        node_uuids.update(key[0] for candidates in block for _, key in candidates)
+        vectors = get_embedding_vectors(model_id, list(node_uuids))
+        if vectors is None:
+            raise RuntimeError("Loading full-precision vectors failed")
+
+        for (customer_uuid, _), candidates in zip(keys, block):
+            customer_vec = vectors.get(customer_uuid)
+            if customer_vec is None:
+                result.append(candidates[:top_k])
+                continue
+            scored = [(float(np.dot(customer_vec, vectors[key[0]])), key)
+                      for _, key in candidates if key[0] in vectors]
+            result.append(heapq.nlargest(top_k, scored))
+    return result
+
+
+def platform_baseline(model_id: int) -> str:
+    """Fingerprint of all platform embeddings of a model (None if there are none or on error)."""
+    fingerprints = get_embedding_fingerprints(model_id, 'platform')
+    if not fingerprints:
+        return None
+    text = ";".join(f"{project}={fp}" for project, fp in sorted(fingerprints.items()))
+    return hashlib.md5(text.encode("utf-8")).hexdigest()
+
+
+def novel_rows(customer_keys: list, customer_vectors, reused: set) -> tuple:
+    """Drop the customer requirements in reused from a block (keys, vectors)."""
+    keep = [i for i, (customer_uuid, _) in enumerate(customer_keys) if customer_uuid not in reused]
+    if len(keep) == len(customer_keys):
+        return customer_keys, customer_vectors
+    if np is not None and isinstance(customer_vectors, np.ndarray):
+        vectors = customer_vectors[keep]
+    else:
+        vectors = [customer_vectors[i] for i in keep]
+    return [customer_keys[i] for i in keep], vectors
+
+
+def check_recall(model_id: int, storage_mode: str, rescore: bool = True,
+                 sample: int = MATCH_QUANT_SAMPLE) -> float:
+    """
+    Rank-1 agreement of a storage mode with full precision.
+
+    A random sample of customer embeddings is matched against all platform
+    embeddings twice: at float32 and in storage_mode (with re-scoring if
+    requested). The compact column must be filled (sync_quantized_embeddings).
+
+    Returns:
+        Share of sampled customers with the same best platform (0-1), None if
+        there is nothing to compare
+    """
+    customer_keys, customer_vectors = sample_embedding_block(model_id, 'customer', sample)
+    if not customer_keys:
+        return None
+
+    exact, platforms = stream_top_k(model_id, customer_vectors, 1)
+    if not platforms:
+        return None
+    candidates_k = MATCH_RESCORE_FACTOR if rescore else 1
+    approx, _ = stream_top_k(model_id, quantize(customer_vectors, storage_mode), candidates_k, storage_mode)
+    if rescore:
+        approx = rescore_top_k(model_id, customer_keys, approx, 1)
+
+    hits = sum(1 for e, a in zip(exact, approx) if e and a and e[0][1][0] == a[0][1][0])
+    return hits / len(customer_keys)
+
+
+def activate_storage_mode(model: str = 'nomic-embed-text',
+                          vector_dims: int = None,
+                          storage_mode: str = 'halfvec',
+                          rescore: bool = True,
+                          min_agreement: float = MATCH_QUANT_MIN_AGREEMENT,
+                          sample: int = MATCH_QUANT_SAMPLE) -> dict:
+    """
+    Switch a model to a storage mode if it passes the recall check.
+
+    Args:
+        model: Model name
+        vector_dims: Vector dimensions (only used if the model is not registered yet)
+        storage_mode: 'float32', 'halfvec', 'int8' or 'binary'
+        rescore: Re-score top-K candidates at full precision (always on for binary)
+        min_agreement: Required rank-1 agreement with float32 (0-1)
+        sample: Customer requirements in the recall check
+
+    Returns:
+        Dict with activated, storage_mode, agreement
+    """
+    model_id = get_or_create_embedding_model(model, vector_dims, 'ollama')
+    if not model_id:
+        return {"activated": False, "message": f"Unknown embedding model {model}"}
+    rescore = rescore or storage_mode == "binary"
+
+    if storage_mode == "float32":
+        set_embedding_storage_mode(model_id, "float32")
+        sync_quantized_embeddings(model_id, "float32")
+        return {"activated": True, "storage_mode": "float32", "agreement": None}
+    if np is None:
+        return {"activated": False, "message": f"{storage_mode} requires numpy"}
+
+    current = get_embedding_model_settings(model_id).get('storage_mode') or "float32"
+    synced = sync_quantized_embeddings(model_id, storage_mode)
+    print(f"[Matching Agent] {storage_mode}: {synced} embeddings converted, checking recall...")
+
+    agreement = check_recall(model_id, storage_mode, rescore, sample)
+    if agreement is None:
+        sync_quantized_embeddings(model_id, current)
+        return {"activated": False, "storage_mode": current, "message": "No embeddings found"}
+
+    if agreement < min_agreement:
+        sync_quantized_embeddings(model_id, current)
+        print(f"[Matching Agent] Refusing {storage_mode}: rank-1 agreement {agreement:.3f} "
+              f"< {min_agreement:.3f}, keeping {current}")
+        return {"activated": False, "storage_mode": current, "agreement": agreement}
+
+    set_embedding_storage_mode(model_id, storage_mode, rescore=rescore, agreement=agreement,
+                               min_agreement=min_agreement)
+    print(f"[Matching Agent] Activated {storage_mode} (rescore={rescore}), rank-1 agreement {agreement:.3f}")
+    return {"activated": True, "storage_mode": storage_mode, "agreement": agreement}
+
+
+def _storage_mode_for_run(model_id: int) -> tuple:
+    """
+    (storage_mode, rescore) for a run; re-checks recall when the last check is
+    stale, against the agreement required when the mode was activated.
+    """
+    settings = get_embedding_model_settings(model_id)
+    storage_mode = settings.get('storage_mode') or "float32"
+    if storage_mode == "float32":
+        return "float32", False
+    if np is None or storage_mode not in STORAGE_MODES:
+        print(f"[Matching Agent] Storage mode {storage_mode} unavailable (numpy missing?), using float32")
+        return "float32", False
+
+    rescore = bool(settings.get('quant_rescore')) or storage_mode == "binary"
+    min_agreement = settings.get('quant_min_agreement')
+    if min_agreement is None:
+        min_agreement = MATCH_QUANT_MIN_AGREEMENT
+    sync_quantized_embeddings(model_id, storage_mode)
+
+    age = settings.get('quant_check_age_hours')
+    if age is None or age >= MATCH_QUANT_RECHECK_HOURS:
+        agreement = check_recall(model_id, storage_mode, rescore)
+        if agreement is not None and agreement < min_agreement:
+            print(f"[Matching Agent] {storage_mode} rank-1 agreement dropped to {agreement:.3f}, "
+                  f"reverting to float32")
+            set_embedding_storage_mode(model_id, "float32", agreement=agreement)
+            sync_quantized_embeddings(model_id, "float32")
+            return "float32", False
+        set_embedding_storage_mode(model_id, storage_mode, rescore=rescore, agreement=agreement)
+
+    return storage_mode, rescore
+
+
+@profile_run('matching_agent')
 def run_once(model: str = 'nomic-embed-text',
-            vector_dims: int = 768,
+            vector_dims: int = None,
             top_k: int = 5,
-            full_threshold: float = 0.85,
-            partial_threshold: float = 0.65,
+            full_threshold: float = None,
+            partial_threshold: float = None,
             clear_existing: bool = True,
-            dry_run: bool = False) -> dict:
+            dry_run: bool = False,
+            candidates: str = "full",
+            rerank_model: str = None,
+            reuse: bool = True) -> dict:
     """
     Run matching once.
 
     Args:
         model: Model name
-        vector_dims: Vector dimensions
+        vector_dims: Vector dimensions (only used if the model is not registered yet)
         top_k: Number of top matches to store per customer req
-        full_threshold: GREEN threshold
-        partial_threshold: YELLOW threshold
+        full_threshold: GREEN threshold for this run's re-ranking band and
+            dry-run output (default: committed threshold of the model); stored
+            matches always use the committed thresholds
+        partial_threshold: YELLOW threshold, like full_threshold
         clear_existing: Clear existing matches before running
         dry_run: Don't actually insert
+        candidates: 'full' (every platform requirement) or 'hybrid'
+            (vector + lexical candidates only, see module docstring)
+        rerank_model: Ollama model re-ranking the YELLOW matches of the run
+            (default: no re-ranking)
+        reuse: Copy the matches of customer text already matched against the
+            same platform baseline instead of scoring it again
 
     Returns:
         Dict with stats
@@ -98,94 +512,166 @@ def run_once(model: str = 'nomic-embed-text',
     # Get model ID
     model_id = get_or_create_embedding_model(model, vector_dims, 'ollama')
     if not model_id:
-        return {"matched": 0, "errors": 1, "message": "Failed to get model_id"}
-
-    # Clear existing matches if requested
-    if clear_existing and not dry_run:
-        clear_matches(model_id)
-        print(f"[Matching Agent] Cleared existing matches for model_id={model_id}")
-
-    # Get embeddings
-    print(f"[Matching Agent] Loading embeddings...")
-    customer_embeddings = get_embeddings_by_scope(model_id, 'customer')
-    platform_embeddings = get_embeddings_by_scope(model_id, 'platform')
-
-    print(f"[Matching Agent] Customer: {len(customer_embeddings)}, Platform: {len(platform_embeddings)}")
-
-    if not customer_embeddings or not platform_embeddings:
-        return {"matched": 0, "errors": 0, "message": "No embeddings found"}
-
+        return {"matched": 0, "errors": 1, "message": f"Unknown embedding model {model}"}
+
+    lock = None
+    if not dry_run:
+        # One run per model at a time: the staging rows and the swap are per model
+        lock = lock_match_run(model_id)
+        if lock is None:
+            return {"matched": 0, "errors": 1,
+                    "message": f"Another matching run of {model} is in progress"}
+    try:
+        return _run_locked(model, model_id, vector_dims, top_k, full_threshold, partial_threshold,
+                           clear_existing, dry_run, candidates, rerank_model, reuse)
+    finally:
+        if lock is not None:
+            unlock_match_run(lock)
+
+
+def _run_locked(model: str, model_id: int, vector_dims: int, top_k: int, full_threshold: float,
+                partial_threshold: float, clear_existing: bool, dry_run: bool, candidates: str,
+                rerank_model: str, reuse: bool) -> dict:
+    """run_once() of a resolved model, with the model's run lock held (except for dry runs)."""
+    start = time.perf_counter()
     matched = 0
     errors = 0
+    customers = 0
+    platforms = 0
+    pairs_scored = REGISTRY.counter("aat_pairs_scored_total", "Customer/platform pairs scored", model=model)
+
+    hybrid = candidates == "hybrid"
+    if hybrid:
+        # Candidates are scored at full precision; reduced-precision storage is not used
+        storage_mode, rescore = "float32", False
+        vector_dims = get_embedding_model_settings(model_id).get('vector_dims')
+        platform_seen = set()
+    else:
+        storage_mode, rescore = _storage_mode_for_run(model_id)
+    candidates_k = top_k * MATCH_RESCORE_FACTOR if rescore else top_k
+
+    committed_full, committed_partial = get_match_thresholds(model_id)
+    full_threshold = committed_full if full_threshold is None else full_threshold
+    partial_threshold = committed_partial if partial_threshold is None else partial_threshold
+    baseline = platform_baseline(model_id)
+    override = full_threshold != committed_full or partial_threshold != committed_partial
+    run_id = None if dry_run else start_match_run(
+        model_id, top_k, storage_mode, committed_full, committed_partial, candidates, baseline,
+        full_threshold if override else None, partial_threshold if override else None)
+    histogram = [0] * int(round(1.0 / MATCH_HISTOGRAM_BIN))
+
+    if run_id:
+        # Staged rows of killed runs (the run lock rules out a live one)
+        discard_staged_matches(model_id)
+    elif clear_existing and not dry_run:
+        # Without a run the matches cannot be staged: clear before matching
+        clear_matches(model_id)
+        print(f"[Matching Agent] Cleared existing matches for model_id={model_id}")
 
-    for i, customer in enumerate(customer_embeddings):
-        try:
-            customer_vec = parse_embedding_vector(customer['embedding'])
-            customer_uuid = customer['node_uuid']
-            customer_id = customer['node_id']
-
-            # Compute similarities to all platform reqs
-            similarities = []
-
-            for platform in platform_embeddings:
-                platform_vec = parse_embedding_vector(platform['embedding'])
-                platform_uuid = platform['node_uuid']
-
-                similarity = cosine_similarity(customer_vec, platform_vec)
-
-                similarities.append({
-                    'platform_uuid': platform_uuid,
-                    'platform_id': platform['node_id'],
-                    'similarity': similarity
-                })
-
-            # Sort by similarity (descending)
-            similarities.sort(key=lambda x: x['similarity'], reverse=True)
-
-            # Take top K
-            top_matches = similarities[:top_k]
-
-            if dry_run:
-                print(f"[DRY RUN] {customer_id} -> {len(top_matches)} matches")
-                for rank, match in enumerate(top_matches, 1):
-                    classification = classify_match(match['similarity'], full_threshold, partial_threshold)
-                    print(f"  [{rank}] {match['platform_id']}: {match['similarity']:.3f} ({classification})")
+    # Repeated customer text: copy the top-K of an earlier run on the same platform baseline
+    reused = set()
+    if reuse and run_id:
+        sources = find_reuse_runs(model_id, run_id, baseline, top_k, storage_mode, candidates)
+        copied = reuse_matches(model_id, run_id, [r["run_id"] for r in sources], top_k,
+                               committed_full, committed_partial)
+        for customer_uuid, similarity, rank in copied:
+            reused.add(customer_uuid)
+            if rank == 1:
+                histogram[histogram_bin(similarity)] += 1
+        matched += len(copied)
+        REGISTRY.counter("aat_customers_reused_total", "Customer requirements with reused matches",
+                         model=model).inc(len(reused))
+        if reused:
+            customers = len(reused)
+            platforms = sources[0]["platforms"] or 0
+            print(f"[Matching Agent] Reused {len(copied)} matches of {len(reused)} customer reqs "
+                  f"from runs {[r['run_id'] for r in sources]}")
+
+    customer_block = MATCH_HYBRID_BLOCK if hybrid else MATCH_CUSTOMER_BLOCK
+    print(f"[Matching Agent] Streaming embeddings (candidates={candidates}, storage={storage_mode}, "
+          f"rescore={rescore}, customer block={customer_block}, platform block={MATCH_PLATFORM_BLOCK})...")
+    try:
+        for customer_keys, customer_vectors in iter_embedding_blocks(model_id, 'customer', customer_block,
+                                                                     storage_mode=storage_mode):
+            customer_keys, customer_vectors = novel_rows(customer_keys, customer_vectors, reused)
+            if not customer_keys:
                 continue
-
-            # Insert matches
-            for rank, match in enumerate(top_matches, 1):
-                classification = classify_match(match['similarity'], full_threshold, partial_threshold)
-
-                success = insert_match(
-                    model_id=model_id,
-                    customer_uuid=customer_uuid,
-                    platform_uuid=match['platform_uuid'],
-                    similarity=match['similarity'],
-                    rank=rank,
-                    classification=classification
-                )
-
-                if success:
-                    matched += 1
+            if hybrid:
+                best, pairs, block_platforms = hybrid_top_k(model_id, vector_dims, customer_keys,
+                                                            customer_vectors, top_k)
+                platform_seen.update(block_platforms)
+                platforms = len(platform_seen)
+            else:
+                best, platforms = stream_top_k(model_id, quantize(customer_vectors, storage_mode),
+                                               candidates_k, storage_mode)
+                if not platforms:
+                    break
+                if rescore:
+                    best = rescore_top_k(model_id, customer_keys, best, top_k)
+                pairs = len(customer_keys) * platforms
+            customers += len(customer_keys)
+            pairs_scored.inc(pairs)
+
+            rows = []
+            for (customer_uuid, customer_id), top_matches in zip(customer_keys, best):
+                if top_matches:
+                    histogram[histogram_bin(top_matches[0][0])] += 1
+                if dry_run:
+                    print(f"[DRY RUN] {customer_id} -> {len(top_matches)} matches")
+                for rank, (similarity, (platform_uuid, platform_id)) in enumerate(top_matches, 1):
+                    if dry_run:
+                        classification = classify_match(similarity, full_threshold, partial_threshold)
+                        print(f"  [{rank}] {platform_id}: {similarity:.3f} ({classification})")
+                    else:
+                        # Re-classified with the committed thresholds at the swap
+                        rows.append((customer_uuid, platform_uuid, similarity, rank,
+                                     classify_match(similarity, committed_full, committed_partial)))
+
+            if rows:
+                written = insert_matches(model_id, rows, run_id=run_id, staged=bool(run_id))
+                if written < 0:
+                    errors += len(rows)
                 else:
-                    errors += 1
+                    matched += written
+
+            print(f"[Matching Agent] Matched {customers} customer reqs against {platforms} platform reqs")
 
-            print(f"[{i+1}/{len(customer_embeddings)}] Matched {customer_id} to {len(top_matches)} platforms")
+    except Exception as e:
+        errors += 1
+        print(f"[ERROR] Matching failed: {e}")
 
-        except Exception as e:
+    if run_id and errors:
+        # Keep the previous results; the run stays unfinished
+        discard_staged_matches(model_id, run_id)
+        print(f"[Matching Agent] Run {run_id} had {errors} errors, previous matches kept")
+    elif run_id:
+        if swap_match_run(model_id, run_id, replace=clear_existing) < 0:
             errors += 1
-            print(f"[ERROR] Matching {customer.get('node_id', 'unknown')}: {e}")
+            discard_staged_matches(model_id, run_id)
+        else:
+            finish_match_run(run_id, customers, platforms, matched, histogram, MATCH_HISTOGRAM_BIN,
+                             len(reused))
 
-    # Update heartbeat
-    update_agent_heartbeat('matching_agent', queue_size=0, details={
-        'model': model,
-        'matched': matched,
-        'errors': errors
-    })
+    if not customers or not platforms:
+        return {"matched": 0, "errors": errors, "message": "No embeddings found"}
+
+    reranked = None
+    if rerank_model and run_id and not errors:
+        reranked = rerank_yellow(model, rerank_model, run_id=run_id, full_threshold=full_threshold,
+                                 partial_threshold=partial_threshold)
 
     return {
         "matched": matched,
-        "errors": errors
+        "errors": errors,
+        "customers": customers,
+        "platforms": platforms,
+        "storage_mode": storage_mode,
+        "candidates": candidates,
+        "reused": len(reused),
+        "computed": customers - len(reused),
+        "run_id": run_id,
+        "rerank": reranked,
+        "seconds": round(time.perf_counter() - start, 3)
     }
 
 
@@ -193,40 +679,82 @@ if __name__ == "__main__":
     import argparse
 
     parser = argparse.ArgumentParser(description='Matching Agent')
-    parser.add_argument('--model', default='nomic-embed-text', help='Model name')
-    parser.add_argument('--dims', type=int, default=768, help='Vector dimensions')
+    parser.add_argument('--model', default='nomic-embed-text',
+                        help='Model name(s), comma separated to match several models side by side')
+    parser.add_argument('--dims', type=int, help='Vector dimensions of a model that is not registered yet')
     parser.add_argument('--topk', type=int, default=5, help='Top K matches')
-    parser.add_argument('--full-th', type=float, default=0.85, help='Full match threshold')
-    parser.add_argument('--partial-th', type=float, default=0.65, help='Partial match threshold')
+    parser.add_argument('--full-th', type=float, help='Full match threshold (default: committed threshold)')
+    parser.add_argument('--partial-th', type=float, help='Partial match threshold (default: committed threshold)')
     parser.add_argument('--no-clear', action='store_true', help='Do not clear existing matches')
+    parser.add_argument('--candidates', choices=CANDIDATE_MODES, default='full',
+                        help='full: score every platform requirement; hybrid: vector + lexical candidates only')
+    parser.add_argument('--no-reuse', action='store_true',
+                        help='Score every customer requirement, even text matched in an earlier run')
+    parser.add_argument('--rerank', metavar='LLM_MODEL',
+                        help='Re-rank the YELLOW matches of each run with this Ollama model')
     parser.add_argument('--dry-run', action='store_true', help='Dry run mode')
     parser.add_argument('--loop', action='store_true', help='Run in loop')
     parser.add_argument('--sleep', type=int, default=300, help='Sleep seconds')
+    parser.add_argument('--profile', choices=PROFILE_MODES,
+                        help='Profile each run (same as AAT_PROFILE); stored in profile_runs')
+    parser.add_argument('--storage-mode', choices=STORAGE_MODES,
+                        help='Check recall and switch the model to this vector storage mode, then exit')
+    parser.add_argument('--no-rescore', action='store_true',
+                        help='With --storage-mode: do not re-score top-K at full precision')
+    parser.add_argument('--min-agreement', type=float, default=MATCH_QUANT_MIN_AGREEMENT,
+                        help='With --storage-mode: required rank-1 agreement with float32')
 
     args = parser.parse_args()
+    models = [m.strip() for m in args.model.split(',') if m.strip()]
 
-    if args.loop:
-        print(f"[Matching Agent] Starting loop mode (sleep={args.sleep}s)")
-        while True:
-            result = run_once(
-                model=args.model,
-                vector_dims=args.dims,
-                top_k=args.topk,
-                full_threshold=args.full_th,
-                partial_threshold=args.partial_th,
-                clear_existing=not args.no_clear,
-                dry_run=args.dry_run
-            )
-            print(f"[Loop] Result: {result}")
-            time.sleep(args.sleep)
-    else:
-        result = run_once(
-            model=args.model,
+    if args.storage_mode:
+        results = {model: activate_storage_mode(
+            model=model,
+            vector_dims=args.dims,
+            storage_mode=args.storage_mode,
+            rescore=not args.no_rescore,
+            min_agreement=args.min_agreement
+        ) for model in models}
+        print(f"Result: {results}")
+        sys.exit(0 if all(r.get("activated") for r in results.values()) else 1)
+
+    if args.profile:
+        os.environ['AAT_PROFILE'] = args.profile
+
+    def match_model(model):
+        return run_once(
+            model=model,
             vector_dims=args.dims,
             top_k=args.topk,
             full_threshold=args.full_th,
             partial_threshold=args.partial_th,
             clear_existing=not args.no_clear,
-            dry_run=args.dry_run
+            dry_run=args.dry_run,
+            candidates=args.candidates,
+            rerank_model=args.rerank,
+            reuse=not args.no_reuse
         )
-        print(f"Result: {result}")
+
+    if args.loop:
+        from agents.runtime import run_agent
+        from agents.matching.coverage_matrix import refresh_coverage_matrix
+
+        def register(runtime):
+            agent = runtime.agent('matching_agent', version="1.9")
+            state = {}
+
+            def run_loop():
+                results = run_concurrently(models, match_model, name="match-model")
+                print(f"[Loop] Result: {results}")
+                state["last_result"] = results
+                # Incremental: only cells whose embeddings changed are recomputed
+                state["coverage_matrix"] = {model: refresh_coverage_matrix(model) for model in models}
+
+            agent.every(args.sleep, run_loop)
+            agent.details(lambda: dict(state, models=models))
+
+        print(f"[Matching Agent] Starting loop mode (models={models}, sleep={args.sleep}s)")
+        run_agent(register)
+    else:
+        for model, result in run_concurrently(models, match_model, name="match-model").items():
+            print(f"Result ({model}): {result}")
@@ -0,0 +1,71 @@
+"""
+Matching - Reduced-precision vectors
+Version: 1.9
+
+In-memory representations and block scoring per storage mode:
+
+  float32  float32 matrix (default)
+  halfvec  float16 matrix, read from embeddings.embedding_half   (1/2 size)
+  int8     int8 matrix, x * 127, read from embedding_int8           (1/4 size)
+  binary   sign bits packed into uint8, read from embedding_bits (1/32 size);
+           scores are Hamming based and must be re-scored at full precision
+
+The compact modes save storage, transfer and block memory, not scoring time:
+blocks are up-cast to float32 one block pair at a time and scored with the
+BLAS matrix product. numpy has no BLAS kernel for integers, and measured on
+2048 x 2048 blocks of 768 dims the alternatives are slower than the float32
+product (~0.05 s): int32-accumulated int8 products ~2 s, uint64 XOR +
+popcount Hamming ~0.17 s. Requires numpy.
+"""
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+STORAGE_MODES = ("float32", "halfvec", "int8", "binary")
+INT8_SCALE = 127.0
+
+
+def quantize(vectors, storage_mode: str):
+    """
+    Convert a block to the representation of storage_mode.
+
+    Args:
+        vectors: float32 matrix, or a block already in the target representation
+        storage_mode: One of STORAGE_MODES
+
+    Returns:
+        Matrix in the storage mode's dtype (float32 / float16 / int8 / packed uint8)
+    """
+    if storage_mode == "halfvec":
+        return vectors.astype(np.float16, copy=False)
+    if storage_mode == "int8":
+        if vectors.dtype == np.int8:
+            return vectors
+        return np.clip(np.rint(vectors * INT8_SCALE), -127, 127).astype(np.int8)
+    if storage_mode == "binary":
+        if vectors.dtype == np.uint8:
+            return vectors
+        return np.packbits(vectors > 0, axis=1)
+    return vectors
+
+
+def _unpack_signs(bits):
+    return np.unpackbits(bits, axis=1).astype(np.float32) * 2 - 1
+
+
+def score_block(customer_vectors, platform_vectors, storage_mode: str):
+    """
+    Similarity matrix (customers x platforms) of two blocks in the same mode.
+
+    float32/halfvec/int8 scores approximate the cosine similarity; binary
+    scores are 1 - 2 * hamming / bits (only their order is meaningful).
+    """
+    if storage_mode == "binary":
+        customer = _unpack_signs(customer_vectors)
+        return customer @ _unpack_signs(platform_vectors).T / customer.shape[1]
+    scores = customer_vectors.astype(np.float32, copy=False) @ platform_vectors.astype(np.float32, copy=False).T
+    if storage_mode == "int8":
+        scores /= INT8_SCALE * INT8_SCALE
+    return scores
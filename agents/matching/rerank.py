@@ -0,0 +1,229 @@
+"""
+Matching - LLM Re-ranking of YELLOW Matches
+Version: 1.9
+
+Optional stage after a matching run: only pairs in the YELLOW band
+(partial <= cosine < full threshold) are judged by an Ollama model. Pairs
+are sent RERANK_BATCH per prompt, at most RERANK_CONCURRENCY prompts at a
+time (through the gateway, batch priority), and the model answers with one
+verdict per pair:
+
+  MATCH      the platform requirement covers the customer requirement
+  PARTIAL    it covers part of it
+  NO_MATCH   it does not cover it
+
+Verdicts are cached in rerank_cache by (customer text hash, platform text
+hash, model), so unchanged pairs are never sent again, and stored on the
+matches (rerank_verdict / rerank_score / rerank_model). The hashes are taken
+over the texts as sent (cut to RERANK_MAX_CHARS), so changing the limit
+invalidates the cache. The cosine classification is left unchanged.
+
+    python agents/matching/rerank.py --model nomic-embed-text --llm llama3.1:8b
+"""
+
+import sys
+import os
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
+
+from agents.db_bridge.database import (
+    get_or_create_embedding_model,
+    get_match_thresholds,
+    get_yellow_matches,
+    get_rerank_cache,
+    save_rerank_cache,
+    set_match_verdicts
+)
+from agents.ollama_bridge import client as ollama_client
+from agents.runtime.metrics import REGISTRY
+
+RERANK_MODEL = os.getenv('RERANK_MODEL', 'llama3.1:8b')
+RERANK_BATCH = int(os.getenv('RERANK_BATCH', '8'))
+RERANK_CONCURRENCY = int(os.getenv('RERANK_CONCURRENCY', '2'))
+RERANK_MAX_CHARS = int(os.getenv('RERANK_MAX_CHARS', '800'))
+RERANK_TIMEOUT = float(os.getenv('RERANK_TIMEOUT', '300'))
+
+VERDICTS = ("MATCH", "PARTIAL", "NO_MATCH")
+CLIENT_NAME = "matching_rerank"
+
+PROMPT_HEADER = """You review requirement matches. For each pair decide whether the PLATFORM requirement
+covers the CUSTOMER requirement:
+- MATCH: it fully covers it
+- PARTIAL: it covers only part of it
+- NO_MATCH: it does not cover it
+
+Answer only with JSON: {"results": [{"pair": <number>, "verdict": "MATCH|PARTIAL|NO_MATCH",
+"score": <confidence 0-1>, "reason": "<at most 15 words>"}, ...]} with one entry per pair.
+"""
+
+
+def build_prompt(pairs: list) -> str:
+    """Prompt for one batch of (customer_text, platform_text) pairs (already cut to RERANK_MAX_CHARS)."""
+    parts = [PROMPT_HEADER]
+    for i, (customer_text, platform_text) in enumerate(pairs, 1):
+        parts.append(f"Pair {i}:\nCUSTOMER: {customer_text}\nPLATFORM: {platform_text}\n")
+    return "\n".join(parts)
+
+
+def parse_verdicts(answer: str, count: int) -> dict:
+    """
+    Verdicts from the model answer.
+
+    Returns:
+        Dict pair index (0-based) -> {verdict, score, reason}; pairs without a
+        valid verdict are missing
+    """
+    try:
+        data = json.loads(answer)
+    except (TypeError, ValueError):
+        return {}
+    results = data.get("results", []) if isinstance(data, dict) else data
+    verdicts = {}
+    for entry in results if isinstance(results, list) else []:
+        if not isinstance(entry, dict):
+            continue
+        try:
+            index = int(entry.get("pair")) - 1
+        except (TypeError, ValueError):
+            continue
+        verdict = str(entry.get("verdict", "")).strip().upper().replace(" ", "_")
+        if 0 <= index < count and verdict in VERDICTS:
+            try:
+                score = min(max(float(entry.get("score")), 0.0), 1.0)
+            except (TypeError, ValueError):
+                score = None
+            verdicts[index] = {"verdict": verdict, "score": score,
+                               "reason": str(entry.get("reason") or "")[:300]}
+    return verdicts
+
+
+def judge_batch(batch: list, llm_model: str) -> tuple:
+    """
+    Send one batch of pairs to the model.
+
+    Args:
+        batch: List of ((customer_hash, platform_hash), customer_text, platform_text)
+
+    Returns:
+        (verdicts, stats): verdicts maps (customer_hash, platform_hash) -> verdict
+        dict; stats holds sent (pairs the model answered), prompt_tokens,
+        eval_tokens, llm_ms, failed
+    """
+    prompt = build_prompt([(c, p) for _, c, p in batch])
+    try:
+        response = ollama_client.generate(prompt, llm_model, CLIENT_NAME,
+                                          priority=ollama_client.PRIORITY_BATCH,
+                                          timeout=RERANK_TIMEOUT, options={"temperature": 0},
+                                          response_format="json")
+    except Exception as e:
+        print(f"[Rerank] Batch of {len(batch)} failed: {e}")
+        return {}, {"sent": 0, "prompt_tokens": 0, "eval_tokens": 0, "llm_ms": 0.0, "failed": len(batch)}
+
+    parsed = parse_verdicts(response.get("response"), len(batch))
+    verdicts = {batch[i][0]: v for i, v in parsed.items()}
+    return verdicts, {
+        "sent": len(batch),
+        "prompt_tokens": response.get("prompt_eval_count") or 0,
+        "eval_tokens": response.get("eval_count") or 0,
+        "llm_ms": (response.get("total_duration") or 0) / 1e6,
+        "failed": len(batch) - len(verdicts)
+    }
+
+
+def rerank_yellow(model: str = 'nomic-embed-text', llm_model: str = RERANK_MODEL,
+                  run_id: int = None, limit: int = None, full_threshold: float = None,
+                  partial_threshold: float = None) -> dict:
+    """
+    Re-rank the YELLOW matches of an embedding model with an LLM.
+
+    Args:
+        model: Embedding model whose matches are re-ranked
+        llm_model: Ollama model giving the verdicts
+        run_id: Only matches of this match run (default: all of the model)
+        limit: Max YELLOW matches (most similar first)
+        full_threshold: GREEN threshold (default: committed threshold of the model)
+        partial_threshold: YELLOW threshold (default: committed threshold of the model)
+
+    Returns:
+        Dict with pairs, cached, judged, failed, batches, seconds, pairs_per_sec,
+        tokens_per_pair and llm_ms_per_pair (cost per pair the LLM answered,
+        including pairs without a valid verdict)
+    """
+    start = time.perf_counter()
+    model_id = get_or_create_embedding_model(model)
+    if not model_id:
+        return {"pairs": 0, "errors": 1, "message": f"Unknown embedding model {model}"}
+
+    committed_full, committed_partial = get_match_thresholds(model_id)
+    full_threshold = committed_full if full_threshold is None else full_threshold
+    partial_threshold = committed_partial if partial_threshold is None else partial_threshold
+    matches = get_yellow_matches(model_id, full_threshold, partial_threshold, run_id=run_id, limit=limit,
+                                 max_chars=RERANK_MAX_CHARS)
+    keys = {(m["customer_hash"], m["platform_hash"]) for m in matches}
+    verdicts = get_rerank_cache(list(keys), llm_model)
+    cached = len(verdicts)
+
+    # Unique uncached pairs, RERANK_BATCH per prompt
+    texts = {}
+    for m in matches:
+        key = (m["customer_hash"], m["platform_hash"])
+        if key not in verdicts and key not in texts:
+            texts[key] = (m["customer_content"] or "", m["platform_content"] or "")
+    pending = [(key, c, p) for key, (c, p) in texts.items()]
+    batches = [pending[i:i + RERANK_BATCH] for i in range(0, len(pending), RERANK_BATCH)]
+
+    totals = {"sent": 0, "prompt_tokens": 0, "eval_tokens": 0, "llm_ms": 0.0, "failed": 0}
+    judged = {}
+    if batches:
+        print(f"[Rerank] {len(matches)} YELLOW matches, {cached} cached pair verdicts, "
+              f"{len(pending)} pairs in {len(batches)} prompts (concurrency {RERANK_CONCURRENCY})")
+        with ThreadPoolExecutor(max_workers=max(1, RERANK_CONCURRENCY)) as executor:
+            for batch_verdicts, stats in executor.map(lambda b: judge_batch(b, llm_model), batches):
+                judged.update(batch_verdicts)
+                for name in totals:
+                    totals[name] += stats[name]
+        save_rerank_cache(llm_model, judged)
+        verdicts.update(judged)
+
+    set_match_verdicts(llm_model, [
+        (m["match_id"], verdicts[key]["verdict"], verdicts[key]["score"])
+        for m in matches
+        for key in [(m["customer_hash"], m["platform_hash"])] if key in verdicts
+    ])
+
+    REGISTRY.counter("aat_rerank_pairs_total", "Re-ranked pairs", source="cache").inc(cached)
+    REGISTRY.counter("aat_rerank_pairs_total", "Re-ranked pairs", source="llm").inc(len(judged))
+
+    elapsed = time.perf_counter() - start
+    result = {
+        "pairs": len(keys),
+        "matches": len(matches),
+        "cached": cached,
+        "judged": len(judged),
+        "failed": totals["failed"],
+        "batches": len(batches),
+        "seconds": round(elapsed, 3),
+        "pairs_per_sec": round(len(judged) / elapsed, 2) if judged and elapsed > 0 else 0.0,
+        "tokens_per_pair": round((totals["prompt_tokens"] + totals["eval_tokens"]) / totals["sent"], 1)
+        if totals["sent"] else None,
+        "llm_ms_per_pair": round(totals["llm_ms"] / totals["sent"], 1) if totals["sent"] else None,
+        "llm_model": llm_model
+    }
+    print(f"[Rerank] Done: {result}")
+    return result
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='LLM re-ranking of YELLOW matches')
+    parser.add_argument('--model', default='nomic-embed-text', help='Embedding model whose matches are re-ranked')
+    parser.add_argument('--llm', default=RERANK_MODEL, help='Ollama model for the verdicts')
+    parser.add_argument('--run-id', type=int, help='Only matches of this match run')
+    parser.add_argument('--limit', type=int, help='Max YELLOW matches (most similar first)')
+
+    args = parser.parse_args()
+    print(f"Result: {rerank_yellow(args.model, args.llm, run_id=args.run_id, limit=args.limit)}")
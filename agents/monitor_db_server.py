@@ -1,42 +1,34 @@
 #!/usr/bin/env python3
 """
 Agent: monitor_db_server
-Version: 1.6
-Description: Monitors database health and reports heartbeat with CPU/RAM metrics
+Version: 1.9
+Description: Monitors database health and reports heartbeat with CPU/RAM metrics,
+             sweeps expired sessions and old profile runs
 """
 
 import os
 import sys
 import time
-import psycopg2
-import psutil
 
 sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
 
-from agents.db_bridge.database import update_agent_heartbeat
+from agents.db_bridge.database import delete_expired_sessions, delete_profile_runs
+from agents.db_bridge.tracing import connect
+from agents.runtime import run_agent
 
 AGENT_NAME = "monitor_db_server"
 
+# Expired-session sweeper (v1.9)
+SESSION_SWEEP_INTERVAL = int(os.getenv('SESSION_SWEEP_INTERVAL', '3600'))
+SESSION_SWEEP_GRACE_HOURS = int(os.getenv('SESSION_SWEEP_GRACE_HOURS', '24'))
 
-def get_db_connection():
-    """Get database connection with schema isolation to work_aa."""
-    return psycopg2.connect(
-        host=os.getenv('DB_HOST'),
-        database=os.getenv('DB_NAME'),
-        user=os.getenv('DB_USER'),
-        password=os.getenv('DB_PASS'),
-        port=os.getenv('DB_PORT'),
-        options="-c search_path=work_aa"
-    )
+# Captured profiles are kept for PROFILE_RETENTION_DAYS (agents/runtime/profiling.py)
+PROFILE_RETENTION_DAYS = int(os.getenv('PROFILE_RETENTION_DAYS', '30'))
 
 
-def get_resource_metrics():
-    """Get current CPU and RAM usage."""
-    return {
-        "cpu_percent": psutil.cpu_percent(interval=1),
-        "ram_percent": psutil.virtual_memory().percent,
-        "ram_mb": round(psutil.virtual_memory().used / 1024 / 1024, 2)
-    }
+def get_db_connection():
+    """Get database connection with schema isolation to work_aa."""
+    return connect()
 
 
 def check_db_health():
@@ -72,50 +64,41 @@ def check_db_health():
         }
 
 
+def register(runtime):
+    """Register the agent: health check every 30s, session sweep every SESSION_SWEEP_INTERVAL."""
+    agent = runtime.agent(AGENT_NAME, version="1.9")
+    state = {"health": {"status": "starting"}, "sessions_deleted": 0}
+
+    def check_health():
+        state["health"] = check_db_health()
+        agent.status = state["health"]["status"]
+
+    def sweep_sessions():
+        # Sweep expired/revoked sessions (app_session grows with every login)
+        state["sessions_deleted"] = delete_expired_sessions(SESSION_SWEEP_GRACE_HOURS)
+        print(f"[{AGENT_NAME}] Session sweep: {state['sessions_deleted']} expired sessions deleted")
+
+    def prune_profiles():
+        deleted = delete_profile_runs(older_than_days=PROFILE_RETENTION_DAYS)
+        if deleted > 0:
+            print(f"[{AGENT_NAME}] Profile sweep: {deleted} old profile runs deleted")
+
+    agent.every(30, check_health)
+    agent.every(SESSION_SWEEP_INTERVAL, sweep_sessions)
+    agent.every(86400, prune_profiles)
+    agent.details(lambda: {**state["health"], "sessions_deleted": state["sessions_deleted"]})
+    return agent
+
+
 def main():
-    """Main monitoring loop."""
+    """Run the monitoring agent until SIGTERM/SIGINT."""
     db_host = os.getenv('DB_HOST', 'localhost')
     db_port = os.getenv('DB_PORT', '5432')
 
     print(f"[{AGENT_NAME}] Starting DB monitoring agent...")
     print(f"[{AGENT_NAME}] Connected to DB at {db_host}:{db_port}")
 
-    while True:
-        try:
-            health = check_db_health()
-            metrics = get_resource_metrics()
-
-            # Merge health and resource metrics
-            details = {
-                **health,
-                "cpu_percent": metrics["cpu_percent"],
-                "ram_percent": metrics["ram_percent"],
-                "ram_mb": metrics["ram_mb"],
-                "version": "1.6"
-            }
-
-            # Update heartbeat with health details
-            update_agent_heartbeat(
-                agent_name=AGENT_NAME,
-                queue_size=0,
-                details=details
-            )
-
-            print(f"[{AGENT_NAME}] Heartbeat sent: {health['status']}, CPU={metrics['cpu_percent']}%, RAM={metrics['ram_percent']}%")
-
-        except Exception as e:
-            print(f"[{AGENT_NAME}] Error: {e}")
-            try:
-                update_agent_heartbeat(
-                    agent_name=AGENT_NAME,
-                    queue_size=0,
-                    details={"status": "error", "error": str(e)}
-                )
-            except:
-                pass
-
-        # Sleep for 30 seconds
-        time.sleep(30)
+    run_agent(register)
 
 
 if __name__ == "__main__":
@@ -1,60 +1,47 @@
 #!/usr/bin/env python3
 """
 Agent: monitor_ollama_server
-Version: 1.6
+Version: 1.9
 Description: Monitors Ollama LLM server health and reports heartbeat with CPU/RAM metrics
 """
 
 import os
 import sys
-import time
 import requests
-import psutil
 
 sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
 
-from agents.db_bridge.database import update_agent_heartbeat
+from agents.ollama_bridge import client as ollama_client
+from agents.runtime import run_agent
 
 AGENT_NAME = "monitor_ollama_server"
 
 
-def get_resource_metrics():
-    """Get current CPU and RAM usage."""
-    return {
-        "cpu_percent": psutil.cpu_percent(interval=1),
-        "ram_percent": psutil.virtual_memory().percent,
-        "ram_mb": round(psutil.virtual_memory().used / 1024 / 1024, 2)
-    }
-
-
 def check_ollama_health():
-    """Check Ollama server health and return metrics."""
-    ollama_url = os.getenv('OLLAMA_BASE_URL', 'http://localhost:11434')
+    """Check Ollama server health (through the gateway) and return metrics."""
+    ollama_url = ollama_client.get_base_url()
     ollama_version = os.getenv('OLLAMA_MOD_VERSION', 'v0.5')
 
     try:
         # Check if Ollama is responding
-        response = requests.get(f"{ollama_url}/api/tags", timeout=5)
-
-        if response.status_code == 200:
-            models = response.json().get('models', [])
-            model_count = len(models)
-
-            return {
-                "status": "active",
-                "module_version": ollama_version,
-                "mode": "active",
-                "ollama_url": ollama_url,
-                "models_available": model_count,
-                "models": [m.get('name', 'unknown') for m in models[:5]]
-            }
-        else:
-            return {
-                "status": "error",
-                "module_version": ollama_version,
-                "mode": "offline",
-                "error": f"HTTP {response.status_code}"
-            }
+        models = ollama_client.list_models(client=AGENT_NAME, timeout=5)
+
+        return {
+            "status": "active",
+            "module_version": ollama_version,
+            "mode": "active",
+            "ollama_url": ollama_url,
+            "models_available": len(models),
+            "models": [m.get('name', 'unknown') for m in models[:5]]
+        }
+
+    except requests.exceptions.HTTPError as e:
+        return {
+            "status": "error",
+            "module_version": ollama_version,
+            "mode": "offline",
+            "error": f"HTTP {e.response.status_code if e.response is not None else '?'}"
+        }
 
     except requests.exceptions.Timeout:
         return {
@@ -79,56 +66,58 @@ def check_ollama_health():
         }
 
 
+def get_gateway_metrics():
+    """Summarize Ollama gateway queue depth and latency (empty if no gateway)."""
+    snapshot = ollama_client.get_gateway_metrics()
+    if not snapshot:
+        return {}
+
+    scheduler = snapshot.get("scheduler", {})
+    metrics = snapshot.get("metrics", {})
+    endpoints = metrics.get("endpoints", {})
+
+    return {
+        "gateway_version": snapshot.get("version"),
+        "gateway_queue_depth": scheduler.get("queue_depth", 0),
+        "gateway_queue_by_priority": scheduler.get("queue_depth_by_priority", {}),
+        "gateway_in_flight": scheduler.get("in_flight", 0),
+        "gateway_cache_hits": metrics.get("cache_hits", 0),
+        "gateway_cache_misses": metrics.get("cache_misses", 0),
+        "gateway_coalesced": metrics.get("coalesced", 0),
+        "gateway_rejected": metrics.get("rejected", 0),
+        "gateway_latency_p95_ms": {
+            path: stats.get("p95_ms", 0.0) for path, stats in endpoints.items()
+        }
+    }
+
+
+def register(runtime):
+    """Register the agent: Ollama health and gateway metrics every 30s."""
+    agent = runtime.agent(AGENT_NAME, version="1.9")
+    state = {"health": {"status": "starting"}, "gateway": {}}
+
+    def check_health():
+        state["health"] = check_ollama_health()
+        state["gateway"] = get_gateway_metrics()
+        agent.status = state["health"].get("status")
+        print(f"[{AGENT_NAME}] {state['health'].get('status')} | Mode: {state['health'].get('mode')}")
+
+    agent.every(30, check_health)
+    agent.set_queue_size(lambda: state["gateway"].get("gateway_queue_depth", 0))
+    agent.details(lambda: {**state["health"], **state["gateway"]})
+    return agent
+
+
 def main():
-    """Main monitoring loop."""
-    ollama_url = os.getenv('OLLAMA_BASE_URL', 'http://localhost:11434')
+    """Run the monitoring agent until SIGTERM/SIGINT."""
+    ollama_url = ollama_client.get_base_url()
     ollama_version = os.getenv('OLLAMA_MOD_VERSION', 'v0.5')
 
     print(f"[{AGENT_NAME}] Starting Ollama monitoring agent...")
     print(f"[{AGENT_NAME}] Ollama URL: {ollama_url}")
     print(f"[{AGENT_NAME}] Module Version: {ollama_version}")
 
-    while True:
-        try:
-            health = check_ollama_health()
-            metrics = get_resource_metrics()
-
-            # Merge health and resource metrics
-            details = {
-                **health,
-                "cpu_percent": metrics["cpu_percent"],
-                "ram_percent": metrics["ram_percent"],
-                "ram_mb": metrics["ram_mb"],
-                "version": "1.6"
-            }
-
-            # Update heartbeat with health details
-            update_agent_heartbeat(
-                agent_name=AGENT_NAME,
-                queue_size=0,
-                details=details
-            )
-
-            print(f"[{AGENT_NAME}] Heartbeat sent: {health.get('status')} | Mode: {health.get('mode')} | CPU={metrics['cpu_percent']}%")
-
-        except Exception as e:
-            print(f"[{AGENT_NAME}] Error: {e}")
-            try:
-                update_agent_heartbeat(
-                    agent_name=AGENT_NAME,
-                    queue_size=0,
-                    details={
-                        "status": "error",
-                        "module_version": os.getenv('OLLAMA_MOD_VERSION', 'v0.5'),
-                        "mode": "offline",
-                        "error": str(e)
-                    }
-                )
-            except:
-                pass
-
-        # Sleep for 30 seconds
-        time.sleep(30)
+    run_agent(register)
 
 
 if __name__ == "__main__":
@@ -0,0 +1 @@
+# Ollama Bridge Module
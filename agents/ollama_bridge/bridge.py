@@ -1,48 +1,552 @@
-from flask import Flask, request, jsonify
+#!/usr/bin/env python3
+"""
+Ollama Gateway (bridge)
+Version: 1.9.0
+Description: Local gateway in front of Ollama. The embedding agent, the Chat page,
+the app health check and the Ollama monitor all talk to Ollama through this
+gateway so that concurrency limits and caches are shared between them.
+
+Features:
+- Priority classes: 'interactive' (chat) is always scheduled before 'batch' (embeddings)
+- Per-client concurrency quotas (X-AAT-Client header)
+- Coalescing of identical in-flight requests
+- Cache for /api/tags (TTL) and for deterministic embedding responses (LRU)
+- Queue depth and latency metrics on /gateway/metrics
+
+The gateway speaks the Ollama HTTP API, so callers only need to point their
+base URL at it (see agents/ollama_bridge/client.py).
+"""
+
 import os
-from dotenv import load_dotenv
+import json
+import math
+import time
+import hashlib
+import threading
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+
+import requests
+from flask import Flask, request, jsonify, Response
+
+GATEWAY_VERSION = "1.9.0"
+
+PRIORITY_INTERACTIVE = "interactive"
+PRIORITY_BATCH = "batch"
+PRIORITIES = (PRIORITY_INTERACTIVE, PRIORITY_BATCH)
+
+CLIENT_HEADER = "X-AAT-Client"
+PRIORITY_HEADER = "X-AAT-Priority"
+
+
+class GatewayBusy(Exception):
+    """Raised when no execution slot became free within the queue timeout."""
+
+
+def _parse_quotas(value: str) -> dict:
+    """Parse 'embedding_agent=2,web_chat=4' into {'embedding_agent': 2, 'web_chat': 4}."""
+    quotas = {}
+    for item in (value or "").split(","):
+        if "=" not in item:
+            continue
+        name, limit = item.split("=", 1)
+        try:
+            quotas[name.strip()] = max(1, int(limit))
+        except ValueError:
+            print(f"[ollama_gateway] Ignoring invalid quota entry: {item}")
+    return quotas
+
+
+def _percentile(values: list, pct: float) -> float:
+    """Nearest-rank percentile of a list of numbers (0 for empty list)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, math.ceil(pct / 100.0 * len(ordered)) - 1))
+    return round(ordered[index], 2)
+
+
+def request_key(path: str, payload: dict) -> str:
+    """Stable key for a request (used for coalescing and caching)."""
+    canonical = json.dumps(payload, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(f"{path}\n{canonical}".encode("utf-8")).hexdigest()
+
+
+class SlotScheduler:
+    """
+    Shared execution slots for Ollama requests.
+
+    - At most max_concurrency requests run at once.
+    - interactive_reserve slots can only be used by interactive requests, and
+      batch requests never start while an interactive request is waiting.
+    - Each client is limited to its quota of concurrent requests.
+    """
+
+    def __init__(self, max_concurrency: int, interactive_reserve: int,
+                 client_quotas: dict = None, default_client_quota: int = None):
+        self.max_concurrency = max(1, max_concurrency)
+        self.interactive_reserve = min(max(0, interactive_reserve), self.max_concurrency - 1)
+        self.client_quotas = client_quotas or {}
+        self.default_client_quota = default_client_quota or self.max_concurrency
+
+        self._cond = threading.Condition()
+        self._in_flight = 0
+        self._in_flight_by_priority = {p: 0 for p in PRIORITIES}
+        self._in_flight_by_client = {}
+        self._waiting = {p: 0 for p in PRIORITIES}
+
+    def _can_run(self, client: str, priority: str) -> bool:
+        if self._in_flight >= self.max_concurrency:
+            return False
+        if priority == PRIORITY_BATCH:
+            if self._waiting[PRIORITY_INTERACTIVE] > 0:
+                return False
+            if self._in_flight >= self.max_concurrency - self.interactive_reserve:
+                return False
+        quota = self.client_quotas.get(client, self.default_client_quota)
+        return self._in_flight_by_client.get(client, 0) < quota
+
+    def acquire(self, client: str, priority: str, timeout: float) -> bool:
+        """Wait for a slot. Returns False if none became free within timeout."""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            self._waiting[priority] += 1
+            try:
+                while not self._can_run(client, priority):
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        return False
+                    self._cond.wait(remaining)
+
+                self._in_flight += 1
+                self._in_flight_by_priority[priority] += 1
+                self._in_flight_by_client[client] = self._in_flight_by_client.get(client, 0) + 1
+                return True
+            finally:
+                self._waiting[priority] -= 1
+                # Batch waiters may be blocked only by this waiter - wake them up
+                self._cond.notify_all()
+
+    def release(self, client: str, priority: str):
+        with self._cond:
+            self._in_flight -= 1
+            self._in_flight_by_priority[priority] -= 1
+            remaining = self._in_flight_by_client.get(client, 1) - 1
+            if remaining > 0:
+                self._in_flight_by_client[client] = remaining
+            else:
+                self._in_flight_by_client.pop(client, None)
+            self._cond.notify_all()
+
+    @contextmanager
+    def slot(self, client: str, priority: str, timeout: float):
+        if not self.acquire(client, priority, timeout):
+            raise GatewayBusy(f"No Ollama slot free for client '{client}' ({priority}) within {timeout}s")
+        try:
+            yield
+        finally:
+            self.release(client, priority)
+
+    def snapshot(self) -> dict:
+        with self._cond:
+            return {
+                "max_concurrency": self.max_concurrency,
+                "interactive_reserve": self.interactive_reserve,
+                "in_flight": self._in_flight,
+                "in_flight_by_priority": dict(self._in_flight_by_priority),
+                "in_flight_by_client": dict(self._in_flight_by_client),
+                "queue_depth": sum(self._waiting.values()),
+                "queue_depth_by_priority": dict(self._waiting),
+            }
+
+
+class _InFlightCall:
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class RequestCoalescer:
+    """Runs identical concurrent requests once and shares the result."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def run(self, key: str, fn):
+        """
+        Execute fn() unless an identical call is already running.
+
+        Returns:
+            Tuple (result, coalesced) - coalesced is True if the result was shared
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _InFlightCall()
+                self._calls[key] = call
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn()
+            return call.result, False
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.event.set()
+
+
+class LRUCache:
+    """Small thread-safe LRU cache."""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._data = OrderedDict()
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._data:
+                return None
+            self._data.move_to_end(key)
+            return self._data[key]
+
+    def put(self, key, value):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._data)
+
+
+class GatewayMetrics:
+    """Request counters plus latency percentiles over a sliding window."""
 
-# Načtení proměnných z .env (pro databázi, pokud ji používáš)
-load_dotenv()
+    def __init__(self, window: int = 500):
+        self.window = window
+        self._lock = threading.Lock()
+        self._endpoints = {}
+        self._queue_wait = {p: deque(maxlen=window) for p in PRIORITIES}
+        self._counters = {"cache_hits": 0, "cache_misses": 0, "coalesced": 0, "rejected": 0}
+
+    def _endpoint(self, name: str) -> dict:
+        if name not in self._endpoints:
+            self._endpoints[name] = {
+                "count": 0,
+                "errors": 0,
+                "total_ms": 0.0,
+                "max_ms": 0.0,
+                "recent": deque(maxlen=self.window),
+            }
+        return self._endpoints[name]
+
+    def observe(self, endpoint: str, latency_ms: float, error: bool = False):
+        with self._lock:
+            stats = self._endpoint(endpoint)
+            stats["count"] += 1
+            stats["total_ms"] += latency_ms
+            stats["max_ms"] = max(stats["max_ms"], latency_ms)
+            stats["recent"].append(latency_ms)
+            if error:
+                stats["errors"] += 1
+
+    def observe_wait(self, priority: str, wait_ms: float):
+        with self._lock:
+            self._queue_wait[priority].append(wait_ms)
+
+    def incr(self, counter: str, amount: int = 1):
+        with self._lock:
+            self._counters[counter] = self._counters.get(counter, 0) + amount
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            endpoints = {}
+            for name, stats in self._endpoints.items():
+                recent = list(stats["recent"])
+                endpoints[name] = {
+                    "count": stats["count"],
+                    "errors": stats["errors"],
+                    "avg_ms": round(stats["total_ms"] / stats["count"], 2) if stats["count"] else 0.0,
+                    "max_ms": round(stats["max_ms"], 2),
+                    "p50_ms": _percentile(recent, 50),
+                    "p95_ms": _percentile(recent, 95),
+                }
+            queue_wait = {
+                p: {"p50_ms": _percentile(list(w), 50), "p95_ms": _percentile(list(w), 95)}
+                for p, w in self._queue_wait.items()
+            }
+            return {"endpoints": endpoints, "queue_wait": queue_wait, **self._counters}
+
+
+class OllamaGateway:
+    """Shared access path to one Ollama server."""
+
+    def __init__(self, base_url: str = None, max_concurrency: int = None,
+                 interactive_reserve: int = None, client_quotas: dict = None,
+                 queue_timeout: float = None, tags_ttl: float = None,
+                 embedding_cache_size: int = None):
+        env = os.getenv
+        self.base_url = (base_url or env('OLLAMA_BASE_URL', 'http://localhost:11434')).rstrip('/')
+        self.queue_timeout = queue_timeout if queue_timeout is not None else float(env('OLLAMA_GATEWAY_QUEUE_TIMEOUT', '120'))
+        self.tags_ttl = tags_ttl if tags_ttl is not None else float(env('OLLAMA_GATEWAY_TAGS_TTL', '30'))
+        self.request_timeout = float(env('OLLAMA_GATEWAY_REQUEST_TIMEOUT', '300'))
+
+        self.scheduler = SlotScheduler(
+            max_concurrency=max_concurrency or int(env('OLLAMA_GATEWAY_CONCURRENCY', '4')),
+            interactive_reserve=interactive_reserve if interactive_reserve is not None
+            else int(env('OLLAMA_GATEWAY_INTERACTIVE_RESERVE', '1')),
+            client_quotas=client_quotas if client_quotas is not None
+            else _parse_quotas(env('OLLAMA_GATEWAY_QUOTAS', '')),
+            default_client_quota=int(env('OLLAMA_GATEWAY_CLIENT_QUOTA', '0')) or None,
+        )
+        self.coalescer = RequestCoalescer()
+        self.embedding_cache = LRUCache(
+            embedding_cache_size if embedding_cache_size is not None
+            else int(env('OLLAMA_GATEWAY_EMBED_CACHE', '5000'))
+        )
+        self.metrics = GatewayMetrics()
+        self.started_at = time.time()
+
+        self._session = requests.Session()
+        self._tags_lock = threading.Lock()
+        self._tags_cache = None
+        self._tags_expires = 0.0
+
+    # ------------------------------------------------------------------
+    # Low level
+    # ------------------------------------------------------------------
+
+    @contextmanager
+    def _slot(self, client: str, priority: str):
+        queued = time.perf_counter()
+        try:
+            with self.scheduler.slot(client, priority, self.queue_timeout):
+                self.metrics.observe_wait(priority, (time.perf_counter() - queued) * 1000)
+                yield
+        except GatewayBusy:
+            self.metrics.incr("rejected")
+            raise
+
+    def _call(self, method: str, path: str, payload: dict, client: str, priority: str) -> dict:
+        """Run one upstream request inside an execution slot."""
+        with self._slot(client, priority):
+            start = time.perf_counter()
+            error = True
+            try:
+                response = self._session.request(
+                    method, f"{self.base_url}{path}",
+                    json=payload, timeout=self.request_timeout
+                )
+                response.raise_for_status()
+                data = response.json()
+                error = False
+                return data
+            finally:
+                self.metrics.observe(path, (time.perf_counter() - start) * 1000, error=error)
+
+    # ------------------------------------------------------------------
+    # Public API
+    # ------------------------------------------------------------------
+
+    def tags(self, client: str = "unknown") -> dict:
+        """Return /api/tags, cached for tags_ttl seconds."""
+        now = time.monotonic()
+        with self._tags_lock:
+            if self._tags_cache is not None and now < self._tags_expires:
+                self.metrics.incr("cache_hits")
+                return self._tags_cache
+
+        self.metrics.incr("cache_misses")
+        data, coalesced = self.coalescer.run(
+            "tags", lambda: self._call("GET", "/api/tags", None, client, PRIORITY_INTERACTIVE)
+        )
+        if coalesced:
+            self.metrics.incr("coalesced")
+        with self._tags_lock:
+            self._tags_cache = data
+            self._tags_expires = time.monotonic() + self.tags_ttl
+        return data
+
+    def embeddings(self, path: str, payload: dict, client: str, priority: str = PRIORITY_BATCH) -> dict:
+        """Proxy /api/embeddings or /api/embed. Responses are deterministic and cached."""
+        key = request_key(path, payload)
+        cached = self.embedding_cache.get(key)
+        if cached is not None:
+            self.metrics.incr("cache_hits")
+            return cached
+
+        self.metrics.incr("cache_misses")
+        data, coalesced = self.coalescer.run(
+            key, lambda: self._call("POST", path, payload, client, priority)
+        )
+        if coalesced:
+            self.metrics.incr("coalesced")
+        else:
+            self.embedding_cache.put(key, data)
+        return data
+
+    def complete(self, path: str, payload: dict, client: str, priority: str = PRIORITY_INTERACTIVE) -> dict:
+        """Proxy non-streaming /api/generate or /api/chat (coalesced, not cached)."""
+        key = request_key(path, payload)
+        data, coalesced = self.coalescer.run(
+            key, lambda: self._call("POST", path, payload, client, priority)
+        )
+        if coalesced:
+            self.metrics.incr("coalesced")
+        return data
+
+    def stream(self, path: str, payload: dict, client: str, priority: str = PRIORITY_INTERACTIVE):
+        """
+        Proxy a streaming /api/generate or /api/chat call.
+
+        Yields raw NDJSON lines. The execution slot is held until the stream is
+        exhausted or the consumer closes the generator (client went away), which
+        also closes the upstream connection so Ollama stops generating.
+        """
+        with self._slot(client, priority):
+            start = time.perf_counter()
+            error = True
+            response = None
+            try:
+                response = self._session.post(
+                    f"{self.base_url}{path}", json=payload,
+                    stream=True, timeout=self.request_timeout
+                )
+                response.raise_for_status()
+                for line in response.iter_lines():
+                    if line:
+                        yield line + b"\n"
+                error = False
+            finally:
+                if response is not None:
+                    response.close()
+                self.metrics.observe(path, (time.perf_counter() - start) * 1000, error=error)
+
+    def snapshot(self) -> dict:
+        """Scheduler state, cache sizes and latency metrics."""
+        return {
+            "version": GATEWAY_VERSION,
+            "ollama_url": self.base_url,
+            "uptime_s": round(time.time() - self.started_at, 1),
+            "scheduler": self.scheduler.snapshot(),
+            "embedding_cache_entries": len(self.embedding_cache),
+            "metrics": self.metrics.snapshot(),
+        }
+
+
+# ============================================================================
+# HTTP SERVICE
+# ============================================================================
 
 app = Flask(__name__)
+gateway = OllamaGateway()
+
+
+def _client_and_priority(default_priority: str):
+    client = request.headers.get(CLIENT_HEADER) or request.remote_addr or "unknown"
+    priority = request.headers.get(PRIORITY_HEADER, default_priority)
+    if priority not in PRIORITIES:
+        priority = default_priority
+    return client, priority
+
+
+def _error_response(error: Exception):
+    """Map gateway/upstream failures onto HTTP responses."""
+    if isinstance(error, GatewayBusy):
+        response = jsonify({"error": str(error)})
+        response.status_code = 503
+        response.headers["Retry-After"] = "5"
+        return response
+    if isinstance(error, requests.exceptions.HTTPError) and error.response is not None:
+        return jsonify({"error": error.response.text}), error.response.status_code
+    if isinstance(error, requests.exceptions.RequestException):
+        return jsonify({"error": f"Ollama unreachable: {error}"}), 502
+    raise error
+
+
+def _proxy(fn):
+    try:
+        return jsonify(fn())
+    except (GatewayBusy, requests.exceptions.RequestException) as e:
+        return _error_response(e)
 
-# Úložiště pro data z monitoru (v paměti)
-system_stats = {}
 
 @app.route('/api/version', methods=['GET'])
 def get_version():
     """Základní test funkčnosti Bridge"""
     return jsonify({
         "status": "running",
-        "version": "1.0.0-ollama",
+        "version": f"{GATEWAY_VERSION}-ollama-gateway",
         "node": "Hetzner-OL-02"
     })
 
-@app.route('/system-status', methods=['POST'])
-def update_status():
-    """Endpoint pro příjem dat z resource_monitor.py"""
-    global system_stats
-    data = request.json
-    if not data:
-        return jsonify({"error": "No data received"}), 400
-    
-    node_name = data.get("node", "unknown")
-    system_stats[node_name] = {
-        "cpu": data.get("cpu"),
-        "ram": data.get("ram"),
-        "disk": data.get("disk"),
-        "last_update": data.get("timestamp")
-    }
-    
-    print(f"Příjata data z uzlu: {node_name}")
-    return jsonify({"status": "success"}), 200
-
-@app.route('/system-status', methods=['GET'])
-def get_status():
-    """Zobrazení aktuálních posbíraných dat"""
-    return jsonify(system_stats)
+
+@app.route('/api/tags', methods=['GET'])
+def get_tags():
+    client, _ = _client_and_priority(PRIORITY_INTERACTIVE)
+    return _proxy(lambda: gateway.tags(client))
+
+
+@app.route('/api/embeddings', methods=['POST'])
+@app.route('/api/embed', methods=['POST'])
+def post_embeddings():
+    payload = request.get_json(silent=True) or {}
+    client, priority = _client_and_priority(PRIORITY_BATCH)
+    return _proxy(lambda: gateway.embeddings(request.path, payload, client, priority))
+
+
+@app.route('/api/generate', methods=['POST'])
+@app.route('/api/chat', methods=['POST'])
+def post_completion():
+    payload = request.get_json(silent=True) or {}
+    client, priority = _client_and_priority(PRIORITY_INTERACTIVE)
+
+    # Ollama streams by default
+    if payload.get("stream", True):
+        stream = gateway.stream(request.path, payload, client, priority)
+        try:
+            first = next(stream)
+        except StopIteration:
+            first = b""
+        except (GatewayBusy, requests.exceptions.RequestException) as e:
+            return _error_response(e)
+
+        def body():
+            try:
+                yield first
+                yield from stream
+            finally:
+                stream.close()
+
+        return Response(body(), mimetype="application/x-ndjson")
+
+    return _proxy(lambda: gateway.complete(request.path, payload, client, priority))
+
+
+@app.route('/gateway/metrics', methods=['GET'])
+def get_gateway_metrics():
+    """Queue depth, in-flight requests, cache and latency metrics."""
+    return jsonify(gateway.snapshot())
+
 
 if __name__ == '__main__':
-    # Port 5002 podle tvé konfigurace
-    app.run(host='0.0.0.0', port=5002)
\ No newline at end of file
+    port = int(os.getenv('OLLAMA_GATEWAY_PORT', '5002'))
+    print(f"[ollama_gateway] Starting v{GATEWAY_VERSION} on port {port} -> {gateway.base_url}")
+    print(f"[ollama_gateway] Scheduler: {gateway.scheduler.snapshot()}")
+    app.run(host='0.0.0.0', port=port, threaded=True)
@@ -0,0 +1,196 @@
+"""
+Ollama Gateway Client
+Version: 1.9.0
+
+Thin helpers used by all AAT callers to reach Ollama through the gateway
+(agents/ollama_bridge/bridge.py). Each call identifies the caller and its
+priority class so the gateway can apply quotas and scheduling.
+
+Base URL resolution (first set wins):
+  OLLAMA_GATEWAY_URL, OLLAMA_API_BASE, OLLAMA_BASE_URL, http://localhost:11434
+
+Since the gateway speaks the Ollama API, the helpers also work directly
+against Ollama when no gateway is deployed (the extra headers are ignored).
+
+Every call is timed in aat_ollama_request_ms{endpoint,client}; failures are
+counted in aat_ollama_errors_total{endpoint}.
+"""
+
+import os
+import json
+import time
+import requests
+from contextlib import contextmanager
+
+from agents.runtime.metrics import REGISTRY, timed
+
+CLIENT_HEADER = "X-AAT-Client"
+PRIORITY_HEADER = "X-AAT-Priority"
+
+PRIORITY_INTERACTIVE = "interactive"
+PRIORITY_BATCH = "batch"
+
+
+def get_base_url() -> str:
+    """Resolve the gateway (or Ollama) base URL from the environment."""
+    return (
+        os.getenv('OLLAMA_GATEWAY_URL')
+        or os.getenv('OLLAMA_API_BASE')
+        or os.getenv('OLLAMA_BASE_URL')
+        or 'http://localhost:11434'
+    ).rstrip('/')
+
+
+def _headers(client: str, priority: str) -> dict:
+    return {CLIENT_HEADER: client, PRIORITY_HEADER: priority}
+
+
+@contextmanager
+def _observe(endpoint: str, client: str):
+    """Time one gateway call and count it as an error if it raises."""
+    try:
+        with timed("aat_ollama_request_ms", "Ollama gateway request latency (ms)",
+                   endpoint=endpoint, client=client):
+            yield
+    except Exception:
+        REGISTRY.counter("aat_ollama_errors_total", "Failed Ollama gateway requests",
+                         endpoint=endpoint).inc()
+        raise
+
+
+def list_models(client: str, timeout: float = 2, base_url: str = None) -> list:
+    """
+    List models available on Ollama (/api/tags, cached by the gateway).
+
+    Raises:
+        requests.RequestException if the gateway/Ollama is not reachable
+    """
+    url = f"{base_url or get_base_url()}/api/tags"
+    with _observe("tags", client):
+        response = requests.get(url, headers=_headers(client, PRIORITY_INTERACTIVE), timeout=timeout)
+        response.raise_for_status()
+        return response.json().get('models', [])
+
+
+def embed(text: str, model: str, client: str, priority: str = PRIORITY_BATCH,
+          timeout: float = 30, base_url: str = None) -> list:
+    """
+    Get a raw (not normalized) embedding vector for text.
+
+    Raises:
+        requests.RequestException on HTTP errors
+    """
+    url = f"{base_url or get_base_url()}/api/embeddings"
+    with _observe("embeddings", client):
+        response = requests.post(
+            url,
+            json={"model": model, "prompt": text},
+            headers=_headers(client, priority),
+            timeout=timeout
+        )
+        response.raise_for_status()
+        return response.json().get('embedding', [])
+
+
+def generate(prompt: str, model: str, client: str, priority: str = PRIORITY_INTERACTIVE,
+             timeout: float = 60, base_url: str = None, options: dict = None,
+             response_format: str = None) -> dict:
+    """
+    Non-streaming /api/generate call.
+
+    Args:
+        response_format: Ollama 'format' (e.g. 'json' to force a JSON answer)
+
+    Returns:
+        Ollama response dict ('response', 'eval_count', ...)
+    """
+    payload = {"model": model, "prompt": prompt, "stream": False}
+    if options:
+        payload["options"] = options
+    if response_format:
+        payload["format"] = response_format
+    url = f"{base_url or get_base_url()}/api/generate"
+    with _observe("generate", client):
+        response = requests.post(url, json=payload, headers=_headers(client, priority), timeout=timeout)
+        response.raise_for_status()
+        return response.json()
+
+
+def chat_stream(messages: list, model: str, client: str, priority: str = PRIORITY_INTERACTIVE,
+                connect_timeout: float = 5, read_timeout: float = 120,
+                base_url: str = None, options: dict = None, stats: dict = None):
+    """
+    Streaming /api/chat call. Yields content pieces as they are generated.
+
+    read_timeout applies between two chunks, not to the whole answer, so long
+    answers do not time out. Closing the generator (e.g. the Streamlit script
+    is stopped because the user navigated away) closes the HTTP connection,
+    which cancels generation upstream.
+
+    If a stats dict is passed, it is filled with:
+        ttft_ms, total_ms, prompt_tokens, eval_tokens, tokens_per_sec, done
+    """
+    if stats is None:
+        stats = {}
+    stats.update({"ttft_ms": None, "total_ms": None, "prompt_tokens": None,
+                  "eval_tokens": None, "tokens_per_sec": None, "done": False})
+
+    payload = {"model": model, "messages": messages, "stream": True}
+    if options:
+        payload["options"] = options
+
+    start = time.perf_counter()
+    response = requests.post(
+        f"{base_url or get_base_url()}/api/chat",
+        json=payload,
+        headers=_headers(client, priority),
+        stream=True,
+        timeout=(connect_timeout, read_timeout)
+    )
+    try:
+        response.raise_for_status()
+        for line in response.iter_lines():
+            if not line:
+                continue
+            chunk = json.loads(line)
+            if chunk.get("error"):
+                raise RuntimeError(chunk["error"])
+
+            content = chunk.get("message", {}).get("content", "")
+            if content:
+                if stats["ttft_ms"] is None:
+                    stats["ttft_ms"] = round((time.perf_counter() - start) * 1000, 1)
+                yield content
+
+            if chunk.get("done"):
+                eval_count = chunk.get("eval_count") or 0
+                eval_duration_ns = chunk.get("eval_duration") or 0
+                stats["prompt_tokens"] = chunk.get("prompt_eval_count")
+                stats["eval_tokens"] = eval_count
+                if eval_duration_ns:
+                    stats["tokens_per_sec"] = round(eval_count / (eval_duration_ns / 1e9), 2)
+                stats["done"] = True
+                break
+    except Exception:
+        REGISTRY.counter("aat_ollama_errors_total", "Failed Ollama gateway requests",
+                         endpoint="chat").inc()
+        raise
+    finally:
+        stats["total_ms"] = round((time.perf_counter() - start) * 1000, 1)
+        REGISTRY.histogram("aat_ollama_request_ms", "Ollama gateway request latency (ms)",
+                           endpoint="chat", client=client).observe(stats["total_ms"])
+        if stats["ttft_ms"] is not None:
+            REGISTRY.histogram("aat_ollama_ttft_ms", "Ollama chat time to first token (ms)",
+                               client=client).observe(stats["ttft_ms"])
+        response.close()
+
+
+def get_gateway_metrics(timeout: float = 2, base_url: str = None) -> dict:
+    """Return gateway metrics, or None if no gateway is in front of Ollama."""
+    try:
+        response = requests.get(f"{base_url or get_base_url()}/gateway/metrics", timeout=timeout)
+        if response.status_code == 200:
+            return response.json()
+    except requests.RequestException:
+        pass
+    return None
@@ -1,3 +1,4 @@
+import os
 import psutil
 import requests
 import time
@@ -5,7 +6,8 @@ import time
 # Správná konfigurace pro Ollama VM
 NODE_NAME = "Hetzner-Ollama-02"
 
-BRIDGE_URL = "http://128.140.108.240:5000/system-status"
+# bridge_api on the central node stores the metrics in system_health
+BRIDGE_URL = os.getenv("BRIDGE_API_URL", "http://128.140.108.240:5000") + "/system-status"
 
 def collect_and_send():
     stats = {
@@ -1,71 +1,336 @@
 #!/usr/bin/env python3
 """
 Agent: pdf_chunker
-Version: 1.6
-Description: Splits extracted PDF text into semantic chunks for embedding
-Status: Scaffold - waiting for implementation
+Version: 1.9
+Description: Splits extracted PDF text into requirement-sized chunks for embedding
+
+Pipeline (generators, one page in memory at a time):
+  pdf_page rows -> layout blocks -> sentences -> chunks -> diff -> batched insert
+
+Chunk boundaries: headings / numbered clauses, requirement IDs and modal
+"shall/must/should" sentences (one requirement statement per chunk), capped
+at CHUNK_MAX_TOKENS for the embedder.
+
+Incremental re-chunking: a revised spec (new content hash, same source key)
+is diffed against the current chunk version of its source by chunk hash
+first, then by anchor (clause number / req ID / heading position) for text
+that is new. Unchanged chunks keep their previous anchor. Every chunk is stored
+with change_type inserted / changed / unchanged, removed chunks get a
+'deleted' tombstone, so downstream agents only redo what changed.
 """
 
 import os
+import re
 import sys
 import time
-import psutil
+import hashlib
 
 # Add parent directory to path for imports
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from agents.db_bridge.database import update_agent_heartbeat
+from agents.db_bridge.database import (
+    get_documents_to_chunk,
+    iter_pdf_pages,
+    get_current_chunk_index,
+    start_chunk_version,
+    insert_pdf_chunks,
+    finalize_chunk_version
+)
+from agents.runtime import run_agent
 
 AGENT_NAME = "pdf_chunker"
 
+CHUNK_MAX_TOKENS = int(os.getenv('CHUNK_MAX_TOKENS', '400'))
+CHUNK_CHARS_PER_TOKEN = 4
+CHUNK_BATCH = int(os.getenv('CHUNK_BATCH', '200'))
+POLL_INTERVAL = int(os.getenv('CHUNK_POLL_INTERVAL', '30'))
+
+CLAUSE_RE = re.compile(r'^(\d+(?:\.\d+)*)\.?\s+(\S.*)$')
+REQ_ID_RE = re.compile(r'^\[?((?:[A-Z][A-Z0-9]*[-_])+\d+[A-Z0-9_.-]*)\]?[:\s]')
+MODAL_RE = re.compile(r'\b(shall|must|should|will)\b', re.IGNORECASE)
+SENTENCE_RE = re.compile(r'(?<=[.!?;])\s+(?=[A-Z0-9(\[])')
+PAGE_NOISE_RE = re.compile(r'^(page\s+\d+(\s+of\s+\d+)?|\d+|-\s*\d+\s*-)$', re.IGNORECASE)
+VERSION_SUFFIX_RE = re.compile(r'[\s_\-]*(v|ver|rev|r)[\s_.\-]?\d+([._]\d+)*$', re.IGNORECASE)
+
+
+def source_key_for(file_name: str) -> str:
+    """
+    Source identity of a document across revisions.
+    'Customer_Spec_v2.pdf' and 'customer_spec-rev3.pdf' -> 'customer_spec'
+    """
+    stem = os.path.splitext(os.path.basename(file_name or 'unknown'))[0]
+    stem = VERSION_SUFFIX_RE.sub('', stem)
+    return re.sub(r'[\s\-]+', '_', stem.strip()).lower()
+
+
+def estimate_tokens(text: str) -> int:
+    """Approximate token count (4 chars per token)."""
+    return max(1, len(text) // CHUNK_CHARS_PER_TOKEN)
+
+
+def chunk_hash(text: str) -> str:
+    """Hash of whitespace-normalized chunk text."""
+    return hashlib.sha256(' '.join(text.split()).encode('utf-8')).hexdigest()
+
+
+def iter_blocks(pages):
+    """
+    Layout blocks of all pages as (page_no, text), page-number noise removed.
+    Falls back to blank-line paragraphs if a page has no layout blocks.
+    """
+    for page in pages:
+        blocks = page.get('blocks') or []
+        if blocks:
+            texts = [' '.join(b.get('lines', [])) for b in blocks]
+        else:
+            texts = re.split(r'\n\s*\n', page.get('text') or '')
+        for text in texts:
+            text = ' '.join(text.split())
+            if text and not PAGE_NOISE_RE.match(text):
+                yield page['page_no'], text
+
+
+def split_sentences(text: str) -> list:
+    """Split a block into sentences (keeps clause numbers with their text)."""
+    return [s for s in SENTENCE_RE.split(text) if s.strip()]
+
+
+def _split_oversize(text: str, max_chars: int) -> list:
+    """Split a single over-long sentence at word boundaries."""
+    parts = []
+    while len(text) > max_chars:
+        cut = text[:max_chars].rsplit(' ', 1)[0] or text[:max_chars]
+        parts.append(cut)
+        text = text[len(cut):].lstrip()
+    if text:
+        parts.append(text)
+    return parts
+
+
+def iter_chunks(blocks, max_tokens: int = CHUNK_MAX_TOKENS):
+    """
+    Group blocks into requirement-sized chunks.
+
+    Yields:
+        Dicts with anchor, heading, text, page_start, page_end, token_estimate
+    """
+    max_chars = max_tokens * CHUNK_CHARS_PER_TOKEN
+    heading = ''
+    section_counter = 0
+    current = None
+
+    def new_chunk(anchor, page_no):
+        return {"anchor": anchor, "heading": heading, "parts": [], "chars": 0,
+                "page_start": page_no, "page_end": page_no, "has_modal": False}
+
+    def finish(chunk):
+        text = ' '.join(chunk["parts"])
+        return {
+            "anchor": chunk["anchor"],
+            "heading": chunk["heading"],
+            "text": text,
+            "page_start": chunk["page_start"],
+            "page_end": chunk["page_end"],
+            "token_estimate": estimate_tokens(text)
+        }
+
+    for page_no, block in blocks:
+        clause = CLAUSE_RE.match(block)
+        req_id = REQ_ID_RE.match(block)
+
+        # Short numbered line without modal verb = heading (e.g. "3.2 Diagnostics")
+        if clause and len(block) < 120 and not MODAL_RE.search(block):
+            if current and current["parts"]:
+                yield finish(current)
+            heading = block
+            section_counter = 0
+            current = None
+            continue
+
+        if clause or req_id:
+            if current and current["parts"]:
+                yield finish(current)
+            anchor = req_id.group(1) if req_id else clause.group(1)
+            current = new_chunk(anchor, page_no)
+
+        for sentence in split_sentences(block):
+            modal = bool(MODAL_RE.search(sentence))
+
+            # One requirement statement per chunk (unless the chunk is anchored by an ID/clause)
+            starts_new = (
+                current is None
+                or current["chars"] + len(sentence) + 1 > max_chars
+                or (modal and current["has_modal"] and not (clause or req_id))
+            )
+            if starts_new:
+                if current and current["parts"]:
+                    yield finish(current)
+                section_counter += 1
+                current = new_chunk(f"{heading or 'document'}#{section_counter}", page_no)
+
+            for part in _split_oversize(sentence, max_chars):
+                if current["chars"] + len(part) + 1 > max_chars and current["parts"]:
+                    yield finish(current)
+                    section_counter += 1
+                    current = new_chunk(f"{heading or 'document'}#{section_counter}", page_no)
+                current["parts"].append(part)
+                current["chars"] += len(part) + 1
+                current["page_end"] = page_no
+            current["has_modal"] = current["has_modal"] or modal
+
+    if current and current["parts"]:
+        yield finish(current)
 
-def get_resource_metrics():
-    """Get current CPU and RAM usage."""
-    return {
-        "cpu_percent": psutil.cpu_percent(interval=1),
-        "ram_percent": psutil.virtual_memory().percent,
-        "ram_mb": round(psutil.virtual_memory().used / 1024 / 1024, 2)
-    }
+
+def diff_chunks(make_chunks, previous: dict, counts: dict):
+    """
+    Classify chunks against the previous version of the source.
+
+    Content comes first: a chunk whose hash exists in the previous version is
+    'unchanged' and keeps that chunk's anchor, wherever it moved (text
+    inserted above it shifts the positional "<heading>#<n>" anchors). Only
+    chunks with unknown content fall back to the anchor: 'changed' if the
+    previous chunk under that anchor was not matched by content, else
+    'inserted'.
+
+    Two streaming passes over the chunks (memory stays flat): the first only
+    records which chunk positions match previous content, the second
+    re-creates the chunks and classifies them.
+
+    Args:
+        make_chunks: Callable returning a fresh chunk iterator (iter_chunks)
+        previous: anchor -> {chunk_id, chunk_hash} of the current version
+        counts: Dict updated with inserted/changed/unchanged/deleted counts
+
+    Yields:
+        Chunks with change_type and previous_chunk_id; 'deleted' tombstones
+        for previous anchors that no longer exist come last
+    """
+    previous_hashes = {}
+    for anchor, old in previous.items():
+        previous_hashes.setdefault(old['chunk_hash'], []).append(anchor)
+
+    # Pass 1: match by content; matched positions keep their previous anchor
+    matched = {}
+    for index, chunk in enumerate(make_chunks()):
+        candidates = previous_hashes.get(chunk_hash(chunk["text"]))
+        if candidates:
+            matched[index] = candidates.pop(0)
+    seen_anchors = set(matched.values())
+
+    # Pass 2: unknown content, by anchor
+    for index, chunk in enumerate(make_chunks()):
+        chunk["chunk_hash"] = chunk_hash(chunk["text"])
+        if index in matched:
+            anchor = matched[index]
+            chunk["anchor"] = anchor
+            chunk["change_type"] = 'unchanged'
+            chunk["previous_chunk_id"] = previous[anchor]['chunk_id']
+        else:
+            # Duplicate anchors (e.g. table of contents) get a suffix
+            anchor = chunk["anchor"]
+            n = 1
+            while anchor in seen_anchors:
+                n += 1
+                anchor = f"{chunk['anchor']}~{n}"
+            chunk["anchor"] = anchor
+            seen_anchors.add(anchor)
+            old = previous.get(anchor)
+            chunk["change_type"] = 'changed' if old else 'inserted'
+            chunk["previous_chunk_id"] = old['chunk_id'] if old else None
+        counts[chunk["change_type"]] += 1
+        yield chunk
+
+    for anchor, old in previous.items():
+        if anchor not in seen_anchors:
+            counts['deleted'] += 1
+            yield {
+                "anchor": anchor,
+                "heading": None,
+                "text": None,
+                "chunk_hash": old['chunk_hash'],
+                "change_type": 'deleted',
+                "previous_chunk_id": old['chunk_id']
+            }
+
+
+def chunk_document(document: dict, max_tokens: int = CHUNK_MAX_TOKENS, batch_size: int = CHUNK_BATCH) -> dict:
+    """
+    Chunk one extracted document and store the diff against its previous version.
+
+    Returns:
+        Dict with counts per change_type and chunks_per_sec
+    """
+    document_id = document['document_id']
+    source_key = source_key_for(document['file_name'])
+    counts = {'inserted': 0, 'changed': 0, 'unchanged': 0, 'deleted': 0}
+
+    if not start_chunk_version(document_id, source_key):
+        return {"status": "error", **counts}
+
+    previous = get_current_chunk_index(source_key, exclude_document_id=document_id)
+    start = time.perf_counter()
+
+    chunks = diff_chunks(lambda: iter_chunks(iter_blocks(iter_pdf_pages(document_id)), max_tokens),
+                         previous, counts)
+
+    batch = []
+    for index, chunk in enumerate(chunks):
+        chunk.update({"source_key": source_key, "document_id": document_id, "chunk_index": index})
+        batch.append(chunk)
+        if len(batch) >= batch_size:
+            if insert_pdf_chunks(batch) < 0:
+                return {"status": "error", **counts}
+            batch = []
+    if batch and insert_pdf_chunks(batch) < 0:
+        return {"status": "error", **counts}
+
+    if not finalize_chunk_version(document_id, source_key, counts):
+        return {"status": "error", **counts}
+
+    elapsed = time.perf_counter() - start
+    total = sum(counts.values())
+    print(f"[{AGENT_NAME}] {document['file_name']} ({source_key}): {counts} in {elapsed:.1f}s")
+
+    return {"status": "done", **counts,
+            "chunks_per_sec": round(total / elapsed, 1) if elapsed > 0 else 0.0}
+
+
+def register(runtime):
+    """Register the agent: chunk newly extracted documents one by one."""
+    agent = runtime.agent(AGENT_NAME, version="1.9")
+    state = {"last": {}}
+
+    def chunk_pending():
+        documents = get_documents_to_chunk()
+        agent.status = "processing" if documents else "idle"
+        for document in documents:
+            if agent.stopping:
+                break
+            try:
+                state["last"] = chunk_document(document)
+                state["last"]["document"] = document['file_name']
+            except Exception as e:
+                print(f"[{AGENT_NAME}] [ERROR] {document.get('file_name')}: {e}")
+        agent.status = "idle"
+
+    agent.every(POLL_INTERVAL, chunk_pending)
+    agent.set_queue_size(lambda: len(get_documents_to_chunk()))
+    agent.details(lambda: {"max_tokens": CHUNK_MAX_TOKENS, "last_run": state["last"]})
+    return agent
 
 
 def main_loop():
-    """Main daemon loop - sends heartbeat every 30s."""
+    """Run the agent until SIGTERM/SIGINT (finishes the running document first)."""
     db_host = os.getenv('DB_HOST', 'localhost')
     db_port = os.getenv('DB_PORT', '5432')
 
     print(f"[{AGENT_NAME}] Starting daemon loop...")
     print(f"[{AGENT_NAME}] Connected to DB at {db_host}:{db_port}")
-    print(f"[{AGENT_NAME}] Status: Scaffold (waiting for implementation)")
-
-    while True:
-        try:
-            metrics = get_resource_metrics()
-
-            details = {
-                "mode": "scaffold",
-                "status": "waiting_for_implementation",
-                "version": "1.6",
-                "cpu_percent": metrics["cpu_percent"],
-                "ram_percent": metrics["ram_percent"],
-                "ram_mb": metrics["ram_mb"]
-            }
-
-            update_agent_heartbeat(
-                agent_name=AGENT_NAME,
-                queue_size=0,
-                details=details
-            )
-
-            print(f"[{AGENT_NAME}] Heartbeat sent: CPU={metrics['cpu_percent']}%, RAM={metrics['ram_percent']}%")
-
-        except Exception as e:
-            print(f"[{AGENT_NAME}] Error: {e}")
+    print(f"[{AGENT_NAME}] Max chunk size: {CHUNK_MAX_TOKENS} tokens")
 
-        time.sleep(30)
+    run_agent(register)
 
 
 if __name__ == "__main__":
-    try:
-        main_loop()
-    except KeyboardInterrupt:
-        print(f"[{AGENT_NAME}] Shutting down...")
+    main_loop()
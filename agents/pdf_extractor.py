@@ -1,71 +1,341 @@
 #!/usr/bin/env python3
 """
 Agent: pdf_extractor
-Version: 1.6
-Description: Extracts text and structure from PDF documents
-Status: Scaffold - waiting for implementation
+Version: 1.9
+Description: Extracts page text and layout blocks from PDF documents
+
+Watches PDF_INBOX_DIR for PDF files (customer RFQs, specs). Each document is
+registered by content hash in pdf_document, so re-uploads are no-ops and an
+interrupted document resumes with the missing pages only. Each page is also
+hashed on its pdftotext layout output (deterministic for the same page
+content); a page already stored under that hash, in any document, is copied
+instead of being parsed again.
+
+Pages are extracted with poppler (pdftotext -bbox-layout, one page per call)
+in a process pool. At most PDF_WINDOW pages are in flight and finished pages
+are written to pdf_page in batches of PDF_PAGE_BATCH, so memory stays bounded
+regardless of document size (a 500-page spec is never loaded at once).
+Pages/sec and per-document peak RSS are reported in the heartbeat.
 """
 
 import os
 import sys
 import time
+import hashlib
+import subprocess
+import xml.etree.ElementTree as ET
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
 import psutil
 
 # Add parent directory to path for imports
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from agents.db_bridge.database import update_agent_heartbeat
+from agents.db_bridge.database import (
+    get_or_create_pdf_document,
+    get_extracted_page_numbers,
+    get_pdf_page_by_hash,
+    insert_pdf_pages,
+    update_pdf_document_status
+)
+from agents.runtime import run_agent
 
 AGENT_NAME = "pdf_extractor"
 
+PDF_INBOX_DIR = os.getenv('PDF_INBOX_DIR', '/app/data/pdf_inbox')
+PDF_WORKERS = int(os.getenv('PDF_WORKERS', str(max(1, (os.cpu_count() or 2) - 1))))
+PDF_WINDOW = int(os.getenv('PDF_WINDOW', str(PDF_WORKERS * 2)))
+PDF_PAGE_BATCH = int(os.getenv('PDF_PAGE_BATCH', '20'))
+PDF_PAGE_TIMEOUT = int(os.getenv('PDF_PAGE_TIMEOUT', '60'))
+POLL_INTERVAL = int(os.getenv('PDF_POLL_INTERVAL', '30'))
+
+# (path, size, mtime) -> content hash, so unchanged files are not re-hashed every poll
+_hash_cache = {}
+# (path, size, mtime) of files already extracted (or known to the DB) in this process
+_completed = set()
+
+
+def process_tree_rss_mb() -> float:
+    """RSS of this agent plus its worker processes."""
+    proc = psutil.Process()
+    rss = proc.memory_info().rss
+    for child in proc.children(recursive=True):
+        try:
+            rss += child.memory_info().rss
+        except psutil.Error:
+            pass
+    return round(rss / 1024 / 1024, 1)
+
+
+def file_key(path: str) -> tuple:
+    """Identity of a file version (path, size, mtime)."""
+    stat = os.stat(path)
+    return (path, stat.st_size, stat.st_mtime)
+
+
+def file_hash(path: str) -> str:
+    """SHA256 of a file, read in 1 MB chunks (cached by size and mtime)."""
+    key = file_key(path)
+    if key in _hash_cache:
+        return _hash_cache[key]
+
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+
+    _hash_cache[key] = digest.hexdigest()
+    return _hash_cache[key]
+
+
+def get_page_count(path: str) -> int:
+    """Number of pages (pdfinfo)."""
+    output = subprocess.run(
+        ["pdfinfo", path], capture_output=True, text=True, timeout=PDF_PAGE_TIMEOUT, check=True
+    ).stdout
+    for line in output.splitlines():
+        if line.startswith("Pages:"):
+            return int(line.split(":", 1)[1].strip())
+    return 0
+
+
+def _local(tag: str) -> str:
+    """Tag name without XML namespace."""
+    return tag.rsplit('}', 1)[-1]
+
+
+def parse_bbox_layout(xhtml: str) -> list:
+    """
+    Parse `pdftotext -bbox-layout` output into layout blocks.
+
+    Returns:
+        List of {"bbox": [xMin, yMin, xMax, yMax], "lines": [str, ...]}
+    """
+    blocks = []
+    root = ET.fromstring(xhtml)
+    for element in root.iter():
+        if _local(element.tag) != 'block':
+            continue
+        lines = []
+        for line in element:
+            if _local(line.tag) != 'line':
+                continue
+            words = [w.text for w in line if _local(w.tag) == 'word' and w.text]
+            if words:
+                lines.append(' '.join(words))
+        if lines:
+            blocks.append({
+                "bbox": [round(float(element.get(k, 0)), 1) for k in ('xMin', 'yMin', 'xMax', 'yMax')],
+                "lines": lines
+            })
+    return blocks
+
+
+def extract_page(path: str, page_no: int) -> dict:
+    """
+    Extract one page (runs in a worker process). The page hash is taken over
+    the body of the pdftotext layout output (words and their boxes); pages whose hash is
+    already stored are taken from pdf_page instead of being parsed.
+
+    Returns:
+        Dict with page_no, page_hash, text, blocks, cached
+    """
+    xhtml = subprocess.run(
+        ["pdftotext", "-bbox-layout", "-enc", "UTF-8", "-f", str(page_no), "-l", str(page_no), path, "-"],
+        capture_output=True, text=True, timeout=PDF_PAGE_TIMEOUT, check=True
+    ).stdout
+
+    # Only the page body: the head carries document metadata (title, producer, dates)
+    body = xhtml[max(xhtml.find('<body'), 0):]
+    page_hash = hashlib.sha256(body.encode('utf-8')).hexdigest()
+    known = get_pdf_page_by_hash(page_hash)
+    if known:
+        return {"page_no": page_no, "page_hash": page_hash, "text": known["text"] or "",
+                "blocks": known["blocks"] or [], "cached": True}
+
+    blocks = parse_bbox_layout(xhtml)
+    text = '\n\n'.join('\n'.join(b["lines"]) for b in blocks)
 
-def get_resource_metrics():
-    """Get current CPU and RAM usage."""
     return {
-        "cpu_percent": psutil.cpu_percent(interval=1),
-        "ram_percent": psutil.virtual_memory().percent,
-        "ram_mb": round(psutil.virtual_memory().used / 1024 / 1024, 2)
+        "page_no": page_no,
+        "page_hash": page_hash,
+        "text": text,
+        "blocks": blocks,
+        "cached": False
     }
 
 
+def extract_document(path: str, pool: ProcessPoolExecutor, stats: dict) -> dict:
+    """
+    Extract all missing pages of one PDF and stream them into the DB.
+
+    Args:
+        path: PDF file path
+        pool: Worker pool
+        stats: Agent stats (pages_total, pages_cached, pages_per_sec, ... updated in place)
+
+    Returns:
+        Dict with document_id, status, pages_extracted
+    """
+    content_hash = file_hash(path)
+    page_count = get_page_count(path)
+
+    document = get_or_create_pdf_document(content_hash, os.path.basename(path),
+                                          os.path.getsize(path), page_count)
+    if not document:
+        return {"status": "error", "pages_extracted": 0}
+    if document["status"] == "done":
+        return {"document_id": document["document_id"], "status": "cached", "pages_extracted": 0}
+
+    document_id = document["document_id"]
+    missing = sorted(set(range(1, page_count + 1)) - get_extracted_page_numbers(document_id))
+    update_pdf_document_status(document_id, "processing")
+
+    print(f"[{AGENT_NAME}] {os.path.basename(path)}: {len(missing)}/{page_count} pages to extract")
+
+    start = time.perf_counter()
+    peak_rss = process_tree_rss_mb()
+    extracted = 0
+    failed = []
+    batch = []
+    in_flight = {}
+    pages = iter(missing)
+
+    def submit_next():
+        page_no = next(pages, None)
+        if page_no is not None:
+            in_flight[pool.submit(extract_page, path, page_no)] = page_no
+
+    # Bounded window: never more than PDF_WINDOW pages queued or in memory
+    for _ in range(PDF_WINDOW):
+        submit_next()
+
+    while in_flight:
+        done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+        for future in done:
+            page_no = in_flight.pop(future)
+            try:
+                batch.append(future.result())
+            except Exception as e:
+                failed.append(page_no)
+                print(f"[{AGENT_NAME}] [ERROR] Page {page_no}: {e}")
+            submit_next()
+
+        if len(batch) >= PDF_PAGE_BATCH or (not in_flight and batch):
+            if insert_pdf_pages(document_id, batch) >= 0:
+                extracted += len(batch)
+                stats["pages_total"] += len(batch)
+                stats["pages_cached"] += sum(1 for p in batch if p.get("cached"))
+            else:
+                failed.extend(p["page_no"] for p in batch)
+            batch = []
+            peak_rss = max(peak_rss, process_tree_rss_mb())
+            elapsed = time.perf_counter() - start
+            stats["pages_per_sec"] = round(extracted / elapsed, 2) if elapsed > 0 else 0.0
+
+    elapsed = time.perf_counter() - start
+    status = "error" if failed else "done"
+    update_pdf_document_status(
+        document_id, status,
+        error=f"{len(failed)} pages failed: {failed[:20]}" if failed else None,
+        extract_seconds=round(elapsed, 2),
+        peak_rss_mb=peak_rss
+    )
+
+    stats["last_document"] = os.path.basename(path)
+    stats["last_document_pages_per_sec"] = round(extracted / elapsed, 2) if elapsed > 0 else 0.0
+    stats["last_document_peak_rss_mb"] = peak_rss
+
+    print(f"[{AGENT_NAME}] {os.path.basename(path)}: {extracted} pages in {elapsed:.1f}s "
+          f"({stats['last_document_pages_per_sec']} pages/s, peak RSS {peak_rss} MB), {len(failed)} failed")
+
+    return {"document_id": document_id, "status": status, "pages_extracted": extracted}
+
+
+def list_inbox(inbox: str = PDF_INBOX_DIR) -> list:
+    """PDF files in the inbox, oldest first."""
+    if not os.path.isdir(inbox):
+        return []
+    files = [
+        os.path.join(inbox, name) for name in os.listdir(inbox)
+        if name.lower().endswith('.pdf') and os.path.isfile(os.path.join(inbox, name))
+    ]
+    return sorted(files, key=os.path.getmtime)
+
+
+def register(runtime):
+    """Register the agent: poll the inbox and extract new documents."""
+    agent = runtime.agent(AGENT_NAME, version="1.9")
+    pool = ProcessPoolExecutor(max_workers=PDF_WORKERS)
+    stats = {"pages_total": 0, "pages_cached": 0, "pages_per_sec": 0.0, "documents_done": 0,
+             "documents_cached": 0}
+    state = {"queue": 0}
+
+    def poll_inbox():
+        files = [p for p in list_inbox() if file_key(p) not in _completed]
+        state["queue"] = len(files)
+        agent.status = "processing" if files else "idle"
+
+        for path in files:
+            if agent.stopping:
+                break
+            try:
+                result = extract_document(path, pool, stats)
+                if result["status"] in ("cached", "done"):
+                    _completed.add(file_key(path))
+                if result["status"] == "cached":
+                    stats["documents_cached"] += 1
+                elif result["status"] == "done":
+                    stats["documents_done"] += 1
+            except Exception as e:
+                print(f"[{AGENT_NAME}] [ERROR] {path}: {e}")
+            state["queue"] -= 1
+            runtime.heartbeat_now()
+
+        agent.status = "idle"
+
+    agent.every(POLL_INTERVAL, poll_inbox)
+    agent.set_queue_size(lambda: state["queue"])
+    agent.details(lambda: {
+        "inbox": PDF_INBOX_DIR,
+        "workers": PDF_WORKERS,
+        "pages_total": stats["pages_total"],
+        "pages_cached": stats["pages_cached"],
+        "pages_per_sec": stats["pages_per_sec"],
+        "documents_done": stats["documents_done"],
+        "documents_cached": stats["documents_cached"],
+        "last_document": stats.get("last_document"),
+        "last_document_pages_per_sec": stats.get("last_document_pages_per_sec"),
+        "last_document_peak_rss_mb": stats.get("last_document_peak_rss_mb")
+    })
+    agent.on_shutdown(lambda: pool.shutdown(wait=True, cancel_futures=True))
+    return agent
+
+
 def main_loop():
-    """Main daemon loop - sends heartbeat every 30s."""
+    """Run the agent until SIGTERM/SIGINT (finishes the running document first)."""
     db_host = os.getenv('DB_HOST', 'localhost')
     db_port = os.getenv('DB_PORT', '5432')
 
     print(f"[{AGENT_NAME}] Starting daemon loop...")
     print(f"[{AGENT_NAME}] Connected to DB at {db_host}:{db_port}")
-    print(f"[{AGENT_NAME}] Status: Scaffold (waiting for implementation)")
+    print(f"[{AGENT_NAME}] Inbox: {PDF_INBOX_DIR}, workers={PDF_WORKERS}, window={PDF_WINDOW}")
 
-    while True:
-        try:
-            metrics = get_resource_metrics()
-
-            details = {
-                "mode": "scaffold",
-                "status": "waiting_for_implementation",
-                "version": "1.6",
-                "cpu_percent": metrics["cpu_percent"],
-                "ram_percent": metrics["ram_percent"],
-                "ram_mb": metrics["ram_mb"]
-            }
-
-            update_agent_heartbeat(
-                agent_name=AGENT_NAME,
-                queue_size=0,
-                details=details
-            )
+    run_agent(register)
 
-            print(f"[{AGENT_NAME}] Heartbeat sent: CPU={metrics['cpu_percent']}%, RAM={metrics['ram_percent']}%")
 
-        except Exception as e:
-            print(f"[{AGENT_NAME}] Error: {e}")
-
-        time.sleep(30)
+if __name__ == "__main__":
+    import argparse
 
+    parser = argparse.ArgumentParser(description='PDF Extractor Agent')
+    parser.add_argument('--file', help='Extract a single PDF and exit')
+    args = parser.parse_args()
 
-if __name__ == "__main__":
     try:
-        main_loop()
+        if args.file:
+            run_stats = {"pages_total": 0, "pages_cached": 0, "pages_per_sec": 0.0}
+            with ProcessPoolExecutor(max_workers=PDF_WORKERS) as executor:
+                print(f"Result: {extract_document(args.file, executor, run_stats)}")
+        else:
+            main_loop()
     except KeyboardInterrupt:
         print(f"[{AGENT_NAME}] Shutting down...")
@@ -1,71 +1,449 @@
 #!/usr/bin/env python3
 """
 Agent: report_agent
-Version: 1.6
-Description: Generates analysis reports for requirements matching and traceability
-Status: Scaffold - waiting for implementation
+Version: 1.9
+Description: Generates RFQ coverage reports (HTML + print/PDF) into rfq_report
+
+For every RFQ whose inputs changed (run key over customer nodes, matches and
+links), the report is rebuilt from ONE streamed query (server-side cursor):
+best match per customer requirement, GREEN/YELLOW/RED color, the LLM
+re-ranking verdict (if the match was judged) and the trace layer counts
+(system/arch/code/test) of the matched platform requirement.
+
+Each requirement row is rendered to an HTML fragment that is cached in
+report_fragment under a key over its inputs (requirement, best match,
+similarity, color, verdict, layer counts, template version). Regenerating after a
+small change re-renders only the affected rows. Rows are written to disk as
+they stream in, so memory stays flat for any RFQ size. Several RFQs are
+rendered concurrently in a process pool.
+
+Output per RFQ (REPORT_OUTPUT_DIR/<rfq_id>/):
+- report.html        screen version
+- report_print.html  print version (A4, repeated table headers)
+- report.pdf         only if wkhtmltopdf is installed
 """
 
 import os
+import re
 import sys
+import json
 import time
-import psutil
+import html
+import shutil
+import hashlib
+import tempfile
+import subprocess
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
 
 # Add parent directory to path for imports
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from agents.db_bridge.database import update_agent_heartbeat
+from agents.db_bridge.database import (
+    get_or_create_embedding_model,
+    get_rfq_report_queue,
+    iter_rfq_report_rows,
+    get_report_fragments,
+    save_report_fragments,
+    prune_report_fragments,
+    save_rfq_report,
+    claim_agent_jobs,
+    finish_agent_job,
+    FULL_MATCH_THRESHOLD,
+    PARTIAL_MATCH_THRESHOLD
+)
+from agents.runtime import run_agent
 
 AGENT_NAME = "report_agent"
 
+REPORT_OUTPUT_DIR = os.getenv('REPORT_OUTPUT_DIR', '/app/data/reports')
+REPORT_WORKERS = int(os.getenv('REPORT_WORKERS', '2'))
+REPORT_MODEL = os.getenv('REPORT_MODEL', 'nomic-embed-text')
+REPORT_BATCH = int(os.getenv('REPORT_BATCH', '500'))
+REPORT_FRAGMENT_DAYS = int(os.getenv('REPORT_FRAGMENT_DAYS', '30'))
+POLL_INTERVAL = int(os.getenv('REPORT_POLL_INTERVAL', '30'))
+
+# Bump when the row template changes (invalidates all cached fragments)
+TEMPLATE_VERSION = "2"
+
+COLORS = {
+    "GREEN": "#4CAF50",
+    "YELLOW": "#FFC107",
+    "RED": "#F44336",
+    "GRAY": "#BDBDBD"
+}
+LAYERS = ("system", "arch", "code", "test")
+VERDICTS = ("MATCH", "PARTIAL", "NO_MATCH")
+
+BASE_CSS = """
+body { font-family: Helvetica, Arial, sans-serif; font-size: 13px; color: #222; margin: 24px; }
+h1 { font-size: 20px; margin-bottom: 4px; }
+table { border-collapse: collapse; width: 100%; margin-bottom: 16px; }
+th, td { border: 1px solid #ddd; padding: 4px 6px; vertical-align: top; text-align: left; }
+th { background: #f5f5f5; }
+td.num { text-align: right; white-space: nowrap; }
+td.color { width: 10px; padding: 0; }
+.muted { color: #777; }
+"""
+SCREEN_CSS = BASE_CSS + """
+tr:hover td { background: #fafafa; }
+"""
+PRINT_CSS = BASE_CSS + """
+@page { size: A4 landscape; margin: 12mm; }
+body { margin: 0; font-size: 10px; }
+thead { display: table-header-group; }
+tr { page-break-inside: avoid; }
+td.color { -webkit-print-color-adjust: exact; print-color-adjust: exact; }
+"""
+
+TABLE_HEAD = (
+    "<table class=\"requirements\"><thead><tr>"
+    "<th></th><th>Customer requirement</th><th>Text</th><th>Platform requirement</th>"
+    "<th>Similarity</th><th>System</th><th>Arch</th><th>Code</th><th>Test</th>"
+    "</tr></thead><tbody>\n"
+)
+TABLE_FOOT = "</tbody></table>\n"
+
+
+def coverage_color(row: dict) -> str:
+    """Stored classification, else by similarity; GRAY if there is no match."""
+    if row.get("similarity") is None:
+        return "GRAY"
+    if row.get("classification") in ("GREEN", "YELLOW", "RED"):
+        return row["classification"]
+    if row["similarity"] >= FULL_MATCH_THRESHOLD:
+        return "GREEN"
+    if row["similarity"] >= PARTIAL_MATCH_THRESHOLD:
+        return "YELLOW"
+    return "RED"
+
+
+def fragment_key(row: dict, color: str) -> str:
+    """Content address of a rendered row (all inputs of render_row)."""
+    payload = [
+        TEMPLATE_VERSION, row["req_id"], row.get("content"), row.get("platform_req_id"),
+        row.get("platform_content"),
+        None if row.get("similarity") is None else round(float(row["similarity"]), 4),
+        color, row.get("verdict")
+    ] + [int(row.get(layer) or 0) for layer in LAYERS]
+    return hashlib.sha256(json.dumps(payload, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+
+def render_row(row: dict, color: str) -> str:
+    """HTML table row for one customer requirement."""
+    if row.get("similarity") is None:
+        platform = "<span class=\"muted\">no match</span>"
+        similarity = ""
+    else:
+        platform = (f"<b>{html.escape(row.get('platform_req_id') or '')}</b><br>"
+                    f"<span class=\"muted\">{html.escape(row.get('platform_content') or '')}</span>")
+        similarity = f"{float(row['similarity']):.3f}"
+        if row.get("verdict"):
+            similarity += f"<br><span class=\"muted\">LLM: {html.escape(row['verdict'])}</span>"
+
+    layers = "".join(f"<td class=\"num\">{int(row.get(layer) or 0)}</td>" for layer in LAYERS)
+    return (
+        f"<tr><td class=\"color\" style=\"background:{COLORS[color]}\" title=\"{color}\"></td>"
+        f"<td>{html.escape(row['req_id'])}</td>"
+        f"<td>{html.escape(row.get('content') or '')}</td>"
+        f"<td>{platform}</td>"
+        f"<td class=\"num\">{similarity}</td>{layers}</tr>\n"
+    )
+
+
+def render_summary(rfq: dict, stats: dict) -> str:
+    """Summary section (counts per color, YELLOW by LLM verdict, trace layer coverage)."""
+    total = stats["total"]
+
+    def pct(n):
+        return f"{(n / total * 100):.1f}%" if total else "0.0%"
+
+    color_rows = "".join(
+        f"<tr><td class=\"color\" style=\"background:{COLORS[c]}\"></td><td>{c}</td>"
+        f"<td class=\"num\">{stats['colors'].get(c, 0)}</td><td class=\"num\">{pct(stats['colors'].get(c, 0))}</td></tr>"
+        for c in ("GREEN", "YELLOW", "RED", "GRAY")
+    )
+    layer_rows = "".join(
+        f"<tr><td>{layer}</td><td class=\"num\">{stats['layers'].get(layer, 0)}</td>"
+        f"<td class=\"num\">{pct(stats['layers'].get(layer, 0))}</td></tr>"
+        for layer in LAYERS
+    )
+    platforms = ", ".join(html.escape(p) for p in stats["platforms"]) or "-"
+
+    verdict_table = ""
+    if any(stats["verdicts"].get(v) for v in VERDICTS):
+        yellow = stats["colors"].get("YELLOW", 0)
+        verdict_rows = "".join(
+            f"<tr><td>{label}</td><td class=\"num\">{stats['verdicts'].get(v, 0)}</td></tr>"
+            for v, label in [(v, v) for v in VERDICTS] + [(None, "not judged")]
+        )
+        verdict_table = (
+            f"<table style=\"width:auto\"><thead><tr><th>YELLOW by LLM verdict</th>"
+            f"<th>Requirements ({yellow})</th></tr></thead><tbody>{verdict_rows}</tbody></table>"
+        )
+
+    return (
+        f"<section class=\"summary\"><h1>RFQ {html.escape(rfq['rfq_id'])} - Coverage Report</h1>"
+        f"<p class=\"muted\">Customer project: {html.escape(rfq['project_id'])} | Platform: {platforms} | "
+        f"Model: {html.escape(REPORT_MODEL)} | Generated: {time.strftime('%Y-%m-%d %H:%M')}</p>"
+        f"<table style=\"width:auto\"><thead><tr><th></th><th>Coverage</th><th>Requirements</th><th>%</th></tr></thead>"
+        f"<tbody>{color_rows}<tr><td></td><td><b>Total</b></td><td class=\"num\"><b>{total}</b></td><td></td></tr></tbody></table>"
+        f"{verdict_table}"
+        f"<table style=\"width:auto\"><thead><tr><th>Trace layer</th><th>Requirements traced</th><th>%</th></tr></thead>"
+        f"<tbody>{layer_rows}</tbody></table></section>\n"
+    )
+
+
+def _write_document(path: str, title: str, css: str, summary: str, body_path: str):
+    """Assemble head + summary + streamed body into one HTML file."""
+    with open(path, 'w', encoding='utf-8') as out:
+        out.write(f"<!DOCTYPE html><html><head><meta charset=\"utf-8\"><title>{html.escape(title)}</title>"
+                  f"<style>{css}</style></head><body>\n")
+        out.write(summary)
+        out.write("<h2>Requirements</h2>\n")
+        out.write(TABLE_HEAD)
+        with open(body_path, 'r', encoding='utf-8') as body:
+            shutil.copyfileobj(body, out)
+        out.write(TABLE_FOOT)
+        out.write("</body></html>\n")
+
+
+def _flush(batch: list, body, stats: dict):
+    """Resolve a batch of rows against the fragment cache and write them in order."""
+    keys = [key for key, _, _ in batch]
+    cached = get_report_fragments(keys)
+    rendered = {}
+    for key, row, color in batch:
+        if key not in cached and key not in rendered:
+            rendered[key] = render_row(row, color)
+    if rendered:
+        save_report_fragments(rendered)
+
+    for key, _, _ in batch:
+        body.write(cached.get(key) or rendered[key])
+
+    stats["fragments_cached"] += sum(1 for k in keys if k in cached)
+    stats["fragments_rendered"] += len(rendered)
+
+
+def render_rfq(rfq: dict, model_id: int, output_dir: str = REPORT_OUTPUT_DIR) -> dict:
+    """
+    Build the report of one RFQ (runs in a worker process).
+
+    Args:
+        rfq: Dict with rfq_id, project_id, run_key
+        model_id: Embedding model ID of the matches
+        output_dir: Base output directory
+
+    Returns:
+        Dict with rfq_id, status and stats
+    """
+    start = time.perf_counter()
+    rfq_dir = os.path.join(output_dir, re.sub(r'[^A-Za-z0-9_.-]', '_', rfq["rfq_id"]))
+    os.makedirs(rfq_dir, exist_ok=True)
+
+    stats = {"total": 0, "colors": Counter(), "verdicts": Counter(), "layers": Counter(), "platforms": [],
+             "fragments_cached": 0, "fragments_rendered": 0}
+    platform_counts = Counter()
+
+    # The .part body is removed on success and failure alike
+    body = tempfile.NamedTemporaryFile('w', encoding='utf-8', dir=rfq_dir, suffix='.part', delete=False)
+    body_path = body.name
+    try:
+        with body:
+            batch = []
+            for row in iter_rfq_report_rows(model_id, rfq["project_id"], itersize=REPORT_BATCH):
+                color = coverage_color(row)
+                stats["total"] += 1
+                stats["colors"][color] += 1
+                if color == "YELLOW":
+                    stats["verdicts"][row.get("verdict")] += 1
+                for layer in LAYERS:
+                    if row.get(layer):
+                        stats["layers"][layer] += 1
+                if row.get("platform_id"):
+                    platform_counts[row["platform_id"]] += 1
+
+                batch.append((fragment_key(row, color), row, color))
+                if len(batch) >= REPORT_BATCH:
+                    _flush(batch, body, stats)
+                    batch = []
+            if batch:
+                _flush(batch, body, stats)
+
+        stats["platforms"] = [p for p, _ in platform_counts.most_common()]
+        summary = render_summary(rfq, stats)
+        title = f"RFQ {rfq['rfq_id']} Coverage"
+
+        report_path = os.path.join(rfq_dir, "report.html")
+        print_path = os.path.join(rfq_dir, "report_print.html")
+        _write_document(report_path, title, SCREEN_CSS, summary, body_path)
+        _write_document(print_path, title, PRINT_CSS, summary, body_path)
+    finally:
+        os.remove(body_path)
+
+    pdf_path = None
+    if shutil.which("wkhtmltopdf"):
+        try:
+            subprocess.run(
+                ["wkhtmltopdf", "--quiet", "--print-media-type", "-O", "Landscape",
+                 print_path, os.path.join(rfq_dir, "report.pdf")],
+                capture_output=True, timeout=600, check=True
+            )
+            pdf_path = os.path.join(rfq_dir, "report.pdf")
+        except Exception as e:
+            print(f"[{AGENT_NAME}] [WARN] PDF rendering failed for {rfq['rfq_id']}: {e}")
+
+    result_stats = {
+        "total": stats["total"],
+        "green": stats["colors"]["GREEN"],
+        "yellow": stats["colors"]["YELLOW"],
+        "red": stats["colors"]["RED"],
+        "unmatched": stats["colors"]["GRAY"],
+        "yellow_verdicts": {v or "NOT_JUDGED": n for v, n in stats["verdicts"].items()},
+        "layers": dict(stats["layers"]),
+        "fragments_cached": stats["fragments_cached"],
+        "fragments_rendered": stats["fragments_rendered"],
+        "print_path": print_path,
+        "seconds": round(time.perf_counter() - start, 2)
+    }
+
+    platform_id = stats["platforms"][0] if stats["platforms"] else None
+    saved = save_rfq_report(rfq["rfq_id"], platform_id, summary, report_path, pdf_path,
+                            rfq.get("run_key"), result_stats)
+
+    return {"rfq_id": rfq["rfq_id"], "status": "done" if saved else "error", "stats": result_stats}
+
+
+def _render_safe(args: tuple) -> dict:
+    rfq, model_id = args
+    try:
+        return render_rfq(rfq, model_id)
+    except Exception as e:
+        print(f"[{AGENT_NAME}] [ERROR] RFQ {rfq['rfq_id']}: {e}")
+        return {"rfq_id": rfq["rfq_id"], "status": "error", "error": str(e)}
+
+
+def run_once(pool: ProcessPoolExecutor, force: bool = False, rfq_id: str = None,
+             on_pending=None) -> dict:
+    """
+    Render all stale RFQ reports concurrently.
+
+    Args:
+        pool: Worker pool
+        force: Render even if inputs are unchanged
+        rfq_id: Only this RFQ
+        on_pending: Callback receiving the number of reports still to render,
+            before rendering and after each finished report
+
+    Returns:
+        Dict with rfqs, rendered, errors, pending (stale reports left after
+        the run), fragments_cached, fragments_rendered
+    """
+    model_id = get_or_create_embedding_model(REPORT_MODEL)
+    queue = get_rfq_report_queue(model_id)
+    if rfq_id:
+        queue = [r for r in queue if r["rfq_id"] == rfq_id]
+    todo = [r for r in queue if force or r["stale"]]
+
+    results = []
+    if on_pending:
+        on_pending(len(todo))
+    for result in (pool.map(_render_safe, [(r, model_id) for r in todo]) if todo else []):
+        results.append(result)
+        if on_pending:
+            on_pending(len(todo) - len(results))
+    done = [r for r in results if r["status"] == "done"]
 
-def get_resource_metrics():
-    """Get current CPU and RAM usage."""
     return {
-        "cpu_percent": psutil.cpu_percent(interval=1),
-        "ram_percent": psutil.virtual_memory().percent,
-        "ram_mb": round(psutil.virtual_memory().used / 1024 / 1024, 2)
+        "rfqs": len(queue),
+        "rendered": len(done),
+        "errors": len(results) - len(done),
+        "pending": len(todo) - len(done),
+        "fragments_cached": sum(r["stats"]["fragments_cached"] for r in done),
+        "fragments_rendered": sum(r["stats"]["fragments_rendered"] for r in done),
+        "results": [{"rfq_id": r["rfq_id"], "status": r["status"]} for r in results]
     }
 
 
+def run_jobs(pool: ProcessPoolExecutor) -> int:
+    """
+    Run 'report' jobs submitted through the bridge API.
+    params: {"rfq_id": optional, "force": optional (default true)}
+    """
+    jobs = claim_agent_jobs("report")
+    for job in jobs:
+        params = job.get("params") or {}
+        try:
+            result = run_once(pool, force=params.get("force", True), rfq_id=params.get("rfq_id"))
+            finish_agent_job(job["job_id"], "ERROR" if result["errors"] else "DONE", result)
+        except Exception as e:
+            finish_agent_job(job["job_id"], "ERROR", error=str(e))
+    return len(jobs)
+
+
+def register(runtime):
+    """Register the agent: report jobs, stale reports, daily fragment pruning."""
+    agent = runtime.agent(AGENT_NAME, version="1.9")
+    pool = ProcessPoolExecutor(max_workers=REPORT_WORKERS)
+    state = {"last": {}, "rfqs": 0, "pending": 0}
+
+    def process_jobs():
+        jobs = run_jobs(pool)
+        if jobs:
+            print(f"[{AGENT_NAME}] Ran {jobs} report jobs")
+        return jobs
+
+    def render_stale():
+        agent.status = "processing"
+        result = run_once(pool, on_pending=lambda n: state.update(pending=n))
+        agent.status = "idle"
+        state["rfqs"] = result["rfqs"]
+        state["pending"] = result["pending"]
+        if result["rendered"] or result["errors"]:
+            state["last"] = result
+            print(f"[{AGENT_NAME}] {result}")
+
+    def prune_fragments():
+        deleted = prune_report_fragments(REPORT_FRAGMENT_DAYS)
+        if deleted > 0:
+            print(f"[{AGENT_NAME}] Pruned {deleted} unused report fragments")
+
+    agent.queue(process_jobs, idle=POLL_INTERVAL)
+    agent.every(POLL_INTERVAL, render_stale)
+    agent.every(86400, prune_fragments)
+    agent.set_queue_size(lambda: state["pending"])
+    agent.details(lambda: {"workers": REPORT_WORKERS, "rfqs": state["rfqs"], "last_run": state["last"]})
+    agent.on_shutdown(lambda: pool.shutdown(wait=True))
+    return agent
+
+
 def main_loop():
-    """Main daemon loop - sends heartbeat every 30s."""
+    """Run the agent until SIGTERM/SIGINT (finishes the running render first)."""
     db_host = os.getenv('DB_HOST', 'localhost')
     db_port = os.getenv('DB_PORT', '5432')
 
     print(f"[{AGENT_NAME}] Starting daemon loop...")
     print(f"[{AGENT_NAME}] Connected to DB at {db_host}:{db_port}")
-    print(f"[{AGENT_NAME}] Status: Scaffold (waiting for implementation)")
-
-    while True:
-        try:
-            metrics = get_resource_metrics()
-
-            details = {
-                "mode": "scaffold",
-                "status": "waiting_for_implementation",
-                "version": "1.6",
-                "cpu_percent": metrics["cpu_percent"],
-                "ram_percent": metrics["ram_percent"],
-                "ram_mb": metrics["ram_mb"]
-            }
-
-            update_agent_heartbeat(
-                agent_name=AGENT_NAME,
-                queue_size=0,
-                details=details
-            )
+    print(f"[{AGENT_NAME}] Output: {REPORT_OUTPUT_DIR}, workers={REPORT_WORKERS}")
 
-            print(f"[{AGENT_NAME}] Heartbeat sent: CPU={metrics['cpu_percent']}%, RAM={metrics['ram_percent']}%")
+    run_agent(register)
 
-        except Exception as e:
-            print(f"[{AGENT_NAME}] Error: {e}")
 
-        time.sleep(30)
+if __name__ == "__main__":
+    import argparse
 
+    parser = argparse.ArgumentParser(description='Report Agent')
+    parser.add_argument('--rfq', help='Render a single RFQ and exit')
+    parser.add_argument('--all', action='store_true', help='Render all RFQs once and exit')
+    parser.add_argument('--force', action='store_true', help='Render even if inputs are unchanged')
+    args = parser.parse_args()
 
-if __name__ == "__main__":
     try:
-        main_loop()
+        if args.rfq or args.all:
+            with ProcessPoolExecutor(max_workers=REPORT_WORKERS) as executor:
+                print(f"Result: {run_once(executor, force=args.force, rfq_id=args.rfq)}")
+        else:
+            main_loop()
     except KeyboardInterrupt:
         print(f"[{AGENT_NAME}] Shutting down...")
@@ -0,0 +1,5 @@
+# Agent Runtime Module - shared scheduler, heartbeats and graceful shutdown
+from agents.runtime.metrics import Histogram, Counter, REGISTRY, timed, instrument, start_metrics_server
+from agents.runtime.resources import ResourceSampler, get_resource_metrics
+from agents.runtime.scheduler import Agent, Task, run_concurrently
+from agents.runtime.runtime import AgentRuntime, run_agent
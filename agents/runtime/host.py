@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+"""
+Agent Host
+Version: 1.9
+Description: Runs several agents in ONE process (shared heartbeat writer,
+resource sampler and shutdown handling) instead of one container each.
+
+Every hostable agent module exposes register(runtime).
+
+Usage:
+  python -m agents.runtime.host embedding_agent matching_agent trace_agent
+  AAT_AGENTS=report_agent,git_impact_agent python -m agents.runtime.host
+"""
+
+import os
+import sys
+import importlib
+
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from agents.runtime.runtime import AgentRuntime
+
+
+def load_agents(names: list, runtime: AgentRuntime):
+    """Import agents.<name> and call its register(runtime)."""
+    for name in names:
+        module = importlib.import_module(f"agents.{name}")
+        if not hasattr(module, "register"):
+            raise SystemExit(f"agents.{name} cannot be hosted (no register(runtime))")
+        module.register(runtime)
+
+
+if __name__ == "__main__":
+    names = sys.argv[1:] or [n.strip() for n in os.getenv('AAT_AGENTS', '').split(',') if n.strip()]
+    if not names:
+        raise SystemExit("Usage: python -m agents.runtime.host <agent> [<agent> ...]")
+
+    runtime = AgentRuntime()
+    load_agents(names, runtime)
+    runtime.run()
@@ -0,0 +1,284 @@
+"""
+Agent Runtime - Metrics
+Version: 1.9
+
+Fixed-bucket latency histograms (milliseconds) and counters. Cheap to update
+from any thread; summaries (count, avg, max, p50/p95/p99 from bucket bounds)
+go into the heartbeat details.
+
+REGISTRY is the process-wide metrics registry. It is rendered in the
+Prometheus text format by a small HTTP server (start_metrics_server, enabled
+by METRICS_PORT) and summarized into the heartbeat (REGISTRY.summary()).
+
+    from agents.runtime.metrics import REGISTRY, timed
+
+    REGISTRY.counter("aat_embeddings_total", "Embeddings stored").inc()
+    with timed("aat_ollama_request_ms", "Ollama request latency", endpoint="embed"):
+        ...
+"""
+
+import os
+import time
+import threading
+import functools
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+METRICS_HOST = os.getenv('METRICS_HOST', '127.0.0.1')
+
+# Upper bounds in ms (last bucket is +inf)
+DEFAULT_BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000,
+                      10000, 30000, 60000, 300000)
+
+
+class Histogram:
+    """Thread-safe latency histogram with fixed buckets."""
+
+    def __init__(self, buckets: tuple = DEFAULT_BUCKETS_MS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value_ms: float):
+        index = len(self.buckets)
+        for i, bound in enumerate(self.buckets):
+            if value_ms <= bound:
+                index = i
+                break
+        with self._lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.total += value_ms
+            if value_ms > self.max:
+                self.max = value_ms
+
+    def percentile(self, pct: float) -> float:
+        """Upper bound of the bucket containing the pct-th observation (max for +inf)."""
+        with self._lock:
+            if not self.count:
+                return 0.0
+            rank = pct / 100.0 * self.count
+            seen = 0
+            for i, n in enumerate(self.counts):
+                seen += n
+                if seen >= rank and n:
+                    return round(float(min(self.buckets[i], self.max)), 2) if i < len(self.buckets) else round(self.max, 2)
+            return round(self.max, 2)
+
+    def summary(self) -> dict:
+        with self._lock:
+            count, total, maximum = self.count, self.total, self.max
+        return {
+            "count": count,
+            "avg_ms": round(total / count, 2) if count else 0.0,
+            "max_ms": round(maximum, 2),
+            "p50_ms": self.percentile(50),
+            "p95_ms": self.percentile(95),
+            "p99_ms": self.percentile(99)
+        }
+
+
+class Counter:
+    """Thread-safe monotonically increasing counter."""
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1):
+        with self._lock:
+            self.value += amount
+
+
+def _label_key(labels: dict) -> tuple:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", " ")
+
+
+def _label_text(key: tuple, extra: tuple = ()) -> str:
+    pairs = key + extra
+    if not pairs:
+        return ""
+    body = ",".join(f'{k}="{_escape(v)}"' for k, v in pairs)
+    return "{" + body + "}"
+
+
+class MetricsRegistry:
+    """Named counter/histogram families with labels."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._families = {}     # name -> {"type", "help", "series": {label_key: metric}}
+        self._rates = {}        # (name, label_key) -> (value, monotonic time)
+
+    def _get(self, kind: str, name: str, help_text: str, labels: dict, factory):
+        key = _label_key(labels)
+        with self._lock:
+            family = self._families.setdefault(name, {"type": kind, "help": help_text, "series": {}})
+            metric = family["series"].get(key)
+            if metric is None:
+                metric = family["series"][key] = factory()
+            return metric
+
+    def counter(self, name: str, help_text: str = "", **labels) -> Counter:
+        return self._get("counter", name, help_text, labels, Counter)
+
+    def histogram(self, name: str, help_text: str = "", **labels) -> Histogram:
+        return self._get("histogram", name, help_text, labels, Histogram)
+
+    def _snapshot(self) -> list:
+        with self._lock:
+            return [(name, f["type"], f["help"], list(f["series"].items()))
+                    for name, f in sorted(self._families.items())]
+
+    def render(self) -> str:
+        """Prometheus text exposition format (histogram buckets in ms)."""
+        lines = []
+        for name, kind, help_text, series in self._snapshot():
+            if help_text:
+                lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for key, metric in series:
+                if kind == "counter":
+                    lines.append(f"{name}{_label_text(key)} {metric.value}")
+                    continue
+                with metric._lock:
+                    counts, count, total = list(metric.counts), metric.count, metric.total
+                cumulative = 0
+                for bound, n in zip(metric.buckets, counts):
+                    cumulative += n
+                    lines.append(f"{name}_bucket{_label_text(key, (('le', bound),))} {cumulative}")
+                lines.append(f"{name}_bucket{_label_text(key, (('le', '+Inf'),))} {count}")
+                lines.append(f"{name}_sum{_label_text(key)} {round(total, 3)}")
+                lines.append(f"{name}_count{_label_text(key)} {count}")
+        return "\n".join(lines) + "\n"
+
+    def summary(self, top: int = 5) -> dict:
+        """
+        Compact summary for the heartbeat.
+
+        Counters report their total and the rate per second since the previous
+        summary; histograms report count/avg/p95. Families with many series
+        (e.g. one per DB helper) are cut to the `top` series by total time.
+        """
+        now = time.monotonic()
+        result = {}
+        for name, kind, _, series in self._snapshot():
+            entries = {}
+            if kind == "counter":
+                for key, metric in series:
+                    value = metric.value
+                    last_value, last_time = self._rates.get((name, key), (0.0, None))
+                    rate = (value - last_value) / (now - last_time) if last_time and now > last_time else None
+                    self._rates[(name, key)] = (value, now)
+                    entries[_series_name(key)] = {
+                        "total": value,
+                        "per_sec": round(rate, 2) if rate is not None else None
+                    }
+            else:
+                ranked = sorted(series, key=lambda item: item[1].total, reverse=True)[:top]
+                for key, metric in ranked:
+                    stats = metric.summary()
+                    entries[_series_name(key)] = {
+                        "count": stats["count"], "avg_ms": stats["avg_ms"], "p95_ms": stats["p95_ms"]
+                    }
+            result[name] = entries
+        return result
+
+
+def _series_name(key: tuple) -> str:
+    return ",".join(str(v) for _, v in key) or "all"
+
+
+REGISTRY = MetricsRegistry()
+
+
+@contextmanager
+def timed(name: str, help_text: str = "", **labels):
+    """Observe the duration of the with-block (ms) in histogram name{labels}."""
+    histogram = REGISTRY.histogram(name, help_text, **labels)
+    start = time.perf_counter()
+    try:
+        yield histogram
+    finally:
+        histogram.observe((time.perf_counter() - start) * 1000)
+
+
+def instrument(fn, name: str, help_text: str = "", label: str = "fn"):
+    """Wrap fn so each call is observed in histogram name{label=fn.__name__}."""
+    histogram = None
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        nonlocal histogram
+        start = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            # Series is created on first use so unused helpers stay out of /metrics
+            if histogram is None:
+                histogram = REGISTRY.histogram(name, help_text, **{label: fn.__name__})
+            histogram.observe((time.perf_counter() - start) * 1000)
+
+    return wrapper
+
+
+# ----------------------------------------------------------------------
+# /metrics endpoint
+# ----------------------------------------------------------------------
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = REGISTRY.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+_server = None
+_server_lock = threading.Lock()
+
+
+def start_metrics_server(port: int = None, host: str = METRICS_HOST):
+    """
+    Serve REGISTRY on http://host:port/metrics in a daemon thread.
+
+    Args:
+        port: Listen port (default: METRICS_PORT env; 0/unset disables)
+        host: Bind address (METRICS_HOST, default 127.0.0.1)
+
+    Returns:
+        The server, or None if disabled / the port is taken. Idempotent per process.
+    """
+    global _server
+    if port is None:
+        port = int(os.getenv('METRICS_PORT', '0') or 0)
+    if not port:
+        return None
+
+    with _server_lock:
+        if _server is None:
+            try:
+                _server = ThreadingHTTPServer((host, port), _MetricsHandler)
+            except OSError as e:
+                print(f"[metrics] Cannot listen on {host}:{port}: {e}")
+                return None
+            _server.daemon_threads = True
+            threading.Thread(target=_server.serve_forever, name="metrics", daemon=True).start()
+            print(f"[metrics] Serving http://{host}:{port}/metrics")
+        return _server
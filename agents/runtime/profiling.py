@@ -0,0 +1,265 @@
+"""
+Agent Runtime - On-demand Profiling
+Version: 1.9
+
+Opt-in profiling of one agent run or one page render. Nothing is captured
+unless a mode is requested:
+
+- AAT_PROFILE=cprofile   deterministic cProfile of the calling thread and of
+                         every thread it starts (run_concurrently workers),
+                         merged into one .pstats dump (snakeviz, flameprof,
+                         `python -m pstats`)
+- AAT_PROFILE=sample     wall-clock stack sampling of all threads every
+                         AAT_PROFILE_INTERVAL_MS (default 5 ms); stored as
+                         collapsed stacks rooted at the thread name
+                         ("thread;a;b;c 42" lines: flamegraph.pl, speedscope,
+                         inferno). The sampler stops by itself when the
+                         profiled thread ends or after AAT_PROFILE_MAX_SECONDS
+                         (default 300).
+
+Profiles are gzip-compressed and stored in the profile_runs table together
+with run metadata and a short text summary; the Admin page lists them for
+download.
+
+    from agents.runtime.profiling import profiled
+
+    with profiled("agent", "matching_agent", meta={"model": model}):
+        run_matching()
+"""
+
+import os
+import io
+import sys
+import gzip
+import time
+import marshal
+import pstats
+import cProfile
+import threading
+import functools
+from collections import Counter
+from contextlib import contextmanager
+
+PROFILE_MODES = ("cprofile", "sample")
+AAT_PROFILE_INTERVAL_MS = float(os.getenv('AAT_PROFILE_INTERVAL_MS', '5'))
+AAT_PROFILE_MAX_SECONDS = float(os.getenv('AAT_PROFILE_MAX_SECONDS', '300'))
+SUMMARY_LINES = 25
+
+
+def profile_mode(mode: str = None) -> str:
+    """Requested mode (argument or AAT_PROFILE env), or None if profiling is off."""
+    mode = (mode if mode is not None else os.getenv('AAT_PROFILE', '')).strip().lower()
+    if mode in ("1", "true", "yes"):
+        return "cprofile"
+    return mode if mode in PROFILE_MODES else None
+
+
+class StackSampler:
+    """
+    Samples the stacks of all threads from a background thread, until stop(),
+    the end of the profiled thread (thread_id) or max_seconds, whichever
+    comes first.
+    """
+
+    def __init__(self, thread_id: int, interval_ms: float = AAT_PROFILE_INTERVAL_MS,
+                 max_seconds: float = AAT_PROFILE_MAX_SECONDS):
+        self.thread_id = thread_id
+        self.interval = interval_ms / 1000.0
+        self.max_seconds = max_seconds
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+
+    @staticmethod
+    def _frame_name(frame) -> str:
+        code = frame.f_code
+        return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+    def _run(self):
+        deadline = time.monotonic() + self.max_seconds
+        while not self._stop.wait(self.interval):
+            if time.monotonic() >= deadline:
+                break
+            frames = sys._current_frames()
+            if self.thread_id not in frames:
+                # Profiled thread has ended (e.g. an abandoned page render)
+                break
+            thread_names = {t.ident: t.name for t in threading.enumerate()}
+            for thread_id, frame in frames.items():
+                if thread_id == self._thread.ident:
+                    continue
+                names = []
+                while frame is not None:
+                    names.append(self._frame_name(frame))
+                    frame = frame.f_back
+                names.append(thread_names.get(thread_id, str(thread_id)))
+                self.stacks[";".join(reversed(names))] += 1
+            self.samples += 1
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def folded(self) -> str:
+        """Collapsed stack format, one 'frame;frame;frame count' line per stack."""
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+    def summary(self) -> str:
+        """Top functions by thread stacks in which they are on top (self time, all threads)."""
+        leaf = Counter()
+        for stack, count in self.stacks.items():
+            leaf[stack.rsplit(";", 1)[-1]] += count
+        total = sum(leaf.values()) or 1
+        lines = [f"{self.samples} samples of all threads every {self.interval * 1000:g} ms (self time)"]
+        for name, count in leaf.most_common(SUMMARY_LINES):
+            lines.append(f"{count / total * 100:6.1f}%  {count:6d}  {name}")
+        return "\n".join(lines)
+
+
+class ThreadProfiler:
+    """
+    cProfile of the calling thread and of every thread started while it is
+    enabled (threading.setprofile hands each new thread its own profile).
+    From Python 3.12 on, one cProfile already sees all threads.
+    """
+
+    def __init__(self):
+        self.profiles = [cProfile.Profile()]
+        self._per_thread = sys.version_info < (3, 12)
+        self._active = False
+        self._previous = None
+        self._lock = threading.Lock()
+
+    def _start_thread(self, frame, event, arg):
+        # First event of a new thread: replace this hook by the thread's own profile
+        sys.setprofile(None)
+        if self._active:
+            profile = cProfile.Profile()
+            with self._lock:
+                self.profiles.append(profile)
+            profile.enable()
+
+    def enable(self):
+        self._active = True
+        if self._per_thread:
+            self._previous = threading.getprofile()
+            threading.setprofile(self._start_thread)
+        self.profiles[0].enable()
+
+    def disable(self):
+        self.profiles[0].disable()
+        self._active = False
+        if self._per_thread:
+            threading.setprofile(self._previous)
+
+    def stats(self, stream=None) -> pstats.Stats:
+        """All profiles merged (threads still running contribute what they have so far)."""
+        merged = None
+        with self._lock:
+            profiles = list(self.profiles)
+        for profile in profiles:
+            profile.create_stats()
+            if not profile.stats:
+                continue
+            if merged is None:
+                merged = pstats.Stats(profile, stream=stream)
+            else:
+                merged.add(profile)
+        return merged
+
+
+def _pstats_summary(stats: pstats.Stats) -> str:
+    out = io.StringIO()
+    stats.stream = out
+    stats.sort_stats("cumulative").print_stats(SUMMARY_LINES)
+    return out.getvalue()
+
+
+def _store(kind: str, target: str, mode: str, fmt: str, payload: bytes,
+           duration_ms: float, samples: int, meta: dict, summary: str) -> int:
+    # Imported lazily: agents.db_bridge.database imports agents.runtime itself
+    from agents.db_bridge.database import save_profile_run
+
+    data = gzip.compress(payload)
+    profile_id = save_profile_run(kind, target, mode, fmt, data, duration_ms,
+                                  samples=samples, meta=meta, summary=summary)
+    print(f"[profile] {kind}/{target}: {mode} profile {profile_id} stored "
+          f"({duration_ms:.0f} ms, {len(data) / 1024:.1f} KB)")
+    return profile_id
+
+
+@contextmanager
+def profiled(kind: str, target: str, mode: str = None, meta: dict = None,
+             max_seconds: float = AAT_PROFILE_MAX_SECONDS):
+    """
+    Profile the with-block if a mode is requested (see module docstring).
+
+    Args:
+        kind: 'agent' or 'page'
+        target: Agent or page name
+        mode: 'cprofile' / 'sample' (default: AAT_PROFILE env, off if unset)
+        meta: Run metadata stored with the profile (arguments, result, ...)
+        max_seconds: Sampling stops after this long ('sample' mode)
+
+    Yields:
+        The meta dict (callers may add results to it before the block ends)
+    """
+    meta = dict(meta or {})
+    mode = profile_mode(mode)
+    if not mode:
+        yield meta
+        return
+
+    profiler = sampler = None
+    if mode == "cprofile":
+        profiler = ThreadProfiler()
+    else:
+        sampler = StackSampler(threading.get_ident(), max_seconds=max_seconds)
+
+    start = time.perf_counter()
+    if profiler:
+        profiler.enable()
+    else:
+        sampler.start()
+    try:
+        yield meta
+    finally:
+        duration_ms = (time.perf_counter() - start) * 1000
+        try:
+            if profiler:
+                profiler.disable()
+                stats = profiler.stats()
+                _store(kind, target, mode, "pstats", marshal.dumps(stats.stats), duration_ms,
+                       None, meta, _pstats_summary(stats))
+            else:
+                sampler.stop()
+                _store(kind, target, mode, "folded", sampler.folded().encode("utf-8"), duration_ms,
+                       sampler.samples, meta, sampler.summary())
+        except Exception as e:
+            print(f"[profile] Failed to store {kind}/{target} profile: {e}")
+
+
+def profile_run(target: str, kind: str = "agent"):
+    """Decorator: profile each call of fn (when AAT_PROFILE is set) with its kwargs as metadata."""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not profile_mode():
+                return fn(*args, **kwargs)
+            with profiled(kind, target, meta={"args": kwargs}) as meta:
+                result = fn(*args, **kwargs)
+                meta["result"] = result
+                return result
+        return wrapper
+    return decorator
+
+
+def profile_file_name(run: dict) -> str:
+    """Download file name for a profile run ({'profile_id', 'target', 'format'})."""
+    extension = "pstats" if run["format"] == "pstats" else "folded"
+    target = "".join(c if c.isalnum() or c in "-_" else "_" for c in str(run["target"]))
+    return f"profile_{run['profile_id']}_{target}.{extension}"
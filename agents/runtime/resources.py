@@ -0,0 +1,63 @@
+"""
+Agent Runtime - Resource Sampling
+Version: 1.9
+
+Non-blocking CPU/RAM sampling. psutil.cpu_percent(interval=None) returns the
+utilisation since the previous call, so the sampler primes it once and every
+later sample is instant (the old interval=1 blocked each agent for a second
+per tick). Samples are cached briefly so many hosted agents share one.
+"""
+
+import time
+import threading
+import psutil
+
+
+class ResourceSampler:
+    """Shared, cached CPU/RAM/RSS sampler."""
+
+    def __init__(self, max_age: float = 1.0):
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._sample = None
+        self._taken = 0.0
+        self._process = psutil.Process()
+        # Prime the CPU counters (first call always returns 0.0)
+        psutil.cpu_percent(interval=None)
+
+    def _rss_mb(self) -> float:
+        rss = self._process.memory_info().rss
+        for child in self._process.children(recursive=True):
+            try:
+                rss += child.memory_info().rss
+            except psutil.Error:
+                pass
+        return round(rss / 1024 / 1024, 1)
+
+    def sample(self) -> dict:
+        """Dict with cpu_percent, ram_percent, ram_mb (host) and rss_mb (this process tree)."""
+        with self._lock:
+            now = time.monotonic()
+            if self._sample is None or now - self._taken >= self.max_age:
+                memory = psutil.virtual_memory()
+                self._sample = {
+                    "cpu_percent": psutil.cpu_percent(interval=None),
+                    "ram_percent": memory.percent,
+                    "ram_mb": round(memory.used / 1024 / 1024, 2),
+                    "rss_mb": self._rss_mb()
+                }
+                self._taken = now
+            return dict(self._sample)
+
+
+_default_sampler = None
+_default_lock = threading.Lock()
+
+
+def get_resource_metrics() -> dict:
+    """Process-wide sampler (drop-in for the per-agent get_resource_metrics)."""
+    global _default_sampler
+    with _default_lock:
+        if _default_sampler is None:
+            _default_sampler = ResourceSampler()
+    return _default_sampler.sample()
@@ -0,0 +1,140 @@
+"""
+Agent Runtime - Process Host
+Version: 1.9
+
+AgentRuntime hosts one or more agents in a single process:
+- one scheduler thread per agent (agents/runtime/scheduler.py)
+- one shared, non-blocking resource sampler
+- one heartbeat thread that writes the heartbeats of ALL hosted agents in a
+  single DB round trip every AGENT_HEARTBEAT_INTERVAL seconds (also while a
+  long task is running), including a summary of the process metrics
+- a /metrics endpoint (Prometheus text format) when METRICS_PORT is set
+- SIGTERM/SIGINT: stop scheduling, let running tasks finish (up to
+  AGENT_DRAIN_TIMEOUT), run shutdown hooks, write a final 'stopped' heartbeat
+"""
+
+import os
+import signal
+import threading
+
+from agents.db_bridge import database
+from agents.runtime.metrics import REGISTRY, start_metrics_server
+from agents.runtime.resources import ResourceSampler
+from agents.runtime.scheduler import Agent
+
+AGENT_HEARTBEAT_INTERVAL = float(os.getenv('AGENT_HEARTBEAT_INTERVAL', '30'))
+AGENT_DRAIN_TIMEOUT = float(os.getenv('AGENT_DRAIN_TIMEOUT', '45'))
+
+
+class AgentRuntime:
+    """Hosts agents, heartbeats and graceful shutdown for one process."""
+
+    def __init__(self, heartbeat_interval: float = AGENT_HEARTBEAT_INTERVAL,
+                 drain_timeout: float = AGENT_DRAIN_TIMEOUT):
+        self.heartbeat_interval = heartbeat_interval
+        self.drain_timeout = drain_timeout
+        self.debug = os.getenv('AGENT_DEBUG') == '1'
+        self.agents = []
+        self.stop_event = threading.Event()
+        self.resources = ResourceSampler()
+        self._pid = os.getpid()
+        self._heartbeat_wakeup = threading.Event()
+
+    def agent(self, name: str, version: str = "1.9", mode: str = "active", status: str = "idle") -> Agent:
+        """Create and register an agent."""
+        agent = Agent(self, name, version=version, mode=mode, status=status)
+        self.agents.append(agent)
+        return agent
+
+    # ------------------------------------------------------------------
+    # Heartbeats
+    # ------------------------------------------------------------------
+
+    def send_heartbeats(self, status: str = None) -> bool:
+        """Write the heartbeats of all hosted agents (one DB round trip)."""
+        resources = self.resources.sample()
+        metrics = REGISTRY.summary()
+        beats = []
+        for agent in self.agents:
+            details = agent.heartbeat_details(resources)
+            details["metrics"] = metrics
+            if status:
+                details["status"] = status
+            beats.append((agent.name, agent.queue_size(), details))
+
+        ok = database.update_agent_heartbeats(beats)
+        if ok:
+            names = ", ".join(a.name for a in self.agents)
+            print(f"[{names}] Heartbeat sent: CPU={resources['cpu_percent']}%, RAM={resources['ram_percent']}%")
+        return ok
+
+    def heartbeat_now(self):
+        """Ask the heartbeat thread to write immediately (e.g. after a status change)."""
+        self._heartbeat_wakeup.set()
+
+    def _heartbeat_loop(self):
+        while not self.stop_event.is_set():
+            try:
+                self.send_heartbeats()
+            except Exception as e:
+                print(f"[runtime] Heartbeat error: {e}")
+            self._heartbeat_wakeup.wait(self.heartbeat_interval)
+            self._heartbeat_wakeup.clear()
+
+    # ------------------------------------------------------------------
+    # Signals / lifecycle
+    # ------------------------------------------------------------------
+
+    def _handle_signal(self, signum, frame):
+        if os.getpid() != self._pid:
+            # Forked pool worker inherited this handler: behave like the default
+            signal.signal(signum, signal.SIG_DFL)
+            os.kill(os.getpid(), signum)
+            return
+        if not self.stop_event.is_set():
+            print(f"[runtime] Received {signal.Signals(signum).name}, draining...")
+        self.stop_event.set()
+        self._heartbeat_wakeup.set()
+
+    def stop(self):
+        self.stop_event.set()
+        self._heartbeat_wakeup.set()
+
+    def run(self):
+        """Run all agents until SIGTERM/SIGINT, then drain and exit."""
+        signal.signal(signal.SIGTERM, self._handle_signal)
+        signal.signal(signal.SIGINT, self._handle_signal)
+
+        names = ", ".join(a.name for a in self.agents)
+        start_metrics_server()
+        print(f"[runtime] Hosting {len(self.agents)} agent(s): {names}")
+
+        for agent in self.agents:
+            agent.start()
+        heartbeat = threading.Thread(target=self._heartbeat_loop, name="heartbeat", daemon=True)
+        heartbeat.start()
+
+        # Wake up regularly so signals are handled promptly
+        while not self.stop_event.wait(1.0):
+            pass
+
+        for agent in self.agents:
+            if not agent.join(self.drain_timeout):
+                print(f"[{agent.name}] Task still running after {self.drain_timeout}s drain timeout")
+        heartbeat.join(5)
+
+        for agent in self.agents:
+            agent.shutdown()
+
+        try:
+            self.send_heartbeats(status="stopped")
+        except Exception as e:
+            print(f"[runtime] Final heartbeat error: {e}")
+        print(f"[runtime] Stopped: {names}")
+
+
+def run_agent(register):
+    """Run a single agent: register(runtime) adds it, then run until stopped."""
+    runtime = AgentRuntime()
+    register(runtime)
+    runtime.run()
@@ -0,0 +1,201 @@
+"""
+Agent Runtime - Cooperative Scheduler
+Version: 1.9
+
+One Agent = one scheduler thread running the agent's tasks cooperatively:
+
+- periodic tasks run every `interval` seconds
+- queue tasks drain a backlog: while the function reports work done (truthy
+  return value) it is rescheduled immediately, otherwise after `idle` seconds
+
+Tasks never run concurrently with each other inside one agent, so agent
+code needs no locking. Long tasks should check `agent.stopping` between
+work items so a shutdown can drain quickly.
+"""
+
+import time
+import threading
+import traceback
+
+from agents.runtime.metrics import Histogram
+
+
+class Task:
+    """A scheduled unit of work of an agent."""
+
+    def __init__(self, name: str, fn, interval: float, queue: bool = False, run_immediately: bool = True):
+        self.name = name
+        self.fn = fn
+        self.interval = interval
+        self.queue = queue
+        self.next_run = time.monotonic() if run_immediately else time.monotonic() + interval
+        self.histogram = Histogram()
+        self.errors = 0
+        self.last_error = None
+        self.last_result = None
+
+
+class Agent:
+    """An agent hosted by an AgentRuntime."""
+
+    def __init__(self, runtime, name: str, version: str = "1.9", mode: str = "active", status: str = "idle"):
+        self.runtime = runtime
+        self.name = name
+        self.version = version
+        self.mode = mode
+        self.status = status
+        self.tasks = []
+        self._queue_size = 0
+        self._details_fns = []
+        self._shutdown_hooks = []
+        self._thread = None
+
+    # ------------------------------------------------------------------
+    # Registration
+    # ------------------------------------------------------------------
+
+    def every(self, interval: float, fn, name: str = None, run_immediately: bool = True) -> Task:
+        """Run fn() every interval seconds."""
+        task = Task(name or fn.__name__, fn, interval, run_immediately=run_immediately)
+        self.tasks.append(task)
+        return task
+
+    def queue(self, fn, idle: float, name: str = None) -> Task:
+        """Run fn() back to back while it returns a truthy value, else every idle seconds."""
+        task = Task(name or fn.__name__, fn, idle, queue=True)
+        self.tasks.append(task)
+        return task
+
+    def details(self, fn):
+        """Register fn() -> dict merged into the heartbeat details."""
+        self._details_fns.append(fn)
+        return fn
+
+    def on_shutdown(self, fn):
+        """Register fn() called once after the scheduler stopped (close pools etc.)."""
+        self._shutdown_hooks.append(fn)
+        return fn
+
+    def set_queue_size(self, value):
+        """Queue size for the heartbeat: an int or a callable returning one."""
+        self._queue_size = value
+
+    @property
+    def stopping(self) -> bool:
+        return self.runtime.stop_event.is_set()
+
+    # ------------------------------------------------------------------
+    # Scheduler
+    # ------------------------------------------------------------------
+
+    def _run_task(self, task: Task):
+        start = time.perf_counter()
+        try:
+            task.last_result = task.fn()
+            did_work = bool(task.last_result)
+        except Exception as e:
+            task.errors += 1
+            task.last_error = str(e)
+            did_work = False
+            print(f"[{self.name}] Error in {task.name}: {e}")
+            if self.runtime.debug:
+                traceback.print_exc()
+        finally:
+            task.histogram.observe((time.perf_counter() - start) * 1000)
+
+        if task.queue and did_work:
+            task.next_run = time.monotonic()
+        else:
+            task.next_run = time.monotonic() + task.interval
+
+    def run(self):
+        """Scheduler loop (runs in the agent thread until the runtime stops)."""
+        stop = self.runtime.stop_event
+        while not stop.is_set():
+            if not self.tasks:
+                stop.wait(60)
+                continue
+            task = min(self.tasks, key=lambda t: t.next_run)
+            delay = task.next_run - time.monotonic()
+            if delay > 0:
+                stop.wait(delay)
+                continue
+            self._run_task(task)
+
+    def start(self):
+        self._thread = threading.Thread(target=self.run, name=f"agent-{self.name}", daemon=True)
+        self._thread.start()
+
+    def join(self, timeout: float) -> bool:
+        """Wait for the current task to finish. Returns False on timeout."""
+        if self._thread is None:
+            return True
+        self._thread.join(timeout)
+        return not self._thread.is_alive()
+
+    def shutdown(self):
+        for hook in self._shutdown_hooks:
+            try:
+                hook()
+            except Exception as e:
+                print(f"[{self.name}] Shutdown hook error: {e}")
+
+    # ------------------------------------------------------------------
+    # Heartbeat
+    # ------------------------------------------------------------------
+
+    def queue_size(self) -> int:
+        value = self._queue_size
+        try:
+            return int(value() if callable(value) else value or 0)
+        except Exception as e:
+            print(f"[{self.name}] Queue size error: {e}")
+            return 0
+
+    def heartbeat_details(self, resources: dict) -> dict:
+        details = {
+            "mode": self.mode,
+            "status": self.status,
+            "version": self.version,
+            "tasks": {
+                t.name: {**t.histogram.summary(), "errors": t.errors, "last_error": t.last_error}
+                for t in self.tasks
+            },
+            **resources
+        }
+        for fn in self._details_fns:
+            try:
+                details.update(fn() or {})
+            except Exception as e:
+                details["details_error"] = str(e)
+        return details
+
+
+def run_concurrently(items: list, fn, name: str = "worker") -> dict:
+    """
+    Run fn(item) for every item in its own thread and wait for all of them
+    (e.g. one embedding pipeline per model inside one task).
+
+    Returns:
+        Dict item -> result; an item whose fn raised maps to None
+    """
+    results = {}
+
+    def run(item):
+        try:
+            results[item] = fn(item)
+        except Exception:
+            print(f"[{name}] {item} failed:\n{traceback.format_exc()}")
+            results[item] = None
+
+    if len(items) == 1:
+        run(items[0])
+        return results
+
+    threads = [threading.Thread(target=run, args=(item,), name=f"{name}-{i}", daemon=True)
+               for i, item in enumerate(items)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results
@@ -1,71 +1,317 @@
 #!/usr/bin/env python3
 """
 Agent: strict_extractor
-Version: 1.6
+Version: 1.9
 Description: Extracts requirements using strict parsing rules (no AI hallucination)
-Status: Scaffold - waiting for implementation
+
+All ID patterns (REQ-xxx, DNG ids, generic PREFIX-123) and modal verbs
+(shall/should/must) are compiled into ONE regex with named groups, so every
+chunk is scanned in a single pass. Chunks from pdf_chunker (inserted/changed)
+are scanned in-process: a batch is well under 1 MB, and shipping it to a
+worker pool measured slower than the scan itself (bench_strict_extractor).
+The requirement nodes are written with batched upserts:
+
+- ID + modal verb      -> id_type 'requirement'
+- ID without modal     -> id_type 'information'
+- modal without ID     -> id_type 'requirement', req_id <source>:<anchor>[.n]
+
+Only IDs at the start of a line open records. IDs inside a line (references
+like "comply with REQ-100" or "Ref. REQ-100") and generic IDs with a
+standard/bus prefix (ISO-26262, CAN-01; STRICT_EXCLUDED_PREFIXES) do not;
+such text is treated as text without IDs.
+
+attributes keep req_id, source document/chunk, anchor and char offsets.
+Patterns can be overridden with STRICT_PATTERNS_FILE (JSON {name: regex}).
 """
 
 import os
+import re
 import sys
+import json
 import time
-import psutil
 
 # Add parent directory to path for imports
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from agents.db_bridge.database import update_agent_heartbeat
+from agents.db_bridge.database import (
+    create_customer_project,
+    get_chunks_to_extract,
+    count_chunks_to_extract,
+    upsert_extracted_requirements,
+    mark_deleted_chunk_requirements,
+    mark_chunks_extracted
+)
+from agents.runtime import run_agent
 
 AGENT_NAME = "strict_extractor"
 
+STRICT_BATCH = int(os.getenv('STRICT_BATCH', '500'))
+POLL_INTERVAL = int(os.getenv('STRICT_POLL_INTERVAL', '30'))
+
+# Patterns are matched at word starts (no leading \b needed).
+# Order matters: the first matching alternative wins.
+DEFAULT_ID_PATTERNS = {
+    "req": r"REQ[-_]\d+(?:[-_.]\d+)*\b",
+    "dng": r"(?:DNG|RM)[-_ ]?\d{3,}\b",
+    "generic": r"[A-Z][A-Z0-9]{1,9}(?:[-_][A-Z0-9]{1,10})*[-_]\d{2,}(?:\.\d+)*\b",
+}
+# First characters any ID can start with (cheap lookahead before the alternation)
+ID_FIRST_CHARS = os.getenv('STRICT_ID_FIRST_CHARS', 'A-Z')
+MODAL_PATTERN = r"(?i:shall|must|should)\b"
+# Prefixes of standards and buses: generic IDs with these never open a record
+STRICT_EXCLUDED_PREFIXES = set(os.getenv(
+    'STRICT_EXCLUDED_PREFIXES',
+    'ISO,IEC,IEEE,SAE,DIN,EN,ECE,VDA,ASIL,AUTOSAR,CAN,LIN,MOST,UDS,DOIP,SOMEIP,FLEXRAY'
+).upper().split(','))
+
+
+def load_id_patterns() -> dict:
+    """ID patterns from STRICT_PATTERNS_FILE or the defaults."""
+    path = os.getenv('STRICT_PATTERNS_FILE')
+    if path and os.path.isfile(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    return DEFAULT_ID_PATTERNS
+
+
+def compile_patterns(id_patterns: dict) -> re.Pattern:
+    """
+    Combine all ID patterns and the modal verbs into one alternation.
+    Group names: id_<name> for IDs, 'modal' for modal verbs.
+
+    The leading lookahead on possible first characters lets the regex engine
+    skip most positions without trying every alternative (~5x faster).
+    """
+    parts = [f"(?P<id_{name}>{pattern})" for name, pattern in id_patterns.items()]
+    parts.append(f"(?P<modal>{MODAL_PATTERN})")
+    return re.compile(f"(?=[{ID_FIRST_CHARS}sSmM])\\b(?:{'|'.join(parts)})")
+
+
+COMBINED_RE = compile_patterns(load_id_patterns())
+MODAL_ONLY_RE = re.compile(r"\b" + MODAL_PATTERN)
+SENTENCE_END_RE = re.compile(r'(?<=[.!?;])\s+')
+
+
+def _starts_statement(text: str, pos: int, req_id: str, kind: str) -> bool:
+    """True if the ID at pos opens a statement (start of text or line, not a standard/bus name)."""
+    if kind == 'generic' and re.split(r'[-_]', req_id, 1)[0] in STRICT_EXCLUDED_PREFIXES:
+        return False
+    i = pos - 1
+    while i >= 0 and text[i] in ' \t[(':
+        i -= 1
+    return i < 0 or text[i] == '\n'
+
+
+def extract_requirements(text: str, fallback_id: str = None) -> list:
+    """
+    Scan text once and cut it into requirement records.
+
+    A record starts at an ID that opens a line and ends before the next
+    one. Text without such an ID (none at all, or only references inside
+    sentences) yields one record per modal sentence (IDs derived from
+    fallback_id, 'derived' if none is given).
+
+    Returns:
+        List of dicts with req_id, id_kind, id_type, text, start, end
+    """
+    if not text:
+        return []
+
+    ids = []
+    modal_positions = []
+    for match in COMBINED_RE.finditer(text):
+        kind = match.lastgroup
+        if kind == 'modal':
+            modal_positions.append(match.start())
+        else:
+            ids.append((match.start(), match.end(), match.group(0), kind[3:]))
+
+    records = []
+
+    # Only IDs that start a statement (not references inside another statement)
+    starts = [i for i in ids if _starts_statement(text, i[0], i[2], i[3])]
+    if starts:
+        for n, (start, id_end, req_id, kind) in enumerate(starts):
+            end = starts[n + 1][0] if n + 1 < len(starts) else len(text)
+            while end > id_end and text[end - 1] in ' \t[(':
+                end -= 1
+            body = text[id_end:end].lstrip(' :]-\t').strip()
+            if not body:
+                continue
+            has_modal = any(start <= p < end for p in modal_positions)
+            records.append({
+                "req_id": req_id,
+                "id_kind": kind,
+                "id_type": "requirement" if has_modal else "information",
+                "text": body,
+                "start": start,
+                "end": end
+            })
+        return records
+
+    if modal_positions:
+        fallback_id = fallback_id or "derived"
+        offset = 0
+        n = 0
+        for sentence in SENTENCE_END_RE.split(text):
+            start = text.find(sentence, offset)
+            offset = start + len(sentence)
+            if MODAL_ONLY_RE.search(sentence):
+                n += 1
+                records.append({
+                    "req_id": fallback_id if n == 1 else f"{fallback_id}.{n}",
+                    "id_kind": "derived",
+                    "id_type": "requirement",
+                    "text": sentence.strip(),
+                    "start": start,
+                    "end": offset
+                })
+
+    return records
+
+
+def extract_chunk(chunk: dict) -> dict:
+    """
+    Extract requirement records from one chunk.
+
+    Returns:
+        Dict with chunk_id, project_id, bytes and records (node-ready dicts)
+    """
+    fallback_id = f"{chunk['source_key']}:{chunk['anchor']}"
+    records = []
+    for r in extract_requirements(chunk.get('text') or '', fallback_id):
+        records.append({
+            "req_id": r["req_id"],
+            "text": r["text"],
+            "id_type": r["id_type"],
+            "attributes": {
+                "req_id": r["req_id"],
+                "id_kind": r["id_kind"],
+                "source_doc": chunk.get('file_name'),
+                "source_key": chunk['source_key'],
+                "document_id": chunk['document_id'],
+                "chunk_id": chunk['chunk_id'],
+                "anchor": chunk['anchor'],
+                "page": chunk.get('page_start'),
+                "start": r["start"],
+                "end": r["end"],
+                "extractor": AGENT_NAME
+            }
+        })
+    return {
+        "chunk_id": chunk['chunk_id'],
+        "project_id": chunk['project_id'],
+        "bytes": len((chunk.get('text') or '').encode('utf-8')),
+        "records": records
+    }
+
+
+def project_for(chunk: dict) -> str:
+    """Target project: pdf_document.project_id, else one customer project per source."""
+    if chunk.get('project_id'):
+        return chunk['project_id']
+    customer_id = chunk['source_key'].upper()
+    create_customer_project(customer_id)
+    return f"Customer_{customer_id}"
+
+
+def run_once(batch_size: int = STRICT_BATCH) -> dict:
+    """
+    Extract one batch of pending chunks.
+
+    Args:
+        batch_size: Chunks per batch
+
+    Returns:
+        Dict with chunks, nodes_inserted, nodes_updated, deleted, mb_per_sec
+    """
+    chunks = get_chunks_to_extract(batch_size)
+    if not chunks:
+        return {"chunks": 0, "nodes_inserted": 0, "nodes_updated": 0, "deleted": 0, "mb_per_sec": 0.0}
+
+    start = time.perf_counter()
+    projects = {}
+    deleted_anchors = {}
+    live = []
+
+    for chunk in chunks:
+        if chunk['change_type'] == 'deleted':
+            deleted_anchors.setdefault(chunk['source_key'], []).append(chunk['anchor'])
+        else:
+            if chunk['source_key'] not in projects:
+                projects[chunk['source_key']] = project_for(chunk)
+            chunk['project_id'] = projects[chunk['source_key']]
+            live.append(chunk)
+
+    by_project = {}
+    total_bytes = 0
+    for result in map(extract_chunk, live):
+        total_bytes += result["bytes"]
+        by_project.setdefault(result["project_id"], []).extend(result["records"])
+    scan_seconds = time.perf_counter() - start
+
+    inserted = 0
+    updated = 0
+    errors = 0
+    for project_id, records in by_project.items():
+        result = upsert_extracted_requirements(project_id, 'customer', records)
+        inserted += result["inserted"]
+        updated += result["updated"]
+        if result.get("error"):
+            errors += 1
+
+    deleted = 0
+    for source_key, anchors in deleted_anchors.items():
+        deleted += max(0, mark_deleted_chunk_requirements(source_key, anchors))
+
+    if not errors:
+        mark_chunks_extracted([c['chunk_id'] for c in chunks])
 
-def get_resource_metrics():
-    """Get current CPU and RAM usage."""
     return {
-        "cpu_percent": psutil.cpu_percent(interval=1),
-        "ram_percent": psutil.virtual_memory().percent,
-        "ram_mb": round(psutil.virtual_memory().used / 1024 / 1024, 2)
+        "chunks": len(chunks),
+        "nodes_inserted": inserted,
+        "nodes_updated": updated,
+        "deleted": deleted,
+        "errors": errors,
+        "mb_per_sec": round(total_bytes / 1024 / 1024 / scan_seconds, 2) if scan_seconds > 0 else 0.0,
+        "seconds": round(time.perf_counter() - start, 2)
     }
 
 
+def register(runtime):
+    """Register the agent: drain pending chunks batch by batch."""
+    agent = runtime.agent(AGENT_NAME, version="1.9")
+    state = {"last": {}}
+
+    def extract_pending():
+        result = run_once()
+        if result["chunks"]:
+            state["last"] = result
+            print(f"[{AGENT_NAME}] {result}")
+        busy = result["chunks"] >= STRICT_BATCH and not result.get("errors")
+        agent.status = "processing" if busy else "idle"
+        return busy
+
+    agent.queue(extract_pending, idle=POLL_INTERVAL)
+    agent.set_queue_size(count_chunks_to_extract)
+    agent.details(lambda: {
+        "last_run": state["last"],
+        "mb_per_sec": state["last"].get("mb_per_sec")
+    })
+    return agent
+
+
 def main_loop():
-    """Main daemon loop - sends heartbeat every 30s."""
+    """Run the agent until SIGTERM/SIGINT (finishes the running batch first)."""
     db_host = os.getenv('DB_HOST', 'localhost')
     db_port = os.getenv('DB_PORT', '5432')
 
     print(f"[{AGENT_NAME}] Starting daemon loop...")
     print(f"[{AGENT_NAME}] Connected to DB at {db_host}:{db_port}")
-    print(f"[{AGENT_NAME}] Status: Scaffold (waiting for implementation)")
-
-    while True:
-        try:
-            metrics = get_resource_metrics()
-
-            details = {
-                "mode": "scaffold",
-                "status": "waiting_for_implementation",
-                "version": "1.6",
-                "cpu_percent": metrics["cpu_percent"],
-                "ram_percent": metrics["ram_percent"],
-                "ram_mb": metrics["ram_mb"]
-            }
-
-            update_agent_heartbeat(
-                agent_name=AGENT_NAME,
-                queue_size=0,
-                details=details
-            )
-
-            print(f"[{AGENT_NAME}] Heartbeat sent: CPU={metrics['cpu_percent']}%, RAM={metrics['ram_percent']}%")
-
-        except Exception as e:
-            print(f"[{AGENT_NAME}] Error: {e}")
+    print(f"[{AGENT_NAME}] Batch: {STRICT_BATCH} chunks, patterns: {list(load_id_patterns())}")
 
-        time.sleep(30)
+    run_agent(register)
 
 
 if __name__ == "__main__":
-    try:
-        main_loop()
-    except KeyboardInterrupt:
-        print(f"[{AGENT_NAME}] Shutting down...")
+    main_loop()
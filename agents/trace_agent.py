@@ -1,35 +1,32 @@
 #!/usr/bin/env python3
 """
 Agent: trace_agent
-Version: 1.6
+Version: 1.9
 Description: Builds and maintains traceability links between requirements
 Status: Scaffold - waiting for implementation
+
+Runs on the shared agent runtime (heartbeats only). Hostable together with
+other agents: python -m agents.runtime.host trace_agent ...
 """
 
 import os
 import sys
-import time
-import psutil
 
 # Add parent directory to path for imports
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from agents.db_bridge.database import update_agent_heartbeat
+from agents.runtime import run_agent
 
 AGENT_NAME = "trace_agent"
 
 
-def get_resource_metrics():
-    """Get current CPU and RAM usage."""
-    return {
-        "cpu_percent": psutil.cpu_percent(interval=1),
-        "ram_percent": psutil.virtual_memory().percent,
-        "ram_mb": round(psutil.virtual_memory().used / 1024 / 1024, 2)
-    }
+def register(runtime):
+    """Register the scaffold agent (no tasks, heartbeat only)."""
+    runtime.agent(AGENT_NAME, version="1.9", mode="scaffold", status="waiting_for_implementation")
 
 
 def main_loop():
-    """Main daemon loop - sends heartbeat every 30s."""
+    """Run the agent until SIGTERM/SIGINT."""
     db_host = os.getenv('DB_HOST', 'localhost')
     db_port = os.getenv('DB_PORT', '5432')
 
@@ -37,35 +34,8 @@ def main_loop():
     print(f"[{AGENT_NAME}] Connected to DB at {db_host}:{db_port}")
     print(f"[{AGENT_NAME}] Status: Scaffold (waiting for implementation)")
 
-    while True:
-        try:
-            metrics = get_resource_metrics()
-
-            details = {
-                "mode": "scaffold",
-                "status": "waiting_for_implementation",
-                "version": "1.6",
-                "cpu_percent": metrics["cpu_percent"],
-                "ram_percent": metrics["ram_percent"],
-                "ram_mb": metrics["ram_mb"]
-            }
-
-            update_agent_heartbeat(
-                agent_name=AGENT_NAME,
-                queue_size=0,
-                details=details
-            )
-
-            print(f"[{AGENT_NAME}] Heartbeat sent: CPU={metrics['cpu_percent']}%, RAM={metrics['ram_percent']}%")
-
-        except Exception as e:
-            print(f"[{AGENT_NAME}] Error: {e}")
-
-        time.sleep(30)
+    run_agent(register)
 
 
 if __name__ == "__main__":
-    try:
-        main_loop()
-    except KeyboardInterrupt:
-        print(f"[{AGENT_NAME}] Shutting down...")
+    main_loop()
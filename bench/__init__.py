@@ -0,0 +1 @@
+# AAT Benchmark Suite
@@ -0,0 +1,176 @@
+"""
+Embedding Read Memory Benchmark
+Version: 1.9.0
+
+Seeds synthetic unit vectors into a bench database and compares the peak
+RSS and wall time of reading them back:
+
+  fetchall   get_embeddings_by_scope() (client-side cursor, list of dicts)
+  stream     iter_embedding_blocks() (server-side cursor, float32 blocks)
+  match      matching_agent.run_once() over the seeded customer/platform sets,
+             once per --storage-modes entry (float32, halfvec, int8, binary;
+             activated without an agreement threshold, agreement is reported)
+
+Each mode runs in its own subprocess so ru_maxrss is not shared.
+
+WARNING: the benchmark wipes nodes/embeddings/matches. It refuses to run
+unless DB_NAME contains 'bench' or --force is given.
+
+Usage:
+  DB_HOST=localhost DB_PORT=5432 DB_NAME=aat_bench DB_USER=... DB_PASS=... \\
+  python bench/bench_memory.py --init-schema --platform 100000 --customer 1000 \\
+    --storage-modes float32,halfvec,int8,binary
+"""
+
+import os
+import sys
+import json
+import time
+import uuid
+import random
+import argparse
+import subprocess
+
+from psycopg2.extras import execute_values
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(ROOT)
+
+from agents.db_bridge.database import (
+    get_connection,
+    get_or_create_embedding_model,
+    get_embeddings_by_scope,
+    iter_embedding_blocks
+)
+from bench.run_bench import PLATFORM_PROJECT, init_schema, peak_rss_mb, reset_data
+
+MODES = ["fetchall", "stream", "match"]
+CUSTOMER_ID = "BENCH"
+MODEL = "bench-memory"
+
+
+def _unit_vector(rng: random.Random, dims: int) -> str:
+    values = [rng.gauss(0.0, 1.0) for _ in range(dims)]
+    norm = sum(v * v for v in values) ** 0.5 or 1.0
+    return '[' + ','.join(f"{v / norm:.6f}" for v in values) + ']'
+
+
+def seed(customers: int, platforms: int, dims: int, seed_value: int) -> int:
+    """Insert nodes with random embeddings; returns the model_id."""
+    reset_data(CUSTOMER_ID)
+    model_id = get_or_create_embedding_model(MODEL, dims, 'bench')
+    rng = random.Random(seed_value)
+
+    conn = get_connection()
+    try:
+        cur = conn.cursor()
+        cur.execute("DELETE FROM embeddings WHERE model_id = %s", (model_id,))
+        for scope, project_id, count in (("customer", f"Customer_{CUSTOMER_ID}", customers),
+                                         ("platform", PLATFORM_PROJECT, platforms)):
+            for start in range(0, count, 5000):
+                nodes = [(str(uuid.uuid4()), f"{scope[0].upper()}-{i:06d}")
+                         for i in range(start, min(start + 5000, count))]
+                execute_values(cur, """
+                    INSERT INTO nodes (node_uuid, project_id, type, scope, content, attributes)
+                    VALUES %s
+                """, [(node_uuid, project_id, "requirement", scope, f"Synthetic {req_id}",
+                       json.dumps({"req_id": req_id})) for node_uuid, req_id in nodes], page_size=1000)
+                execute_values(cur, """
+                    INSERT INTO embeddings (node_uuid, model_id, content_hash, embedding)
+                    VALUES %s
+                """, [(node_uuid, model_id, req_id, _unit_vector(rng, dims)) for node_uuid, req_id in nodes],
+                    template="(%s, %s, %s, %s::vector)", page_size=500)
+                conn.commit()
+                print(f"[seed] {scope}: {min(start + 5000, count)}/{count}")
+        cur.close()
+    finally:
+        conn.close()
+    return model_id
+
+
+def run_mode(mode: str, model_id: int, dims: int) -> dict:
+    """Run one mode in this process and measure it."""
+    start = time.perf_counter()
+    if mode == "fetchall":
+        rows = get_embeddings_by_scope(model_id, 'platform')
+        vectors = [[float(x) for x in str(r['embedding']).strip('[]').split(',')] for r in rows]
+        count = len(vectors)
+    elif mode == "stream":
+        count = 0
+        for keys, _ in iter_embedding_blocks(model_id, 'platform'):
+            count += len(keys)
+    else:
+        from agents.matching import matching_agent
+        result = matching_agent.run_once(model=MODEL, vector_dims=dims)
+        count = result.get("platforms", 0)
+    return {
+        "mode": mode,
+        "vectors": count,
+        "seconds": round(time.perf_counter() - start, 3),
+        "peak_rss_mb": peak_rss_mb()
+    }
+
+
+def run_subprocess(mode: str, model_id: int, dims: int) -> dict:
+    output = subprocess.check_output(
+        [sys.executable, os.path.abspath(__file__), "--worker", mode,
+         "--model-id", str(model_id), "--dims", str(dims)],
+        text=True
+    )
+    return json.loads(output.strip().splitlines()[-1])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Embedding read memory benchmark')
+    parser.add_argument('--customer', type=int, default=1000, help='Customer vectors')
+    parser.add_argument('--platform', type=int, default=100000, help='Platform vectors')
+    parser.add_argument('--dims', type=int, default=768, help='Vector dimensions')
+    parser.add_argument('--seed', type=int, default=42, help='Random seed')
+    parser.add_argument('--modes', default=",".join(MODES), help='Comma separated modes')
+    parser.add_argument('--storage-modes', default="float32", help='Comma separated storage modes for match')
+    parser.add_argument('--no-seed', action='store_true', help='Reuse the previously seeded data')
+    parser.add_argument('--init-schema', action='store_true', help='Create/upgrade work_aa schema first')
+    parser.add_argument('--force', action='store_true', help="Run even if DB_NAME does not contain 'bench'")
+    parser.add_argument('--worker', choices=MODES, help=argparse.SUPPRESS)
+    parser.add_argument('--model-id', type=int, help=argparse.SUPPRESS)
+
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(run_mode(args.worker, args.model_id, args.dims)))
+        sys.exit(0)
+
+    db_name = os.getenv('DB_NAME', '')
+    if 'bench' not in db_name.lower() and not args.force:
+        print(f"Refusing to run: benchmark wipes requirement data and DB_NAME='{db_name}' "
+              f"does not contain 'bench'. Use a dedicated database or --force.")
+        sys.exit(2)
+
+    if args.init_schema:
+        init_schema()
+
+    if args.no_seed:
+        model_id = get_or_create_embedding_model(MODEL, args.dims, 'bench')
+    else:
+        model_id = seed(args.customer, args.platform, args.dims, args.seed)
+
+    results = []
+    for mode in [m for m in args.modes.split(",") if m]:
+        if mode != "match":
+            results.append(run_subprocess(mode, model_id, args.dims))
+            continue
+        from agents.matching.matching_agent import activate_storage_mode
+        for storage_mode in [m for m in args.storage_modes.split(",") if m]:
+            activation = activate_storage_mode(MODEL, args.dims, storage_mode, min_agreement=0.0)
+            result = run_subprocess(mode, model_id, args.dims)
+            result["mode"] = f"match ({storage_mode})"
+            result["agreement"] = activation.get("agreement")
+            results.append(result)
+        activate_storage_mode(MODEL, args.dims, "float32")
+
+    print("\n| Mode | Vectors | Seconds | Peak RSS (MB) | Rank-1 agreement |")
+    print("|---|---:|---:|---:|---:|")
+    for r in results:
+        agreement = r.get("agreement")
+        agreement = f"{agreement:.3f}" if agreement is not None else "-"
+        print(f"| {r['mode']} | {r['vectors']} | {r['seconds']} | {r['peak_rss_mb']} | {agreement} |")
@@ -0,0 +1,268 @@
+"""
+Embedding Model Evaluation
+Version: 1.9.0
+
+Runs the embedding and matching agents for several embedding models over the
+requirements already loaded in the database and compares them side by side:
+
+  throughput   embeddings/s of embedding_agent.run_once(drain=True)
+  latency      p50/p95 of single embedding requests
+  storage      bytes per stored vector and HNSW index size
+  matching     matching_agent.run_once() wall time
+  agreement    recall@1, recall@k and MRR of the stored matches against a
+               labeled set of (customer_req_id, platform_req_id) pairs
+
+Labels come from a CSV file (--labels, header customer_req_id,platform_req_id)
+or from a bench/synth.py dataset (--dataset; duplicated and paraphrased
+customer requirements carry the req_id of their platform source).
+
+The report recommends the model with the smallest vector storage whose
+recall@1 reaches --min-recall.
+
+WARNING: --reembed deletes the stored embeddings of the evaluated models
+before embedding them again. It refuses to run unless DB_NAME contains
+'bench' or --force is given.
+
+Usage:
+  DB_HOST=localhost DB_PORT=5432 DB_NAME=aat_bench DB_USER=... DB_PASS=... \\
+  python bench/eval_models.py --models nomic-embed-text,all-minilm --dataset bench/data
+"""
+
+import os
+import sys
+import csv
+import json
+import time
+import argparse
+from datetime import datetime, timezone
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(ROOT)
+
+from agents.db_bridge.database import (
+    get_connection,
+    get_embedding_storage,
+    get_match_ranks
+)
+from agents.embedding import embedding_agent
+from agents.matching import matching_agent
+from bench import synth
+from bench.fake_ollama import start_fake_ollama
+from bench.run_bench import percentile, git_commit
+
+LATENCY_TEXT = "The system shall log every diagnostic event with a timestamp."
+
+
+# ============================================================================
+# LABELS
+# ============================================================================
+
+def load_labels(labels_path: str = None, dataset_dir: str = None) -> dict:
+    """Expected platform req_id per customer req_id."""
+    labels = {}
+    if labels_path:
+        with open(labels_path, "r", encoding="utf-8", newline="") as f:
+            for row in csv.DictReader(f):
+                labels[row["customer_req_id"]] = row["platform_req_id"]
+    elif dataset_dir:
+        for row in synth.read_dataset(dataset_dir)["customer"]:
+            if row.get("source_req_id"):
+                labels[row["req_id"]] = row["source_req_id"]
+    return labels
+
+
+def label_agreement(ranks: list, labels: dict, top_k: int) -> dict:
+    """
+    Recall@1, recall@k and MRR of stored matches against the labels.
+
+    Args:
+        ranks: get_match_ranks() rows
+        labels: customer req_id -> expected platform req_id
+        top_k: Matches stored per customer requirement
+
+    Returns:
+        Dict with labeled, recall_at_1, recall_at_k, mrr
+    """
+    found = {}
+    for customer_req_id, platform_req_id, rank, _ in ranks:
+        if labels.get(customer_req_id) == platform_req_id:
+            found[customer_req_id] = min(rank, found.get(customer_req_id, rank))
+
+    total = len(labels) or 1
+    return {
+        "labeled": len(labels),
+        "recall_at_1": round(sum(1 for r in found.values() if r == 1) / total, 4),
+        "recall_at_k": round(sum(1 for r in found.values() if r <= top_k) / total, 4),
+        "mrr": round(sum(1.0 / r for r in found.values()) / total, 4)
+    }
+
+
+# ============================================================================
+# EVALUATION
+# ============================================================================
+
+def delete_embeddings(model_id: int):
+    conn = get_connection()
+    try:
+        cur = conn.cursor()
+        cur.execute("DELETE FROM embeddings WHERE model_id = %s", (model_id,))
+        conn.commit()
+        print(f"[Eval] Deleted {cur.rowcount} embeddings of model {model_id}")
+        cur.close()
+    finally:
+        conn.close()
+
+
+def embed_latency(model: str, samples: int) -> list:
+    """Milliseconds of single embedding requests."""
+    timings = []
+    for i in range(samples):
+        start = time.perf_counter()
+        embedding_agent.get_embedding_from_ollama(f"{LATENCY_TEXT} ({i})", model, embedding_agent._ollama_url())
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def evaluate_model(model: str, dims: int, labels: dict, args) -> dict:
+    """Embed, match and score one model."""
+    fake = None
+    if args.fake:
+        fake = start_fake_ollama(dims=dims or 768, latency_ms=args.fake_latency_ms)
+        os.environ['OLLAMA_GATEWAY_URL'] = fake.url
+    try:
+        model_id, dims = embedding_agent.resolve_model(model, dims)
+        if not model_id:
+            return {"model": model, "error": "model could not be registered"}
+        if args.reembed:
+            delete_embeddings(model_id)
+
+        embedded = embedding_agent.run_once(model=model, drain=True)
+        latency = embed_latency(model, args.latency_samples)
+        matched = matching_agent.run_once(model=model, top_k=args.top_k)
+    finally:
+        if fake:
+            fake.shutdown()
+
+    storage = get_embedding_storage(model_id)
+    count = storage.get("embeddings") or 0
+    return {
+        "model": model,
+        "model_id": model_id,
+        "vector_dims": dims,
+        "embedded": embedded.get("embedded", 0),
+        "embed_errors": embedded.get("errors", 0),
+        "embeddings_per_sec": embedded.get("embeddings_per_sec", 0.0),
+        "latency_p50_ms": round(percentile(latency, 50), 2),
+        "latency_p95_ms": round(percentile(latency, 95), 2),
+        "match_seconds": matched.get("seconds"),
+        "embeddings": count,
+        "bytes_per_vector": round(storage.get("vector_bytes", 0) / count, 1) if count else None,
+        "index_mb": round(storage.get("index_bytes", 0) / (1024 * 1024), 2),
+        **label_agreement(get_match_ranks(model_id), labels, args.top_k)
+    }
+
+
+def recommend(results: list, min_recall: float) -> str:
+    """Smallest model (bytes per vector) whose recall@1 reaches min_recall."""
+    good = [r for r in results if not r.get("error") and r.get("bytes_per_vector")
+            and r["recall_at_1"] >= min_recall]
+    if not good:
+        return None
+    return min(good, key=lambda r: (r["bytes_per_vector"], -r["recall_at_1"]))["model"]
+
+
+def render_markdown(report: dict) -> str:
+    """Side-by-side Markdown table of the evaluated models."""
+    lines = [
+        "# Embedding Model Evaluation",
+        "",
+        f"- Commit: `{report['git']['commit']}`{' (dirty)' if report['git']['dirty'] else ''}",
+        f"- Timestamp: {report['timestamp']}",
+        f"- Labeled pairs: {report['params']['labeled']}, top_k: {report['params']['top_k']}, "
+        f"embedder: {report['params']['embedder']}",
+        "",
+        "| Model | Dims | Emb/s | p50 ms | p95 ms | Match s | Bytes/vector | Index MB "
+        "| Recall@1 | Recall@k | MRR |",
+        "|---|---:|---:|---:|---:|---:|---:|---:|---:|---:|---:|",
+    ]
+    for r in report["models"]:
+        if r.get("error"):
+            lines.append(f"| {r['model']} | {r['error']} |" + " |" * 9)
+            continue
+        lines.append(
+            f"| {r['model']} | {r['vector_dims']} | {r['embeddings_per_sec']} | {r['latency_p50_ms']} "
+            f"| {r['latency_p95_ms']} | {r['match_seconds']} | {r['bytes_per_vector']} | {r['index_mb']} "
+            f"| {r['recall_at_1']:.3f} | {r['recall_at_k']:.3f} | {r['mrr']:.3f} |"
+        )
+    lines.append("")
+    if report["recommended"]:
+        lines.append(f"Recommended: **{report['recommended']}** (smallest vectors with "
+                     f"recall@1 >= {report['params']['min_recall']})")
+    else:
+        lines.append(f"No model reaches recall@1 >= {report['params']['min_recall']}")
+    return "\n".join(lines) + "\n"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Embedding model evaluation')
+    parser.add_argument('--models', required=True, help='Comma separated embedding model names')
+    parser.add_argument('--dims', default='', help='Comma separated dims for new models (default: probed)')
+    parser.add_argument('--labels', help='CSV with customer_req_id,platform_req_id')
+    parser.add_argument('--dataset', help='bench/synth.py dataset directory (labels from source_req_id)')
+    parser.add_argument('--top-k', type=int, default=5, help='Matches per customer requirement')
+    parser.add_argument('--latency-samples', type=int, default=50, help='Single embedding requests to time')
+    parser.add_argument('--min-recall', type=float, default=0.9, help='Recall@1 required for the recommendation')
+    parser.add_argument('--reembed', action='store_true', help='Delete and recompute the models\' embeddings')
+    parser.add_argument('--fake', action='store_true', help='Use the deterministic fake embedder')
+    parser.add_argument('--fake-latency-ms', type=float, default=0.0, help='Simulated embedder latency')
+    parser.add_argument('--ollama-url', help='Ollama/gateway URL (default: OLLAMA_GATEWAY_URL)')
+    parser.add_argument('--out-dir', default=os.path.join(ROOT, 'bench', 'results'), help='Report directory')
+    parser.add_argument('--force', action='store_true', help="Run even if DB_NAME does not contain 'bench'")
+
+    args = parser.parse_args()
+
+    db_name = os.getenv('DB_NAME', '')
+    if args.reembed and 'bench' not in db_name.lower() and not args.force:
+        print(f"Refusing to run: --reembed deletes embeddings and DB_NAME='{db_name}' "
+              f"does not contain 'bench'. Use a dedicated database or --force.")
+        sys.exit(2)
+
+    labels = load_labels(args.labels, args.dataset)
+    if not labels:
+        print("No labeled pairs: pass --labels or --dataset")
+        sys.exit(2)
+    if args.ollama_url:
+        os.environ['OLLAMA_GATEWAY_URL'] = args.ollama_url
+
+    models = embedding_agent.parse_models(args.models)
+    dims = [int(d) for d in args.dims.split(',') if d.strip()]
+    results = []
+    for i, model in enumerate(models):
+        print(f"[Eval] Model: {model}")
+        results.append(evaluate_model(model, dims[i] if i < len(dims) else None, labels, args))
+
+    report = {
+        "git": git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "params": {
+            "labeled": len(labels),
+            "top_k": args.top_k,
+            "min_recall": args.min_recall,
+            "latency_samples": args.latency_samples,
+            "embedder": "fake" if args.fake else os.getenv('OLLAMA_GATEWAY_URL', 'default')
+        },
+        "models": results,
+        "recommended": recommend(results, args.min_recall)
+    }
+
+    os.makedirs(args.out_dir, exist_ok=True)
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%d_%H%M%S")
+    base_name = os.path.join(args.out_dir, f"eval_{report['git']['commit'] or 'nogit'}_{stamp}")
+    with open(base_name + ".json", "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, default=str)
+    markdown = render_markdown(report)
+    with open(base_name + ".md", "w", encoding="utf-8") as f:
+        f.write(markdown)
+
+    print(markdown)
+    print(f"Reports written: {base_name}.json, {base_name}.md")
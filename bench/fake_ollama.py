@@ -0,0 +1,144 @@
+"""
+Fake Ollama Server (benchmarks)
+Version: 1.9.0
+
+Deterministic local embedder speaking the subset of the Ollama API used by
+AAT (/api/version, /api/tags, /api/embeddings, /api/embed). Point agents at
+it with OLLAMA_GATEWAY_URL.
+
+Embeddings are feature-hashed bags of words and word bigrams, so identical
+texts get identical vectors and paraphrases stay close - matching results
+are meaningful, not random. Vectors are returned raw (not normalized), like
+Ollama.
+"""
+
+import re
+import json
+import math
+import time
+import hashlib
+import argparse
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+DEFAULT_MODEL = "nomic-embed-text"
+TOKEN_RE = re.compile(r"\w+")
+
+
+def fake_embedding(text: str, dims: int = 768) -> list:
+    """Deterministic embedding for text (feature hashing, signed)."""
+    vector = [0.0] * dims
+    tokens = TOKEN_RE.findall(text.lower())
+    features = tokens + [f"{a}_{b}" for a, b in zip(tokens, tokens[1:])]
+
+    for feature in features:
+        digest = hashlib.blake2b(feature.encode('utf-8'), digest_size=8).digest()
+        index = int.from_bytes(digest[:4], 'little') % dims
+        sign = 1.0 if digest[4] & 1 else -1.0
+        vector[index] += sign
+
+    if not features:
+        vector[0] = 1.0
+
+    # Scale like a real model (non-unit magnitude)
+    scale = 10.0 / math.sqrt(len(features) or 1)
+    return [round(x * scale, 6) for x in vector]
+
+
+class FakeOllamaHandler(BaseHTTPRequestHandler):
+    """Request handler; settings come from the server instance."""
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, payload: dict, status: int = 200):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_json(self) -> dict:
+        length = int(self.headers.get("Content-Length") or 0)
+        if not length:
+            return {}
+        return json.loads(self.rfile.read(length))
+
+    def do_GET(self):
+        if self.path == "/api/version":
+            self._send_json({"version": "0.0.0-fake"})
+        elif self.path == "/api/tags":
+            self._send_json({"models": [{"name": self.server.model, "size": 0}]})
+        else:
+            self._send_json({"error": "not found"}, 404)
+
+    def do_POST(self):
+        payload = self._read_json()
+        dims = self.server.dims
+
+        if self.server.latency_s:
+            time.sleep(self.server.latency_s)
+
+        if self.path == "/api/embeddings":
+            self.server.count(1)
+            self._send_json({"embedding": fake_embedding(payload.get("prompt", ""), dims)})
+        elif self.path == "/api/embed":
+            inputs = payload.get("input", "")
+            if isinstance(inputs, str):
+                inputs = [inputs]
+            self.server.count(len(inputs))
+            self._send_json({"model": payload.get("model", self.server.model),
+                             "embeddings": [fake_embedding(t, dims) for t in inputs]})
+        else:
+            self._send_json({"error": f"{self.path} not supported by fake server"}, 404)
+
+
+class FakeOllamaServer(ThreadingHTTPServer):
+    """Threaded fake Ollama server with an embedding counter."""
+
+    daemon_threads = True
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, dims: int = 768,
+                 latency_ms: float = 0.0, model: str = DEFAULT_MODEL):
+        super().__init__((host, port), FakeOllamaHandler)
+        self.dims = dims
+        self.latency_s = latency_ms / 1000.0
+        self.model = model
+        self.embedded = 0
+        self._lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def count(self, n: int):
+        with self._lock:
+            self.embedded += n
+
+
+def start_fake_ollama(port: int = 0, dims: int = 768, latency_ms: float = 0.0) -> FakeOllamaServer:
+    """Start the fake server in a daemon thread. Returns the server (see .url)."""
+    server = FakeOllamaServer(port=port, dims=dims, latency_ms=latency_ms)
+    threading.Thread(target=server.serve_forever, name="fake-ollama", daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Fake Ollama server (deterministic embeddings)')
+    parser.add_argument('--host', default='127.0.0.1', help='Bind address')
+    parser.add_argument('--port', type=int, default=11435, help='Port')
+    parser.add_argument('--dims', type=int, default=768, help='Vector dimensions')
+    parser.add_argument('--latency-ms', type=float, default=0.0, help='Simulated model latency per request')
+
+    args = parser.parse_args()
+
+    server = FakeOllamaServer(host=args.host, port=args.port, dims=args.dims, latency_ms=args.latency_ms)
+    print(f"[Fake Ollama] Listening on {server.url} (dims={args.dims})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("[Fake Ollama] Shutting down...")
@@ -0,0 +1,470 @@
+"""
+AAT End-to-End Benchmark
+Version: 1.9.0
+
+Runs the AAT pipeline stages against a local Postgres+pgvector database
+with a synthetic dataset and a deterministic fake Ollama embedder:
+
+  import     platform + customer requirements (row by row, as the import
+             pages do) and V-model trace nodes/links
+  embedding  embedding_agent.run_once() until the backlog is empty
+  matching   matching_agent.run_once()
+  trace      build_trace_for_requirements() for sampled pairs
+  coverage   compute_coverage_summary() / get_match_statistics()
+
+Writes a JSON and a Markdown report (throughput, p50/p95/p99 latency, RSS,
+git commit) that can be compared across commits with --compare.
+
+WARNING: the benchmark wipes nodes/links/embeddings/matches. It refuses to
+run unless DB_NAME contains 'bench' or --force is given.
+
+Usage:
+  DB_HOST=localhost DB_PORT=5432 DB_NAME=aat_bench DB_USER=... DB_PASS=... \\
+  python bench/run_bench.py --init-schema --customer 1000 --platform 2000
+"""
+
+import os
+import sys
+import json
+import math
+import time
+import uuid
+import random
+import resource
+import argparse
+import platform as platform_info
+import subprocess
+import importlib
+from datetime import datetime, timezone
+
+import psutil
+from psycopg2.extras import execute_values
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(ROOT)
+sys.path.append(os.path.join(ROOT, 'web'))
+
+from agents.db_bridge.database import (
+    get_connection,
+    create_customer_project,
+    insert_or_update_platform_requirement,
+    insert_or_update_customer_requirement,
+    get_or_create_embedding_model,
+    get_match_statistics
+)
+from bench import synth
+from bench.fake_ollama import start_fake_ollama
+
+PLATFORM_PROJECT = "Platform_A"
+STAGES = ["import", "embedding", "matching", "trace", "coverage"]
+TRACE_NAMESPACE = uuid.UUID("6f1c3a52-8d0e-4a39-9b7c-2f4e5d6a7b80")
+
+
+# ============================================================================
+# HELPERS
+# ============================================================================
+
+def percentile(values: list, pct: float) -> float:
+    """Nearest-rank percentile (None for empty input)."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, math.ceil(pct / 100 * len(ordered)) - 1))
+    return round(ordered[index], 2)
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process (Linux: ru_maxrss is in KB)."""
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+def git_commit() -> dict:
+    """Current commit hash and dirty flag (None outside a git checkout)."""
+    try:
+        commit = subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True).strip()
+        dirty = bool(subprocess.check_output(["git", "status", "--porcelain", "--untracked-files=no"],
+                                             cwd=ROOT, text=True).strip())
+        return {"commit": commit, "dirty": dirty}
+    except Exception:
+        return {"commit": None, "dirty": None}
+
+
+def stage_result(items: int, seconds: float, samples_ms: list, unit: str, **extra) -> dict:
+    """Summarize one stage."""
+    return {
+        "items": items,
+        "seconds": round(seconds, 3),
+        "throughput_per_s": round(items / seconds, 2) if seconds > 0 else None,
+        "latency_unit": unit,
+        "samples": len(samples_ms),
+        "p50_ms": percentile(samples_ms, 50),
+        "p95_ms": percentile(samples_ms, 95),
+        "p99_ms": percentile(samples_ms, 99),
+        "rss_mb": round(psutil.Process().memory_info().rss / 1024 / 1024, 1),
+        "peak_rss_mb": peak_rss_mb(),
+        **extra
+    }
+
+
+# ============================================================================
+# DATABASE SETUP
+# ============================================================================
+
+def init_schema():
+    """Create / upgrade the work_aa schema with the regular setup scripts."""
+    sys.path.append(os.path.join(ROOT, 'db', 'db_setup'))
+    importlib.import_module('manage_db_aa').init_aa_structure()
+    importlib.import_module('db_upgrade_work_aa').upgrade()
+
+
+def reset_data(customer_id: str):
+    """Wipe requirement data and create the benchmark projects."""
+    conn = get_connection()
+    try:
+        cur = conn.cursor()
+        cur.execute("TRUNCATE nodes CASCADE;")
+        cur.execute("""
+            INSERT INTO projects (project_id, type, status)
+            VALUES (%s, 'PLATFORM', 'ACTIVE')
+            ON CONFLICT (project_id) DO NOTHING
+        """, (PLATFORM_PROJECT,))
+        conn.commit()
+        cur.close()
+    finally:
+        conn.close()
+    create_customer_project(customer_id)
+
+
+# ============================================================================
+# STAGES
+# ============================================================================
+
+def bench_import(dataset: dict) -> dict:
+    """Import requirements row by row, then bulk-load trace nodes and links."""
+    samples = []
+    failed = 0
+    start = time.perf_counter()
+
+    for req in dataset["platform"]:
+        t0 = time.perf_counter()
+        if not insert_or_update_platform_requirement(req):
+            failed += 1
+        samples.append((time.perf_counter() - t0) * 1000)
+
+    for req in dataset["customer"]:
+        t0 = time.perf_counter()
+        if not insert_or_update_customer_requirement(dataset["customer_id"], req):
+            failed += 1
+        samples.append((time.perf_counter() - t0) * 1000)
+
+    req_seconds = time.perf_counter() - start
+
+    # Trace nodes below platform requirements (no loader exists yet - bulk insert)
+    t0 = time.perf_counter()
+    conn = get_connection()
+    try:
+        cur = conn.cursor()
+        cur.execute("""
+            SELECT attributes->>'req_id', node_uuid::text FROM nodes
+            WHERE project_id = %s AND scope = 'platform'
+        """, (PLATFORM_PROJECT,))
+        uuids = dict(cur.fetchall())
+
+        for node in dataset["trace"]:
+            uuids[node["node_id"]] = str(uuid.uuid5(TRACE_NAMESPACE, node["node_id"]))
+
+        execute_values(cur, """
+            INSERT INTO nodes (node_uuid, project_id, type, scope, content, attributes)
+            VALUES %s
+        """, [
+            (uuids[n["node_id"]], PLATFORM_PROJECT, n["scope"], n["scope"], n["text"],
+             json.dumps({"req_id": n["node_id"]}))
+            for n in dataset["trace"]
+        ], page_size=1000)
+
+        execute_values(cur, """
+            INSERT INTO links (source_uuid, target_uuid, link_type)
+            VALUES %s
+        """, [
+            (uuids[n["parent"]], uuids[n["node_id"]], "derives")
+            for n in dataset["trace"] if n["parent"] in uuids
+        ], page_size=1000)
+
+        conn.commit()
+        cur.close()
+    finally:
+        conn.close()
+    trace_seconds = time.perf_counter() - t0
+
+    items = len(dataset["platform"]) + len(dataset["customer"])
+    return stage_result(items, req_seconds, samples, "row",
+                        failed=failed,
+                        trace_nodes=len(dataset["trace"]),
+                        trace_load_seconds=round(trace_seconds, 3))
+
+
+def bench_embedding(model: str, dims: int, batch_size: int) -> dict:
+    """Run the embedding agent until no node is left without an embedding."""
+    embedding_agent = importlib.import_module('agents.embedding.embedding_agent')
+
+    samples = []
+    embedded = 0
+    errors = 0
+    start = time.perf_counter()
+
+    while True:
+        t0 = time.perf_counter()
+        result = embedding_agent.run_once(model=model, vector_dims=dims, batch_size=batch_size)
+        elapsed_ms = (time.perf_counter() - t0) * 1000
+        embedded += result.get("embedded", 0)
+        errors += result.get("errors", 0)
+        if not result.get("embedded"):
+            break
+        samples.append(elapsed_ms / result["embedded"])
+
+    return stage_result(embedded, time.perf_counter() - start, samples, "node (batch average)",
+                        errors=errors, batch_size=batch_size)
+
+
+def bench_matching(model: str, dims: int, top_k: int, customers: int, platforms: int,
+                   candidates: str = "full") -> dict:
+    """Run the matching agent once over all embeddings."""
+    matching_agent = importlib.import_module('agents.matching.matching_agent')
+
+    start = time.perf_counter()
+    result = matching_agent.run_once(model=model, vector_dims=dims, top_k=top_k, candidates=candidates)
+    seconds = time.perf_counter() - start
+
+    pairs = customers * platforms
+    return stage_result(pairs, seconds, [seconds * 1000], "run",
+                        matched=result.get("matched", 0), errors=result.get("errors", 0),
+                        reused=result.get("reused", 0), computed=result.get("computed", 0),
+                        top_k=top_k, candidates=candidates)
+
+
+def bench_trace(dataset: dict, samples_n: int, seed: int) -> dict:
+    """Build traces for sampled customer/platform pairs."""
+    from agents.trace.trace_engine import build_trace_for_requirements
+
+    rng = random.Random(seed)
+    pairs = [
+        (rng.choice(dataset["customer"])["req_id"], rng.choice(dataset["platform"])["req_id"])
+        for _ in range(samples_n)
+    ] if dataset["customer"] and dataset["platform"] else []
+
+    samples = []
+    nodes = 0
+    start = time.perf_counter()
+    for customer_req, platform_req in pairs:
+        t0 = time.perf_counter()
+        trace = build_trace_for_requirements(customer_req, platform_req)
+        samples.append((time.perf_counter() - t0) * 1000)
+        nodes += sum(len(trace.get(k, [])) for k in ("system_nodes", "architecture_nodes", "code_nodes", "test_nodes"))
+
+    return stage_result(len(pairs), time.perf_counter() - start, samples, "trace",
+                        avg_linked_nodes=round(nodes / len(pairs), 1) if pairs else 0)
+
+
+def bench_coverage(model: str, dims: int, customer_id: str, repeats: int) -> dict:
+    """Compute coverage summary and match statistics repeatedly."""
+    from components.coverage import compute_coverage_summary
+
+    model_id = get_or_create_embedding_model(model, dims, 'ollama')
+    samples = []
+    summary = {}
+    stats = {}
+    start = time.perf_counter()
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        summary = compute_coverage_summary(model_id, f"Customer_{customer_id}", PLATFORM_PROJECT)
+        stats = get_match_statistics(model_id)
+        samples.append((time.perf_counter() - t0) * 1000)
+
+    return stage_result(repeats, time.perf_counter() - start, samples, "summary",
+                        coverage_total=summary.get("total", 0),
+                        match_statistics={k: v for k, v in stats.items() if not isinstance(v, (list, dict))})
+
+
+# ============================================================================
+# REPORTS
+# ============================================================================
+
+def render_markdown(report: dict, baseline: dict = None) -> str:
+    """Markdown report (optionally with deltas against a baseline report)."""
+    lines = [
+        f"# AAT Benchmark - {report['git']['commit'] or 'unknown'}{' (dirty)' if report['git']['dirty'] else ''}",
+        "",
+        f"- Timestamp: {report['timestamp']}",
+        f"- Dataset: {report['params']['customer']} customer / {report['params']['platform']} platform reqs, "
+        f"links depth {report['params']['links_depth']}, dup ratio {report['params']['dup_ratio']}",
+        f"- Host: Python {report['host']['python']}, {report['host']['cpu_count']} CPUs",
+        "",
+        "| Stage | Items | Seconds | Throughput/s | Unit | p50 ms | p95 ms | p99 ms | Peak RSS MB |",
+        "|---|---:|---:|---:|---|---:|---:|---:|---:|",
+    ]
+    for name, s in report["stages"].items():
+        lines.append(
+            f"| {name} | {s['items']} | {s['seconds']} | {s['throughput_per_s']} | {s['latency_unit']} "
+            f"| {s['p50_ms']} | {s['p95_ms']} | {s['p99_ms']} | {s['peak_rss_mb']} |"
+        )
+
+    if baseline:
+        lines += [
+            "",
+            f"## Compared to {baseline['git']['commit'] or 'baseline'}",
+            "",
+            "| Stage | Throughput/s | Δ throughput | p95 ms | Δ p95 |",
+            "|---|---:|---:|---:|---:|",
+        ]
+        for name, s in report["stages"].items():
+            base = baseline.get("stages", {}).get(name)
+            if not base:
+                continue
+            lines.append(
+                f"| {name} | {s['throughput_per_s']} | {_delta(s['throughput_per_s'], base['throughput_per_s'])} "
+                f"| {s['p95_ms']} | {_delta(s['p95_ms'], base['p95_ms'])} |"
+            )
+
+    return "\n".join(lines) + "\n"
+
+
+def _delta(current, previous) -> str:
+    if current is None or not previous:
+        return "n/a"
+    return f"{(current - previous) / previous * 100:+.1f}%"
+
+
+# ============================================================================
+# MAIN
+# ============================================================================
+
+def run_benchmark(args) -> dict:
+    """Run the selected stages and return the report dict."""
+    if args.dataset:
+        dataset = synth.read_dataset(args.dataset)
+    else:
+        dataset = synth.generate_dataset(
+            customer=args.customer,
+            platform=args.platform,
+            links_depth=args.links_depth,
+            fanout=args.fanout,
+            dup_ratio=args.dup_ratio,
+            seed=args.seed
+        )
+
+    stages = [s.strip() for s in args.stages.split(",") if s.strip()]
+    fake = None
+    if "embedding" in stages and not args.ollama_url:
+        fake = start_fake_ollama(dims=args.dims, latency_ms=args.fake_latency_ms)
+        os.environ['OLLAMA_GATEWAY_URL'] = fake.url
+        print(f"[Bench] Fake Ollama at {fake.url}")
+    elif args.ollama_url:
+        os.environ['OLLAMA_GATEWAY_URL'] = args.ollama_url
+
+    if args.init_schema:
+        init_schema()
+
+    report = {
+        "git": git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "params": {
+            "customer": len(dataset["customer"]),
+            "platform": len(dataset["platform"]),
+            "trace_nodes": len(dataset["trace"]),
+            "links_depth": args.links_depth,
+            "fanout": args.fanout,
+            "dup_ratio": args.dup_ratio,
+            "seed": args.seed,
+            "model": args.model,
+            "candidates": args.candidates,
+            "embedder": args.ollama_url or "fake",
+        },
+        "host": {
+            "python": platform_info.python_version(),
+            "cpu_count": os.cpu_count(),
+            "machine": platform_info.machine(),
+        },
+        "stages": {}
+    }
+
+    if "import" in stages:
+        reset_data(dataset["customer_id"])
+
+    for stage in STAGES:
+        if stage not in stages:
+            continue
+        print(f"[Bench] Stage: {stage}")
+        if stage == "import":
+            result = bench_import(dataset)
+        elif stage == "embedding":
+            result = bench_embedding(args.model, args.dims, args.embed_batch)
+        elif stage == "matching":
+            result = bench_matching(args.model, args.dims, args.top_k,
+                                    len(dataset["customer"]), len(dataset["platform"]), args.candidates)
+        elif stage == "trace":
+            result = bench_trace(dataset, args.trace_samples, args.seed)
+        else:
+            result = bench_coverage(args.model, args.dims, dataset["customer_id"], args.coverage_repeats)
+        report["stages"][stage] = result
+        print(f"[Bench] {stage}: {result['items']} items in {result['seconds']}s "
+              f"({result['throughput_per_s']}/s, p95 {result['p95_ms']} ms)")
+
+    if fake:
+        fake.shutdown()
+
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='AAT end-to-end benchmark')
+    parser.add_argument('--dataset', help='Dataset directory from bench/synth.py (default: generate)')
+    parser.add_argument('--customer', type=int, default=1000, help='Customer requirements')
+    parser.add_argument('--platform', type=int, default=2000, help='Platform requirements')
+    parser.add_argument('--links-depth', type=int, default=3, help='Trace levels below platform (0-4)')
+    parser.add_argument('--fanout', type=int, default=1, help='Children per node and level')
+    parser.add_argument('--dup-ratio', type=float, default=0.2, help='Share of duplicate texts')
+    parser.add_argument('--seed', type=int, default=42, help='Random seed')
+    parser.add_argument('--stages', default=",".join(STAGES), help='Comma separated stages')
+    parser.add_argument('--model', default='nomic-embed-text', help='Embedding model name')
+    parser.add_argument('--dims', type=int, default=768, help='Vector dimensions')
+    parser.add_argument('--embed-batch', type=int, default=200, help='Embedding agent batch size')
+    parser.add_argument('--top-k', type=int, default=5, help='Matches per customer requirement')
+    parser.add_argument('--candidates', choices=['full', 'hybrid'], default='full',
+                        help='Matching candidate generation')
+    parser.add_argument('--trace-samples', type=int, default=200, help='Traces to build')
+    parser.add_argument('--coverage-repeats', type=int, default=20, help='Coverage summaries to compute')
+    parser.add_argument('--ollama-url', help='Use a real Ollama/gateway instead of the fake embedder')
+    parser.add_argument('--fake-latency-ms', type=float, default=0.0, help='Simulated embedder latency')
+    parser.add_argument('--init-schema', action='store_true', help='Create/upgrade work_aa schema first')
+    parser.add_argument('--out-dir', default=os.path.join(ROOT, 'bench', 'results'), help='Report directory')
+    parser.add_argument('--compare', help='Baseline JSON report to compare against')
+    parser.add_argument('--force', action='store_true', help="Run even if DB_NAME does not contain 'bench'")
+
+    args = parser.parse_args()
+
+    db_name = os.getenv('DB_NAME', '')
+    if 'bench' not in db_name.lower() and not args.force:
+        print(f"Refusing to run: benchmark wipes requirement data and DB_NAME='{db_name}' "
+              f"does not contain 'bench'. Use a dedicated database or --force.")
+        sys.exit(2)
+
+    report = run_benchmark(args)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+
+    os.makedirs(args.out_dir, exist_ok=True)
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%d_%H%M%S")
+    base_name = os.path.join(args.out_dir, f"bench_{report['git']['commit'] or 'nogit'}_{stamp}")
+
+    with open(base_name + ".json", "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, default=str)
+
+    markdown = render_markdown(report, baseline)
+    with open(base_name + ".md", "w", encoding="utf-8") as f:
+        f.write(markdown)
+
+    print(markdown)
+    print(f"Reports written: {base_name}.json, {base_name}.md")
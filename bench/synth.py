@@ -0,0 +1,212 @@
+"""
+Synthetic V-Model Dataset Generator
+Version: 1.9.0
+
+Generates deterministic (seeded) requirement datasets for benchmarks:
+- platform.jsonl  platform requirements (import_platform format)
+- customer.jsonl  customer requirements (import_customer format)
+- trace.jsonl     system/arch/code/test nodes below platform requirements,
+                  one line per node with the parent it is linked from
+
+Knobs:
+- customer / platform: requirement counts
+- links_depth: V-model levels below a platform requirement (0-4:
+  system, arch, code, test)
+- fanout: child nodes per node and level
+- dup_ratio: share of customer requirements that copy a platform
+  requirement text verbatim (the rest are paraphrases or unrelated)
+"""
+
+import os
+import json
+import random
+import argparse
+
+TRACE_LEVELS = ["system", "arch", "code", "test"]
+
+SUBJECTS = [
+    "The ECU", "The brake controller", "The gateway", "The infotainment unit",
+    "The battery management system", "The steering assist", "The body controller",
+    "The ADAS camera", "The door module", "The seat controller", "The telematics unit",
+    "The powertrain controller", "The airbag control unit", "The lighting module"
+]
+VERBS = [
+    "shall transmit", "shall monitor", "shall report", "shall store", "shall validate",
+    "shall limit", "shall detect", "shall diagnose", "shall switch off", "shall log",
+    "shall request", "shall acknowledge", "shall encrypt", "shall update"
+]
+OBJECTS = [
+    "the wheel speed signal", "the vehicle speed", "the battery voltage", "the DTC status",
+    "the CAN bus load", "the ignition state", "the firmware image", "the door lock state",
+    "the motor temperature", "the diagnostic session", "the torque request",
+    "the brake pressure", "the ambient light level", "the crash signal"
+]
+CONDITIONS = [
+    "within 10 ms", "within 100 ms", "every 20 ms", "after ignition on", "in degraded mode",
+    "when the voltage drops below 9 V", "during a diagnostic session", "on a bus-off event",
+    "after a reset", "when the vehicle speed exceeds 5 km/h", "in sleep mode",
+    "according to ISO 26262 ASIL B", "according to UDS ISO 14229", "at every power cycle"
+]
+FILLER = [
+    "The value shall be plausibilized.", "A DTC shall be set on failure.",
+    "The behaviour shall be configurable by coding.", "Timing is measured at the connector.",
+    "The function shall be testable in end-of-line mode.", "Signal quality shall be evaluated."
+]
+ASIL = ["QM", "A", "B", "C", "D"]
+PRIORITY = ["high", "medium", "low"]
+
+
+def _requirement_text(rng: random.Random) -> str:
+    text = f"{rng.choice(SUBJECTS)} {rng.choice(VERBS)} {rng.choice(OBJECTS)} {rng.choice(CONDITIONS)}."
+    for _ in range(rng.randint(0, 2)):
+        text += " " + rng.choice(FILLER)
+    return text
+
+
+def _paraphrase(rng: random.Random, text: str) -> str:
+    """Drop / swap a few words so the text stays similar but not identical."""
+    words = text.split()
+    kept = [w for w in words if rng.random() > 0.15] or words
+    if len(kept) > 3 and rng.random() < 0.5:
+        i = rng.randrange(len(kept) - 1)
+        kept[i], kept[i + 1] = kept[i + 1], kept[i]
+    return " ".join(kept)
+
+
+def generate_dataset(customer: int = 1000, platform: int = 2000, links_depth: int = 3,
+                     fanout: int = 1, dup_ratio: float = 0.2, paraphrase_ratio: float = 0.5,
+                     customer_id: str = "BENCH", seed: int = 42) -> dict:
+    """
+    Generate a synthetic dataset in memory.
+
+    Args:
+        customer: Number of customer requirements
+        platform: Number of platform requirements
+        links_depth: Trace levels below each platform requirement (0-4)
+        fanout: Child nodes per node and level
+        dup_ratio: Share of customer reqs copying a platform text verbatim
+        paraphrase_ratio: Share of customer reqs paraphrasing a platform text
+        customer_id: Customer ID (project Customer_<id>)
+        seed: Random seed
+
+    Returns:
+        dict with platform, customer and trace lists
+    """
+    rng = random.Random(seed)
+    links_depth = max(0, min(links_depth, len(TRACE_LEVELS)))
+
+    platform_reqs = []
+    for i in range(platform):
+        platform_reqs.append({
+            "req_id": f"PLAT-{i + 1:06d}",
+            "text": _requirement_text(rng),
+            "type": "functional",
+            "priority": rng.choice(PRIORITY),
+            "asil": rng.choice(ASIL),
+            "owner": "bench",
+            "version": "1.0",
+            "baseline": "BENCH_BL",
+            "status": "approved",
+            "id_type": "requirement"
+        })
+
+    customer_reqs = []
+    for i in range(customer):
+        roll = rng.random()
+        source = None
+        if platform_reqs and roll < dup_ratio:
+            source = rng.choice(platform_reqs)
+            text = source["text"]
+        elif platform_reqs and roll < dup_ratio + paraphrase_ratio:
+            source = rng.choice(platform_reqs)
+            text = _paraphrase(rng, source["text"])
+        else:
+            text = _requirement_text(rng)
+        customer_reqs.append({
+            "req_id": f"{customer_id}-{i + 1:06d}",
+            "text": text,
+            "priority": rng.choice(PRIORITY),
+            "source_doc": f"{customer_id}_RFQ.pdf",
+            "id_type": "requirement",
+            # Ground truth for model evaluation (bench/eval_models.py)
+            "source_req_id": source["req_id"] if source else None
+        })
+
+    trace = []
+    for req in platform_reqs:
+        parents = [("platform", req["req_id"])]
+        for level in TRACE_LEVELS[:links_depth]:
+            children = []
+            for _, parent_id in parents:
+                for k in range(fanout):
+                    node_id = f"{parent_id}/{level[:3].upper()}{k + 1}"
+                    trace.append({
+                        "node_id": node_id,
+                        "scope": level,
+                        "parent": parent_id,
+                        "root": req["req_id"],
+                        "text": f"{level} element {node_id}"
+                    })
+                    children.append((level, node_id))
+            parents = children
+
+    return {"platform": platform_reqs, "customer": customer_reqs, "trace": trace,
+            "customer_id": customer_id}
+
+
+def write_dataset(dataset: dict, out_dir: str) -> dict:
+    """Write dataset to JSONL files in out_dir. Returns the file paths."""
+    os.makedirs(out_dir, exist_ok=True)
+    paths = {}
+    for name in ("platform", "customer", "trace"):
+        path = os.path.join(out_dir, f"{name}.jsonl")
+        with open(path, "w", encoding="utf-8") as f:
+            for row in dataset[name]:
+                f.write(json.dumps(row) + "\n")
+        paths[name] = path
+
+    meta_path = os.path.join(out_dir, "meta.json")
+    with open(meta_path, "w", encoding="utf-8") as f:
+        json.dump({"customer_id": dataset["customer_id"],
+                   "counts": {k: len(dataset[k]) for k in ("platform", "customer", "trace")}}, f)
+    paths["meta"] = meta_path
+    return paths
+
+
+def read_dataset(in_dir: str) -> dict:
+    """Read a dataset written by write_dataset()."""
+    dataset = {}
+    for name in ("platform", "customer", "trace"):
+        with open(os.path.join(in_dir, f"{name}.jsonl"), "r", encoding="utf-8") as f:
+            dataset[name] = [json.loads(line) for line in f if line.strip()]
+    with open(os.path.join(in_dir, "meta.json"), "r", encoding="utf-8") as f:
+        dataset["customer_id"] = json.load(f)["customer_id"]
+    return dataset
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Synthetic V-model dataset generator')
+    parser.add_argument('--out', required=True, help='Output directory')
+    parser.add_argument('--customer', type=int, default=1000, help='Customer requirements')
+    parser.add_argument('--platform', type=int, default=2000, help='Platform requirements')
+    parser.add_argument('--links-depth', type=int, default=3, help='Trace levels below platform (0-4)')
+    parser.add_argument('--fanout', type=int, default=1, help='Children per node and level')
+    parser.add_argument('--dup-ratio', type=float, default=0.2, help='Share of verbatim duplicate texts')
+    parser.add_argument('--paraphrase-ratio', type=float, default=0.5, help='Share of paraphrased texts')
+    parser.add_argument('--customer-id', default='BENCH', help='Customer ID')
+    parser.add_argument('--seed', type=int, default=42, help='Random seed')
+
+    args = parser.parse_args()
+
+    data = generate_dataset(
+        customer=args.customer,
+        platform=args.platform,
+        links_depth=args.links_depth,
+        fanout=args.fanout,
+        dup_ratio=args.dup_ratio,
+        paraphrase_ratio=args.paraphrase_ratio,
+        customer_id=args.customer_id,
+        seed=args.seed
+    )
+    files = write_dataset(data, args.out)
+    print(f"Dataset written: {files}")
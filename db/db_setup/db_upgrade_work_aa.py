@@ -193,6 +193,336 @@ def upgrade():
         ON CONFLICT (agent_name) DO NOTHING;
         """, (agent,))
 
+    # --- Chat latency per model (v1.9) ---
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS chat_metrics (
+        metric_id BIGSERIAL PRIMARY KEY,
+        model TEXT NOT NULL,
+        ttft_ms DOUBLE PRECISION,
+        total_ms DOUBLE PRECISION,
+        prompt_tokens INT,
+        eval_tokens INT,
+        tokens_per_sec DOUBLE PRECISION,
+        context_messages INT,
+        completed BOOLEAN DEFAULT TRUE,
+        created_at TIMESTAMPTZ DEFAULT now()
+    );
+    """)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_chat_metrics_model ON chat_metrics(model, created_at);")
+    cur.execute("ALTER TABLE chat_metrics ADD COLUMN IF NOT EXISTS mode TEXT DEFAULT 'plain';")
+    cur.execute("ALTER TABLE chat_metrics ADD COLUMN IF NOT EXISTS retrieval_ms DOUBLE PRECISION;")
+
+    # --- Session sweeper (v1.9) ---
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_app_session_expires ON app_session(expires_at);")
+
+    # --- PDF extraction (v1.9) ---
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS pdf_document (
+        document_id BIGSERIAL PRIMARY KEY,
+        content_hash TEXT UNIQUE NOT NULL,
+        file_name TEXT,
+        file_size BIGINT,
+        page_count INT,
+        pages_done INT DEFAULT 0,
+        status TEXT DEFAULT 'pending',
+        error TEXT,
+        extract_seconds DOUBLE PRECISION,
+        peak_rss_mb DOUBLE PRECISION,
+        created_at TIMESTAMPTZ DEFAULT now(),
+        finished_at TIMESTAMPTZ
+    );
+    """)
+
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS pdf_page (
+        document_id BIGINT REFERENCES pdf_document(document_id) ON DELETE CASCADE,
+        page_no INT NOT NULL,
+        page_hash TEXT NOT NULL,
+        text TEXT,
+        blocks JSONB,
+        char_count INT,
+        created_at TIMESTAMPTZ DEFAULT now(),
+        PRIMARY KEY (document_id, page_no)
+    );
+    """)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_pdf_page_hash ON pdf_page(page_hash);")
+
+    # --- PDF chunks (v1.9) ---
+    cur.execute("ALTER TABLE pdf_document ADD COLUMN IF NOT EXISTS source_key TEXT;")
+    cur.execute("ALTER TABLE pdf_document ADD COLUMN IF NOT EXISTS chunk_status TEXT;")
+    cur.execute("ALTER TABLE pdf_document ADD COLUMN IF NOT EXISTS chunked_at TIMESTAMPTZ;")
+    cur.execute("ALTER TABLE pdf_document ADD COLUMN IF NOT EXISTS chunk_stats JSONB;")
+
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS pdf_chunk (
+        chunk_id BIGSERIAL PRIMARY KEY,
+        source_key TEXT NOT NULL,
+        document_id BIGINT REFERENCES pdf_document(document_id) ON DELETE CASCADE,
+        chunk_index INT NOT NULL,
+        anchor TEXT NOT NULL,
+        chunk_hash TEXT NOT NULL,
+        heading TEXT,
+        text TEXT,
+        page_start INT,
+        page_end INT,
+        token_estimate INT,
+        change_type TEXT NOT NULL CHECK (change_type IN ('inserted', 'changed', 'unchanged', 'deleted')),
+        previous_chunk_id BIGINT,
+        is_current BOOLEAN DEFAULT FALSE,
+        created_at TIMESTAMPTZ DEFAULT now()
+    );
+    """)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_pdf_chunk_source ON pdf_chunk(source_key, is_current);")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_pdf_chunk_document ON pdf_chunk(document_id, chunk_index);")
+
+    # --- Strict extraction (v1.9) ---
+    cur.execute("ALTER TABLE pdf_chunk ADD COLUMN IF NOT EXISTS extracted_at TIMESTAMPTZ;")
+    cur.execute("ALTER TABLE pdf_document ADD COLUMN IF NOT EXISTS project_id TEXT;")
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_pdf_chunk_extract
+        ON pdf_chunk(chunk_id) WHERE is_current AND extracted_at IS NULL;
+    """)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_nodes_req_id ON nodes(project_id, scope, (attributes->>'req_id'));")
+
+    # --- Git impact processing (v1.9) ---
+    cur.execute("ALTER TABLE code_change_event ADD COLUMN IF NOT EXISTS claimed_at TIMESTAMPTZ;")
+    cur.execute("ALTER TABLE code_change_event ADD COLUMN IF NOT EXISTS error TEXT;")
+    cur.execute("ALTER TABLE code_change_event ADD COLUMN IF NOT EXISTS attempts INT NOT NULL DEFAULT 0;")
+    cur.execute("ALTER TABLE code_impact ADD COLUMN IF NOT EXISTS event_id BIGINT;")
+    cur.execute("ALTER TABLE code_link_hint ADD COLUMN IF NOT EXISTS event_id BIGINT;")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_code_change_event_status ON code_change_event(status, event_id);")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_code_impact_event ON code_impact(event_id);")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_code_link_hint_event ON code_link_hint(event_id);")
+
+    # --- RFQ report rendering (v1.9) ---
+    cur.execute("ALTER TABLE rfq_report ADD COLUMN IF NOT EXISTS report_path TEXT;")
+    cur.execute("ALTER TABLE rfq_report ADD COLUMN IF NOT EXISTS run_key TEXT;")
+    cur.execute("ALTER TABLE rfq_report ADD COLUMN IF NOT EXISTS stats JSONB;")
+    cur.execute("ALTER TABLE rfq_report ADD COLUMN IF NOT EXISTS updated_at TIMESTAMPTZ;")
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS report_fragment (
+        fragment_key TEXT PRIMARY KEY,
+        html TEXT NOT NULL,
+        created_at TIMESTAMPTZ DEFAULT now(),
+        last_used_at TIMESTAMPTZ DEFAULT now()
+    );
+    """)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_report_fragment_used ON report_fragment(last_used_at);")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_matches_customer_rank ON matches(model_id, customer_node_uuid, match_rank);")
+
+    # --- Bridge API jobs (v1.9) ---
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS agent_job (
+        job_id BIGSERIAL PRIMARY KEY,
+        job_type TEXT NOT NULL,
+        params JSONB DEFAULT '{}',
+        status TEXT DEFAULT 'NEW',
+        result JSONB,
+        error TEXT,
+        submitted_by TEXT,
+        created_at TIMESTAMPTZ DEFAULT now(),
+        started_at TIMESTAMPTZ,
+        finished_at TIMESTAMPTZ
+    );
+    """)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_agent_job_status ON agent_job(job_type, status, job_id);")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_matches_model_id ON matches(model_id, match_id);")
+
+    # --- Profile Runs (v1.9, on-demand profiling) ---
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS profile_runs (
+        profile_id BIGSERIAL PRIMARY KEY,
+        kind TEXT NOT NULL,
+        target TEXT NOT NULL,
+        mode TEXT NOT NULL,
+        format TEXT NOT NULL,
+        duration_ms FLOAT,
+        samples INTEGER,
+        meta JSONB DEFAULT '{}',
+        summary TEXT,
+        data BYTEA NOT NULL,
+        size_bytes INTEGER,
+        created_at TIMESTAMPTZ DEFAULT now()
+    );
+    """)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_profile_runs_created ON profile_runs(created_at DESC);")
+
+    # --- Query Stats (v1.9, agents/db_bridge/tracing.py) ---
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS query_stats (
+        fingerprint TEXT NOT NULL,
+        caller TEXT NOT NULL,
+        query_text TEXT,
+        calls BIGINT DEFAULT 0,
+        total_ms DOUBLE PRECISION DEFAULT 0,
+        max_ms DOUBLE PRECISION DEFAULT 0,
+        rows BIGINT DEFAULT 0,
+        slow_calls BIGINT DEFAULT 0,
+        slow_ms DOUBLE PRECISION,
+        slow_query TEXT,
+        slow_plan JSONB,
+        slow_sampled_at TIMESTAMPTZ,
+        first_seen TIMESTAMPTZ DEFAULT now(),
+        last_seen TIMESTAMPTZ DEFAULT now(),
+        PRIMARY KEY (fingerprint, caller)
+    );
+    """)
+
+    # --- Embedding pipeline keyset paging (v1.9) ---
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_nodes_requirement_keyset ON nodes(created_at, node_uuid) WHERE type = 'requirement';")
+
+    # --- Reduced-precision embeddings (v1.9, pgvector >= 0.7 for halfvec / binary_quantize) ---
+    cur.execute("ALTER TABLE embedding_models ADD COLUMN IF NOT EXISTS storage_mode TEXT NOT NULL DEFAULT 'float32';")
+    cur.execute("ALTER TABLE embedding_models ADD COLUMN IF NOT EXISTS quant_rescore BOOLEAN NOT NULL DEFAULT TRUE;")
+    cur.execute("ALTER TABLE embedding_models ADD COLUMN IF NOT EXISTS quant_agreement REAL;")
+    cur.execute("ALTER TABLE embedding_models ADD COLUMN IF NOT EXISTS quant_checked_at TIMESTAMPTZ;")
+    cur.execute("ALTER TABLE embedding_models ADD COLUMN IF NOT EXISTS quant_min_agreement REAL;")
+    cur.execute("ALTER TABLE embeddings ADD COLUMN IF NOT EXISTS embedding_half halfvec;")
+    cur.execute("ALTER TABLE embeddings ADD COLUMN IF NOT EXISTS embedding_bits BIT VARYING;")
+    cur.execute("ALTER TABLE embeddings ADD COLUMN IF NOT EXISTS embedding_int8 BYTEA;")
+
+    # --- Multi-model embeddings (v1.9): dimension per model, partial HNSW index per model ---
+    cur.execute("DROP INDEX IF EXISTS idx_embeddings_hnsw;")
+    cur.execute("ALTER TABLE embeddings ALTER COLUMN embedding TYPE vector;")
+    cur.execute("SELECT model_id, vector_dims FROM embedding_models;")
+    for model_id, vector_dims in cur.fetchall():
+        cur.execute(f"""
+            CREATE INDEX IF NOT EXISTS idx_embeddings_hnsw_{model_id}
+            ON embeddings USING hnsw ((embedding::vector({vector_dims})) vector_cosine_ops)
+            WHERE model_id = {model_id};
+        """)
+
+    # --- Match runs (v1.9): rank-1 similarity histogram per run, committed thresholds ---
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS match_runs (
+        run_id SERIAL PRIMARY KEY,
+        model_id INT NOT NULL REFERENCES embedding_models(model_id),
+        top_k INT,
+        storage_mode TEXT,
+        customers INT,
+        platforms INT,
+        matched INT,
+        histogram JSONB,
+        bin_width REAL,
+        full_threshold REAL,
+        partial_threshold REAL,
+        thresholds_committed_at TIMESTAMPTZ,
+        started_at TIMESTAMPTZ DEFAULT now(),
+        finished_at TIMESTAMPTZ
+    );
+    """)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_match_runs_model ON match_runs(model_id, run_id DESC);")
+    cur.execute("ALTER TABLE matches ADD COLUMN IF NOT EXISTS run_id INT;")
+
+    # --- Coverage aggregation (v1.9): project IDs on matches + covering index ---
+    cur.execute("ALTER TABLE matches ADD COLUMN IF NOT EXISTS customer_project_id TEXT;")
+    cur.execute("ALTER TABLE matches ADD COLUMN IF NOT EXISTS platform_project_id TEXT;")
+    cur.execute("""
+        UPDATE matches m
+        SET customer_project_id = c.project_id, platform_project_id = p.project_id
+        FROM nodes c, nodes p
+        WHERE c.node_uuid = m.customer_node_uuid
+          AND p.node_uuid = m.platform_node_uuid
+          AND (m.customer_project_id IS NULL OR m.platform_project_id IS NULL);
+    """)
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_matches_coverage
+        ON matches(model_id, customer_project_id, platform_project_id, match_rank)
+        INCLUDE (customer_node_uuid, similarity_score, classification);
+    """)
+
+    # --- Coverage matrix (v1.9): customer x platform project summary per model ---
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS coverage_matrix (
+        model_id INT NOT NULL REFERENCES embedding_models(model_id) ON DELETE CASCADE,
+        customer_project_id TEXT NOT NULL,
+        platform_project_id TEXT NOT NULL,
+        requirements INT NOT NULL DEFAULT 0,
+        mean_best REAL,
+        histogram JSONB,
+        bin_width REAL,
+        customer_fingerprint TEXT,
+        platform_fingerprint TEXT,
+        computed_at TIMESTAMPTZ DEFAULT now(),
+        PRIMARY KEY (model_id, customer_project_id, platform_project_id)
+    );
+    """)
+
+    # --- Hybrid candidates (v1.9): full-text index on requirement content ---
+    cur.execute("""
+        ALTER TABLE nodes ADD COLUMN IF NOT EXISTS content_tsv tsvector
+        GENERATED ALWAYS AS (to_tsvector('simple', COALESCE(content, ''))) STORED;
+    """)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_nodes_content_tsv ON nodes USING gin (content_tsv) WHERE scope = 'platform';")
+    cur.execute("ALTER TABLE match_runs ADD COLUMN IF NOT EXISTS candidates TEXT DEFAULT 'full';")
+    # Thresholds given for a single run (CLI --full-th/--partial-th); never become the committed ones
+    cur.execute("ALTER TABLE match_runs ADD COLUMN IF NOT EXISTS override_full_threshold REAL;")
+    cur.execute("ALTER TABLE match_runs ADD COLUMN IF NOT EXISTS override_partial_threshold REAL;")
+    # Committed thresholds live on the model (runs started before a commit must not revert it)
+    cur.execute("ALTER TABLE embedding_models ADD COLUMN IF NOT EXISTS full_threshold REAL;")
+    cur.execute("ALTER TABLE embedding_models ADD COLUMN IF NOT EXISTS partial_threshold REAL;")
+    cur.execute("ALTER TABLE embedding_models ADD COLUMN IF NOT EXISTS thresholds_committed_at TIMESTAMPTZ;")
+    # Last in-place change of the model's matches outside runs (LLM verdicts, clearing); bridge ETags
+    cur.execute("ALTER TABLE embedding_models ADD COLUMN IF NOT EXISTS matches_changed_at TIMESTAMPTZ;")
+    cur.execute("""
+        UPDATE embedding_models em
+        SET full_threshold = r.full_threshold, partial_threshold = r.partial_threshold,
+            thresholds_committed_at = r.thresholds_committed_at
+        FROM (
+            SELECT DISTINCT ON (model_id) model_id, full_threshold, partial_threshold, thresholds_committed_at
+            FROM match_runs
+            WHERE finished_at IS NOT NULL AND full_threshold IS NOT NULL
+            ORDER BY model_id, run_id DESC
+        ) r
+        WHERE em.model_id = r.model_id AND em.full_threshold IS NULL;
+    """)
+
+    # --- LLM re-ranking of YELLOW matches (v1.9, agents/matching/rerank.py) ---
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS rerank_cache (
+        customer_hash TEXT NOT NULL,
+        platform_hash TEXT NOT NULL,
+        model TEXT NOT NULL,
+        verdict TEXT NOT NULL CHECK (verdict IN ('MATCH', 'PARTIAL', 'NO_MATCH')),
+        score REAL,
+        reason TEXT,
+        created_at TIMESTAMPTZ DEFAULT now(),
+        PRIMARY KEY (customer_hash, platform_hash, model)
+    );
+    """)
+    cur.execute("ALTER TABLE matches ADD COLUMN IF NOT EXISTS rerank_verdict TEXT;")
+    cur.execute("ALTER TABLE matches ADD COLUMN IF NOT EXISTS rerank_score REAL;")
+    cur.execute("ALTER TABLE matches ADD COLUMN IF NOT EXISTS rerank_model TEXT;")
+
+    # --- Match reuse (v1.9): copy top-K of repeated customer text across RFQs ---
+    cur.execute("ALTER TABLE matches ADD COLUMN IF NOT EXISTS customer_content_hash TEXT;")
+    cur.execute("ALTER TABLE match_runs ADD COLUMN IF NOT EXISTS platform_fingerprint TEXT;")
+    cur.execute("ALTER TABLE match_runs ADD COLUMN IF NOT EXISTS reused INT DEFAULT 0;")
+    # Matches of a running run are staged here and swapped into matches when it finishes
+    cur.execute("""
+    CREATE UNLOGGED TABLE IF NOT EXISTS match_staging (
+        run_id INT NOT NULL,
+        model_id INT NOT NULL,
+        customer_node_uuid UUID NOT NULL,
+        platform_node_uuid UUID NOT NULL,
+        similarity_score FLOAT NOT NULL,
+        match_rank INT NOT NULL,
+        classification TEXT,
+        customer_project_id TEXT,
+        platform_project_id TEXT,
+        customer_content_hash TEXT,
+        rerank_verdict TEXT,
+        rerank_score REAL,
+        rerank_model TEXT
+    );
+    """)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_match_staging_run ON match_staging(model_id, run_id);")
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_matches_reuse
+        ON matches(model_id, customer_content_hash, run_id)
+        WHERE match_rank = 1;
+    """)
+
     # --- System Health ---
     cur.execute("""
     CREATE TABLE IF NOT EXISTS system_health (
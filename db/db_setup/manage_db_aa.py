@@ -212,7 +212,7 @@ def init_aa_structure():
                 node_uuid UUID NOT NULL REFERENCES nodes(node_uuid) ON DELETE CASCADE,
                 model_id INT NOT NULL REFERENCES embedding_models(model_id),
                 content_hash TEXT NOT NULL,
-                embedding VECTOR(768),
+                embedding VECTOR,
                 created_at TIMESTAMPTZ DEFAULT NOW(),
                 UNIQUE(node_uuid, model_id, content_hash)
             );
@@ -248,6 +248,16 @@ def init_aa_structure():
             ON CONFLICT (model_name) DO NOTHING;
         """)
 
+        # Vector indexes for nearest-neighbour queries (RAG chat retrieval):
+        # the column has no fixed dimension, so one partial index per model
+        cur.execute("SELECT model_id, vector_dims FROM embedding_models;")
+        for model_id, vector_dims in cur.fetchall():
+            cur.execute(f"""
+                CREATE INDEX IF NOT EXISTS idx_embeddings_hnsw_{model_id}
+                ON embeddings USING hnsw ((embedding::vector({vector_dims})) vector_cosine_ops)
+                WHERE model_id = {model_id};
+            """)
+
         # --- POMOCNÉ INDEXY ---
         cur.execute("CREATE INDEX IF NOT EXISTS idx_nodes_project ON nodes(project_id);")
         cur.execute("CREATE INDEX IF NOT EXISTS idx_links_source ON links(source_uuid);")
@@ -26,15 +26,13 @@ session.init_session_state()
 # Dynamic build date
 build_date = datetime.now().strftime("%Y-%m-%d %H:%M")
 
-# Check Ollama API availability for Mode status
+# Check Ollama API availability for Mode status (via gateway, /api/tags is cached there)
 ollama_mode = "Offline"
 try:
-    ollama_base = os.getenv('OLLAMA_API_BASE', os.getenv('OLLAMA_BASE_URL', ''))
-    if ollama_base:
-        import requests
-        response = requests.get(f"{ollama_base}/api/tags", timeout=2)
-        if response.status_code == 200:
-            ollama_mode = "Online"
+    if os.getenv('OLLAMA_GATEWAY_URL') or os.getenv('OLLAMA_API_BASE') or os.getenv('OLLAMA_BASE_URL'):
+        from agents.ollama_bridge import client as ollama_client
+        ollama_client.list_models(client="web_app", timeout=2)
+        ollama_mode = "Online"
 except Exception as e:
     print(f"[AAT Web] Ollama API check: {e}")
     ollama_mode = "Offline"
@@ -251,3 +249,5 @@ st.markdown("""
 """)
 
 st.markdown("---")
+
+layout.render_footer()
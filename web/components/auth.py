@@ -1,20 +1,12 @@
 import streamlit as st
-import os
-import psycopg2
 from psycopg2.extras import RealDictCursor
+from agents.db_bridge.tracing import connect
 from components import security, session
 
 
 def get_connection():
     """Get database connection to work_aa schema."""
-    return psycopg2.connect(
-        host=os.getenv('DB_HOST'),
-        database=os.getenv('DB_NAME'),
-        user=os.getenv('DB_USER'),
-        password=os.getenv('DB_PASS'),
-        port=os.getenv('DB_PORT'),
-        options="-c search_path=work_aa"
-    )
+    return connect()
 
 
 def login(email: str, password: str) -> bool:
@@ -0,0 +1,228 @@
+"""
+Chat Component
+Version: 1.9.0
+
+Streaming chat with Ollama (through the Ollama gateway) with bounded
+conversation context and per-model latency recording.
+
+RAG mode: the question is embedded once, the most similar requirement nodes
+are fetched with a vector index query and a compact context (within a token
+budget) is sent as system prompt so the answer can cite req_ids.
+"""
+
+import os
+import sys
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
+
+from agents.ollama_bridge import client as ollama_client
+from agents.embedding.embedding_agent import normalize_text, l2_normalize
+from agents.db_bridge.database import (
+    insert_chat_metric,
+    get_chat_latency_by_model,
+    get_or_create_embedding_model,
+    search_similar_requirements
+)
+
+CHAT_CLIENT = "web_chat"
+
+# Conversation context sent with every question
+MAX_CONTEXT_MESSAGES = 20
+MAX_CONTEXT_CHARS = 12000
+
+# RAG settings
+RAG_EMBED_MODEL = 'nomic-embed-text'
+RAG_TOP_N = 8
+RAG_TOKEN_BUDGET = 1500
+RAG_CHARS_PER_TOKEN = 4
+RAG_CACHE_TTL = 600
+RAG_CACHE_SIZE = 256
+
+RAG_SYSTEM_PROMPT = """You are an automotive requirements engineering assistant.
+Answer the question using ONLY the requirements listed below.
+Cite every requirement you use by its ID in square brackets, e.g. [REQ-001].
+If the requirements do not answer the question, say so.
+
+Requirements:
+{context}"""
+
+_retrieval_cache = OrderedDict()
+_retrieval_lock = threading.Lock()
+
+
+def build_chat_context(messages: list, system_prompt: str = None,
+                       max_messages: int = MAX_CONTEXT_MESSAGES,
+                       max_chars: int = MAX_CONTEXT_CHARS) -> list:
+    """
+    Select the most recent messages that fit into the context budget.
+
+    The newest message is always included (truncated if it alone exceeds
+    max_chars). Older messages are dropped first.
+
+    Args:
+        messages: Full chat history [{"role": ..., "content": ...}]
+        system_prompt: Optional system message prepended to the context
+        max_messages: Maximum number of history messages
+        max_chars: Maximum total characters of history messages
+
+    Returns:
+        List of messages for /api/chat
+    """
+    selected = []
+    used = 0
+
+    for message in reversed(messages[-max_messages:]):
+        content = message.get("content", "")
+        if selected and used + len(content) > max_chars:
+            break
+        if not selected and len(content) > max_chars:
+            content = content[-max_chars:]
+        selected.append({"role": message["role"], "content": content})
+        used += len(content)
+
+    selected.reverse()
+
+    if system_prompt:
+        selected.insert(0, {"role": "system", "content": system_prompt})
+
+    return selected
+
+
+def stream_chat_reply(model: str, messages: list, stats: dict, system_prompt: str = None):
+    """
+    Stream the assistant reply for the conversation.
+
+    Yields content pieces (for st.write_stream). stats is filled by the
+    client with TTFT / tokens per second and 'context_messages'.
+    """
+    context = build_chat_context(messages, system_prompt=system_prompt)
+    stats["context_messages"] = len(context)
+
+    yield from ollama_client.chat_stream(
+        context, model,
+        client=CHAT_CLIENT,
+        priority=ollama_client.PRIORITY_INTERACTIVE,
+        stats=stats
+    )
+
+
+def record_chat_metrics(model: str, stats: dict) -> bool:
+    """Persist latency stats of one answer (skipped if nothing was generated)."""
+    if stats.get("ttft_ms") is None:
+        return False
+    return insert_chat_metric(model, stats, stats.get("context_messages", 0))
+
+
+def get_model_latency_table(days: int = 7) -> list:
+    """Per-model TTFT and tokens/sec for comparing interactive latency."""
+    return get_chat_latency_by_model(days)
+
+
+# ============================================================================
+# RAG (retrieval over requirement embeddings)
+# ============================================================================
+
+def question_hash(question: str, embed_model: str, top_n: int, scope: str = None) -> str:
+    """Cache key for retrieval results (whitespace and case insensitive)."""
+    normalized = ' '.join(question.lower().split())
+    key = f"{embed_model}|{top_n}|{scope or 'all'}|{normalized}"
+    return hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+
+def _cache_get(key: str):
+    with _retrieval_lock:
+        entry = _retrieval_cache.get(key)
+        if entry is None:
+            return None
+        stored_at, hits = entry
+        if time.time() - stored_at > RAG_CACHE_TTL:
+            del _retrieval_cache[key]
+            return None
+        _retrieval_cache.move_to_end(key)
+        return hits
+
+
+def _cache_put(key: str, hits: list):
+    with _retrieval_lock:
+        _retrieval_cache[key] = (time.time(), hits)
+        _retrieval_cache.move_to_end(key)
+        while len(_retrieval_cache) > RAG_CACHE_SIZE:
+            _retrieval_cache.popitem(last=False)
+
+
+def retrieve_requirements(question: str, embed_model: str = RAG_EMBED_MODEL,
+                          top_n: int = RAG_TOP_N, scope: str = None) -> dict:
+    """
+    Fetch the requirement nodes most similar to the question.
+
+    Returns:
+        dict with:
+        {
+            "hits": [{req_id, scope, project_id, content, similarity}, ...],
+            "retrieval_ms": time spent embedding + querying,
+            "cached": True if served from the per-question cache
+        }
+    """
+    start = time.perf_counter()
+    key = question_hash(question, embed_model, top_n, scope)
+
+    hits = _cache_get(key)
+    if hits is not None:
+        return {"hits": hits, "retrieval_ms": round((time.perf_counter() - start) * 1000, 1), "cached": True}
+
+    model_id = get_or_create_embedding_model(embed_model)
+    query_text = normalize_text(question)
+    vector = l2_normalize(ollama_client.embed(
+        query_text, embed_model,
+        client=CHAT_CLIENT,
+        priority=ollama_client.PRIORITY_INTERACTIVE,
+        timeout=10
+    ))
+
+    rows = search_similar_requirements(model_id, vector, top_n=top_n, scope=scope) or []
+    hits = [
+        {
+            "req_id": r.get("req_id") or str(r["node_uuid"])[:8],
+            "scope": r.get("scope"),
+            "project_id": r.get("project_id"),
+            "content": r.get("content") or "",
+            "similarity": round(float(r.get("similarity") or 0.0), 3)
+        }
+        for r in rows
+    ]
+    _cache_put(key, hits)
+
+    return {"hits": hits, "retrieval_ms": round((time.perf_counter() - start) * 1000, 1), "cached": False}
+
+
+def build_rag_context(hits: list, token_budget: int = RAG_TOKEN_BUDGET) -> str:
+    """
+    Compact requirement list that fits into token_budget (approx. 4 chars/token).
+    Hits are expected best-first; each line is truncated to fit.
+    """
+    budget = token_budget * RAG_CHARS_PER_TOKEN
+    lines = []
+
+    for hit in hits:
+        header = f"[{hit['req_id']}] ({hit['scope']}, {hit['project_id']}, sim {hit['similarity']:.2f}): "
+        content = ' '.join(hit['content'].split())
+        remaining = budget - len(header)
+        if remaining < 80:
+            break
+        if len(content) > remaining:
+            content = content[:remaining - 3].rsplit(' ', 1)[0] + "..."
+        line = header + content
+        lines.append(line)
+        budget -= len(line) + 1
+
+    return "\n".join(lines)
+
+
+def build_rag_system_prompt(hits: list, token_budget: int = RAG_TOKEN_BUDGET) -> str:
+    """System prompt with the retrieved requirements as grounding context."""
+    context = build_rag_context(hits, token_budget) or "(no matching requirements found)"
+    return RAG_SYSTEM_PROMPT.format(context=context)
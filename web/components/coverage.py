@@ -1,9 +1,10 @@
 """
 Coverage Classification Component
-Version: 1.66
+Version: 1.9
 Task: H.1 - Trace Engine + Coverage Classification + Graphviz generator
 
-Provides coverage summary computation for requirements matching.
+Provides coverage summary computation for requirements matching. Counts are
+aggregated in the database over the matches written by the matching agent.
 """
 
 import os
@@ -13,19 +14,24 @@ import sys
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 
 from agents.db_bridge.database import (
-    list_best_matches,
-    classify_coverage,
+    get_coverage_counts,
+    get_coverage_matrix,
+    get_match_thresholds,
     FULL_MATCH_THRESHOLD,
     PARTIAL_MATCH_THRESHOLD
 )
+from agents.matching.coverage_matrix import refresh_coverage_matrix as run_matrix_refresh
+from components.matching import classify_histogram
 
 
 def compute_coverage_summary(model_id: int, rfq_id: str, platform_id: str) -> dict:
     """
     Compute coverage summary for a given model, RFQ, and platform.
 
-    Uses list_best_matches() to get best match per customer requirement,
-    then classify_coverage() to determine GREEN/YELLOW/RED status.
+    Uses get_coverage_counts(), one grouped query over the best match per
+    customer requirement classified with the committed thresholds; only the
+    counts leave the database. Requirements without a match on the platform
+    count as RED.
 
     Args:
         model_id: The embedding model ID
@@ -35,58 +41,98 @@ def compute_coverage_summary(model_id: int, rfq_id: str, platform_id: str) -> di
     Returns:
         dict with:
         {
-            "total": total number of customer requirements,
-            "green": count of GREEN (full match >= 0.85),
-            "yellow": count of YELLOW (partial match >= 0.65),
-            "red": count of RED (no match < 0.65),
+            "total": total number of customer requirements of the RFQ,
+            "green": count of GREEN (full match),
+            "yellow": count of YELLOW (partial match),
+            "red": count of RED (no match, including unmatched),
+            "unmatched": requirements without any match on the platform,
             "pct_green": percentage of green matches,
             "pct_partial": percentage of yellow matches,
-            "pct_red": percentage of red matches,
-            "details": list of classified matches
+            "pct_red": percentage of red matches
         }
     """
-    try:
-        # Get best matches from database
-        rows = list_best_matches(model_id, rfq_id, platform_id)
-
-        # Classify each match
-        classified = classify_coverage(FULL_MATCH_THRESHOLD, PARTIAL_MATCH_THRESHOLD, rows)
-
-        # Count by color
-        total = len(classified)
-        green = sum(1 for r in classified if r["color"] == "GREEN")
-        yellow = sum(1 for r in classified if r["color"] == "YELLOW")
-        red = sum(1 for r in classified if r["color"] == "RED")
-
-        # Calculate percentages (avoid division by zero)
-        pct_green = round((green / total) * 100, 2) if total > 0 else 0.0
-        pct_partial = round((yellow / total) * 100, 2) if total > 0 else 0.0
-        pct_red = round((red / total) * 100, 2) if total > 0 else 0.0
-
-        return {
-            "total": total,
-            "green": green,
-            "yellow": yellow,
-            "red": red,
-            "pct_green": pct_green,
-            "pct_partial": pct_partial,
-            "pct_red": pct_red,
-            "details": classified
-        }
-
-    except Exception as e:
-        print(f"Error computing coverage summary: {e}")
+    counts = get_coverage_counts(model_id, rfq_id, platform_id)
+    if not counts:
         return {
             "total": 0,
             "green": 0,
             "yellow": 0,
             "red": 0,
+            "unmatched": 0,
             "pct_green": 0.0,
             "pct_partial": 0.0,
             "pct_red": 0.0,
-            "details": [],
-            "error": str(e)
+            "error": "coverage query failed"
+        }
+
+    total = counts["total"]
+    green = counts["green"]
+    yellow = counts["yellow"]
+    red = counts["red"]
+
+    # Calculate percentages (avoid division by zero)
+    pct_green = round((green / total) * 100, 2) if total > 0 else 0.0
+    pct_partial = round((yellow / total) * 100, 2) if total > 0 else 0.0
+    pct_red = round((red / total) * 100, 2) if total > 0 else 0.0
+
+    return {
+        "total": total,
+        "green": green,
+        "yellow": yellow,
+        "red": red,
+        "unmatched": counts["unmatched"],
+        "pct_green": pct_green,
+        "pct_partial": pct_partial,
+        "pct_red": pct_red
+    }
+
+
+def get_coverage_matrix_summary(model_id: int) -> dict:
+    """
+    Coverage of every customer project x platform project pair, read from the
+    coverage_matrix summary table and classified with the committed thresholds.
+
+    Args:
+        model_id: The embedding model ID
+
+    Returns:
+        dict with:
+        {
+            "full_threshold", "partial_threshold": thresholds applied,
+            "computed_at": newest cell refresh (None if the matrix is empty),
+            "cells": list of dicts with customer_project_id, platform_project_id,
+                     total, green, yellow, red, pct_* and mean_best
         }
+    """
+    full_th, partial_th = get_match_thresholds(model_id)
+    cells = []
+    computed_at = None
+    for row in get_coverage_matrix(model_id):
+        counts = classify_histogram(row["histogram"], row["bin_width"], full_th, partial_th)
+        cells.append({
+            "customer_project_id": row["customer_project_id"],
+            "platform_project_id": row["platform_project_id"],
+            "mean_best": row["mean_best"],
+            **counts
+        })
+        if computed_at is None or row["computed_at"] > computed_at:
+            computed_at = row["computed_at"]
+    return {
+        "full_threshold": full_th,
+        "partial_threshold": partial_th,
+        "computed_at": computed_at,
+        "cells": cells
+    }
+
+
+def refresh_coverage_matrix(model: str, force: bool = False) -> dict:
+    """
+    Recompute the coverage matrix cells whose embeddings changed.
+
+    Returns:
+        Dict with cells, refreshed, platforms_scanned, seconds
+    """
+    return run_matrix_refresh(model, force=force)
 
 
 def get_coverage_color(similarity: float) -> str:
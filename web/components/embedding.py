@@ -29,7 +29,6 @@ def generate_embeddings(scope: str = 'all',
 
     return embedding_run_once(
         model=model,
-        vector_dims=768,
         scope=scope_param,
         batch_size=batch_size,
         only_missing=True,
@@ -9,6 +9,7 @@ Supports multiple data types: requirements, architecture, code, tests, links.
 
 import os
 import sys
+import time
 import tempfile
 import importlib.util
 
@@ -23,6 +24,15 @@ _project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '.
 if _project_root not in sys.path:
     sys.path.insert(0, _project_root)
 
+from agents.runtime.metrics import REGISTRY
+
+
+def _record_import(kind: str, result: dict, elapsed: float):
+    """Count imported rows (aat_import_rows_total) and import duration."""
+    rows = (result.get("inserted") or 0) + (result.get("failed") or 0)
+    REGISTRY.counter("aat_import_rows_total", "Rows processed by file imports", kind=kind).inc(rows)
+    REGISTRY.histogram("aat_import_ms", "File import duration (ms)", kind=kind).observe(elapsed * 1000)
+
 
 def _load_module_from_path(module_name: str, file_path: str):
     """Load a Python module from file path (handles 'import' folder name issue)."""
@@ -110,6 +120,7 @@ def import_platform_file(
         tmp.write(uploaded_file_bytes)
         tmp_path = tmp.name
 
+    start = time.perf_counter()
     try:
         # For now, all V-Model data types use platform requirements loader
         # TODO: Implement specific loaders for each V-Model data type (architecture, code, tests, etc.)
@@ -125,6 +136,7 @@ def import_platform_file(
             result["status"] = "success"
             result["platform_id"] = platform_id
             result["data_type"] = data_type
+            _record_import("platform", result, time.perf_counter() - start)
             return result
         else:
             return {"inserted": 0, "failed": 0, "status": f"Unknown data type: {data_type}"}
@@ -153,6 +165,7 @@ def import_customer_file(customer_id: str, uploaded_file_bytes: bytes, filetype:
         tmp.write(uploaded_file_bytes)
         tmp_path = tmp.name
 
+    start = time.perf_counter()
     try:
         if filetype == 'csv':
             result = load_customer_csv(customer_id, tmp_path)
@@ -162,6 +175,7 @@ def import_customer_file(customer_id: str, uploaded_file_bytes: bytes, filetype:
             return {"inserted": 0, "failed": 0, "status": f"Unsupported filetype: {filetype}"}
 
         result["status"] = "success"
+        _record_import("customer", result, time.perf_counter() - start)
         return result
     except Exception as e:
         return {"inserted": 0, "failed": 0, "status": f"Error: {str(e)}"}
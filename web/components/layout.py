@@ -1,9 +1,43 @@
+import os
+import time
+from contextlib import ExitStack
 import streamlit as st
 from components import auth
+from agents.runtime.metrics import REGISTRY, start_metrics_server
+from agents.runtime.profiling import profiled
+
+# Sampling of a page render stops after this long, even if render_footer() is never reached
+PAGE_PROFILE_MAX_SECONDS = float(os.getenv('PAGE_PROFILE_MAX_SECONDS', '60'))
+
+# Web /metrics endpoint (METRICS_PORT), started once per Streamlit process
+start_metrics_server()
+
+
+def _start_page_profile(title: str):
+    """
+    Profile this render if an admin enabled page profiling for the session.
+
+    The sampler ends with the render's script thread or after
+    PAGE_PROFILE_MAX_SECONDS, so abandoned sessions keep no sampler running.
+    """
+    stale = st.session_state.pop("_page_profile", None)
+    if stale:
+        # Previous render stopped early (st.stop/st.rerun): store what was captured
+        stale.close()
+
+    mode = st.session_state.get("profile_pages")
+    if mode:
+        user = auth.get_current_user() or {}
+        stack = ExitStack()
+        stack.enter_context(profiled("page", title, mode=mode, meta={"user": user.get("email")},
+                                     max_seconds=PAGE_PROFILE_MAX_SECONDS))
+        st.session_state["_page_profile"] = stack
 
 
 def render_header(title: str):
-    """Render application header with custom styling."""
+    """Render application header with custom styling (starts the page render timer)."""
+    st.session_state["_page_render"] = (title, time.perf_counter())
+    _start_page_profile(title)
     st.markdown(
         f'<div class="header">{title}</div>',
         unsafe_allow_html=True
@@ -20,3 +54,17 @@ def render_user_info():
         if st.sidebar.button("🚪 Logout", use_container_width=True, type="secondary"):
             auth.logout()
             st.switch_page("app.py")
+
+
+def render_footer():
+    """Record the page render time (aat_page_render_ms) and store a page profile if enabled."""
+    profile = st.session_state.pop("_page_profile", None)
+    if profile:
+        profile.close()
+
+    started = st.session_state.pop("_page_render", None)
+    if started:
+        title, start = started
+        REGISTRY.histogram("aat_page_render_ms", "Streamlit page render time (ms)", page=title).observe(
+            (time.perf_counter() - start) * 1000
+        )
@@ -1,6 +1,6 @@
 """
 Matching Web Component
-Version: 1.70
+Version: 1.9
 """
 
 import sys
@@ -9,37 +9,58 @@ import os
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
 
 from agents.matching.matching_agent import run_once as matching_run_once
-from agents.db_bridge.database import get_match_statistics
+from agents.db_bridge.database import (
+    get_match_statistics,
+    list_embedding_models,
+    get_latest_match_run,
+    commit_match_thresholds,
+    get_yellow_verdicts
+)
 
 
 def run_matching(model: str = 'nomic-embed-text',
                 top_k: int = 5,
-                full_threshold: float = 0.85,
-                partial_threshold: float = 0.65) -> dict:
+                full_threshold: float = None,
+                partial_threshold: float = None,
+                candidates: str = "full",
+                rerank_model: str = None) -> dict:
     """
     Run matching engine.
 
     Args:
         model: Model name
         top_k: Top K matches per customer req
-        full_threshold: GREEN threshold
-        partial_threshold: YELLOW threshold
+        full_threshold: GREEN threshold (default: committed threshold)
+        partial_threshold: YELLOW threshold (default: committed threshold)
+        candidates: 'full' or 'hybrid' (vector + lexical candidates only)
+        rerank_model: Ollama model re-ranking the YELLOW matches (default: none)
 
     Returns:
         Dict with matched, errors counts
     """
     return matching_run_once(
         model=model,
-        vector_dims=768,
         top_k=top_k,
         full_threshold=full_threshold,
         partial_threshold=partial_threshold,
         clear_existing=True,
-        dry_run=False
+        dry_run=False,
+        candidates=candidates,
+        rerank_model=rerank_model
     )
 
 
-def get_coverage_summary(model_id: int = 1) -> dict:
+def get_embedding_models() -> list:
+    """
+    Registered embedding models (model_id, model_name, vector_dims, embeddings count).
+
+    Returns:
+        List of dicts, oldest model first
+    """
+    return list_embedding_models()
+
+
+def get_coverage_summary(model_id: int) -> dict:
     """
     Get coverage summary from matches.
 
@@ -50,3 +71,76 @@ def get_coverage_summary(model_id: int = 1) -> dict:
         Dict with GREEN, YELLOW, RED counts and percentages
     """
     return get_match_statistics(model_id)
+
+
+def get_latest_run(model_id: int) -> dict:
+    """
+    Latest finished matching run of a model (histogram, committed thresholds).
+
+    Returns:
+        Dict from get_latest_match_run(), {} if the model was never matched
+    """
+    return get_latest_match_run(model_id)
+
+
+def classify_histogram(histogram: list, bin_width: float,
+                       full_threshold: float, partial_threshold: float) -> dict:
+    """
+    GREEN/YELLOW/RED counts of a run's rank-1 similarity histogram.
+
+    Exact for thresholds on the bin grid (multiples of bin_width).
+
+    Args:
+        histogram: Counts per bin (bin i covers [i * bin_width, (i + 1) * bin_width))
+        bin_width: Histogram bin width
+        full_threshold: GREEN threshold
+        partial_threshold: YELLOW threshold
+
+    Returns:
+        Dict with total, green, yellow, red counts and percentages
+    """
+    histogram = histogram or []
+    full_bin = int(round(full_threshold / bin_width))
+    partial_bin = min(int(round(partial_threshold / bin_width)), full_bin)
+
+    green = sum(histogram[full_bin:])
+    yellow = sum(histogram[partial_bin:full_bin])
+    red = sum(histogram[:partial_bin])
+    total = green + yellow + red
+
+    def pct(count):
+        return round(count / total * 100, 1) if total else 0
+
+    return {
+        'total': total,
+        'green': green,
+        'yellow': yellow,
+        'red': red,
+        'pct_green': pct(green),
+        'pct_yellow': pct(yellow),
+        'pct_red': pct(red)
+    }
+
+
+def get_verdict_review(model_id: int, full_threshold: float, partial_threshold: float,
+                       verdict: str = None, limit: int = 200) -> tuple:
+    """
+    YELLOW best matches by LLM re-ranking verdict.
+
+    Args:
+        verdict: MATCH, PARTIAL, NO_MATCH, 'NONE' (not judged) or None (all)
+
+    Returns:
+        (counts, rows) from get_yellow_verdicts()
+    """
+    return get_yellow_verdicts(model_id, full_threshold, partial_threshold, verdict=verdict, limit=limit)
+
+
+def commit_thresholds(model_id: int, full_threshold: float, partial_threshold: float) -> int:
+    """
+    Persist thresholds for a model and re-classify its stored matches.
+
+    Returns:
+        Number of matches whose classification changed, -1 on error
+    """
+    return commit_match_thresholds(model_id, full_threshold, partial_threshold)
@@ -3,20 +3,27 @@ from datetime import datetime, timedelta, timezone
 import uuid
 from components import security
 import os
-import psycopg2
+import time
+import select
+import threading
 from psycopg2.extras import RealDictCursor
+from agents.db_bridge.tracing import connect
+
+# In-process session cache (v1.9): avoids one auth query per Streamlit rerun.
+# Entries hold user, roles, expiry and revoked flag; expiry is re-checked on
+# every call, the DB row is re-read after SESSION_CACHE_TTL seconds.
+SESSION_CACHE_TTL = float(os.getenv('SESSION_CACHE_TTL', '30'))
+SESSION_CACHE_MAX = 5000
+SESSION_NOTIFY_CHANNEL = 'aat_session_revoked'
+
+_session_cache = {}
+_session_cache_lock = threading.Lock()
+_listener_started = False
 
 
 def get_connection():
     """Get database connection to work_aa schema."""
-    return psycopg2.connect(
-        host=os.getenv('DB_HOST'),
-        database=os.getenv('DB_NAME'),
-        user=os.getenv('DB_USER'),
-        password=os.getenv('DB_PASS'),
-        port=os.getenv('DB_PORT'),
-        options="-c search_path=work_aa"
-    )
+    return connect()
 
 
 def create_session(user_id: str) -> dict:
@@ -56,9 +63,91 @@ def create_session(user_id: str) -> dict:
         return None
 
 
+def _load_session(session_id: str) -> dict:
+    """
+    Read session, user and roles in one query.
+
+    Returns:
+        Dict with expires_at, revoked and user (incl. roles), or None if the
+        session does not exist
+    """
+    conn = get_connection()
+    try:
+        cur = conn.cursor(cursor_factory=RealDictCursor)
+        cur.execute("""
+            SELECT
+                s.expires_at,
+                s.revoked,
+                u.user_id,
+                u.email,
+                u.full_name,
+                u.is_active,
+                ARRAY_AGG(r.name) as roles
+            FROM app_session s
+            JOIN app_user u ON s.user_id = u.user_id
+            LEFT JOIN app_user_role ur ON u.user_id = ur.user_id
+            LEFT JOIN app_role r ON ur.role_id = r.role_id
+            WHERE s.session_id = %s
+            GROUP BY s.session_id, s.expires_at, s.revoked,
+                     u.user_id, u.email, u.full_name, u.is_active;
+        """, (session_id,))
+        row = cur.fetchone()
+        cur.close()
+    finally:
+        conn.close()
+
+    if not row:
+        return None
+
+    return {
+        'expires_at': row['expires_at'],
+        'revoked': row['revoked'],
+        'user': {
+            'user_id': str(row['user_id']),
+            'email': row['email'],
+            'full_name': row['full_name'],
+            'is_active': row['is_active'],
+            'roles': [r for r in row['roles'] if r is not None]
+        }
+    }
+
+
+def _get_cached_session(session_id: str) -> dict:
+    """Session entry from the cache, loading it from the DB when stale."""
+    now = time.monotonic()
+    with _session_cache_lock:
+        cached = _session_cache.get(session_id)
+    if cached and now - cached[0] < SESSION_CACHE_TTL:
+        return cached[1]
+
+    entry = _load_session(session_id)
+
+    with _session_cache_lock:
+        if len(_session_cache) >= SESSION_CACHE_MAX:
+            # Drop stale entries first, then everything if still full
+            stale = [k for k, (t, _) in _session_cache.items() if now - t >= SESSION_CACHE_TTL]
+            for key in stale:
+                del _session_cache[key]
+            if len(_session_cache) >= SESSION_CACHE_MAX:
+                _session_cache.clear()
+        _session_cache[session_id] = (now, entry)
+
+    return entry
+
+
+def invalidate_session_cache(session_id: str = None):
+    """Drop one session (or all sessions if session_id is None) from the cache."""
+    with _session_cache_lock:
+        if session_id is None:
+            _session_cache.clear()
+        else:
+            _session_cache.pop(str(session_id), None)
+
+
 def validate_session(session_id: str) -> bool:
     """
     Validate if session exists and is not expired or revoked.
+    Served from the in-process session cache (see SESSION_CACHE_TTL).
     
     Args:
         session_id: Session UUID to validate
@@ -67,18 +156,7 @@ def validate_session(session_id: str) -> bool:
         True if session is valid, False otherwise
     """
     try:
-        conn = get_connection()
-        cur = conn.cursor(cursor_factory=RealDictCursor)
-        
-        cur.execute("""
-            SELECT session_id, expires_at, revoked
-            FROM app_session
-            WHERE session_id = %s;
-        """, (session_id,))
-        
-        session = cur.fetchone()
-        cur.close()
-        conn.close()
+        session = _get_cached_session(str(session_id))
         
         if not session:
             return False
@@ -101,10 +179,12 @@ def validate_session(session_id: str) -> bool:
 def revoke_session(session_id: str):
     """
     Revoke a session (logout).
+    Invalidates the local cache and notifies other web processes.
     
     Args:
         session_id: Session UUID to revoke
     """
+    invalidate_session_cache(session_id)
     try:
         conn = get_connection()
         cur = conn.cursor()
@@ -114,17 +194,21 @@ def revoke_session(session_id: str):
             SET revoked = TRUE
             WHERE session_id = %s;
         """, (session_id,))
+        cur.execute("SELECT pg_notify(%s, %s);", (SESSION_NOTIFY_CHANNEL, str(session_id)))
         
         conn.commit()
         cur.close()
         conn.close()
     except Exception as e:
         print(f"Error revoking session: {e}")
+    finally:
+        invalidate_session_cache(session_id)
 
 
 def get_user_from_session(session_id: str) -> dict:
     """
     Get user data from session ID.
+    Served from the in-process session cache (see SESSION_CACHE_TTL).
     
     Args:
         session_id: Session UUID
@@ -133,46 +217,67 @@ def get_user_from_session(session_id: str) -> dict:
         Dictionary with user data and roles, or None if invalid
     """
     try:
-        conn = get_connection()
-        cur = conn.cursor(cursor_factory=RealDictCursor)
-        
-        cur.execute("""
-            SELECT 
-                u.user_id,
-                u.email,
-                u.full_name,
-                u.is_active,
-                ARRAY_AGG(r.name) as roles
-            FROM app_session s
-            JOIN app_user u ON s.user_id = u.user_id
-            LEFT JOIN app_user_role ur ON u.user_id = ur.user_id
-            LEFT JOIN app_role r ON ur.role_id = r.role_id
-            WHERE s.session_id = %s
-                AND s.revoked = FALSE
-                AND s.expires_at > NOW()
-            GROUP BY u.user_id, u.email, u.full_name, u.is_active;
-        """, (session_id,))
-        
-        user = cur.fetchone()
-        cur.close()
-        conn.close()
-        
-        if user:
-            return {
-                'user_id': str(user['user_id']),
-                'email': user['email'],
-                'full_name': user['full_name'],
-                'is_active': user['is_active'],
-                'roles': [r for r in user['roles'] if r is not None]
-            }
-        return None
+        session = _get_cached_session(str(session_id))
+
+        if not session or session['revoked']:
+            return None
+        if datetime.now(timezone.utc) > session['expires_at']:
+            return None
+
+        return dict(session['user'])
     except Exception as e:
         print(f"Error getting user from session: {e}")
         return None
 
 
+def _listen_for_revocations():
+    """Background loop: invalidate cache entries on NOTIFY from other processes."""
+    while True:
+        conn = None
+        try:
+            conn = get_connection()
+            conn.autocommit = True
+            cur = conn.cursor()
+            cur.execute(f"LISTEN {SESSION_NOTIFY_CHANNEL};")
+            # Notifications may have been missed while disconnected
+            invalidate_session_cache()
+
+            while True:
+                if select.select([conn], [], [], 60) == ([], [], []):
+                    continue
+                conn.poll()
+                while conn.notifies:
+                    notify = conn.notifies.pop(0)
+                    invalidate_session_cache(notify.payload)
+        except Exception as e:
+            print(f"Session listener error: {e}")
+            time.sleep(10)
+        finally:
+            if conn:
+                try:
+                    conn.close()
+                except Exception:
+                    pass
+
+
+def start_session_listener():
+    """
+    Start the LISTEN/NOTIFY revocation listener once per process.
+    Optional - enabled with SESSION_CACHE_LISTEN=1.
+    """
+    global _listener_started
+    if _listener_started or os.getenv('SESSION_CACHE_LISTEN', '0') != '1':
+        return
+    with _session_cache_lock:
+        if _listener_started:
+            return
+        _listener_started = True
+    threading.Thread(target=_listen_for_revocations, name="session-listener", daemon=True).start()
+
+
 def init_session_state():
     """Initialize session state variables if not present."""
+    start_session_listener()
     if 'authenticated' not in st.session_state:
         st.session_state.authenticated = False
     if 'user' not in st.session_state:
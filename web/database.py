@@ -1,17 +1,9 @@
-import os
-import psycopg2
 from psycopg2.extras import RealDictCursor
+from agents.db_bridge.tracing import connect
 import time
 
 def get_connection():
-    return psycopg2.connect(
-        host=os.getenv('DB_HOST'),
-        database=os.getenv('DB_NAME'),
-        user=os.getenv('DB_USER'),
-        password=os.getenv('DB_PASS'),
-        port=os.getenv('DB_PORT'),
-        options="-c search_path=work_aa"
-    )
+    return connect()
 
 def get_aa_stats():
     """Vrací statistiky tabulek pro Dashboard"""
@@ -108,3 +108,5 @@ st.markdown("---")
 
 # Additional info
 st.info("Use the navigation menu on the left to access all modules.")
+
+layout.render_footer()
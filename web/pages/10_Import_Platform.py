@@ -247,3 +247,5 @@ with st.expander("CSV/JSONL Format Reference"):
 
 st.markdown("---")
 st.caption("Refer to project documentation for detailed format specifications.")
+
+layout.render_footer()
@@ -86,3 +86,5 @@ One JSON object per line with the same fields.
 
 Example files are available in the project documentation.
 """)
+
+layout.render_footer()
@@ -1,6 +1,6 @@
 """
 Embeddings Generation Page
-Version: 1.8
+Version: 1.9
 Generate vector embeddings for requirements
 """
 
@@ -12,6 +12,7 @@ sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
 
 from components import auth, session, layout
 from components.embedding import generate_embeddings
+from components.matching import get_embedding_models
 
 st.set_page_config(page_title="Embeddings", page_icon="🧠", layout="wide")
 
@@ -37,7 +38,8 @@ with st.expander("ℹ️ About Embeddings", expanded=False):
     st.markdown("""
     **Embeddings** are vector representations of text that capture semantic meaning.
 
-    - Uses Ollama's **nomic-embed-text** model (768 dimensions)
+    - Uses an Ollama embedding model (default **nomic-embed-text**, 768 dimensions); other models
+      are registered on first use with their own dimension and can be compared side by side
     - Required for AI-powered matching between requirements
     - Generates embeddings for all requirements (customer + platform)
     - Skips already-embedded content (deduplication by hash)
@@ -54,6 +56,17 @@ st.markdown("---")
 # Configuration
 st.subheader("⚙️ Configuration")
 
+registered_models = [m['model_name'] for m in get_embedding_models()] or ['nomic-embed-text']
+model_choice = st.selectbox(
+    "Embedding Model",
+    options=registered_models + ["➕ New model..."],
+    help="Registered models; choose 'New model' to embed with another Ollama model"
+)
+if model_choice == "➕ New model...":
+    model_name = st.text_input("Ollama model name", placeholder="e.g. all-minilm").strip()
+else:
+    model_name = model_choice
+
 col1, col2 = st.columns(2)
 
 with col1:
@@ -75,12 +88,12 @@ with col2:
 st.markdown("---")
 
 # Generate button
-if st.button("🚀 Generate Embeddings", type="primary", use_container_width=True):
-    with st.spinner(f"Generating embeddings for {scope} requirements..."):
+if st.button("🚀 Generate Embeddings", type="primary", use_container_width=True, disabled=not model_name):
+    with st.spinner(f"Generating {model_name} embeddings for {scope} requirements..."):
         try:
             result = generate_embeddings(
                 scope=scope,
-                model='nomic-embed-text',
+                model=model_name,
                 batch_size=batch_size
             )
 
@@ -115,12 +128,14 @@ try:
     conn = get_connection()
     cur = conn.cursor(cursor_factory=RealDictCursor)
 
-    # Count embeddings by scope
+    # Count embeddings by model and scope
     cur.execute("""
-        SELECT n.scope, COUNT(e.embedding_id) as count
+        SELECT m.model_name AS model, m.vector_dims AS dims, n.scope, COUNT(e.embedding_id) as count
         FROM embeddings e
         JOIN nodes n ON e.node_uuid = n.node_uuid
-        GROUP BY n.scope
+        JOIN embedding_models m ON m.model_id = e.model_id
+        GROUP BY m.model_name, m.vector_dims, n.scope
+        ORDER BY m.model_name, n.scope
     """)
 
     results = cur.fetchall()
@@ -145,3 +160,5 @@ try:
 
 except Exception as e:
     st.error(f"Error loading status: {e}")
+
+layout.render_footer()
@@ -1,6 +1,6 @@
 """
 Matching Page with G.2 Matching Engine UI
-Version: 1.8.1
+Version: 1.9
 """
 
 import streamlit as st
@@ -10,7 +10,14 @@ import os
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
 
 from components import auth, session, layout
-from components.matching import run_matching, get_coverage_summary
+from components.matching import (
+    run_matching,
+    get_embedding_models,
+    get_latest_run,
+    classify_histogram,
+    commit_thresholds,
+    get_verdict_review
+)
 from agents.db_bridge.database import list_projects
 
 st.set_page_config(page_title="Matching", page_icon="🔗", layout="wide")
@@ -40,12 +47,19 @@ with st.expander("ℹ️ About Matching", expanded=False):
     1. Embeddings must be generated first (see Embeddings page)
     2. Cosine similarity is calculated between customer and platform requirement vectors
     3. Top-K matches are stored for each customer requirement
-    4. Coverage classification is applied based on thresholds
+    4. Coverage classification is derived from the stored similarities and the committed thresholds
 
-    **Classification:**
+    **Classification (default thresholds):**
     - 🟢 **GREEN** (≥0.85): Full match - requirement is covered
     - 🟡 **YELLOW** (≥0.65): Partial match - needs review
     - 🔴 **RED** (<0.65): No match - gap identified
+
+    Threshold changes are previewed instantly from the last run's similarity histogram;
+    **Commit Thresholds** stores them and re-classifies the stored matches (no re-run needed).
+
+    With **LLM Re-ranking** the YELLOW matches of the run are additionally judged by an
+    Ollama model (MATCH / PARTIAL / NO_MATCH); the cosine classification is kept and the
+    verdicts are listed under **YELLOW Review**.
     """)
 
 st.markdown("---")
@@ -94,23 +108,51 @@ st.markdown("""
 Match customer requirements to platform requirements using AI-powered similarity analysis.
 """)
 
+# Embedding model (vector dimension comes from the model registry)
+models = get_embedding_models()
+if models:
+    model_labels = {
+        m['model_id']: f"{m['model_name']} ({m['vector_dims']} dims, {m['embeddings']} embeddings)"
+        for m in models
+    }
+    selected_model_id = st.selectbox(
+        "Embedding Model",
+        options=list(model_labels.keys()),
+        format_func=lambda model_id: model_labels[model_id],
+        help="Model whose embeddings are matched (see Embeddings page)"
+    )
+    selected_model = next(m['model_name'] for m in models if m['model_id'] == selected_model_id)
+else:
+    st.warning("No embedding models registered. Generate embeddings first.")
+    selected_model_id = None
+    selected_model = None
+
 # Configuration
-col1, col2, col3 = st.columns(3)
+col1, col2 = st.columns(2)
 
 with col1:
     top_k = st.slider("Top K Matches", min_value=1, max_value=10, value=5,
-                     help="Number of best matches per customer requirement")
+                      help="Number of best matches per customer requirement")
 
 with col2:
-    green_threshold = st.slider("GREEN Threshold", min_value=0.5, max_value=1.0, value=0.85, step=0.05,
-                                help="Full match threshold")
-
-with col3:
-    yellow_threshold = st.slider("YELLOW Threshold", min_value=0.5, max_value=1.0, value=0.65, step=0.05,
-                                 help="Partial match threshold")
+    candidates = st.selectbox(
+        "Candidates",
+        options=["full", "hybrid"],
+        format_func=lambda c: {"full": "Full (every platform requirement)",
+                               "hybrid": "Hybrid (vector + identifier candidates)"}[c],
+        help="Hybrid scores only the nearest vectors and platform requirements sharing "
+             "part numbers, signal names or ASIL tags - much faster on large platforms"
+    )
+rerank_model = st.text_input(
+    "LLM Re-ranking (optional)",
+    value="",
+    placeholder="e.g. llama3.1:8b",
+    help="Ollama model that judges the YELLOW matches after the run; verdicts are cached per pair"
+).strip() or None
+st.caption("Matches are classified with the committed thresholds (see Coverage Summary below).")
 
 # Only enable if projects are selected
-matching_enabled = selected_customer is not None and selected_platform is not None
+matching_enabled = selected_customer is not None and selected_platform is not None and selected_model is not None
 
 # Run matching
 if st.button("🚀 Run Matching", type="primary", use_container_width=True, disabled=not matching_enabled):
@@ -119,21 +161,30 @@ if st.button("🚀 Run Matching", type="primary", use_container_width=True, disa
     else:
         with st.spinner("Running matching engine..."):
             try:
-                result = run_matching(
-                    model='nomic-embed-text',
-                    top_k=top_k,
-                    full_threshold=green_threshold,
-                    partial_threshold=yellow_threshold
-                )
+                result = run_matching(model=selected_model, top_k=top_k, candidates=candidates,
+                                      rerank_model=rerank_model)
 
                 st.success("✅ Matching completed!")
 
-                col1, col2 = st.columns(2)
+                col1, col2, col3, col4 = st.columns(4)
                 with col1:
                     st.metric("Matches Created", result.get('matched', 0))
                 with col2:
+                    st.metric("Reused Reqs", result.get('reused', 0),
+                              help="Customer requirements whose text was already matched against "
+                                   "the same platform baseline (matches copied)")
+                with col3:
+                    st.metric("Computed Reqs", result.get('computed', 0))
+                with col4:
                     st.metric("Errors", result.get('errors', 0))
 
+                rerank = result.get('rerank')
+                if rerank:
+                    st.info(f"🤖 Re-ranked {rerank.get('pairs', 0)} YELLOW pairs with {rerank.get('llm_model')}: "
+                            f"{rerank.get('cached', 0)} cached, {rerank.get('judged', 0)} judged, "
+                            f"{rerank.get('failed', 0)} failed · {rerank.get('pairs_per_sec', 0)} pairs/s, "
+                            f"{rerank.get('tokens_per_pair')} tokens/pair")
+
             except Exception as e:
                 st.error(f"❌ Error running matching: {str(e)}")
                 with st.expander("Error Details"):
@@ -141,38 +192,116 @@ if st.button("🚀 Run Matching", type="primary", use_container_width=True, disa
 
 st.markdown("---")
 
-# Coverage summary
+# Coverage summary (what-if over the last run's rank-1 similarity histogram)
 st.subheader("📊 Coverage Summary")
 
 try:
-    summary = get_coverage_summary(model_id=1)
+    run = get_latest_run(selected_model_id) if selected_model_id else {}
+    histogram = run.get('histogram') or []
+    bin_width = run.get('bin_width') or 0.01
+
+    if sum(histogram) > 0:
+        committed_green = round(run.get('full_threshold') or 0.85, 2)
+        committed_yellow = round(run.get('partial_threshold') or 0.65, 2)
+
+        col1, col2 = st.columns(2)
+        with col1:
+            green_threshold = st.slider("GREEN Threshold", min_value=0.0, max_value=1.0,
+                                        value=committed_green, step=0.01,
+                                        key=f"green_threshold_{run['run_id']}",
+                                        help="Full match threshold")
+        with col2:
+            yellow_threshold = st.slider("YELLOW Threshold", min_value=0.0, max_value=1.0,
+                                         value=committed_yellow, step=0.01,
+                                         key=f"yellow_threshold_{run['run_id']}",
+                                         help="Partial match threshold")
+
+        if yellow_threshold > green_threshold:
+            st.warning("YELLOW threshold is above GREEN threshold - YELLOW is empty.")
+            yellow_threshold = green_threshold
+
+        summary = classify_histogram(histogram, bin_width, green_threshold, yellow_threshold)
+        committed = classify_histogram(histogram, bin_width, committed_green, committed_yellow)
+        changed = (green_threshold, yellow_threshold) != (committed_green, committed_yellow)
 
-    if summary.get('total', 0) > 0:
         col1, col2, col3, col4 = st.columns(4)
 
         with col1:
             st.metric("Total Requirements", summary['total'])
         with col2:
-            st.metric("🟢 GREEN (Full)", f"{summary['green']} ({summary['pct_green']}%)")
+            st.metric("🟢 GREEN (Full)", f"{summary['green']} ({summary['pct_green']}%)",
+                      delta=summary['green'] - committed['green'] if changed else None)
         with col3:
-            st.metric("🟡 YELLOW (Partial)", f"{summary['yellow']} ({summary['pct_yellow']}%)")
+            st.metric("🟡 YELLOW (Partial)", f"{summary['yellow']} ({summary['pct_yellow']}%)",
+                      delta=summary['yellow'] - committed['yellow'] if changed else None,
+                      delta_color="off")
         with col4:
-            st.metric("🔴 RED (No Match)", f"{summary['red']} ({summary['pct_red']}%)")
+            st.metric("🔴 RED (No Match)", f"{summary['red']} ({summary['pct_red']}%)",
+                      delta=summary['red'] - committed['red'] if changed else None,
+                      delta_color="inverse")
 
-        # Pie chart
+        # Distribution of the best similarity per customer requirement
         try:
             import plotly.graph_objects as go
 
-            fig = go.Figure(data=[go.Pie(
-                labels=['GREEN', 'YELLOW', 'RED'],
-                values=[summary['green'], summary['yellow'], summary['red']],
-                marker=dict(colors=['#4CAF50', '#FFC107', '#F44336'])
-            )])
-
-            fig.update_layout(title='Coverage Classification')
+            edges = [round(i * bin_width, 4) for i in range(len(histogram))]
+            colors = ['#4CAF50' if e >= green_threshold - 1e-9 else
+                      '#FFC107' if e >= yellow_threshold - 1e-9 else '#F44336' for e in edges]
+            first = next((i for i, c in enumerate(histogram) if c), 0)
+
+            fig = go.Figure(data=[go.Bar(x=edges[first:], y=histogram[first:],
+                                         marker=dict(color=colors[first:]), width=bin_width)])
+            fig.add_vline(x=green_threshold, line_dash="dash", line_color="#4CAF50")
+            fig.add_vline(x=yellow_threshold, line_dash="dash", line_color="#FFC107")
+            fig.update_layout(title='Best Match Similarity Distribution',
+                              xaxis_title='Cosine similarity (rank 1)',
+                              yaxis_title='Customer requirements', bargap=0)
             st.plotly_chart(fig, use_container_width=True)
         except ImportError:
-            st.info("Plotly not available for pie chart visualization")
+            st.info("Plotly not available for distribution chart")
+
+        committed_at = run.get('thresholds_committed_at') or run.get('finished_at')
+        st.caption(f"Run {run['run_id']} ({run.get('storage_mode')}, top {run.get('top_k')}), "
+                   f"committed thresholds {committed_green} / {committed_yellow} "
+                   f"since {committed_at:%Y-%m-%d %H:%M}")
+
+        if st.button("💾 Commit Thresholds", disabled=not changed,
+                     help="Store the thresholds and re-classify the stored matches"):
+            reclassified = commit_thresholds(selected_model_id, green_threshold, yellow_threshold)
+            if reclassified < 0:
+                st.error("❌ Failed to commit thresholds")
+            else:
+                st.success(f"✅ Thresholds committed, {reclassified} matches re-classified")
+                st.rerun()
+
+        # YELLOW best matches by LLM re-ranking verdict (committed thresholds)
+        st.markdown("#### 🤖 YELLOW Review")
+        verdict_counts, _ = get_verdict_review(selected_model_id, committed_green, committed_yellow, limit=0)
+        if any(verdict_counts.get(v) for v in ("MATCH", "PARTIAL", "NO_MATCH")):
+            col1, col2, col3, col4 = st.columns(4)
+            with col1:
+                st.metric("LLM: MATCH", verdict_counts.get("MATCH", 0))
+            with col2:
+                st.metric("LLM: PARTIAL", verdict_counts.get("PARTIAL", 0))
+            with col3:
+                st.metric("LLM: NO_MATCH", verdict_counts.get("NO_MATCH", 0))
+            with col4:
+                st.metric("Not judged", verdict_counts.get(None, 0))
+
+            verdict_filter = st.selectbox(
+                "Verdict",
+                options=["ALL", "MATCH", "PARTIAL", "NO_MATCH", "NONE"],
+                format_func=lambda v: {"ALL": "All YELLOW", "NONE": "Not judged"}.get(v, v),
+                help="YELLOW best matches (committed thresholds) by LLM verdict, most similar first"
+            )
+            _, verdict_rows = get_verdict_review(selected_model_id, committed_green, committed_yellow,
+                                                 verdict=None if verdict_filter == "ALL" else verdict_filter)
+            if verdict_rows:
+                st.dataframe(verdict_rows, use_container_width=True, hide_index=True)
+            else:
+                st.info("No YELLOW matches with this verdict.")
+        else:
+            st.caption("No LLM verdicts yet - run matching with LLM Re-ranking.")
 
     else:
         st.info("No matches found yet. Run matching first!")
@@ -181,3 +310,5 @@ except Exception as e:
     st.error(f"Error loading coverage: {e}")
     with st.expander("Error Details"):
         st.code(str(e))
+
+layout.render_footer()
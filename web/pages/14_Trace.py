@@ -329,3 +329,5 @@ Customer Requirement ID: CR-001
 Platform Requirement ID: REQ-PLAT-001
     """)
     st.markdown("This will show the complete traceability from customer requirement CR-001 through the platform requirement REQ-PLAT-001 and down through the entire V-Model.")
+
+layout.render_footer()
@@ -1,8 +1,11 @@
 import streamlit as st
-from components import auth, session, layout
-import requests
+import sys
 import os
-import json
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
+
+from components import auth, session, layout, chat
+from agents.ollama_bridge import client as ollama_client
 
 st.set_page_config(page_title="Chat", page_icon="💬", layout="wide")
 
@@ -25,14 +28,13 @@ st.title("💬 Chat with Ollama")
 if "messages" not in st.session_state:
     st.session_state.messages = []
 
-# Get Ollama API base URL
-ollama_base = os.getenv('OLLAMA_API_BASE', os.getenv('OLLAMA_BASE_URL', 'http://localhost:11434'))
+# Ollama gateway base URL (falls back to Ollama itself)
+ollama_base = ollama_client.get_base_url()
 
-# Check Ollama availability
+# Check Ollama availability (model list is cached by the gateway)
 try:
-    response = requests.get(f"{ollama_base}/api/tags", timeout=2)
-    ollama_available = response.status_code == 200
-    models = response.json().get('models', []) if ollama_available else []
+    models = ollama_client.list_models(client="web_chat", timeout=2)
+    ollama_available = True
 except Exception as e:
     ollama_available = False
     models = []
@@ -52,11 +54,26 @@ if ollama_available:
         st.warning("No models found. Please pull a model first.")
         st.code("ollama pull llama3")
         st.stop()
-    
+
+    # RAG mode: ground answers in imported requirements
+    col1, col2 = st.columns([2, 1])
+    with col1:
+        rag_mode = st.toggle(
+            "📚 Answer from requirements (RAG)",
+            value=False,
+            help="Retrieve the most similar requirements and cite their IDs in the answer"
+        )
+    with col2:
+        rag_scope = st.selectbox("Requirement Scope", ["all", "customer", "platform"], disabled=not rag_mode)
+
     # Display chat messages
     for message in st.session_state.messages:
         with st.chat_message(message["role"]):
             st.markdown(message["content"])
+            if message.get("sources"):
+                with st.expander(f"📎 Sources ({len(message['sources'])})"):
+                    for hit in message["sources"]:
+                        st.markdown(f"**[{hit['req_id']}]** ({hit['scope']}, sim {hit['similarity']:.2f}) {hit['content'][:200]}")
     
     # Chat input
     if prompt := st.chat_input("Ask me anything..."):
@@ -65,43 +82,70 @@ if ollama_available:
         with st.chat_message("user"):
             st.markdown(prompt)
         
-        # Get AI response
+        # Stream AI response (tokens are rendered as they arrive)
         with st.chat_message("assistant"):
-            with st.spinner("Thinking..."):
-                try:
-                    # Call Ollama API
-                    response = requests.post(
-                        f"{ollama_base}/api/generate",
-                        json={
-                            "model": selected_model,
-                            "prompt": prompt,
-                            "stream": False
-                        },
-                        timeout=60
+            stats = {"mode": "plain"}
+            system_prompt = None
+            sources = []
+            try:
+                if rag_mode:
+                    retrieval = chat.retrieve_requirements(
+                        prompt, scope=None if rag_scope == "all" else rag_scope
                     )
-                    
-                    if response.status_code == 200:
-                        result = response.json()
-                        assistant_response = result.get('response', 'No response')
-                        st.markdown(assistant_response)
-                        
-                        # Add assistant response to chat history
-                        st.session_state.messages.append({
-                            "role": "assistant",
-                            "content": assistant_response
-                        })
-                    else:
-                        st.error(f"Error: {response.status_code}")
-                        st.code(response.text)
-                
-                except Exception as e:
-                    st.error(f"Failed to get response: {str(e)}")
-    
+                    sources = retrieval["hits"]
+                    system_prompt = chat.build_rag_system_prompt(sources)
+                    stats["mode"] = "rag"
+                    stats["retrieval_ms"] = retrieval["retrieval_ms"]
+                    st.caption(
+                        f"🔎 Retrieval: {retrieval['retrieval_ms']:.0f} ms"
+                        f"{' (cached)' if retrieval['cached'] else ''} | {len(sources)} requirements"
+                    )
+
+                assistant_response = st.write_stream(
+                    chat.stream_chat_reply(selected_model, st.session_state.messages, stats,
+                                           system_prompt=system_prompt)
+                )
+
+                # Add assistant response to chat history
+                st.session_state.messages.append({
+                    "role": "assistant",
+                    "content": assistant_response,
+                    "sources": sources
+                })
+
+                if sources:
+                    with st.expander(f"📎 Sources ({len(sources)})"):
+                        for hit in sources:
+                            st.markdown(f"**[{hit['req_id']}]** ({hit['scope']}, sim {hit['similarity']:.2f}) {hit['content'][:200]}")
+
+                chat.record_chat_metrics(selected_model, stats)
+
+                if stats.get("ttft_ms") is not None:
+                    st.caption(
+                        f"⏱️ Generation - first token: {stats['ttft_ms']:.0f} ms | "
+                        f"{stats.get('tokens_per_sec') or 0:.1f} tokens/s | "
+                        f"Total: {stats['total_ms'] / 1000:.1f} s | "
+                        f"Context: {stats.get('context_messages', 0)} messages"
+                    )
+
+            except Exception as e:
+                st.error(f"Failed to get response: {str(e)}")
+
     # Clear chat button
     if st.button("Clear Chat History"):
         st.session_state.messages = []
         st.rerun()
 
+    # Interactive latency per model
+    with st.expander("📈 Model Latency (last 7 days)"):
+        latency = chat.get_model_latency_table(days=7)
+        if latency:
+            st.dataframe(latency, use_container_width=True, hide_index=True)
+        else:
+            st.info("No latency data recorded yet.")
+
 else:
     st.warning("Chat is not available. Ollama server is offline.")
     st.info("Please ensure Ollama is running on Linux 2 and accessible.")
+
+layout.render_footer()
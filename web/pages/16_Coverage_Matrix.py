@@ -0,0 +1,153 @@
+"""
+Coverage Matrix Page - coverage of every customer project x platform project
+Version: 1.9
+"""
+
+import streamlit as st
+import sys
+import os
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
+
+from components import auth, session, layout
+from components.matching import get_embedding_models
+from components.coverage import get_coverage_matrix_summary, refresh_coverage_matrix
+
+st.set_page_config(page_title="Coverage Matrix", page_icon="🗺️", layout="wide")
+
+session.init_session_state()
+user = auth.get_current_user()
+
+if not auth.is_authenticated():
+    st.warning("Please login to access the application.")
+    if st.button("Goto Login Page", type="primary"):
+        st.switch_page("pages/99_Login_Logout.py")
+    st.stop()
+
+auth.require_role(["admin", "visitor"])
+
+layout.render_header("Coverage Matrix")
+st.title("🗺️ Coverage Matrix")
+
+with st.expander("ℹ️ About the Coverage Matrix", expanded=False):
+    st.markdown("""
+    GREEN/YELLOW/RED coverage of **every customer project against every platform project**,
+    based on the best match of each customer requirement within the platform.
+
+    The matrix is a stored summary: the matching agent refreshes the cells whose customer or
+    platform embeddings changed after each run, and **Refresh** does the same on demand.
+    Classification uses the thresholds committed on the Matching page.
+    """)
+
+st.markdown("---")
+
+models = get_embedding_models()
+if not models:
+    st.warning("No embedding models registered. Generate embeddings first.")
+    layout.render_footer()
+    st.stop()
+
+model_labels = {m['model_id']: f"{m['model_name']} ({m['vector_dims']} dims)" for m in models}
+col1, col2 = st.columns([3, 1])
+with col1:
+    selected_model_id = st.selectbox(
+        "Embedding Model",
+        options=list(model_labels.keys()),
+        format_func=lambda model_id: model_labels[model_id]
+    )
+selected_model = next(m['model_name'] for m in models if m['model_id'] == selected_model_id)
+
+with col2:
+    st.write("")
+    if st.button("🔄 Refresh", use_container_width=True,
+                 help="Recompute cells whose embeddings changed since the last refresh"):
+        with st.spinner("Refreshing coverage matrix..."):
+            result = refresh_coverage_matrix(selected_model)
+        if result.get('errors'):
+            st.error(f"❌ Refresh failed: {result.get('message', 'see agent logs')}")
+        else:
+            st.success(f"✅ {result['refreshed']} of {result['cells']} cells refreshed "
+                       f"({result['platforms_scanned']} platforms scanned, {result['seconds']}s)")
+
+try:
+    summary = get_coverage_matrix_summary(selected_model_id)
+    cells = summary['cells']
+
+    if not cells:
+        st.info("Coverage matrix is empty. Run matching or press Refresh.")
+        layout.render_footer()
+        st.stop()
+
+    metric = st.radio(
+        "Show",
+        options=["% GREEN", "% GREEN + YELLOW", "Mean best similarity"],
+        horizontal=True
+    )
+
+    def cell_value(cell):
+        if metric == "% GREEN":
+            return cell['pct_green']
+        if metric == "% GREEN + YELLOW":
+            return round(cell['pct_green'] + cell['pct_yellow'], 1)
+        return round(cell['mean_best'], 3) if cell['mean_best'] is not None else None
+
+    customers = sorted({c['customer_project_id'] for c in cells})
+    platforms = sorted({c['platform_project_id'] for c in cells})
+    by_pair = {(c['customer_project_id'], c['platform_project_id']): c for c in cells}
+
+    z = [[cell_value(by_pair[(customer, platform)]) if (customer, platform) in by_pair else None
+          for platform in platforms] for customer in customers]
+
+    try:
+        import plotly.graph_objects as go
+
+        fig = go.Figure(data=go.Heatmap(
+            z=z,
+            x=platforms,
+            y=customers,
+            colorscale=[[0.0, '#F44336'], [0.5, '#FFC107'], [1.0, '#4CAF50']],
+            zmin=0,
+            zmax=1 if metric == "Mean best similarity" else 100,
+            text=[[f"{v}" if v is not None else "" for v in row] for row in z],
+            texttemplate="%{text}",
+            hovertemplate="Customer: %{y}<br>Platform: %{x}<br>" + metric + ": %{z}<extra></extra>"
+        ))
+        fig.update_layout(
+            title=f"Coverage: {metric}",
+            xaxis_title="Platform project",
+            yaxis_title="Customer project",
+            height=max(300, 40 * len(customers) + 150)
+        )
+        st.plotly_chart(fig, use_container_width=True)
+    except ImportError:
+        st.info("Plotly not available for heatmap visualization")
+        st.dataframe([{"Customer": customer, **{p: v for p, v in zip(platforms, row)}}
+                      for customer, row in zip(customers, z)], use_container_width=True)
+
+    # Best platform per customer project (most GREEN, then most YELLOW)
+    st.subheader("🏆 Best Platform per Customer Project")
+    best_rows = []
+    for customer in customers:
+        candidates = [by_pair[(customer, p)] for p in platforms if (customer, p) in by_pair]
+        best = max(candidates, key=lambda c: (c['pct_green'], c['pct_yellow'], c['mean_best'] or 0))
+        best_rows.append({
+            "Customer Project": customer,
+            "Best Platform": best['platform_project_id'],
+            "Requirements": best['total'],
+            "🟢 GREEN %": best['pct_green'],
+            "🟡 YELLOW %": best['pct_yellow'],
+            "🔴 RED %": best['pct_red'],
+            "Mean Best Similarity": best['mean_best']
+        })
+    st.dataframe(best_rows, use_container_width=True, hide_index=True)
+
+    computed_at = summary['computed_at']
+    st.caption(f"Thresholds: GREEN ≥ {summary['full_threshold']}, YELLOW ≥ {summary['partial_threshold']} · "
+               f"last refresh {computed_at:%Y-%m-%d %H:%M}")
+
+except Exception as e:
+    st.error(f"Error loading coverage matrix: {e}")
+    with st.expander("Error Details"):
+        st.code(str(e))
+
+layout.render_footer()
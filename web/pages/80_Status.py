@@ -236,3 +236,5 @@ except Exception as e:
 st.markdown("---")
 st.caption(f"Last refresh: {datetime.fromtimestamp(st.session_state.last_refresh).strftime('%H:%M:%S')}")
 st.caption("Click Refresh button to update status")
+
+layout.render_footer()
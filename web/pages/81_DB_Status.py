@@ -2,6 +2,7 @@ import streamlit as st
 from components import auth, session, layout
 import database
 import pandas as pd
+from agents.db_bridge.database import get_top_queries, reset_query_stats
 
 st.set_page_config(page_title="DB Status", page_icon="🗄️", layout="wide")
 
@@ -44,3 +45,35 @@ if stats:
     st.dataframe(df, use_container_width=True, hide_index=True)
 else:
     st.warning("No data available or database connection error.")
+
+st.markdown("---")
+st.subheader("Top Queries")
+st.caption("Every statement issued through the db_bridge connection factory, grouped by fingerprint and caller. "
+           "Many calls with few rows per call from one caller usually means an N+1 loop.")
+
+col1, col2 = st.columns([3, 1])
+with col1:
+    order_labels = {"total_ms": "Total time", "calls": "Calls", "avg_ms": "Average time", "max_ms": "Max time"}
+    order_by = st.radio("Order by", list(order_labels.keys()), format_func=order_labels.get, horizontal=True)
+with col2:
+    if st.button("🗑️ Reset Statistics", use_container_width=True):
+        if reset_query_stats():
+            st.success("Query statistics reset.")
+
+queries = get_top_queries(limit=50, order_by=order_by)
+if queries:
+    qdf = pd.DataFrame(queries)
+    display_cols = ['caller', 'calls', 'total_ms', 'avg_ms', 'max_ms', 'rows_per_call', 'slow_calls', 'query_text', 'last_seen']
+    st.dataframe(qdf[display_cols], use_container_width=True, hide_index=True)
+
+    slow = [q for q in queries if q.get('slow_plan')]
+    if slow:
+        st.markdown("**Sampled plans of slow statements**")
+        for q in slow:
+            with st.expander(f"{q['caller']} - {q['slow_ms']:.0f} ms ({q['slow_sampled_at']:%Y-%m-%d %H:%M})"):
+                st.code(q['slow_query'], language="sql")
+                st.json(q['slow_plan'])
+else:
+    st.info("No query statistics collected yet.")
+
+layout.render_footer()
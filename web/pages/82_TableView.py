@@ -90,3 +90,5 @@ else:
         if st.button("Next ➡️", disabled=(offset + LIMIT >= total), use_container_width=True):
             st.session_state.table_offset = offset + LIMIT
             st.rerun()
+
+layout.render_footer()
@@ -2,6 +2,7 @@ import streamlit as st
 import pandas as pd
 import sys
 import os
+import gzip
 
 # Add parent directory to path for imports
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -9,6 +10,7 @@ sys.path.append("/app")
 
 from components import auth, session, layout, security
 from agents.db_bridge import database
+from agents.runtime.profiling import PROFILE_MODES, profile_file_name
 
 st.set_page_config(page_title="Admin Panel", page_icon="⚙️", layout="wide")
 
@@ -31,11 +33,12 @@ st.success(f"Welcome, {user['full_name']} (admin)")
 st.markdown("---")
 
 # Create tabs for different sections
-tab1, tab2, tab3, tab4 = st.tabs([
+tab1, tab2, tab3, tab4, tab5 = st.tabs([
     "👥 User Management",
     "🏢 Customer Management",
     "🖥️ Platform Management",
-    "⚙️ System Settings"
+    "⚙️ System Settings",
+    "🔬 Profiling"
 ])
 
 # ============================================================================
@@ -406,3 +409,65 @@ with tab4:
 
     except Exception as e:
         st.error(f"Error loading system info: {e}")
+
+# ============================================================================
+# TAB 5: PROFILING
+# ============================================================================
+with tab5:
+    st.subheader("Profiling")
+    st.caption(
+        "Agents: set AAT_PROFILE=cprofile|sample or run embedding/matching agents with --profile. "
+        "Pages: enable below (applies to your session only)."
+    )
+
+    options = ["off"] + list(PROFILE_MODES)
+    current = st.session_state.get("profile_pages") or "off"
+    page_mode = st.radio("Profile page renders", options, index=options.index(current), horizontal=True)
+    st.session_state.profile_pages = None if page_mode == "off" else page_mode
+
+    st.markdown("---")
+
+    try:
+        runs = database.list_profile_runs(limit=100)
+        if runs:
+            df = pd.DataFrame(runs)
+            df['size_kb'] = (df['size_bytes'] / 1024).round(1)
+            df['duration_ms'] = df['duration_ms'].round(0)
+            display_cols = ['profile_id', 'created_at', 'kind', 'target', 'mode', 'duration_ms', 'samples', 'size_kb']
+            st.dataframe(df[display_cols], use_container_width=True, hide_index=True)
+
+            run_by_id = {r['profile_id']: r for r in runs}
+            selected_id = st.selectbox(
+                "Profile",
+                options=list(run_by_id.keys()),
+                format_func=lambda pid: f"#{pid} {run_by_id[pid]['kind']}/{run_by_id[pid]['target']} ({run_by_id[pid]['mode']})"
+            )
+            selected = run_by_id[selected_id]
+
+            if selected.get('summary'):
+                st.code(selected['summary'], language=None)
+            if selected.get('meta'):
+                with st.expander("Run metadata"):
+                    st.json(selected['meta'])
+
+            col1, col2 = st.columns(2)
+            with col1:
+                profile = database.get_profile_run_data(selected_id)
+                if profile:
+                    st.download_button(
+                        "⬇️ Download" + (" (collapsed stacks for flamegraph.pl / speedscope)"
+                                        if selected['format'] == 'folded' else " (.pstats for snakeviz / flameprof)"),
+                        data=gzip.decompress(profile['data']),
+                        file_name=profile_file_name(selected),
+                        use_container_width=True
+                    )
+            with col2:
+                if st.button("🗑️ Delete Profile", use_container_width=True):
+                    database.delete_profile_runs(profile_id=selected_id)
+                    st.rerun()
+        else:
+            st.info("No profiles captured yet.")
+    except Exception as e:
+        st.error(f"Error loading profiles: {e}")
+
+layout.render_footer()